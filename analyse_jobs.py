@@ -0,0 +1,128 @@
+# analyse_jobs.py  # Kommentar: Hintergrund-Warteschlange für KI-Analysen (lokaler Thread-Pool, Job-Tabelle je Benutzer)
+
+import os  # Kommentar: Env für Worker-Anzahl
+import time  # Kommentar: Zeitstempel/Aufbewahrung
+import uuid  # Kommentar: Job-IDs
+import threading  # Kommentar: Lock für die Job-Tabelle
+from concurrent.futures import ThreadPoolExecutor  # Kommentar: Worker-Pool (Gemini-Aufrufe sind I/O-lastig)
+
+import programm_2_word_output  # Kommentar: PDF-Bytes -> Daten (Analyse im Speicher)
+import fall_speicher  # Kommentar: Ergebnis als Fall ablegen (Neu-Erzeugen ohne neue Analyse)
+import telemetrie  # Kommentar: Stufen-Zeiten je Job
+
+JOB_WORKER = int(os.getenv("ANALYSE_JOB_WORKER", "4"))  # Kommentar: gleichzeitige Analysen im Prozess
+JOB_AUFBEWAHRUNG_S = 6 * 3600  # Kommentar: fertige Jobs nach 6 h vergessen
+JOB_MAX_PRO_BENUTZER = 20  # Kommentar: Schutz gegen Überlaufen der Warteschlange
+
+STATUS_WARTEND = "wartend"  # Kommentar: eingereiht
+STATUS_LAEUFT = "läuft"  # Kommentar: wird bearbeitet
+STATUS_FERTIG = "fertig"  # Kommentar: Ergebnis liegt vor
+STATUS_FEHLER = "fehler"  # Kommentar: Analyse fehlgeschlagen
+
+_jobs = {}  # Kommentar: job_id -> Job-Dict (gemeinsam für alle Sessions)
+_jobs_lock = threading.Lock()  # Kommentar: Lock für _jobs
+_pool = None  # Kommentar: Worker-Pool (bei Bedarf erstellt)
+_pool_lock = threading.Lock()  # Kommentar: Lock für Pool-Erstellung
+
+
+def _pool_holen() -> ThreadPoolExecutor:  # Kommentar: Pool einmal pro Prozess erstellen
+    global _pool  # Kommentar: Modulvariable setzen
+    with _pool_lock:  # Kommentar: nur ein Thread erstellt den Pool
+        if _pool is None:  # Kommentar: noch kein Pool?
+            _pool = ThreadPoolExecutor(max_workers=JOB_WORKER, thread_name_prefix="analyse")  # Kommentar: Pool starten
+        return _pool  # Kommentar: Pool zurückgeben
+
+
+def _aktualisieren(job_id: str, **felder) -> None:  # Kommentar: Job-Felder threadsicher setzen
+    with _jobs_lock:  # Kommentar: Tabelle exklusiv
+        job = _jobs.get(job_id)  # Kommentar: Job holen
+        if job is not None:  # Kommentar: existiert noch?
+            job.update(felder)  # Kommentar: Felder setzen
+
+
+def _teilfeld_setzen(job_id: str, key: str, wert: str) -> None:  # Kommentar: Gestreamtes Feld im Job ablegen (neues Dict, damit Kopien der UI stabil bleiben)
+    with _jobs_lock:  # Kommentar: Tabelle exklusiv
+        job = _jobs.get(job_id)  # Kommentar: Job holen
+        if job is not None:  # Kommentar: existiert noch?
+            job["teildaten"] = {**job["teildaten"], key: wert}  # Kommentar: ersetzen statt ändern
+
+
+def _job_ausfuehren(job_id: str, pdf_bytes: bytes, auswahl: str, steuerstatus: str, benutzer: str, dateiname: str) -> None:  # Kommentar: Worker: eine Analyse durchführen
+    _aktualisieren(job_id, status=STATUS_LAEUFT, gestartet=time.time())  # Kommentar: Status setzen
+    info = {}  # Kommentar: Versuche/Wartezeiten des KI-Aufrufs
+    bei_feld = lambda key, wert: _teilfeld_setzen(job_id, key, wert)  # Kommentar: Felder schon während des Streamings anzeigen
+    try:  # Kommentar: Fehler im Job-Dict ablegen (nie den Worker abstürzen lassen)
+        with telemetrie.job("analyse", job_id=job_id[:12], auswahl=auswahl, pdf_bytes=len(pdf_bytes)):  # Kommentar: Stufen dieser Analyse erfassen
+            daten = programm_2_word_output.daten_aus_pdf_bytes(pdf_bytes, auswahl, steuerstatus, info, bei_feld)  # Kommentar: Analyse
+        fall_id = fall_speicher.fall_anlegen(  # Kommentar: Fall ablegen (Extraktion + Antwort nur dort, nicht in der Job-Tabelle)
+            benutzer, dateiname, auswahl, steuerstatus, daten, info.pop("ki_text", ""), info.pop("extraktion", ""), info.get("pdf_sha256", "")
+        )  # Kommentar: Ende fall_anlegen
+        _aktualisieren(job_id, status=STATUS_FERTIG, daten=daten, info=info, fall_id=fall_id, beendet=time.time())  # Kommentar: Ergebnis speichern
+    except Exception as e:  # Kommentar: Fehlerfall
+        info.pop("ki_text", None)  # Kommentar: große Texte nicht in der Job-Tabelle halten
+        info.pop("extraktion", None)  # Kommentar: dito
+        _aktualisieren(job_id, status=STATUS_FEHLER, fehler=str(e), info=info, beendet=time.time())  # Kommentar: Fehler speichern
+
+
+def _aufraeumen() -> None:  # Kommentar: Alte abgeschlossene Jobs entfernen (unter Lock aufrufen)
+    grenze = time.time() - JOB_AUFBEWAHRUNG_S  # Kommentar: Zeitgrenze
+    for job_id in [j for j, job in _jobs.items() if job.get("beendet") and job["beendet"] < grenze]:  # Kommentar: abgelaufene Jobs
+        del _jobs[job_id]  # Kommentar: entfernen
+
+
+def job_einreichen(benutzer: str, dateiname: str, pdf_bytes: bytes, auswahl: str, steuerstatus: str, vorlage_pfad: str) -> str:  # Kommentar: Analyse einreihen, Job-ID zurückgeben
+    with _jobs_lock:  # Kommentar: Tabelle exklusiv
+        _aufraeumen()  # Kommentar: alte Jobs entfernen
+        offen = sum(1 for job in _jobs.values() if job["benutzer"] == benutzer and job["status"] in (STATUS_WARTEND, STATUS_LAEUFT))  # Kommentar: offene Jobs des Benutzers
+        if offen >= JOB_MAX_PRO_BENUTZER:  # Kommentar: Limit erreicht?
+            raise RuntimeError(f"Zu viele offene Analysen ({offen}). Bitte warten.")  # Kommentar: Fehler
+        job_id = uuid.uuid4().hex  # Kommentar: neue ID
+        _jobs[job_id] = {  # Kommentar: Job-Dict
+            "id": job_id,  # Kommentar: ID
+            "benutzer": benutzer,  # Kommentar: Eigentümer
+            "dateiname": dateiname,  # Kommentar: Anzeige
+            "auswahl": auswahl,  # Kommentar: Variante
+            "steuerstatus": steuerstatus,  # Kommentar: Steuerstatus
+            "vorlage_pfad": vorlage_pfad,  # Kommentar: Vorlage
+            "status": STATUS_WARTEND,  # Kommentar: Status
+            "eingereicht": time.time(),  # Kommentar: Zeitpunkt
+            "gestartet": None,  # Kommentar: Start
+            "beendet": None,  # Kommentar: Ende
+            "daten": None,  # Kommentar: Ergebnis
+            "teildaten": {},  # Kommentar: bereits gestreamte Felder (vor dem Ergebnis)
+            "fehler": "",  # Kommentar: Fehlertext
+            "fall_id": None,  # Kommentar: Fall im Fall-Speicher (nach Erfolg)
+            "info": {},  # Kommentar: Versuche/Wartezeiten (Limiter, Backoff)
+        }  # Kommentar: Ende Job
+    _pool_holen().submit(_job_ausfuehren, job_id, pdf_bytes, auswahl, steuerstatus, benutzer, dateiname)  # Kommentar: an Worker übergeben (PDF nur im Auftrag, nicht in der Tabelle)
+    return job_id  # Kommentar: ID zurückgeben
+
+
+def jobs_des_benutzers(benutzer: str) -> list[dict]:  # Kommentar: Kopien der Jobs eines Benutzers (neueste zuerst)
+    with _jobs_lock:  # Kommentar: Tabelle exklusiv
+        jobs = [dict(job) for job in _jobs.values() if job["benutzer"] == benutzer]  # Kommentar: nur eigene Jobs
+    return sorted(jobs, key=lambda job: job["eingereicht"], reverse=True)  # Kommentar: neueste zuerst
+
+
+def job_holen(job_id: str, benutzer: str) -> dict | None:  # Kommentar: einzelnen Job (nur für Eigentümer)
+    with _jobs_lock:  # Kommentar: Tabelle exklusiv
+        job = _jobs.get(job_id)  # Kommentar: Job holen
+        if job is None or job["benutzer"] != benutzer:  # Kommentar: fehlt oder fremd?
+            return None  # Kommentar: nichts
+        return dict(job)  # Kommentar: Kopie
+
+
+def job_entfernen(job_id: str, benutzer: str) -> None:  # Kommentar: Job aus der Tabelle löschen (z.B. nach Übernahme)
+    with _jobs_lock:  # Kommentar: Tabelle exklusiv
+        job = _jobs.get(job_id)  # Kommentar: Job holen
+        if job is not None and job["benutzer"] == benutzer:  # Kommentar: nur eigene Jobs
+            del _jobs[job_id]  # Kommentar: löschen
+
+
+def warteschlange_statistik() -> dict:  # Kommentar: Anzahl Jobs je Status (für Debug-Anzeige)
+    with _jobs_lock:  # Kommentar: Tabelle exklusiv
+        stats = {}  # Kommentar: Status -> Anzahl
+        for job in _jobs.values():  # Kommentar: Jobs iterieren
+            stats[job["status"]] = stats.get(job["status"], 0) + 1  # Kommentar: zählen
+    stats["worker"] = JOB_WORKER  # Kommentar: Konfiguration
+    return stats  # Kommentar: Statistik zurückgeben
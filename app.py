@@ -1,33 +1,41 @@
 # app.py  # Kommentar: Streamlit App (Upload -> KI Analyse -> Korrektur -> Word erzeugen)
 
 import os  # Kommentar: Für Dateipfade und Ordner
-import json  # Kommentar: Für JSON (Users / KI-Zwischenformat)
 import time  # Kommentar: Für Timing (optional)
-import hashlib  # Kommentar: Für PBKDF2 Passwort-Hashing (ohne externe Library)
-import hmac  # Kommentar: Für konstanten Zeitvergleich beim Login
-import secrets  # Kommentar: Für kryptografisch sicheren Salt
 from datetime import datetime  # Kommentar: Für Zeitstempel bei Dateinamen
 import streamlit as st  # Kommentar: Streamlit UI
 
 import config  # Kommentar: Konfigurationsdatei (Ordnerpfade / Vorlagenordner)
 import programm_1_ki_input  # Kommentar: Programm 1: PDF -> KI -> _ki.txt
 import programm_2_word_output  # Kommentar: Programm 2: JSON -> DOCX
+import ki_cache  # Kommentar: KI-Cache (nur für Debug-Statistik)
+import ki_limiter  # Kommentar: Gemeinsamer Gemini-Ratenbegrenzer (Debug-Anzeige)
+import user_store  # Kommentar: Benutzer-Speicher (SQLite/JSON) + Passwort-Hashing
+import analyse_jobs  # Kommentar: Hintergrund-Warteschlange für Analysen
+import telemetrie  # Kommentar: Stufen-Zeiten je Job (Debug-Anzeige, Metriken)
+import fall_speicher  # Kommentar: Gespeicherte Fälle (Neu-Erzeugen ohne neue Analyse)
+import pdf_konverter  # Kommentar: optional: Schreiben zusätzlich als PDF (warmer LibreOffice-Pool)
+import kontext_cache  # Kommentar: Prompt-Kontext-Cache (Debug-Anzeige)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Kommentar: Basisverzeichnis des Projekts
 EINGANGS_ORDNER = config.EINGANGS_ORDNER  # Kommentar: PDF Eingang
 KI_ANTWORT_ORDNER = config.KI_ANTWORT_ORDNER  # Kommentar: KI Antworten Ordner
 AUSGANGS_ORDNER = os.path.join(BASE_DIR, "ausgang_schreiben")  # Kommentar: DOCX Ausgabe Ordner
 
-os.makedirs(EINGANGS_ORDNER, exist_ok=True)  # Kommentar: Ordner anlegen (falls nicht vorhanden)
-os.makedirs(KI_ANTWORT_ORDNER, exist_ok=True)  # Kommentar: Ordner anlegen (falls nicht vorhanden)
-os.makedirs(AUSGANGS_ORDNER, exist_ok=True)  # Kommentar: Ordner anlegen (falls nicht vorhanden)
-
 st.set_page_config(page_title="Kfz-Gutachten → Anwaltsschreiben", layout="centered")  # Kommentar: Streamlit Setup
 
-USERS_FILE = os.path.join(BASE_DIR, "users.json")  # Kommentar: User-Speicherdatei (Hash + Salt)
-PBKDF2_ITERATIONS = 200_000  # Kommentar: PBKDF2 Iterationen (MVP-sicher)
-PBKDF2_ALGO = "sha256"  # Kommentar: PBKDF2 Hash Algorithmus
-SALT_BYTES = 16  # Kommentar: Salt Länge (Bytes)
+@st.cache_resource  # Kommentar: einmal pro Server-Prozess statt bei jedem Rerun
+def ordner_anlegen() -> None:  # Kommentar: Arbeitsordner sicherstellen
+    os.makedirs(EINGANGS_ORDNER, exist_ok=True)  # Kommentar: Ordner anlegen (falls nicht vorhanden)
+    os.makedirs(KI_ANTWORT_ORDNER, exist_ok=True)  # Kommentar: Ordner anlegen (falls nicht vorhanden)
+    os.makedirs(AUSGANGS_ORDNER, exist_ok=True)  # Kommentar: Ordner anlegen (falls nicht vorhanden)
+
+ordner_anlegen()  # Kommentar: Ordner anlegen (nur beim ersten Lauf)
+telemetrie.metriken_server_starten()  # Kommentar: /metrics (nur wenn TELEMETRIE_METRIKEN_PORT gesetzt, einmal pro Prozess)
+
+JOB_POLL_SEKUNDEN = 2  # Kommentar: Abfrageintervall für den Job-Status
+VORLAGEN_PFAD_TTL_S = 300  # Kommentar: Vorlagenpfade so lange cachen (neue/verschobene Vorlagen nach spätestens 5 min sichtbar)
+SUMMEN_VORSCHAU_EINTRAEGE = 256  # Kommentar: max. gemerkte Summen-Vorschauen (klein, nur Beträge)
 
 # ==========================
 # Prompt-Baustein (nur Anzeige / Copy-Paste in Programm 1)
@@ -84,79 +92,20 @@ FORMAT:
 """
 
 # ==========================
-# Helper: JSON atomar schreiben
-# ==========================
-def _atomic_write_json(path: str, data: dict) -> None:  # Kommentar: JSON atomar speichern (verhindert kaputte Datei)
-    tmp = path + ".tmp"  # Kommentar: Temp-Datei
-    with open(tmp, "w", encoding="utf-8") as f:  # Kommentar: Temp-Datei öffnen
-        json.dump(data, f, ensure_ascii=False, indent=2)  # Kommentar: JSON schreiben
-    os.replace(tmp, path)  # Kommentar: Temp-Datei atomar ersetzen
-
-# ==========================
-# User Storage
+# User Storage (user_store: SQLite/JSON, Hashing im Worker-Pool)
 # ==========================
-def load_users() -> dict:  # Kommentar: Users.json laden
-    if not os.path.isfile(USERS_FILE):  # Kommentar: Wenn Datei nicht existiert
-        return {}  # Kommentar: Dann leeres Dict
-    try:  # Kommentar: Fehler abfangen
-        with open(USERS_FILE, "r", encoding="utf-8") as f:  # Kommentar: Datei öffnen
-            data = json.load(f)  # Kommentar: JSON laden
-        if isinstance(data, dict):  # Kommentar: Format check
-            return data  # Kommentar: Zurückgeben
-    except Exception:  # Kommentar: Fehlerfall
-        return {}  # Kommentar: Fallback
-    return {}  # Kommentar: Fallback
-
-def save_users(users: dict) -> None:  # Kommentar: Users speichern
-    _atomic_write_json(USERS_FILE, users)  # Kommentar: Atomar schreiben
-
-def valid_username(name: str) -> bool:  # Kommentar: Username validieren
-    if not name or len(name) < 3 or len(name) > 32:  # Kommentar: Längencheck
-        return False  # Kommentar: Ungültig
-    for ch in name:  # Kommentar: Zeichen prüfen
-        if not (ch.isalnum() or ch in ["_", "-"]):  # Kommentar: Nur alnum/_/-
-            return False  # Kommentar: Ungültig
-    return True  # Kommentar: Gültig
-
-def valid_password(pw: str) -> bool:  # Kommentar: Passwort validieren
-    return isinstance(pw, str) and len(pw) >= 10  # Kommentar: Mindestlänge
-
-def pbkdf2_hash_password(password: str, salt_hex: str) -> str:  # Kommentar: PBKDF2 Hash berechnen
-    salt = bytes.fromhex(salt_hex)  # Kommentar: Salt hex -> bytes
-    dk = hashlib.pbkdf2_hmac(PBKDF2_ALGO, password.encode("utf-8"), salt, PBKDF2_ITERATIONS)  # Kommentar: Ableitung
-    return dk.hex()  # Kommentar: Rückgabe als hex
-
-def create_password_record(password: str) -> dict:  # Kommentar: Record erstellen (salt + hash)
-    salt_hex = secrets.token_bytes(SALT_BYTES).hex()  # Kommentar: Salt erzeugen
-    pw_hash_hex = pbkdf2_hash_password(password, salt_hex)  # Kommentar: Hash erzeugen
-    return {"salt": salt_hex, "hash": pw_hash_hex}  # Kommentar: Record zurückgeben
-
-def check_password(password: str, record: dict) -> bool:  # Kommentar: Passwort prüfen
-    if not isinstance(record, dict):  # Kommentar: Typcheck
-        return False  # Kommentar: Ungültig
-    salt_hex = record.get("salt", "")  # Kommentar: Salt holen
-    stored_hash = record.get("hash", "")  # Kommentar: Hash holen
-    if not salt_hex or not stored_hash:  # Kommentar: Wenn fehlt
-        return False  # Kommentar: Ungültig
-    candidate = pbkdf2_hash_password(password, salt_hex)  # Kommentar: Kandidatenhash
-    return hmac.compare_digest(candidate, stored_hash)  # Kommentar: Konstanter Vergleich
-
 def register_user(username: str, pw: str) -> tuple[bool, str]:  # Kommentar: Registrieren
-    users = load_users()  # Kommentar: Users laden
-    if not valid_username(username):  # Kommentar: Username prüfen
-        return False, "Benutzername ungültig (3–32 Zeichen, nur a-z A-Z 0-9 _ -)."  # Kommentar: Meldung
-    if username in users:  # Kommentar: Existiert bereits?
-        return False, "Benutzername existiert bereits."  # Kommentar: Meldung
-    if not valid_password(pw):  # Kommentar: Passwort prüfen
-        return False, "Passwort zu kurz (mindestens 10 Zeichen)."  # Kommentar: Meldung
-    users[username] = create_password_record(pw)  # Kommentar: Hash+Salt speichern
-    save_users(users)  # Kommentar: Persistieren
-    return True, "Registrierung erfolgreich. Du kannst dich jetzt einloggen."  # Kommentar: OK
+    try:  # Kommentar: Überlast im Hash-Pool abfangen
+        return user_store.register_user(username, pw)  # Kommentar: Validierung + transaktionales Anlegen
+    except RuntimeError as e:  # Kommentar: Warteschlange voll
+        return False, str(e)  # Kommentar: Meldung
 
 def login_user(username: str, pw: str) -> tuple[bool, str]:  # Kommentar: Login
-    users = load_users()  # Kommentar: Users laden
-    record = users.get(username)  # Kommentar: Record holen
-    if not record or not check_password(pw, record):  # Kommentar: Check
+    try:  # Kommentar: Überlast im Hash-Pool abfangen
+        ok = user_store.login_pruefen(username, pw)  # Kommentar: Index-Lookup + PBKDF2 im Pool
+    except RuntimeError as e:  # Kommentar: Warteschlange voll
+        return False, str(e)  # Kommentar: Meldung
+    if not ok:  # Kommentar: Check
         return False, "Benutzername oder Passwort falsch."  # Kommentar: Einheitliche Meldung
     st.session_state["logged_in"] = True  # Kommentar: Session setzen
     st.session_state["username"] = username  # Kommentar: Username setzen
@@ -165,29 +114,34 @@ def login_user(username: str, pw: str) -> tuple[bool, str]:  # Kommentar: Login
 # ==========================
 # Vorlagen-Auswahl
 # ==========================
-VORLAGEN = {  # Kommentar: Deine 6 Varianten
-    "Fiktive Abrechnung (Reparaturschaden)": "vorlage_fiktive_abrechnung.docx",  # Kommentar: Variante 1
-    "Konkrete Abrechnung < WBW": "vorlage_konkret_unter_wbw.docx",  # Kommentar: Variante 2
-    "130%-Regelung": "vorlage_130_prozent.docx",  # Kommentar: Variante 3
-    "Totalschaden fiktiv": "vorlage_totalschaden_fiktiv.docx",  # Kommentar: Variante 4
-    "Totalschaden konkret": "vorlage_totalschaden_konkret.docx",  # Kommentar: Variante 5
-    "Totalschaden Ersatzbeschaffung": "vorlage_schreibentotalschaden.docx"  # Kommentar: Variante 6
-}  # Kommentar: Ende Vorlagen
+VORLAGEN = config.VORLAGEN  # Kommentar: Deine 6 Varianten (zentral in config)
 
+@st.cache_data(ttl=VORLAGEN_PFAD_TTL_S, show_spinner=False)  # Kommentar: Dateisystem-Prüfungen nicht bei jedem Rerun
 def resolve_vorlage_pfad(auswahl: str) -> str:  # Kommentar: Auswahl -> Pfad
-    if auswahl not in VORLAGEN:  # Kommentar: Check
-        raise ValueError(f"Unbekannte Auswahl: {auswahl}")  # Kommentar: Fehler
-    dateiname = VORLAGEN[auswahl]  # Kommentar: Dateiname
-    if getattr(config, "VORLAGEN_ORDNER", None):  # Kommentar: Wenn Vorlagenordner gesetzt
-        pfad1 = os.path.join(config.VORLAGEN_ORDNER, dateiname)  # Kommentar: Pfad
-        if os.path.isfile(pfad1):  # Kommentar: Existiert?
-            return pfad1  # Kommentar: Treffer
-    pfad2 = os.path.join(BASE_DIR, dateiname)  # Kommentar: Fallback in BASE_DIR
-    if os.path.isfile(pfad2):  # Kommentar: Existiert?
-        return pfad2  # Kommentar: Treffer
-    if os.path.isabs(dateiname) and os.path.isfile(dateiname):  # Kommentar: Absoluter Pfad
-        return dateiname  # Kommentar: Treffer
-    raise FileNotFoundError(f"Vorlage nicht gefunden: {dateiname}")  # Kommentar: Fehler
+    return programm_2_word_output.resolve_vorlage_pfad(auswahl)  # Kommentar: gemeinsame Logik aus Programm 2
+
+@st.cache_data(max_entries=SUMMEN_VORSCHAU_EINTRAEGE, show_spinner=False)  # Kommentar: gleiche Beträge -> gleiche Vorschau (kein erneutes Rechnen)
+def summen_vorschau(betraege: tuple[tuple[str, str], ...], auswahl: str, steuerstatus: str, zus_bez: str, zus_betrag: str) -> dict:  # Kommentar: Schlüssel = nur summenrelevante Eingaben
+    return programm_2_word_output.summen_vorschau(dict(betraege), auswahl, steuerstatus, zus_bez, zus_betrag)  # Kommentar: ohne Vorlage/Render
+
+# ==========================
+# Gemeinsame Ressourcen
+# ==========================
+@st.cache_resource  # Kommentar: einmal pro Server-Prozess (für alle Sessions)
+def gemini_client_holen():  # Kommentar: Gemeinsamen Gemini-Client vorab erstellen
+    try:  # Kommentar: fehlender Key soll die App nicht blockieren
+        return programm_1_ki_input.get_gemini_client()  # Kommentar: gleicher Client wie in Programm 1/Batch
+    except Exception as e:  # Kommentar: Fehlerfall
+        print("[DEBUG] Gemini-Client nicht erstellt:", repr(e))  # Kommentar: loggen
+        return None  # Kommentar: wird beim ersten Aufruf erneut versucht
+
+@st.cache_resource  # Kommentar: einmal pro Server-Prozess
+def pdf_pool_holen():  # Kommentar: PDF-Pool anlegen und vorwärmen (None = PDF-Ausgabe aus/nicht verfügbar)
+    if not pdf_konverter.PDF_KONVERTER_AKTIV or not pdf_konverter.verfuegbar():  # Kommentar: abgeschaltet oder LibreOffice fehlt
+        return None  # Kommentar: nur DOCX
+    pool = pdf_konverter.pool_holen()  # Kommentar: gemeinsamer Pool
+    pool.vorwaermen()  # Kommentar: soffice im Hintergrund starten
+    return pool  # Kommentar: zurückgeben
 
 # ==========================
 # Datei-Cleanup
@@ -201,18 +155,18 @@ def cleanup_files(*paths: str) -> None:  # Kommentar: Dateien löschen
                 pass  # Kommentar: MVP
 
 # ==========================
-# Wrapper: DOCX aus korrigierten Daten erzeugen (robust)
+# Wrapper: DOCX aus korrigierten Daten erzeugen (im Speicher)
 # ==========================
-def generate_docx_from_corrected_data(  # Kommentar: Erzeugt DOCX aus Daten, egal ob programm_2 generate_from_data existiert
+def generate_docx_from_corrected_data(  # Kommentar: Erzeugt DOCX-Bytes aus korrigierten Daten (ohne Temp-Dateien)
     daten: dict,  # Kommentar: Korrigierte Daten
     vorlage_pfad: str,  # Kommentar: Vorlagepfad
     auswahl: str,  # Kommentar: Variante
     steuerstatus: str,  # Kommentar: Steuerstatus
     zus_bez: str,  # Kommentar: Zusatzkosten-Bezeichnung
     zus_betrag: str,  # Kommentar: Zusatzkosten-Betrag
-) -> str:  # Kommentar: Gibt Pfad zur DOCX zurück
-    if hasattr(programm_2_word_output, "generate_from_data"):  # Kommentar: Wenn Funktion existiert
-        return programm_2_word_output.generate_from_data(  # Kommentar: Direkt nutzen
+) -> bytes:  # Kommentar: Gibt DOCX-Bytes zurück
+    with telemetrie.job("schreiben", auswahl=auswahl):  # Kommentar: Vorbereitung/Render/Schrift messen
+        return programm_2_word_output.generate_from_data(  # Kommentar: Direkt im Speicher rendern
             daten=daten,  # Kommentar: Daten
             vorlage_pfad=vorlage_pfad,  # Kommentar: Vorlage
             auswahl=auswahl,  # Kommentar: Variante
@@ -220,22 +174,6 @@ def generate_docx_from_corrected_data(  # Kommentar: Erzeugt DOCX aus Daten, ega
             zus_bez=zus_bez,  # Kommentar: Zusatzname
             zus_betrag=zus_betrag,  # Kommentar: Zusatzbetrag
         )  # Kommentar: Return
-    tmp_name = f"corrected_{datetime.now().strftime('%Y%m%d_%H%M%S')}_ki.txt"  # Kommentar: Temp-Dateiname
-    tmp_path = os.path.join(KI_ANTWORT_ORDNER, tmp_name)  # Kommentar: Temp-Pfad
-    wrapper_text = "JSON_START\n" + json.dumps(daten, ensure_ascii=False, indent=2) + "\nJSON_END\n"  # Kommentar: KI-Wrapper bauen
-    with open(tmp_path, "w", encoding="utf-8") as f:  # Kommentar: Schreiben
-        f.write(wrapper_text)  # Kommentar: Inhalt schreiben
-    try:  # Kommentar: Try
-        return programm_2_word_output.main(  # Kommentar: Fallback: main nutzen
-            pfad_ki_txt=tmp_path,  # Kommentar: Temp-KI-Datei
-            vorlage_pfad=vorlage_pfad,  # Kommentar: Vorlage
-            auswahl=auswahl,  # Kommentar: Variante
-            steuerstatus=steuerstatus,  # Kommentar: Steuerstatus
-            zus_bez=zus_bez,  # Kommentar: Zusatzname
-            zus_betrag=zus_betrag,  # Kommentar: Zusatzbetrag
-        )  # Kommentar: Return
-    finally:  # Kommentar: Cleanup
-        cleanup_files(tmp_path)  # Kommentar: Temp-Datei löschen
 
 # ==========================
 # Session State init
@@ -248,10 +186,6 @@ if "analysis_ready" not in st.session_state:  # Kommentar: Analyse-Flag
     st.session_state["analysis_ready"] = False  # Kommentar: Default
 if "analysis_data" not in st.session_state:  # Kommentar: Analyse-Daten
     st.session_state["analysis_data"] = {}  # Kommentar: Default
-if "analysis_pdf_path" not in st.session_state:  # Kommentar: PDF Pfad
-    st.session_state["analysis_pdf_path"] = ""  # Kommentar: Default
-if "analysis_ki_path" not in st.session_state:  # Kommentar: KI Pfad
-    st.session_state["analysis_ki_path"] = ""  # Kommentar: Default
 if "analysis_meta" not in st.session_state:  # Kommentar: Meta (Variante etc.)
     st.session_state["analysis_meta"] = {}  # Kommentar: Default
 
@@ -287,6 +221,7 @@ if not st.session_state["logged_in"]:  # Kommentar: Login Screen
 # App UI (nach Login)
 # ==========================
 st.title(f"Kfz-Gutachten Automatisierung - Eingeloggt als {st.session_state['username']}")  # Kommentar: Titel nach Login
+gemini_client_holen()  # Kommentar: Client einmal pro Prozess vorbereiten
 
 if st.button("Logout"):  # Kommentar: Logout button
     st.session_state["logged_in"] = False  # Kommentar: Reset
@@ -294,8 +229,6 @@ if st.button("Logout"):  # Kommentar: Logout button
     st.session_state["analysis_ready"] = False  # Kommentar: Reset
     st.session_state["analysis_data"] = {}  # Kommentar: Reset
     st.session_state["analysis_meta"] = {}  # Kommentar: Reset
-    st.session_state["analysis_pdf_path"] = ""  # Kommentar: Reset
-    st.session_state["analysis_ki_path"] = ""  # Kommentar: Reset
     st.rerun()  # Kommentar: Reload
 
 st.header("1. Abrechnungsvariante / Vorlage wählen")  # Kommentar: Abschnitt
@@ -315,40 +248,79 @@ zusatzkosten_bezeichnung = st.text_input("Bezeichnung (optional)", value="")  #
 zusatzkosten_betrag = st.text_input("Betrag in Euro (optional, z.B. 25,00)", value="")  # Kommentar: Zusatzkosten Betrag
 
 st.header("4. Gutachten hochladen")  # Kommentar: Abschnitt
-uploaded_file = st.file_uploader("Gutachten als PDF hochladen", type=["pdf"])  # Kommentar: Upload
+uploaded_files = st.file_uploader("Gutachten als PDF hochladen (mehrere möglich)", type=["pdf"], accept_multiple_files=True)  # Kommentar: Upload
 
 # ==========================
 # Schritt 1: Analyse
 # ==========================
 if st.button("1) Analysieren (KI)"):  # Kommentar: Schritt 1
-    if uploaded_file is None:  # Kommentar: Kein Upload?
+    if not uploaded_files:  # Kommentar: Kein Upload?
         st.error("Bitte zuerst eine PDF-Datei hochladen.")  # Kommentar: Hinweis
         st.stop()  # Kommentar: Stop
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")  # Kommentar: Timestamp
-    safe_name = f"gutachten_{timestamp}.pdf"  # Kommentar: Safe Name
-    pdf_path = os.path.join(EINGANGS_ORDNER, safe_name)  # Kommentar: Zielpfad
-    with open(pdf_path, "wb") as f:  # Kommentar: Speichern
-        f.write(uploaded_file.getbuffer())  # Kommentar: Bytes speichern
     try:  # Kommentar: Fehler abfangen
-        with st.spinner("Analysiere Gutachten mit KI..."):  # Kommentar: Spinner
-            pfad_ki = programm_1_ki_input.main(pdf_path, auswahl, steuerstatus)  # Kommentar: Programm 1 starten
-            with open(pfad_ki, "r", encoding="utf-8") as f:  # Kommentar: KI-Datei lesen
-                ki_text = f.read()  # Kommentar: Text lesen
-            daten = programm_2_word_output.json_aus_ki_antwort_parsen(ki_text)  # Kommentar: JSON aus KI parsen
-        st.session_state["analysis_ready"] = True  # Kommentar: Flag setzen
-        st.session_state["analysis_data"] = daten  # Kommentar: Daten speichern
-        st.session_state["analysis_pdf_path"] = pdf_path  # Kommentar: PDF Pfad speichern
-        st.session_state["analysis_ki_path"] = pfad_ki  # Kommentar: KI Pfad speichern
-        st.session_state["analysis_meta"] = {  # Kommentar: Meta speichern (damit Nutzer nicht “umstellt”)
-            "auswahl": auswahl,  # Kommentar: Variante
-            "steuerstatus": steuerstatus,  # Kommentar: Steuerstatus
-            "vorlage_pfad": vorlage_pfad,  # Kommentar: Vorlagepfad
-        }  # Kommentar: Ende Meta
-        st.success("Analyse abgeschlossen. Bitte Daten prüfen und korrigieren.")  # Kommentar: Info
+        for datei in uploaded_files:  # Kommentar: jede Datei einreihen
+            analyse_jobs.job_einreichen(  # Kommentar: Analyse im Hintergrund starten
+                benutzer=st.session_state["username"],  # Kommentar: Eigentümer
+                dateiname=datei.name,  # Kommentar: Anzeige
+                pdf_bytes=datei.getvalue(),  # Kommentar: PDF-Bytes
+                auswahl=auswahl,  # Kommentar: Variante
+                steuerstatus=steuerstatus,  # Kommentar: Steuerstatus
+                vorlage_pfad=vorlage_pfad,  # Kommentar: Vorlagepfad
+            )  # Kommentar: Ende einreichen
+        st.success(f"{len(uploaded_files)} Analyse(n) eingereiht. Du kannst weiterarbeiten.")  # Kommentar: Info
     except Exception as e:  # Kommentar: Fehlerfall
-        st.error(f"Fehler bei der Analyse: {e}")  # Kommentar: Anzeige
-        cleanup_files(pdf_path)  # Kommentar: PDF im Fehlerfall löschen
-        st.stop()  # Kommentar: Stop
+        st.error(f"Fehler beim Einreihen: {e}")  # Kommentar: Anzeige
+
+# ==========================
+# Analyse-Aufträge (Status + Übernahme)
+# ==========================
+def analyse_auftraege_anzeigen() -> None:  # Kommentar: Job-Liste des Benutzers (wird periodisch neu gezeichnet)
+    jobs = analyse_jobs.jobs_des_benutzers(st.session_state["username"])  # Kommentar: eigene Jobs
+    if not jobs:  # Kommentar: keine Jobs?
+        return  # Kommentar: nichts anzeigen
+    st.header("Analyse-Aufträge")  # Kommentar: Abschnitt
+    for job in jobs:  # Kommentar: Jobs iterieren
+        spalte_info, spalte_aktion = st.columns([3, 1])  # Kommentar: Info + Button
+        dauer = ""  # Kommentar: Dauer-Anzeige
+        if job["gestartet"]:  # Kommentar: gestartet?
+            dauer = f" ({(job['beendet'] or time.time()) - job['gestartet']:.0f} s)"  # Kommentar: Laufzeit
+        spalte_info.write(f"**{job['dateiname']}** – {job['auswahl']} – {job['status']}{dauer}")  # Kommentar: Zeile
+        gewartet = job["info"].get("wartezeit_limiter_s", 0.0) + job["info"].get("wartezeit_backoff_s", 0.0)  # Kommentar: Wartezeit am Ratenlimit/Backoff
+        if gewartet >= 1:  # Kommentar: spürbar gewartet?
+            spalte_info.caption(f"Wartezeit Ratenlimit/Wiederholung: {gewartet:.0f} s ({job['info'].get('versuche', 0)} Versuch(e))")  # Kommentar: Hinweis
+        if job["status"] == analyse_jobs.STATUS_LAEUFT and job["teildaten"]:  # Kommentar: schon Felder gestreamt?
+            with spalte_info.expander(f"Bisher erkannt: {len(job['teildaten'])} Felder"):  # Kommentar: Vorschau während der Analyse
+                for key, wert in job["teildaten"].items():  # Kommentar: Felder in Ankunftsreihenfolge
+                    st.text(f"{key}: {wert}")  # Kommentar: Feld anzeigen
+        if job["info"].get("schnellmodus"):  # Kommentar: ohne KI erledigt?
+            spalte_info.caption("Schnellmodus: Felder nur aus lokalen Regeln (Schadenhergang bitte ergänzen)")  # Kommentar: Hinweis
+        if job["info"].get("fallback"):  # Kommentar: Gemini war nicht erreichbar?
+            spalte_info.caption("KI nicht erreichbar: Felder nur aus lokalen Regeln – bitte sorgfältig prüfen")  # Kommentar: Warnhinweis
+        if job["status"] == analyse_jobs.STATUS_FEHLER:  # Kommentar: Fehler?
+            spalte_info.caption(job["fehler"])  # Kommentar: Fehlertext
+        if job["status"] == analyse_jobs.STATUS_FERTIG:  # Kommentar: Ergebnis da?
+            if spalte_aktion.button("Übernehmen", key=f"job_{job['id']}"):  # Kommentar: in Korrektur laden
+                st.session_state["analysis_ready"] = True  # Kommentar: Flag setzen
+                st.session_state["analysis_data"] = job["daten"]  # Kommentar: Daten speichern
+                st.session_state["analysis_meta"] = {  # Kommentar: Meta speichern (damit Nutzer nicht “umstellt”)
+                    "auswahl": job["auswahl"],  # Kommentar: Variante
+                    "steuerstatus": job["steuerstatus"],  # Kommentar: Steuerstatus
+                    "vorlage_pfad": job["vorlage_pfad"],  # Kommentar: Vorlagepfad
+                    "dateiname": job["dateiname"],  # Kommentar: Anzeige
+                    "fall_id": job.get("fall_id"),  # Kommentar: Fall im Fall-Speicher
+                }  # Kommentar: Ende Meta
+                analyse_jobs.job_entfernen(job["id"], st.session_state["username"])  # Kommentar: Job aus Liste nehmen
+                st.rerun()  # Kommentar: ganze Seite neu zeichnen
+        elif job["status"] == analyse_jobs.STATUS_FEHLER:  # Kommentar: Fehler -> entfernen anbieten
+            if spalte_aktion.button("Entfernen", key=f"job_{job['id']}"):  # Kommentar: Button
+                analyse_jobs.job_entfernen(job["id"], st.session_state["username"])  # Kommentar: löschen
+                st.rerun()  # Kommentar: neu zeichnen
+
+if hasattr(st, "fragment"):  # Kommentar: Neuere Streamlit-Versionen: nur die Job-Liste periodisch neu laden
+    analyse_auftraege_anzeigen = st.fragment(run_every=JOB_POLL_SEKUNDEN)(analyse_auftraege_anzeigen)  # Kommentar: Polling als Fragment
+analyse_auftraege_anzeigen()  # Kommentar: anzeigen
+if not hasattr(st, "fragment"):  # Kommentar: Ältere Versionen: manuell aktualisieren
+    st.button("Status aktualisieren")  # Kommentar: löst Rerun aus
 
 # ==========================
 # Schritt 2: Korrektur + DOCX
@@ -356,60 +328,86 @@ if st.button("1) Analysieren (KI)"):  # Kommentar: Schritt 1
 if st.session_state.get("analysis_ready"):  # Kommentar: Wenn Analyse vorhanden
     meta = st.session_state.get("analysis_meta", {})  # Kommentar: Meta laden
     st.header("5. Daten prüfen & korrigieren")  # Kommentar: Abschnitt
-    st.caption(f"Analyse basiert auf: {meta.get('auswahl','')} | Steuerstatus: {meta.get('steuerstatus','')}")  # Kommentar: Info
+    st.caption(f"Analyse basiert auf: {meta.get('dateiname','')} | {meta.get('auswahl','')} | Steuerstatus: {meta.get('steuerstatus','')}")  # Kommentar: Info
 
     with st.expander("Prompt-Baustein für Programm 1 (SCHADENHERGANG Word-tauglich)"):  # Kommentar: Expander
         st.code(SCHADENHERGANG_WORDTAUGLICH_PROMPT, language="text")  # Kommentar: Prompt anzeigen
 
     data = dict(st.session_state.get("analysis_data", {}))  # Kommentar: Kopie der Daten
 
-    st.subheader("Wichtige Felder")  # Kommentar: Untertitel
-
-    data["SCHADENSNUMMER"] = st.text_input("Schadensnummer", value=str(data.get("SCHADENSNUMMER", "")))  # Kommentar: Input
-    data["AKTENZEICHEN"] = st.text_input("Aktenzeichen", value=str(data.get("AKTENZEICHEN", "")))  # Kommentar: Input
-    data["MANDANT_NAME"] = st.text_input("Mandant Name", value=str(data.get("MANDANT_NAME", "")))  # Kommentar: Input
-    data["UNFALL_DATUM"] = st.text_input("Unfall Datum (TT.MM.JJJJ)", value=str(data.get("UNFALL_DATUM", "")))  # Kommentar: Input
-    data["UNFALL_UHRZEIT"] = st.text_input("Unfall Uhrzeit (HH:MM)", value=str(data.get("UNFALL_UHRZEIT", "")))  # Kommentar: Input
-    data["UNFALLORT"] = st.text_input("Unfallort", value=str(data.get("UNFALLORT", "")))  # Kommentar: Input
-    data["UNFALL_STRASSE"] = st.text_input("Unfallstraße", value=str(data.get("UNFALL_STRASSE", "")))  # Kommentar: Input
-    data["FAHRZEUGTYP"] = st.text_input("Fahrzeugtyp", value=str(data.get("FAHRZEUGTYP", "")))  # Kommentar: Input
-    data["KENNZEICHEN"] = st.text_input("Kennzeichen", value=str(data.get("KENNZEICHEN", "")))  # Kommentar: Input
-
-    st.subheader("Schadenshergang (für Word – als Absatz)")  # Kommentar: Untertitel
-    data["SCHADENHERGANG"] = st.text_area(  # Kommentar: Textarea für SCHADENHERGANG
-        "SCHADENHERGANG",  # Kommentar: Label
-        value=str(data.get("SCHADENHERGANG", "")),  # Kommentar: Value
-        height=160,  # Kommentar: Höhe
-        help="Hier soll ein schreibfertiger, neutraler Absatz stehen (3–6 Sätze). Falls unklar: leer lassen.",  # Kommentar: Hilfe
-    )  # Kommentar: Ende Textarea
-
-    st.subheader("Kosten")  # Kommentar: Untertitel
-
-    data["REPARATURKOSTEN"] = st.text_input("Reparaturkosten", value=str(data.get("REPARATURKOSTEN", "")))  # Kommentar: Input
-    data["WERTMINDERUNG"] = st.text_input("Wertminderung", value=str(data.get("WERTMINDERUNG", "")))  # Kommentar: Input
-    data["KOSTENPAUSCHALE"] = st.text_input("Kostenpauschale", value=str(data.get("KOSTENPAUSCHALE", "")))  # Kommentar: Input
-    data["GUTACHTERKOSTEN"] = st.text_input("Gutachterkosten", value=str(data.get("GUTACHTERKOSTEN", "")))  # Kommentar: Input
-    data["NUTZUNGSAUSFALL"] = st.text_input("Nutzungsausfall", value=str(data.get("NUTZUNGSAUSFALL", "")))  # Kommentar: Input
-    data["MWST_BETRAG"] = st.text_input("MwSt-Betrag (wird je nach Fall ggf. leer)", value=str(data.get("MWST_BETRAG", "")))  # Kommentar: Input
-
-    with st.expander("Alle Felder (optional)"):  # Kommentar: Expander
-        skip_keys = {  # Kommentar: Keys, die schon oben gepflegt werden
-            "SCHADENSNUMMER", "AKTENZEICHEN", "MANDANT_NAME", "UNFALL_DATUM", "UNFALL_UHRZEIT", "UNFALLORT",
-            "UNFALL_STRASSE", "FAHRZEUGTYP", "KENNZEICHEN", "SCHADENHERGANG", "REPARATURKOSTEN", "WERTMINDERUNG",
-            "KOSTENPAUSCHALE", "GUTACHTERKOSTEN", "NUTZUNGSAUSFALL", "MWST_BETRAG",
-        }  # Kommentar: Ende Skip
-        for k in sorted(list(data.keys())):  # Kommentar: Keys sortieren
-            if k in skip_keys:  # Kommentar: Skip?
-                continue  # Kommentar: Überspringen
-            data[k] = st.text_input(f"{k}", value=str(data.get(k, "")))  # Kommentar: Generische Inputs
-
-    st.session_state["analysis_data"] = data  # Kommentar: Zurück in Session speichern
-
-    if st.button("2) Schreiben erzeugen (DOCX)"):  # Kommentar: Schritt 2
+    with st.form("korrektur_form"):  # Kommentar: Eingaben sammeln, Rerun erst beim Absenden (nicht bei jeder Eingabe)
+        st.subheader("Wichtige Felder")  # Kommentar: Untertitel
+
+        data["SCHADENSNUMMER"] = st.text_input("Schadensnummer", value=str(data.get("SCHADENSNUMMER", "")))  # Kommentar: Input
+        data["AKTENZEICHEN"] = st.text_input("Aktenzeichen", value=str(data.get("AKTENZEICHEN", "")))  # Kommentar: Input
+        data["MANDANT_NAME"] = st.text_input("Mandant Name", value=str(data.get("MANDANT_NAME", "")))  # Kommentar: Input
+        data["UNFALL_DATUM"] = st.text_input("Unfall Datum (TT.MM.JJJJ)", value=str(data.get("UNFALL_DATUM", "")))  # Kommentar: Input
+        data["UNFALL_UHRZEIT"] = st.text_input("Unfall Uhrzeit (HH:MM)", value=str(data.get("UNFALL_UHRZEIT", "")))  # Kommentar: Input
+        data["UNFALLORT"] = st.text_input("Unfallort", value=str(data.get("UNFALLORT", "")))  # Kommentar: Input
+        data["UNFALL_STRASSE"] = st.text_input("Unfallstraße", value=str(data.get("UNFALL_STRASSE", "")))  # Kommentar: Input
+        data["FAHRZEUGTYP"] = st.text_input("Fahrzeugtyp", value=str(data.get("FAHRZEUGTYP", "")))  # Kommentar: Input
+        data["KENNZEICHEN"] = st.text_input("Kennzeichen", value=str(data.get("KENNZEICHEN", "")))  # Kommentar: Input
+
+        st.subheader("Schadenshergang (für Word – als Absatz)")  # Kommentar: Untertitel
+        data["SCHADENHERGANG"] = st.text_area(  # Kommentar: Textarea für SCHADENHERGANG
+            "SCHADENHERGANG",  # Kommentar: Label
+            value=str(data.get("SCHADENHERGANG", "")),  # Kommentar: Value
+            height=160,  # Kommentar: Höhe
+            help="Hier soll ein schreibfertiger, neutraler Absatz stehen (3–6 Sätze). Falls unklar: leer lassen.",  # Kommentar: Hilfe
+        )  # Kommentar: Ende Textarea
+
+        st.subheader("Kosten")  # Kommentar: Untertitel
+
+        data["REPARATURKOSTEN"] = st.text_input("Reparaturkosten", value=str(data.get("REPARATURKOSTEN", "")))  # Kommentar: Input
+        data["WERTMINDERUNG"] = st.text_input("Wertminderung", value=str(data.get("WERTMINDERUNG", "")))  # Kommentar: Input
+        data["KOSTENPAUSCHALE"] = st.text_input("Kostenpauschale", value=str(data.get("KOSTENPAUSCHALE", "")))  # Kommentar: Input
+        data["GUTACHTERKOSTEN"] = st.text_input("Gutachterkosten", value=str(data.get("GUTACHTERKOSTEN", "")))  # Kommentar: Input
+        data["NUTZUNGSAUSFALL"] = st.text_input("Nutzungsausfall", value=str(data.get("NUTZUNGSAUSFALL", "")))  # Kommentar: Input
+        data["MWST_BETRAG"] = st.text_input("MwSt-Betrag (wird je nach Fall ggf. leer)", value=str(data.get("MWST_BETRAG", "")))  # Kommentar: Input
+
+        with st.expander("Alle Felder (optional)"):  # Kommentar: Expander
+            skip_keys = {  # Kommentar: Keys, die schon oben gepflegt werden
+                "SCHADENSNUMMER", "AKTENZEICHEN", "MANDANT_NAME", "UNFALL_DATUM", "UNFALL_UHRZEIT", "UNFALLORT",
+                "UNFALL_STRASSE", "FAHRZEUGTYP", "KENNZEICHEN", "SCHADENHERGANG", "REPARATURKOSTEN", "WERTMINDERUNG",
+                "KOSTENPAUSCHALE", "GUTACHTERKOSTEN", "NUTZUNGSAUSFALL", "MWST_BETRAG",
+            }  # Kommentar: Ende Skip
+            for k in sorted(list(data.keys())):  # Kommentar: Keys sortieren
+                if k in skip_keys:  # Kommentar: Skip?
+                    continue  # Kommentar: Überspringen
+                data[k] = st.text_input(f"{k}", value=str(data.get(k, "")))  # Kommentar: Generische Inputs
+
+        als_pdf = False  # Kommentar: Standard: nur DOCX
+        if pdf_pool_holen() is not None:  # Kommentar: PDF-Ausgabe verfügbar?
+            als_pdf = st.checkbox("Zusätzlich als PDF erzeugen", value=False)  # Kommentar: optional
+        spalte_uebernehmen, spalte_erzeugen = st.columns(2)  # Kommentar: zwei Absende-Knöpfe
+        uebernehmen = spalte_uebernehmen.form_submit_button("Änderungen übernehmen", help="Speichert die Eingaben und aktualisiert die Summen-Vorschau (ohne Word-Dokument).")  # Kommentar: nur speichern
+        erzeugen = spalte_erzeugen.form_submit_button("2) Schreiben erzeugen (DOCX)")  # Kommentar: speichern + erzeugen
+
+    if uebernehmen or erzeugen:  # Kommentar: Formular abgeschickt?
+        st.session_state["analysis_data"] = data  # Kommentar: Zurück in Session speichern
+
+    if not erzeugen:  # Kommentar: Vorschau nur solange noch korrigiert wird
+        vorschau_daten = st.session_state.get("analysis_data", {})  # Kommentar: zuletzt übernommene Daten
+        vorschau = summen_vorschau(  # Kommentar: gemerkt je Beträge/Variante/Zusatzkosten
+            tuple((k, str(vorschau_daten.get(k, ""))) for k in programm_2_word_output.SUMMEN_EINGABEN),  # Kommentar: nur summenrelevante Felder als Schlüssel
+            meta.get("auswahl", auswahl),  # Kommentar: Analyse-Variante
+            meta.get("steuerstatus", steuerstatus),  # Kommentar: Analyse-Steuerstatus
+            zusatzkosten_bezeichnung,  # Kommentar: Zusatzkosten Name
+            zusatzkosten_betrag,  # Kommentar: Zusatzkosten Betrag
+        )  # Kommentar: Ende Vorschau
+        st.subheader("Summen-Vorschau")  # Kommentar: Untertitel
+        if vorschau["positionen"]:  # Kommentar: etwas addiert?
+            st.dataframe(vorschau["positionen"], hide_index=True)  # Kommentar: Positionstabelle wie im Schreiben
+        st.write(f"**KOSTENSUMME_X:** {vorschau['KOSTENSUMME_X'] or '–'}")  # Kommentar: Summe
+        if vorschau["WIEDERBESCHAFFUNGSAUFWAND"]:  # Kommentar: nur bei Totalschaden relevant
+            st.write(f"**WIEDERBESCHAFFUNGSAUFWAND:** {vorschau['WIEDERBESCHAFFUNGSAUFWAND']}")  # Kommentar: WBA
+        st.caption("Berechnet aus den übernommenen Eingaben – „Änderungen übernehmen“ aktualisiert die Vorschau, das Word-Dokument wird erst mit Schritt 2 erzeugt.")  # Kommentar: Hinweis
+
+    if erzeugen:  # Kommentar: Schritt 2
         try:  # Kommentar: Fehler abfangen
             with st.spinner("Erzeuge Word-Dokument..."):  # Kommentar: Spinner
                 used_meta = st.session_state.get("analysis_meta", {})  # Kommentar: Meta holen
-                docx_pfad = generate_docx_from_corrected_data(  # Kommentar: DOCX aus korrigierten Daten erstellen
+                docx_bytes = generate_docx_from_corrected_data(  # Kommentar: DOCX-Bytes aus korrigierten Daten erstellen
                     daten=st.session_state["analysis_data"],  # Kommentar: Korrigierte Daten
                     vorlage_pfad=used_meta.get("vorlage_pfad", vorlage_pfad),  # Kommentar: Analyse-Vorlage nutzen
                     auswahl=used_meta.get("auswahl", auswahl),  # Kommentar: Analyse-Variante nutzen
@@ -417,19 +415,22 @@ if st.session_state.get("analysis_ready"):  # Kommentar: Wenn Analyse vorhanden
                     zus_bez=zusatzkosten_bezeichnung,  # Kommentar: Zusatzkosten Name
                     zus_betrag=zusatzkosten_betrag,  # Kommentar: Zusatzkosten Betrag
                 )  # Kommentar: Ende call
-
-            with open(docx_pfad, "rb") as f:  # Kommentar: DOCX lesen
-                docx_bytes = f.read()  # Kommentar: Bytes lesen
-
-            cleanup_files(st.session_state.get("analysis_pdf_path", ""))  # Kommentar: PDF löschen
-            cleanup_files(st.session_state.get("analysis_ki_path", ""))  # Kommentar: KI-Text löschen
-            cleanup_files(docx_pfad)  # Kommentar: DOCX auf Server löschen (wir haben Bytes)
+                gespeichert = fall_speicher.korrektur_speichern(  # Kommentar: Korrektur + Render-Infos am Fall ablegen
+                    used_meta.get("fall_id"),  # Kommentar: Fall-ID (None = nicht gespeichert)
+                    st.session_state["username"],  # Kommentar: Eigentümer
+                    st.session_state["analysis_data"],  # Kommentar: korrigierte Daten (vor Summenbildung)
+                    {  # Kommentar: Render-Infos
+                        "zus_bez": zusatzkosten_bezeichnung,  # Kommentar: Zusatzkosten Name
+                        "zus_betrag": zusatzkosten_betrag,  # Kommentar: Zusatzkosten Betrag
+                        "vorlage": os.path.basename(used_meta.get("vorlage_pfad", vorlage_pfad)),  # Kommentar: Vorlage
+                        "gerendert": time.time(),  # Kommentar: Zeitpunkt
+                        "docx_bytes": len(docx_bytes),  # Kommentar: Größe
+                    },  # Kommentar: Ende Render-Infos
+                )  # Kommentar: Ende speichern
 
             st.session_state["analysis_ready"] = False  # Kommentar: Reset
             st.session_state["analysis_data"] = {}  # Kommentar: Reset
             st.session_state["analysis_meta"] = {}  # Kommentar: Reset
-            st.session_state["analysis_pdf_path"] = ""  # Kommentar: Reset
-            st.session_state["analysis_ki_path"] = ""  # Kommentar: Reset
 
             st.download_button(  # Kommentar: Download Button
                 label="Erstelltes Anwaltsschreiben herunterladen",  # Kommentar: Label
@@ -437,18 +438,109 @@ if st.session_state.get("analysis_ready"):  # Kommentar: Wenn Analyse vorhanden
                 file_name="anwaltsschreiben.docx",  # Kommentar: Downloadname
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # Kommentar: MIME
             )  # Kommentar: Ende download
-            st.success("Fertig. Dateien wurden gelöscht.")  # Kommentar: Erfolg
+            if als_pdf:  # Kommentar: PDF gewünscht?
+                try:  # Kommentar: DOCX bleibt auch bei PDF-Fehler verfügbar
+                    with st.spinner("Erzeuge PDF..."):  # Kommentar: Spinner
+                        pdf_bytes = pdf_pool_holen().konvertieren(docx_bytes)  # Kommentar: warmer LibreOffice-Worker
+                    st.download_button(  # Kommentar: Download Button
+                        label="Anwaltsschreiben als PDF herunterladen",  # Kommentar: Label
+                        data=pdf_bytes,  # Kommentar: PDF Bytes
+                        file_name="anwaltsschreiben.pdf",  # Kommentar: Downloadname
+                        mime="application/pdf",  # Kommentar: MIME
+                    )  # Kommentar: Ende download
+                except Exception as e:  # Kommentar: Fehlerfall
+                    st.warning(f"PDF konnte nicht erzeugt werden: {e}")  # Kommentar: Hinweis
+            if gespeichert:  # Kommentar: Fall gespeichert?
+                st.success("Fertig. Der Fall ist gespeichert und kann unter „Gespeicherte Fälle“ ohne neue Analyse erneut erzeugt werden.")  # Kommentar: Erfolg
+            else:  # Kommentar: Fall-Speicher aus
+                st.success("Fertig. Es wurden keine Dateien auf dem Server gespeichert.")  # Kommentar: Erfolg
         except Exception as e:  # Kommentar: Fehlerfall
             st.error(f"Fehler beim Erzeugen: {e}")  # Kommentar: Anzeige
 
 # ==========================
-# Debug: Dateien
+# Gespeicherte Fälle (Neu-Erzeugen ohne neue Analyse)
+# ==========================
+def gespeicherte_faelle_anzeigen() -> None:  # Kommentar: Fall-Liste (als Fragment: Suche/Knöpfe laden nur diesen Teil neu)
+    st.header("Gespeicherte Fälle")  # Kommentar: Abschnitt
+    suchbegriff = st.text_input("Suche nach Schadensnummer oder Aktenzeichen (Anfang genügt)", value="")  # Kommentar: Suche
+    faelle = fall_speicher.faelle_suchen(st.session_state["username"], suchbegriff)  # Kommentar: neueste zuerst
+    if faelle is None:  # Kommentar: DB-Fehler
+        st.warning("Gespeicherte Fälle konnten nicht geladen werden.")  # Kommentar: Hinweis statt Absturz
+        return  # Kommentar: nichts anzeigen
+    for fall in faelle:  # Kommentar: je Fall
+        titel = f"{fall['schadensnummer'] or '–'} | {fall['aktenzeichen'] or '–'} | {fall['mandant']} | {fall['auswahl']}"  # Kommentar: Kopfzeile
+        with st.expander(titel):  # Kommentar: ein Fall
+            st.caption(f"{fall['dateiname']} – zuletzt geändert {datetime.fromtimestamp(fall['geaendert']).strftime('%d.%m.%Y %H:%M')}")  # Kommentar: Info
+            fall_bez = st.text_input("Zusatzkosten Bezeichnung", value=fall["render_meta"].get("zus_bez", ""), key=f"fall_bez_{fall['id']}")  # Kommentar: Zusatzkosten Name
+            fall_betrag = st.text_input("Zusatzkosten Betrag", value=fall["render_meta"].get("zus_betrag", ""), key=f"fall_betrag_{fall['id']}")  # Kommentar: Zusatzkosten Betrag
+            spalte_neu, spalte_laden, spalte_loeschen = st.columns(3)  # Kommentar: Aktionen
+            if spalte_neu.button("Neu erzeugen", key=f"fall_neu_{fall['id']}"):  # Kommentar: aus gespeicherten Daten rendern
+                try:  # Kommentar: Fehler abfangen
+                    with telemetrie.job("neu_erzeugen", auswahl=fall["auswahl"]):  # Kommentar: Dauer messen
+                        docx_bytes = fall_speicher.fall_rendern(fall["id"], st.session_state["username"], fall_bez, fall_betrag)  # Kommentar: ohne Analyse
+                    st.download_button(  # Kommentar: Download Button
+                        label="Schreiben herunterladen",  # Kommentar: Label
+                        data=docx_bytes,  # Kommentar: DOCX Bytes
+                        file_name="anwaltsschreiben.docx",  # Kommentar: Downloadname
+                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # Kommentar: MIME
+                        key=f"fall_download_{fall['id']}",  # Kommentar: eindeutiger Key
+                    )  # Kommentar: Ende download
+                except Exception as e:  # Kommentar: Fehlerfall
+                    st.error(f"Fehler beim Erzeugen: {e}")  # Kommentar: Anzeige
+            if spalte_laden.button("In Korrektur laden", key=f"fall_laden_{fall['id']}"):  # Kommentar: Daten erneut bearbeiten
+                voll = fall_speicher.fall_holen(fall["id"], st.session_state["username"])  # Kommentar: kompletter Fall
+                if voll is None:  # Kommentar: gelöscht oder DB-Fehler
+                    st.warning("Fall konnte nicht geladen werden.")  # Kommentar: Hinweis
+                else:  # Kommentar: noch vorhanden
+                    st.session_state["analysis_ready"] = True  # Kommentar: Flag setzen
+                    st.session_state["analysis_data"] = voll["korrigiert"] if voll["korrigiert"] is not None else voll["daten"]  # Kommentar: Korrektur hat Vorrang
+                    st.session_state["analysis_meta"] = {  # Kommentar: Meta wie nach einer Analyse
+                        "auswahl": voll["auswahl"],  # Kommentar: Variante
+                        "steuerstatus": voll["steuerstatus"],  # Kommentar: Steuerstatus
+                        "vorlage_pfad": resolve_vorlage_pfad(voll["auswahl"]),  # Kommentar: aktuelle Vorlage
+                        "dateiname": voll["dateiname"],  # Kommentar: Anzeige
+                        "fall_id": voll["id"],  # Kommentar: gleicher Fall
+                    }  # Kommentar: Ende Meta
+                    st.rerun()  # Kommentar: neu zeichnen
+            if spalte_loeschen.button("Löschen", key=f"fall_loeschen_{fall['id']}"):  # Kommentar: Fall entfernen
+                if fall_speicher.fall_loeschen(fall["id"], st.session_state["username"]):  # Kommentar: löschen
+                    st.rerun()  # Kommentar: neu zeichnen
+                else:  # Kommentar: schon weg oder DB-Fehler
+                    st.warning("Fall konnte nicht gelöscht werden.")  # Kommentar: Hinweis
+
+if fall_speicher.FALL_SPEICHER_AKTIV:  # Kommentar: nur wenn der Fall-Speicher aktiv ist
+    if hasattr(st, "fragment"):  # Kommentar: Neuere Streamlit-Versionen: Teil-Rerun
+        gespeicherte_faelle_anzeigen = st.fragment(gespeicherte_faelle_anzeigen)  # Kommentar: als Fragment
+    gespeicherte_faelle_anzeigen()  # Kommentar: anzeigen
+
+# ==========================
+# Debug: Stufen-Zeiten + Statistiken
 # ==========================
-with st.expander("Debug: Dateien im System anzeigen"):  # Kommentar: Debug Bereich
-    st.subheader("Eingang Gutachten")  # Kommentar: Untertitel
-    st.write(os.listdir(EINGANGS_ORDNER))  # Kommentar: Liste anzeigen
-    st.subheader("KI-Antworten")  # Kommentar: Untertitel
-    st.write(os.listdir(KI_ANTWORT_ORDNER))  # Kommentar: Liste anzeigen
-    st.subheader("Ausgang-Schreiben")  # Kommentar: Untertitel
-    st.write(os.listdir(AUSGANGS_ORDNER))  # Kommentar: Liste anzeigen
+with st.expander("Debug: letzte Jobs und Statistiken"):  # Kommentar: Debug Bereich
+    if st.checkbox("Debug-Daten laden", key="debug_laden"):  # Kommentar: erst auf Wunsch abfragen (DB-Zugriffe/Locks nicht bei jedem Rerun)
+        st.subheader(f"Letzte Jobs (max. {telemetrie.LETZTE_JOBS})")  # Kommentar: Untertitel
+        for eintrag in telemetrie.letzte_jobs():  # Kommentar: neueste zuerst
+            zeit = datetime.fromtimestamp(eintrag["start"]).strftime("%H:%M:%S")  # Kommentar: Startzeit
+            st.write(f"**{zeit} {eintrag['name']}** – {eintrag['ergebnis']} – {eintrag['dauer_s']:.2f} s {eintrag.get('fehler', '')}")  # Kommentar: Kopfzeile
+            st.caption(", ".join(f"{k}={v}" for k, v in eintrag["attribute"].items()))  # Kommentar: Job-Attribute (Variante, Größe, Cache)
+            st.dataframe(  # Kommentar: eine Zeile je Stufe
+                [{"stufe": s["name"], "dauer_s": s["dauer_s"], "ergebnis": s["ergebnis"], **s["attribute"]} for s in eintrag["stufen"]],  # Kommentar: Stufen + Größen
+                hide_index=True,  # Kommentar: ohne Index
+            )  # Kommentar: Ende Tabelle
+        st.subheader("Analyse-Warteschlange")  # Kommentar: Untertitel
+        st.write(analyse_jobs.warteschlange_statistik())  # Kommentar: Jobs je Status
+        st.subheader("Gemini-Verbindungen")  # Kommentar: Untertitel
+        st.write(programm_1_ki_input.verbindungs_statistik())  # Kommentar: Anfragen / neue Verbindungen / Wiederverwendung
+        st.subheader("Gemini-Ratenlimit")  # Kommentar: Untertitel
+        st.write(ki_limiter.gemini_limiter().statistik())  # Kommentar: Anfragen / Wartezeiten / Limits
+        if kontext_cache.PROMPT_CACHE_MODUS != "aus":  # Kommentar: nur wenn der statische Prompt-Teil abgetrennt wird
+            st.subheader("Prompt-Kontext-Cache")  # Kommentar: Untertitel
+            st.write(kontext_cache.kontext_cache().statistik())  # Kommentar: Anlegen/Treffer/Verlängerungen
+        st.subheader("KI-Cache")  # Kommentar: Untertitel
+        st.write(ki_cache.cache_statistik())  # Kommentar: Treffer/Fehlschläge/Belegung anzeigen
+        st.subheader("Fall-Speicher")  # Kommentar: Untertitel
+        st.write(fall_speicher.speicher_statistik())  # Kommentar: Fälle/Belegung/Limits
+        if pdf_konverter.PDF_KONVERTER_AKTIV:  # Kommentar: nur wenn PDF-Ausgabe aktiv
+            st.subheader("PDF-Konverter")  # Kommentar: Untertitel
+            st.write(pdf_konverter.pool_statistik())  # Kommentar: Latenzen/Auslastung/Neustarts
 
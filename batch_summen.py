@@ -0,0 +1,165 @@
+# batch_summen.py  # Kommentar: Summen (KOSTENSUMME_X / WIEDERBESCHAFFUNGSAUFWAND) für viele Fälle auf einmal neu berechnen (spaltenweise, Decimal-genau bei ganzen Cent, sonst Float wie im Einzelfall, optional NumPy)
+
+import re  # Kommentar: Zeichenfilter in C statt Python-Schleife
+import sys  # Kommentar: größter Unicode-Codepunkt
+from decimal import Decimal, InvalidOperation  # Kommentar: exakte Beträge (keine Float-Rundungsfehler)
+
+import programm_2_word_output as p2  # Kommentar: Summen-Regeln (SUMMEN_POSITIONEN, variante_key, float_zu_euro)
+
+try:  # Kommentar: optional, beschleunigt große Spalten
+    import numpy as np  # Kommentar: Vektorrechnung auf Cent-Ganzzahlen
+except ImportError:  # Kommentar: nicht installiert
+    np = None  # Kommentar: reiner Decimal-Pfad
+
+BETRAGS_SPALTEN = (  # Kommentar: Eingabespalten (Euro-Texte wie im Fall-Dict)
+    "REPARATURKOSTEN", "MWST_BETRAG", "WERTMINDERUNG", "NUTZUNGSAUSFALL", "KOSTENPAUSCHALE",
+    "GUTACHTERKOSTEN", "ZUSATZKOSTEN_BETRAG", "WIEDERBESCHAFFUNGSWERT", "RESTWERT",
+)  # Kommentar: Ende Spalten
+POSITIONEN = ("REPARATURKOSTEN", "MWST_BETRAG", "WERTMINDERUNG") + p2.NEBENKOSTEN + ("WIEDERBESCHAFFUNGSAUFWAND",)  # Kommentar: Spalten der Summenmatrix
+TOTALSCHADEN = ("TOTAL_FIKTIV", "TOTAL_KONKRET", "TOTAL_ERSATZ")  # Kommentar: Varianten ohne Reparaturposition
+OHNE_MWST = ("Fiktive Abrechnung (Reparaturschaden)", "Totalschaden fiktiv")  # Kommentar: wie mwst_leeren_wenn_noetig
+NULL = Decimal(0)  # Kommentar: Konstante
+CENT = Decimal("0.01")  # Kommentar: kleinste Einheit des Decimal-Pfads
+EXAKT_GRENZE = Decimal(10) ** 11  # Kommentar: bis hier rundet die Float-Summe des Einzelfalls ganze Cent nie anders als Decimal
+_SONDERZIFFERN = "".join(chr(i) for i in range(sys.maxunicode + 1) if chr(i).isdigit() and not chr(i).isdecimal())  # Kommentar: isdigit()-Zeichen, die \d nicht abdeckt (z.B. ²)
+_NICHT_ERLAUBT_RE = re.compile("[^\\d" + re.escape(_SONDERZIFFERN) + ",.+\\-]")  # Kommentar: alles außer isdigit() und ,.+- (exakt wie euro_zu_float)
+
+
+def euro_zu_decimal(text) -> Decimal:  # Kommentar: Euro-String -> Decimal (gleiche Regeln wie euro_zu_float, aber exakt)
+    if isinstance(text, (int, float)):  # Kommentar: Schon Zahl?
+        return Decimal(repr(float(text)))  # Kommentar: wie float(text), kürzeste Darstellung
+    if not text:  # Kommentar: leer?
+        return NULL  # Kommentar: Null
+    t = _NICHT_ERLAUBT_RE.sub("", str(text))  # Kommentar: Währung, Leerzeichen, Buchstaben in einem Durchlauf entfernen
+    if "." in t and "," in t:  # Kommentar: Fall 1.234,56
+        t = t.replace(".", "").replace(",", ".")  # Kommentar: Tausender weg, Komma -> Punkt
+    elif "," in t:  # Kommentar: Fall 1234,56
+        t = t.replace(",", ".")  # Kommentar: Komma -> Punkt
+    try:  # Kommentar: parse versuchen
+        wert = Decimal(t)  # Kommentar: exakt
+    except InvalidOperation:  # Kommentar: parse fail (auch leerer String)
+        return NULL  # Kommentar: fallback
+    return wert if wert.is_finite() else NULL  # Kommentar: "NaN"/"Inf" kommen durch den Filter nicht, sicher ist sicher
+
+
+def ganze_cent(d: Decimal) -> bool:  # Kommentar: Vertrag des Decimal-Pfads: ganze Cent und nicht riesig (sonst rechnet der Einzelfall-Pfad mit Float anders)
+    try:  # Kommentar: quantize kann bei sehr großen Zahlen scheitern
+        return abs(d) < EXAKT_GRENZE and d == d.quantize(CENT)  # Kommentar: keine Bruchteile von Cent
+    except InvalidOperation:  # Kommentar: zu viele Stellen
+        return False  # Kommentar: Float-Pfad
+
+
+def spalte_parsen(werte: list) -> list[Decimal]:  # Kommentar: Ganze Spalte parsen (jeder verschiedene Text nur einmal)
+    cache = {}  # Kommentar: Text -> Decimal (Spalten wiederholen sich stark, z.B. "25,00 €")
+    ergebnis = []  # Kommentar: Ausgabe
+    for wert in werte:  # Kommentar: Zeilen
+        schluessel = (type(wert), wert) if isinstance(wert, (int, float)) else wert or ""  # Kommentar: 1 und "1" getrennt halten
+        d = cache.get(schluessel)  # Kommentar: schon geparst?
+        if d is None:  # Kommentar: neu
+            d = cache[schluessel] = euro_zu_decimal(wert)  # Kommentar: parsen + merken
+        ergebnis.append(d)  # Kommentar: anhängen
+    return ergebnis  # Kommentar: Spalte zurückgeben
+
+
+def spalten_aus_faellen(faelle: list[dict]) -> dict:  # Kommentar: Fälle ({"daten", "auswahl", "steuerstatus"}) -> Spalten
+    spalten = {name: [f["daten"].get(name, "") for f in faelle] for name in BETRAGS_SPALTEN + ("WIEDERBESCHAFFUNGSAUFWAND",)}  # Kommentar: Betragsspalten
+    spalten["auswahl"] = [f.get("auswahl", "") for f in faelle]  # Kommentar: Variante je Fall
+    spalten["steuerstatus"] = [f.get("steuerstatus", "") for f in faelle]  # Kommentar: Steuerstatus je Fall
+    return spalten  # Kommentar: Spalten zurückgeben
+
+
+def _positionsspalten(spalten: dict, feste_werte: dict) -> tuple[list[str], dict, set[int]]:  # Kommentar: Regeln (MwSt leeren, 130%, Totalschaden, WBA) spaltenweise anwenden
+    n = len(spalten["auswahl"])  # Kommentar: Anzahl Fälle
+    werte = {}  # Kommentar: Spalte -> Decimal-Liste
+    for name in BETRAGS_SPALTEN:  # Kommentar: Spalten parsen
+        if name in feste_werte:  # Kommentar: neue Regel für alle Fälle (z.B. andere Kostenpauschale)?
+            werte[name] = [euro_zu_decimal(feste_werte[name])] * n  # Kommentar: überall gleicher Wert
+        else:  # Kommentar: Wert je Fall
+            werte[name] = spalte_parsen(spalten.get(name, [""] * n))  # Kommentar: parsen
+    varianten = [p2.variante_key(a) for a in spalten["auswahl"]]  # Kommentar: interner Key je Fall
+    float_zeilen = {i for name in BETRAGS_SPALTEN for i, d in enumerate(werte[name]) if d and not ganze_cent(d)}  # Kommentar: Fälle außerhalb des Vertrags (z.B. "1,015" oder 2.675) -> wie im Einzelfall mit Float rechnen
+    werte["WIEDERBESCHAFFUNGSAUFWAND"] = [max(w - r, NULL) for w, r in zip(werte["WIEDERBESCHAFFUNGSWERT"], werte["RESTWERT"])]  # Kommentar: WBA = WBW - Restwert (nie negativ)
+    for i, (variante, auswahl, steuer) in enumerate(zip(varianten, spalten["auswahl"], spalten["steuerstatus"])):  # Kommentar: Regeln je Fall (nur Vergleiche, keine Parser)
+        if auswahl in OHNE_MWST or steuer == "vorsteuerabzugsberechtigt":  # Kommentar: MwSt wird geleert
+            werte["MWST_BETRAG"][i] = NULL  # Kommentar: 0
+        if variante == "REGEL_130":  # Kommentar: 130% -> Wertminderung raus
+            werte["WERTMINDERUNG"][i] = NULL  # Kommentar: 0
+        if variante in TOTALSCHADEN:  # Kommentar: Totalschaden -> Reparatur keine Position
+            werte["REPARATURKOSTEN"][i] = NULL  # Kommentar: 0
+    return varianten, werte, float_zeilen  # Kommentar: Keys + bereinigte Spalten + Fälle für den Float-Pfad
+
+
+def _summen_decimal(varianten: list[str], werte: dict, positionen: dict) -> list[Decimal]:  # Kommentar: Summen zeilenweise in Decimal
+    summen = []  # Kommentar: Ergebnis
+    for i, variante in enumerate(varianten):  # Kommentar: Fälle
+        summe = NULL  # Kommentar: Start
+        for position in positionen.get(variante, positionen["UNKNOWN"]):  # Kommentar: Positionen der Variante
+            summe += werte[position][i]  # Kommentar: exakt addieren
+        summen.append(summe)  # Kommentar: merken
+    return summen  # Kommentar: Summen zurückgeben
+
+
+def _summen_float(varianten: list[str], werte: dict, positionen: dict, zeilen: set[int]) -> dict[int, tuple[float, float]]:  # Kommentar: Summe + WBA je Fall genau wie prepare_data_for_template (Float, gleiche Reihenfolge)
+    ergebnis = {}  # Kommentar: Index -> (Summe, WBA)
+    for i in zeilen:  # Kommentar: nur Fälle außerhalb des Cent-Vertrags
+        zeile = {name: float(werte[name][i]) for name in BETRAGS_SPALTEN}  # Kommentar: wie euro_zu_float (gleicher Text -> gleicher Float)
+        zeile["WIEDERBESCHAFFUNGSAUFWAND"] = max(zeile["WIEDERBESCHAFFUNGSWERT"] - zeile["RESTWERT"], 0.0)  # Kommentar: WBA wie im Einzelfall
+        reihenfolge = positionen.get(varianten[i], positionen["UNKNOWN"])  # Kommentar: Positionen der Variante
+        summe = zeile[reihenfolge[0]]  # Kommentar: erste Position (wie summe_tabelle_berechnen)
+        for position in reihenfolge[1:]:  # Kommentar: gleiche Additionsreihenfolge
+            summe += zeile[position]  # Kommentar: addieren
+        ergebnis[i] = (summe, zeile["WIEDERBESCHAFFUNGSAUFWAND"])  # Kommentar: merken
+    return ergebnis  # Kommentar: zurückgeben
+
+
+def _summen_numpy(varianten: list[str], werte: dict, positionen: dict, float_zeilen: set[int]) -> list[Decimal] | None:  # Kommentar: Summen als Cent-Matrix x Varianten-Maske (None = nicht exakt möglich)
+    cents = {}  # Kommentar: Spalte -> Cent-Ganzzahlen
+    for name in POSITIONEN:  # Kommentar: Summenspalten
+        ganz = []  # Kommentar: Cent-Werte der Spalte
+        for i, d in enumerate(werte[name]):  # Kommentar: Werte umrechnen
+            if i in float_zeilen:  # Kommentar: Fall wird ohnehin mit Float gerechnet
+                ganz.append(0)  # Kommentar: Platzhalter
+                continue  # Kommentar: weiter
+            c = int(d * 100)  # Kommentar: Cent (abgeschnitten)
+            if c != d * 100 or abs(c) >= 2 ** 53:  # Kommentar: Bruchteile von Cent oder zu groß für int64-Summen?
+                return None  # Kommentar: Decimal-Pfad nehmen
+            ganz.append(c)  # Kommentar: merken
+        cents[name] = np.array(ganz, dtype=np.int64)  # Kommentar: Spalte als Vektor
+    matrix = np.column_stack([cents[name] for name in POSITIONEN])  # Kommentar: Fälle x Positionen
+    masken = {v: np.array([p in pos for p in POSITIONEN], dtype=np.int64) for v, pos in positionen.items()}  # Kommentar: Variante -> 0/1-Zeile
+    maske = np.stack([masken.get(v, masken["UNKNOWN"]) for v in varianten])  # Kommentar: Maske je Fall
+    summen = (matrix * maske).sum(axis=1)  # Kommentar: alle Fälle auf einmal (Ganzzahl, exakt)
+    return [Decimal(int(c)).scaleb(-2) for c in summen]  # Kommentar: zurück in Euro
+
+
+def summen_neu_berechnen(spalten: dict, positionen: dict | None = None, feste_werte: dict | None = None, numpy_nutzen: bool = False) -> dict:  # Kommentar: Spalten -> neue KOSTENSUMME_X/WIEDERBESCHAFFUNGSAUFWAND
+    positionen = positionen or p2.SUMMEN_POSITIONEN  # Kommentar: geänderte Regeln (z.B. MwSt bei TOTAL_ERSATZ) oder aktuelle
+    varianten, werte, float_zeilen = _positionsspalten(spalten, feste_werte or {})  # Kommentar: Regeln anwenden
+    summen = None  # Kommentar: noch nicht berechnet
+    if numpy_nutzen and np is not None:  # Kommentar: NumPy gewünscht und installiert? (Parsen/Formatieren dominieren, daher nicht Standard)
+        summen = _summen_numpy(varianten, werte, positionen, float_zeilen)  # Kommentar: vektorisiert
+    if summen is None:  # Kommentar: kein NumPy oder nicht exakt möglich
+        summen = _summen_decimal(varianten, werte, positionen)  # Kommentar: Decimal-Pfad
+    for i, (summe, wba) in _summen_float(varianten, werte, positionen, float_zeilen).items():  # Kommentar: Bruchteile von Cent -> Ergebnis des Einzelfall-Pfads übernehmen
+        summen[i] = summe  # Kommentar: Float-Summe (rundet beim Formatieren wie prepare_data_for_template)
+        werte["WIEDERBESCHAFFUNGSAUFWAND"][i] = wba  # Kommentar: Float-WBA
+    alt_wba = spalten.get("WIEDERBESCHAFFUNGSAUFWAND", [""] * len(varianten))  # Kommentar: bisheriger Wert (bleibt ausserhalb Totalschaden)
+    return {  # Kommentar: neue Spalten (Formatierung wie im Einzelfall)
+        "KOSTENSUMME_X": [p2.float_zu_euro(s) if s > 0 else "" for s in summen],  # Kommentar: Summe für Word
+        "WIEDERBESCHAFFUNGSAUFWAND": [  # Kommentar: WBA nur bei Totalschaden mit WBA > 0 neu setzen
+            p2.float_zu_euro(w) if v in TOTALSCHADEN and w > 0 else alt  # Kommentar: sonst unverändert
+            for v, w, alt in zip(varianten, werte["WIEDERBESCHAFFUNGSAUFWAND"], alt_wba)  # Kommentar: je Fall
+        ],  # Kommentar: Ende WBA
+    }  # Kommentar: Ende Ergebnis
+
+
+def mit_skalarpfad_vergleichen(faelle: list[dict], numpy_nutzen: bool = False) -> list[dict]:  # Kommentar: Batch-Ergebnis gegen prepare_data_for_template prüfen (Liste der Abweichungen)
+    batch = summen_neu_berechnen(spalten_aus_faellen(faelle), numpy_nutzen=numpy_nutzen)  # Kommentar: spaltenweise
+    abweichungen = []  # Kommentar: Ergebnis
+    for i, fall in enumerate(faelle):  # Kommentar: Fälle einzeln
+        daten = fall["daten"]  # Kommentar: Felder
+        skalar = p2.prepare_data_for_template(dict(daten), fall.get("auswahl", ""), fall.get("steuerstatus", ""), daten.get("ZUSATZKOSTEN_BEZEICHNUNG", ""), daten.get("ZUSATZKOSTEN_BETRAG", ""))  # Kommentar: bisheriger Weg
+        for feld in ("KOSTENSUMME_X", "WIEDERBESCHAFFUNGSAUFWAND"):  # Kommentar: verglichene Felder
+            if skalar[feld] != batch[feld][i]:  # Kommentar: abweichend?
+                abweichungen.append({"index": i, "feld": feld, "skalar": skalar[feld], "batch": batch[feld][i]})  # Kommentar: merken
+    return abweichungen  # Kommentar: leere Liste = identisch
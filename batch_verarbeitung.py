@@ -0,0 +1,176 @@
+# batch_verarbeitung.py  # Kommentar: Headless-Batch (Ordner/Manifest -> KI-Analyse -> DOCX) mit begrenzter Parallelität
+
+import os  # Kommentar: Pfade/Ordner
+import sys  # Kommentar: Exit-Code
+import csv  # Kommentar: Manifest als CSV
+import json  # Kommentar: Manifest/Zusammenfassung als JSON
+import time  # Kommentar: Zeitmessung und Wartezeiten
+import argparse  # Kommentar: Kommandozeile
+import hashlib  # Kommentar: eindeutige Ausgabenamen bei gleichen Dateinamen
+from datetime import datetime  # Kommentar: Zeitstempel für Ausgabeordner
+from concurrent.futures import ThreadPoolExecutor, as_completed  # Kommentar: Parallele Verarbeitung (I/O-lastig)
+
+import config  # Kommentar: Konfiguration (Ordner, Vorlagen)
+import programm_1_ki_input  # Kommentar: Programm 1: PDF -> KI-Antwort (im Speicher)
+import programm_2_word_output  # Kommentar: Programm 2: JSON -> DOCX
+import ki_limiter  # Kommentar: Gemeinsamer Ratenbegrenzer (gleiche Logik wie in der App)
+import telemetrie  # Kommentar: Stufen-Zeiten je Fall (Log + Metriken)
+import pdf_konverter  # Kommentar: optional: Schreiben zusätzlich als PDF (warmer LibreOffice-Pool)
+import kontext_cache  # Kommentar: Prompt-Kontext-Cache (Statistik)
+
+STANDARD_AUSWAHL = "Konkrete Abrechnung < WBW"  # Kommentar: Default-Variante ohne Manifest (Vorlage liegt bei)
+STANDARD_STEUERSTATUS = "nicht vorsteuerabzugsberechtigt"  # Kommentar: Default-Steuerstatus ohne Manifest
+STANDARD_PARALLEL = 4  # Kommentar: gleichzeitige Fälle
+STANDARD_PRO_MINUTE = ki_limiter.GEMINI_RPM  # Kommentar: globales Limit für Gemini-Anfragen pro Minute
+
+
+def auftraege_aus_ordner(ordner: str, auswahl: str, steuerstatus: str) -> list[dict]:  # Kommentar: Alle PDFs im Ordner als Aufträge
+    auftraege = []  # Kommentar: Liste
+    for name in sorted(os.listdir(ordner)):  # Kommentar: sortiert für reproduzierbare Reihenfolge
+        if name.lower().endswith(".pdf"):  # Kommentar: nur PDFs
+            auftraege.append({"datei": os.path.join(ordner, name), "auswahl": auswahl, "steuerstatus": steuerstatus})  # Kommentar: Auftrag
+    return auftraege  # Kommentar: Liste zurückgeben
+
+
+def auftraege_aus_manifest(pfad: str, auswahl: str, steuerstatus: str) -> list[dict]:  # Kommentar: Manifest (CSV oder JSON-Liste) lesen
+    basis = os.path.dirname(os.path.abspath(pfad))  # Kommentar: relative Pfade relativ zum Manifest
+    with open(pfad, "r", encoding="utf-8") as f:  # Kommentar: Datei öffnen
+        if pfad.lower().endswith(".json"):  # Kommentar: JSON?
+            zeilen = json.load(f)  # Kommentar: Liste von Objekten
+        else:  # Kommentar: CSV mit Kopfzeile
+            zeilen = list(csv.DictReader(f, delimiter=";"))  # Kommentar: Semikolon (Excel-DE)
+    auftraege = []  # Kommentar: Liste
+    for zeile in zeilen:  # Kommentar: Zeilen iterieren
+        datei = (zeile.get("datei") or "").strip()  # Kommentar: Pflichtfeld
+        if not datei:  # Kommentar: leer?
+            continue  # Kommentar: überspringen
+        auftraege.append({  # Kommentar: Auftrag bauen
+            "datei": datei if os.path.isabs(datei) else os.path.join(basis, datei),  # Kommentar: Pfad
+            "auswahl": (zeile.get("auswahl") or auswahl).strip(),  # Kommentar: Variante
+            "steuerstatus": (zeile.get("steuerstatus") or steuerstatus).strip(),  # Kommentar: Steuerstatus
+            "zus_bez": (zeile.get("zus_bez") or "").strip(),  # Kommentar: Zusatzkosten Name
+            "zus_betrag": (zeile.get("zus_betrag") or "").strip(),  # Kommentar: Zusatzkosten Betrag
+        })  # Kommentar: Ende Auftrag
+    return auftraege  # Kommentar: Liste zurückgeben
+
+
+def ausgabe_namen(auftraege: list[dict]) -> list[str]:  # Kommentar: Ausgabename je Auftrag (ohne Endung), eindeutig auch bei gleichen Dateinamen in verschiedenen Ordnern
+    basisnamen = [os.path.splitext(os.path.basename(a["datei"]))[0] for a in auftraege]  # Kommentar: Name ohne Endung
+    namen = []  # Kommentar: Ergebnis
+    for basisname, auftrag in zip(basisnamen, auftraege):  # Kommentar: je Auftrag
+        if basisnamen.count(basisname) > 1:  # Kommentar: Name kommt mehrfach vor?
+            basisname += "_" + hashlib.sha1(os.path.abspath(auftrag["datei"]).encode("utf-8")).hexdigest()[:8]  # Kommentar: Pfad-Hash anhängen (stabil über Läufe)
+        namen.append(basisname)  # Kommentar: merken
+    return namen  # Kommentar: Liste zurückgeben
+
+
+def auftrag_verarbeiten(auftrag: dict, ausgabe_ordner: str, pdf: bool = False, ausgabe_name: str = "") -> dict:  # Kommentar: Ein Gutachten komplett verarbeiten
+    ergebnis = {"datei": auftrag["datei"], "auswahl": auftrag["auswahl"], "status": "fehler", "docx": "", "pdf": "", "fehler": ""}  # Kommentar: Ergebniszeile
+    start = time.perf_counter()  # Kommentar: Start
+    try:  # Kommentar: Fehler je Datei abfangen (Batch läuft weiter)
+        with telemetrie.job("batch", datei=os.path.basename(auftrag["datei"]), auswahl=auftrag["auswahl"]):  # Kommentar: Stufen dieses Falls erfassen
+            vorlage_pfad = programm_2_word_output.resolve_vorlage_pfad(auftrag["auswahl"])  # Kommentar: Vorlage bestimmen (früh prüfen)
+            info = {}  # Kommentar: Versuche/Wartezeiten des KI-Aufrufs
+            with open(auftrag["datei"], "rb") as f:  # Kommentar: PDF lesen
+                pdf_bytes = f.read()  # Kommentar: Bytes
+            ki_text = programm_1_ki_input.analyse_aus_bytes(pdf_bytes, auftrag["auswahl"], auftrag["steuerstatus"], info)  # Kommentar: Programm 1 im Speicher (keine _ki.txt, die parallele Fälle teilen könnten)
+            ergebnis["wartezeit_s"] = round(info.get("wartezeit_limiter_s", 0.0) + info.get("wartezeit_backoff_s", 0.0), 3)  # Kommentar: tatsächliche Wartezeit (Limit + Backoff)
+            ergebnis["versuche"] = info.get("versuche", 0)  # Kommentar: KI-Versuche (0 = Cache-Treffer)
+            daten = programm_2_word_output.json_aus_ki_antwort_parsen(ki_text)  # Kommentar: JSON parsen
+            daten = programm_2_word_output.prepare_data_for_template(  # Kommentar: Summen/Defaults
+                daten, auftrag["auswahl"], auftrag["steuerstatus"], auftrag.get("zus_bez", ""), auftrag.get("zus_betrag", "")
+            )  # Kommentar: Ende prepare
+            basisname = ausgabe_name or os.path.splitext(os.path.basename(auftrag["datei"]))[0]  # Kommentar: eindeutiger Name (batch_ausfuehren) oder Name ohne Endung
+            ziel_pfad = os.path.join(ausgabe_ordner, basisname + ".docx")  # Kommentar: Ausgabepfad
+            programm_2_word_output.word_aus_vorlage_erstellen(daten, vorlage_pfad, ziel_pfad)  # Kommentar: DOCX rendern
+            if pdf:  # Kommentar: PDF gewünscht?
+                ergebnis["pdf"] = pdf_konverter.pdf_neben_docx(ziel_pfad)  # Kommentar: über den warmen Pool konvertieren
+            ergebnis["status"] = "ok"  # Kommentar: Erfolg
+            ergebnis["docx"] = ziel_pfad  # Kommentar: Pfad merken
+            ergebnis["kostensumme"] = daten.get("KOSTENSUMME_X", "")  # Kommentar: Summe zur Kontrolle
+    except Exception as e:  # Kommentar: Fehlerfall
+        ergebnis["fehler"] = repr(e)  # Kommentar: Fehlertext
+    ergebnis["dauer_s"] = round(time.perf_counter() - start, 3)  # Kommentar: Dauer
+    return ergebnis  # Kommentar: Ergebnis zurückgeben
+
+
+def batch_ausfuehren(auftraege: list[dict], ausgabe_ordner: str, parallel: int, pro_minute: float, pdf: bool = False) -> dict:  # Kommentar: Alle Aufträge verarbeiten
+    os.makedirs(ausgabe_ordner, exist_ok=True)  # Kommentar: Ausgabeordner sicherstellen
+    if pdf:  # Kommentar: PDF gewünscht?
+        pdf_konverter.pool_holen().vorwaermen()  # Kommentar: soffice-Prozesse starten, während die ersten Analysen laufen
+    ki_limiter.gemini_limiter().konfigurieren(rpm=pro_minute)  # Kommentar: ein Limit für alle Worker (prozessweit)
+    ergebnisse = []  # Kommentar: Ergebnisse
+    start = time.perf_counter()  # Kommentar: Gesamtzeit
+    with ThreadPoolExecutor(max_workers=max(parallel, 1)) as pool:  # Kommentar: begrenzte Parallelität
+        futures = [pool.submit(auftrag_verarbeiten, a, ausgabe_ordner, pdf, name) for a, name in zip(auftraege, ausgabe_namen(auftraege))]  # Kommentar: alle einreichen
+        for future in as_completed(futures):  # Kommentar: in Fertigstellungsreihenfolge
+            ergebnis = future.result()  # Kommentar: Ergebnis holen
+            ergebnisse.append(ergebnis)  # Kommentar: sammeln
+            print(f"[{ergebnis['status']}] {os.path.basename(ergebnis['datei'])} ({ergebnis['dauer_s']} s) {ergebnis['fehler']}")  # Kommentar: Fortschritt
+    dauer = time.perf_counter() - start  # Kommentar: Gesamtdauer
+    ergebnisse.sort(key=lambda e: e["datei"])  # Kommentar: stabile Reihenfolge in der Zusammenfassung
+    ok = sum(1 for e in ergebnisse if e["status"] == "ok")  # Kommentar: Erfolge zählen
+    zusammenfassung = {  # Kommentar: Gesamtergebnis
+        "gestartet": datetime.now().isoformat(timespec="seconds"),  # Kommentar: Zeitpunkt
+        "anzahl": len(ergebnisse),  # Kommentar: Gesamt
+        "ok": ok,  # Kommentar: Erfolge
+        "fehler": len(ergebnisse) - ok,  # Kommentar: Fehler
+        "parallel": parallel,  # Kommentar: Einstellung
+        "pro_minute": pro_minute,  # Kommentar: Einstellung
+        "dauer_s": round(dauer, 3),  # Kommentar: Gesamtdauer
+        "durchsatz_pro_minute": round(len(ergebnisse) / dauer * 60, 2) if dauer > 0 else 0.0,  # Kommentar: Fälle pro Minute
+        "limiter": ki_limiter.gemini_limiter().statistik(),  # Kommentar: Wartezeiten am Ratenlimit
+        "kontext_cache": kontext_cache.kontext_cache().statistik(),  # Kommentar: Anlegen/Treffer des Prompt-Caches (PROMPT_CACHE_MODUS)
+        "pdf_konverter": pdf_konverter.pool_statistik(),  # Kommentar: Latenzen/Auslastung der PDF-Worker (leer ohne --pdf)
+        "ergebnisse": ergebnisse,  # Kommentar: Details je Datei
+    }  # Kommentar: Ende Zusammenfassung
+    with open(os.path.join(ausgabe_ordner, "zusammenfassung.json"), "w", encoding="utf-8") as f:  # Kommentar: Zusammenfassung speichern
+        json.dump(zusammenfassung, f, ensure_ascii=False, indent=2)  # Kommentar: JSON schreiben
+    return zusammenfassung  # Kommentar: Zurückgeben
+
+
+def vorlagen_pruefen(auftraege: list[dict]) -> dict:  # Kommentar: Variante -> Fehlertext für Aufträge ohne Vorlage (leer = alles da)
+    fehlende = {}  # Kommentar: Ergebnis
+    for auswahl in sorted({auftrag["auswahl"] for auftrag in auftraege}):  # Kommentar: jede Variante einmal
+        try:  # Kommentar: Vorlage auflösen
+            programm_2_word_output.resolve_vorlage_pfad(auswahl)  # Kommentar: existiert die Datei?
+        except (ValueError, FileNotFoundError) as e:  # Kommentar: unbekannte Variante oder Datei fehlt
+            fehlende[auswahl] = str(e)  # Kommentar: merken
+    return fehlende  # Kommentar: zurückgeben
+
+
+def main(argv: list[str] | None = None) -> int:  # Kommentar: Entry-Point (python batch_verarbeitung.py ...)
+    parser = argparse.ArgumentParser(description="Gutachten im Batch analysieren und Schreiben erzeugen")  # Kommentar: Parser
+    parser.add_argument("--ordner", default=config.EINGANGS_ORDNER, help="Ordner mit PDF-Gutachten")  # Kommentar: Eingangsordner
+    parser.add_argument("--manifest", default="", help="CSV (;) oder JSON mit datei/auswahl/steuerstatus/zus_bez/zus_betrag")  # Kommentar: Manifest
+    parser.add_argument("--auswahl", default=STANDARD_AUSWAHL, choices=list(config.VORLAGEN.keys()))  # Kommentar: Default-Variante
+    parser.add_argument("--steuerstatus", default=STANDARD_STEUERSTATUS, choices=["nicht vorsteuerabzugsberechtigt", "vorsteuerabzugsberechtigt"])  # Kommentar: Default-Steuerstatus
+    parser.add_argument("--parallel", type=int, default=STANDARD_PARALLEL, help="gleichzeitige Fälle")  # Kommentar: Parallelität
+    parser.add_argument("--pro-minute", type=float, default=STANDARD_PRO_MINUTE, help="max. Gemini-Anfragen pro Minute inkl. Wiederholungen (0 = ohne Limit)")  # Kommentar: Ratenlimit
+    parser.add_argument("--ausgabe", default="", help="Ausgabeordner (Default: ausgang_schreiben/batch_<zeit>)")  # Kommentar: Ausgabe
+    parser.add_argument("--pdf", action="store_true", help="Schreiben zusätzlich als PDF ablegen (LibreOffice + python3-uno nötig)")  # Kommentar: PDF-Ausgabe
+    args = parser.parse_args(argv)  # Kommentar: parsen
+
+    if args.manifest:  # Kommentar: Manifest hat Vorrang
+        auftraege = auftraege_aus_manifest(args.manifest, args.auswahl, args.steuerstatus)  # Kommentar: Aufträge aus Manifest
+    else:  # Kommentar: Ordner scannen
+        auftraege = auftraege_aus_ordner(args.ordner, args.auswahl, args.steuerstatus)  # Kommentar: Aufträge aus Ordner
+    if not auftraege:  # Kommentar: nichts zu tun?
+        print("Keine Gutachten gefunden.")  # Kommentar: Hinweis
+        return 1  # Kommentar: Fehlercode
+    fehlende = vorlagen_pruefen(auftraege)  # Kommentar: Vorlagen einmal vorab prüfen (nicht erst nach der KI-Analyse je Fall)
+    if fehlende:  # Kommentar: Variante ohne Vorlage?
+        for auswahl, fehler in fehlende.items():  # Kommentar: je Variante
+            print(f"Vorlage fehlt für '{auswahl}': {fehler}")  # Kommentar: klare Meldung
+        print(f"Abbruch: Vorlage in {config.VORLAGEN_ORDNER} ablegen oder andere --auswahl wählen.")  # Kommentar: Hinweis
+        return 1  # Kommentar: Fehlercode
+    ausgabe = args.ausgabe or os.path.join(  # Kommentar: Ausgabeordner bestimmen
+        programm_2_word_output.AUSGANGS_ORDNER, "batch_" + datetime.now().strftime("%Y%m%d_%H%M%S")
+    )  # Kommentar: Ende Ausgabe
+    zusammenfassung = batch_ausfuehren(auftraege, ausgabe, args.parallel, args.pro_minute, args.pdf)  # Kommentar: ausführen
+    print(f"{zusammenfassung['ok']}/{zusammenfassung['anzahl']} ok in {zusammenfassung['dauer_s']} s -> {ausgabe}")  # Kommentar: Ergebnis
+    return 0 if zusammenfassung["fehler"] == 0 else 2  # Kommentar: Exit-Code (2 = Teilfehler)
+
+
+if __name__ == "__main__":  # Kommentar: Direktausführung
+    sys.exit(main())  # Kommentar: Aufruf
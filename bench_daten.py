@@ -0,0 +1,230 @@
+# bench_daten.py  # Kommentar: Synthetische Gutachten-PDFs (reines Python) + Stub für den Gemini-Client (Benchmarks ohne API)
+
+import json  # Kommentar: Antworten als JSON
+import time  # Kommentar: simulierte Latenz
+import random  # Kommentar: reproduzierbare Fülltexte
+import itertools  # Kommentar: aufgezeichnete Antworten reihum
+
+from google.genai import errors as genai_errors  # Kommentar: Fehler wie beim echten Client (abgelaufener Kontext-Cache)
+
+SEITE_BREITE = 595  # Kommentar: A4 in Punkt
+SEITE_HOEHE = 842  # Kommentar: A4 in Punkt
+ZEILEN_PRO_SEITE = 50  # Kommentar: Zeilen je Seite (11 pt, 14 pt Zeilenabstand)
+
+GUTACHTEN_WERTE = {  # Kommentar: "Wahrheit" des synthetischen Gutachtens (für Stub-Antwort und Prüfung)
+    "MANDANT_VORNAME": "Max", "MANDANT_NACHNAME": "Müller", "MANDANT_NAME": "Max Müller",
+    "MANDANT_STRASSE": "Hauptstraße 12", "MANDANT_PLZ_ORT": "10115 Berlin",
+    "UNFALL_DATUM": "12.03.2024", "UNFALL_UHRZEIT": "14:30", "UNFALLORT": "Berlin", "UNFALL_STRASSE": "Friedrichstraße",
+    "FAHRZEUGTYP": "VW Golf VIII 1.5 TSI", "KENNZEICHEN": "B-MM 1234", "FAHRZEUG_KENNZEICHEN": "B-MM 1234",
+    "POLIZEIAKTE_NUMMER": "1234/24/5678", "SCHADENSNUMMER": "12-345678/AB", "AKTENZEICHEN": "2024-0815",
+    "SCHADENHERGANG": (
+        "Der Anspruchsteller befuhr die Friedrichstraße in nördlicher Richtung. An der Kreuzung zur "
+        "Leipziger Straße musste er verkehrsbedingt anhalten. Das nachfolgende Fahrzeug bemerkte dies "
+        "zu spät und fuhr auf das Heck des Fahrzeugs des Anspruchstellers auf. Dabei wurden die "
+        "Heckstoßfänger, die Heckklappe und die linke Heckleuchte beschädigt."
+    ),
+    "REPARATURKOSTEN": "4.906,91 €", "WERTMINDERUNG": "500,00 €", "KOSTENPAUSCHALE": "25,00 €",
+    "GUTACHTERKOSTEN": "689,47 €", "NUTZUNGSAUSFALL": "215,00 €", "MWST_BETRAG": "783,46 €",
+    "WIEDERBESCHAFFUNGSWERT": "18.500,00 €", "RESTWERT": "9.200,00 €",
+    "FRIST_DATUM": "", "HEUTDATUM": "",
+}  # Kommentar: Ende Werte
+
+FUELL_SAETZE = [  # Kommentar: typische Gutachten-Floskeln für Füllseiten
+    "Die Besichtigung erfolgte bei Tageslicht in trockenem Zustand.",
+    "Die Lackschichtdickenmessung ergab keine Hinweise auf Vorschäden.",
+    "Die Ersatzteilpreise entsprechen den unverbindlichen Preisempfehlungen des Herstellers.",
+    "Die Arbeitswerte wurden nach Herstellervorgaben kalkuliert.",
+    "Das Fahrzeug befand sich in einem dem Alter entsprechenden Pflegezustand.",
+    "Verbringungskosten zur Lackiererei wurden berücksichtigt.",
+    "Eine Achsvermessung ist nach Abschluss der Instandsetzung erforderlich.",
+]  # Kommentar: Ende Sätze
+
+
+def _gutachten_zeilen(seiten: int, seed: int = 1) -> list[str]:  # Kommentar: Textzeilen eines Gutachtens mit n Seiten
+    w = GUTACHTEN_WERTE  # Kommentar: Kurzname
+    zeilen = [  # Kommentar: Seite 1: Stammdaten
+        "Kfz-Schadensgutachten Nr. 2024-0815",
+        f"Aktenzeichen: {w['AKTENZEICHEN']}",
+        f"Auftraggeber: {w['MANDANT_NAME']}, {w['MANDANT_STRASSE']}, {w['MANDANT_PLZ_ORT']}",
+        f"Amtl. Kennzeichen: {w['KENNZEICHEN']}",
+        f"Fahrzeugtyp: {w['FAHRZEUGTYP']}",
+        f"Schadennummer: {w['SCHADENSNUMMER']}",
+        "VS-Nr. 99887766",
+        f"Unfalltag: {w['UNFALL_DATUM']}   Uhrzeit: {w['UNFALL_UHRZEIT']} Uhr",
+        f"Unfallort: {w['UNFALLORT']}, {w['UNFALL_STRASSE']}",
+        f"Polizei Tagebuch-Nr. {w['POLIZEIAKTE_NUMMER']}",
+        "",
+        "Schadenhergang",
+    ]  # Kommentar: Ende Stammdaten
+    satz = ""  # Kommentar: Hergang auf ~90 Zeichen umbrechen
+    for wort in w["SCHADENHERGANG"].split():  # Kommentar: Wörter
+        if len(satz) + len(wort) > 90:  # Kommentar: Zeile voll?
+            zeilen.append(satz)  # Kommentar: Zeile übernehmen
+            satz = ""  # Kommentar: neue Zeile
+        satz = f"{satz} {wort}".strip()  # Kommentar: anhängen
+    zeilen += [satz, "", "Zusammenfassung der Kalkulation"]  # Kommentar: Kostenblock
+    zeilen += [  # Kommentar: Beträge
+        "Reparaturkosten netto 4.123,45 €",
+        f"Reparaturkosten brutto {w['REPARATURKOSTEN']}",
+        f"Mehrwertsteuer {w['MWST_BETRAG']}",
+        f"Wertminderung: {w['WERTMINDERUNG']}",
+        f"Nutzungsausfall: {w['NUTZUNGSAUSFALL']}",
+        f"Wiederbeschaffungswert: {w['WIEDERBESCHAFFUNGSWERT']}",
+        f"Restwert: {w['RESTWERT']}",
+        f"Gutachterkosten: {w['GUTACHTERKOSTEN']}",
+    ]  # Kommentar: Ende Beträge
+    rnd = random.Random(seed)  # Kommentar: reproduzierbar
+    position = 1  # Kommentar: Kalkulationsposition
+    while len(zeilen) < seiten * ZEILEN_PRO_SEITE:  # Kommentar: restliche Seiten füllen
+        if len(zeilen) % ZEILEN_PRO_SEITE == 0:  # Kommentar: neue Seite
+            zeilen.append(f"Anlage {len(zeilen) // ZEILEN_PRO_SEITE}: Kalkulationspositionen")  # Kommentar: Seitenüberschrift
+        elif rnd.random() < 0.6:  # Kommentar: Kalkulationszeile
+            zeilen.append(f"Pos. {position:04d}  Ersatzteil {rnd.randint(10000, 99999)}  {rnd.randint(1, 40)} AW  {rnd.randint(10, 999)},{rnd.randint(0, 99):02d}")  # Kommentar: Position
+            position += 1  # Kommentar: weiterzählen
+        else:  # Kommentar: Fließtext
+            zeilen.append(rnd.choice(FUELL_SAETZE))  # Kommentar: Floskel
+    return zeilen[:seiten * ZEILEN_PRO_SEITE]  # Kommentar: genau n Seiten
+
+
+def _pdf_text(text: str) -> bytes:  # Kommentar: Text als PDF-String (WinAnsi/Latin-1, Sonderzeichen escapen)
+    roh = text.replace("€", "EUR").encode("latin-1", "replace")  # Kommentar: € ist in Latin-1 nicht enthalten
+    return roh.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")  # Kommentar: escapen
+
+
+def synthetisches_pdf(seiten: int = 10, seed: int = 1) -> bytes:  # Kommentar: Gutachten-PDF mit n Seiten erzeugen (ohne externe Library)
+    zeilen = _gutachten_zeilen(seiten, seed)  # Kommentar: Textzeilen
+    objekte = []  # Kommentar: PDF-Objekte (Index + 1 = Objektnummer)
+    objekte.append(b"<< /Type /Catalog /Pages 2 0 R >>")  # Kommentar: 1: Katalog
+    objekte.append(b"")  # Kommentar: 2: Seitenbaum (wird unten gesetzt)
+    objekte.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")  # Kommentar: 3: Schrift
+    seiten_ids = []  # Kommentar: Objektnummern der Seiten
+    for s in range(seiten):  # Kommentar: Seiten erzeugen
+        inhalt = [b"BT /F1 11 Tf 14 TL 50 800 Td"]  # Kommentar: Textblock starten
+        for zeile in zeilen[s * ZEILEN_PRO_SEITE:(s + 1) * ZEILEN_PRO_SEITE]:  # Kommentar: Zeilen der Seite
+            inhalt.append(b"(" + _pdf_text(zeile) + b") Tj T*")  # Kommentar: Zeile ausgeben + Zeilenumbruch
+        inhalt.append(b"ET")  # Kommentar: Textblock Ende
+        strom = b"\n".join(inhalt)  # Kommentar: Content-Stream
+        objekte.append(b"<< /Length %d >>\nstream\n" % len(strom) + strom + b"\nendstream")  # Kommentar: Inhalt
+        objekte.append(  # Kommentar: Seite
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (SEITE_BREITE, SEITE_HOEHE, len(objekte))
+        )  # Kommentar: Ende Seite
+        seiten_ids.append(len(objekte))  # Kommentar: Objektnummer merken
+    kinder = b" ".join(b"%d 0 R" % i for i in seiten_ids)  # Kommentar: Seitenverweise
+    objekte[1] = b"<< /Type /Pages /Kids [" + kinder + b"] /Count %d >>" % seiten  # Kommentar: Seitenbaum
+    pdf = bytearray(b"%PDF-1.4\n")  # Kommentar: Kopf
+    offsets = []  # Kommentar: Byte-Offsets für die xref-Tabelle
+    for nr, obj in enumerate(objekte, start=1):  # Kommentar: Objekte schreiben
+        offsets.append(len(pdf))  # Kommentar: Offset merken
+        pdf += b"%d 0 obj\n" % nr + obj + b"\nendobj\n"  # Kommentar: Objekt
+    xref = len(pdf)  # Kommentar: Start der xref-Tabelle
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objekte) + 1)  # Kommentar: Kopf + freies Objekt 0
+    pdf += b"".join(b"%010d 00000 n \n" % o for o in offsets)  # Kommentar: Einträge
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objekte) + 1, xref)  # Kommentar: Trailer
+    return bytes(pdf)  # Kommentar: fertiges PDF
+
+
+def stub_antwort(schema: bool = False, werte: dict | None = None) -> str:  # Kommentar: Kanonische KI-Antwort zum synthetischen Gutachten
+    daten = dict(werte or GUTACHTEN_WERTE)  # Kommentar: Werte
+    if schema:  # Kommentar: Schema-Modus: reines JSON
+        return json.dumps(daten, ensure_ascii=False)  # Kommentar: ohne Marker
+    stichpunkte = "\n".join(f"- {k}: {v}" for k, v in list(daten.items())[:6])  # Kommentar: Stichpunkte wie im Marker-Modus
+    return stichpunkte + "\n\nJSON_START\n" + json.dumps(daten, ensure_ascii=False, indent=2) + "\nJSON_END\n"  # Kommentar: Marker-Format
+
+
+class StubNutzung:  # Kommentar: usage_metadata wie beim echten Client
+    def __init__(self, eingabe_tokens: int, ausgabe_tokens: int, cache_tokens: int = 0):  # Kommentar: Tokenzahlen
+        self.prompt_token_count = eingabe_tokens  # Kommentar: Eingabe
+        self.candidates_token_count = ausgabe_tokens  # Kommentar: Ausgabe
+        self.cached_content_token_count = cache_tokens  # Kommentar: aus Kontext-Cache
+
+
+class StubAntwort:  # Kommentar: Antwortobjekt (text + usage_metadata)
+    def __init__(self, text: str, nutzung: StubNutzung):  # Kommentar: Felder
+        self.text = text  # Kommentar: Antworttext
+        self.usage_metadata = nutzung  # Kommentar: Tokens
+
+
+class _StubModelle:  # Kommentar: client.models
+    def __init__(self, client):  # Kommentar: Rückverweis
+        self.client = client  # Kommentar: merken
+
+    def _text(self, config) -> str:  # Kommentar: nächste Antwort (aufgezeichnet oder kanonisch)
+        schema = getattr(config, "response_mime_type", None) == "application/json"  # Kommentar: Schema-Modus?
+        text = next(self.client.antworten) if self.client.antworten else stub_antwort(schema)  # Kommentar: Antwort wählen
+        for stopp in getattr(config, "stop_sequences", None) or []:  # Kommentar: Stoppsequenzen wie der Server
+            pos = text.find(stopp)  # Kommentar: Position
+            if pos != -1:  # Kommentar: gefunden?
+                text = text[:pos]  # Kommentar: abschneiden (ohne Stoppsequenz)
+        return text  # Kommentar: Text zurückgeben
+
+    def _nutzung(self, contents, text: str, config) -> StubNutzung:  # Kommentar: grobe Tokenzahlen (4 Zeichen/Token)
+        cache_tokens = self.client.cache_tokens.get(getattr(config, "cached_content", None), 0)  # Kommentar: Tokens des referenzierten Kontext-Caches
+        system_tokens = len(getattr(config, "system_instruction", None) or "") // 4  # Kommentar: System-Instruktion zählt als Eingabe
+        return StubNutzung(len(str(contents)) // 4 + system_tokens + cache_tokens, len(text) // 4, cache_tokens)  # Kommentar: Nutzung
+
+    def _cache_pruefen(self, config) -> None:  # Kommentar: referenzierter Cache vorhanden und nicht abgelaufen? (sonst 404 wie der Server)
+        name = getattr(config, "cached_content", None)  # Kommentar: Cache-Name
+        if name and self.client.cache_ablauf.get(name, 0.0) <= time.monotonic():  # Kommentar: unbekannt/gelöscht/abgelaufen?
+            self.client.cache_tokens.pop(name, None)  # Kommentar: abgelaufenen Cache entfernen
+            raise genai_errors.ClientError(404, {"error": {"code": 404, "message": f"CachedContent not found: {name}", "status": "NOT_FOUND"}})  # Kommentar: wie genai
+
+    def generate_content(self, model, contents, config=None):  # Kommentar: wie genai: ganze Antwort
+        self.client.aufrufe += 1  # Kommentar: zählen
+        self._cache_pruefen(config)  # Kommentar: Kontext-Cache gültig?
+        text = self._text(config)  # Kommentar: Antwort
+        time.sleep(self.client.latenz_s + len(text) / 4 * self.client.s_pro_token)  # Kommentar: Netz + Generierung simulieren
+        return StubAntwort(text, self._nutzung(contents, text, config))  # Kommentar: Antwortobjekt
+
+    def generate_content_stream(self, model, contents, config=None):  # Kommentar: wie genai: Antwort in Stücken
+        self.client.aufrufe += 1  # Kommentar: zählen
+        self._cache_pruefen(config)  # Kommentar: Kontext-Cache gültig?
+        text = self._text(config)  # Kommentar: Antwort
+        time.sleep(self.client.latenz_s)  # Kommentar: Zeit bis zum ersten Stück
+        n = self.client.stueck_zeichen  # Kommentar: Stückgröße
+        for i in range(0, len(text), n):  # Kommentar: Stücke liefern
+            stueck = text[i:i + n]  # Kommentar: Text des Stücks
+            time.sleep(len(stueck) / 4 * self.client.s_pro_token)  # Kommentar: Generierungszeit
+            yield StubAntwort(stueck, self._nutzung(contents, text[:i + n], config))  # Kommentar: Stück mit laufender Nutzung
+
+
+def _ttl_s(config) -> float:  # Kommentar: "3600s" -> 3600.0 (Standard wie beim Server: 1 Stunde)
+    ttl = getattr(config, "ttl", None) or "3600s"  # Kommentar: TTL aus der Config
+    return float(str(ttl).rstrip("s"))  # Kommentar: Sekunden
+
+
+class _StubCaches:  # Kommentar: client.caches (Kontext-Caching)
+    def __init__(self, client):  # Kommentar: Rückverweis
+        self.client = client  # Kommentar: merken
+
+    def create(self, model, config=None):  # Kommentar: Cache anlegen, Objekt mit name zurückgeben
+        name = f"cachedContents/stub-{self.client.cache_angelegt + 1}"  # Kommentar: eindeutiger Name
+        inhalt = getattr(config, "system_instruction", None) or getattr(config, "contents", None) or ""  # Kommentar: gecachter Text
+        self.client.cache_tokens[name] = len(str(inhalt)) // 4  # Kommentar: Tokens merken
+        self.client.cache_ablauf[name] = time.monotonic() + _ttl_s(config)  # Kommentar: Ablauf merken
+        self.client.cache_angelegt += 1  # Kommentar: zählen
+        return type("StubCache", (), {"name": name})()  # Kommentar: Objekt mit name
+
+    def update(self, name, config=None):  # Kommentar: TTL verlängern (404, wenn nicht mehr vorhanden)
+        if self.client.cache_ablauf.get(name, 0.0) <= time.monotonic():  # Kommentar: unbekannt/abgelaufen?
+            raise genai_errors.ClientError(404, {"error": {"code": 404, "message": f"CachedContent not found: {name}", "status": "NOT_FOUND"}})  # Kommentar: wie genai
+        self.client.cache_ablauf[name] = time.monotonic() + _ttl_s(config)  # Kommentar: neuer Ablauf
+        return type("StubCache", (), {"name": name})()  # Kommentar: Objekt mit name
+
+    def delete(self, name, config=None):  # Kommentar: Cache löschen
+        self.client.cache_tokens.pop(name, None)  # Kommentar: entfernen
+        self.client.cache_ablauf.pop(name, None)  # Kommentar: Ablauf entfernen
+
+
+class StubGeminiClient:  # Kommentar: Ersatz für genai.Client (models.generate_content[_stream], caches.create/delete)
+    def __init__(self, antworten: list[str] | None = None, latenz_s: float = 0.0, s_pro_token: float = 0.0, stueck_zeichen: int = 40):  # Kommentar: Verhalten
+        self.antworten = itertools.cycle(antworten) if antworten else None  # Kommentar: aufgezeichnete Antworten reihum
+        self.latenz_s = latenz_s  # Kommentar: Zeit bis zur ersten Antwort
+        self.s_pro_token = s_pro_token  # Kommentar: Generierungszeit je Ausgabetoken
+        self.stueck_zeichen = stueck_zeichen  # Kommentar: Zeichen je Stream-Stück
+        self.aufrufe = 0  # Kommentar: Anzahl Aufrufe
+        self.cache_tokens = {}  # Kommentar: Kontext-Caches (name -> Tokens)
+        self.cache_ablauf = {}  # Kommentar: Kontext-Caches (name -> monotone Ablaufzeit)
+        self.cache_angelegt = 0  # Kommentar: Anzahl angelegter Caches (eindeutige Namen)
+        self.models = _StubModelle(self)  # Kommentar: wie genai.Client.models
+        self.caches = _StubCaches(self)  # Kommentar: wie genai.Client.caches
@@ -0,0 +1,534 @@
+# benchmark.py  # Kommentar: Benchmarks für die Pipeline (Aufruf: python benchmark.py <teil> ...)
+
+import io  # Kommentar: In-Memory-Puffer für DOCX
+import os  # Kommentar: Pfade
+import re  # Kommentar: Text aus document.xml (Serienbrief-Abgleich)
+import sys  # Kommentar: Exit-Code
+import json  # Kommentar: Maschinenlesbare Ausgabe
+import zipfile  # Kommentar: DOCX-Teile lesen (Serienbrief-Abgleich)
+import time  # Kommentar: Zeitmessung (perf_counter)
+import argparse  # Kommentar: Kommandozeile
+import random  # Kommentar: zufällige Benutzer beim Login-Benchmark
+import tempfile  # Kommentar: temporäre Benutzer-Dateien
+import statistics  # Kommentar: Median/Mittelwert
+from concurrent.futures import ThreadPoolExecutor  # Kommentar: gleichzeitige Logins
+
+import programm_1_ki_input  # Kommentar: Programm 1 (PDF-Extraktion)
+import programm_2_word_output  # Kommentar: Programm 2 (Antwort-Parser)
+import user_store  # Kommentar: Benutzer-Speicher (Login-Benchmark)
+import ki_limiter  # Kommentar: Limiter im Stufen-Benchmark abschalten
+import bench_daten  # Kommentar: synthetische PDFs + Stub-Client
+import pdf_backends  # Kommentar: PDF-Backends (Durchsatz-Vergleich)
+import batch_summen  # Kommentar: spaltenweise Summen-Neuberechnung
+import serienbrief  # Kommentar: kompilierte Vorlagen (Serienbrief-Durchsatz)
+import config  # Kommentar: Varianten (VORLAGEN)
+import ki_cache  # Kommentar: Antwort-Cache im Langdokument-Benchmark abschalten
+import kontext_cache  # Kommentar: Prompt-Cache-Modus umschalten
+
+AUSGABE_MODI = ["marker", "schema"]  # Kommentar: verglichene Ausgabemodi
+
+
+def _pdf_dateien(pfade: list[str]) -> list[str]:  # Kommentar: Dateien und Ordner zu PDF-Liste auflösen
+    dateien = []  # Kommentar: Ergebnisliste
+    for pfad in pfade:  # Kommentar: Argumente iterieren
+        if os.path.isdir(pfad):  # Kommentar: Ordner?
+            for name in sorted(os.listdir(pfad)):  # Kommentar: Inhalt sortiert
+                if name.lower().endswith(".pdf"):  # Kommentar: nur PDFs
+                    dateien.append(os.path.join(pfad, name))  # Kommentar: hinzufügen
+        elif os.path.isfile(pfad):  # Kommentar: Einzeldatei?
+            dateien.append(pfad)  # Kommentar: hinzufügen
+    return dateien  # Kommentar: Liste zurückgeben
+
+
+def _messen(funktion, wiederholungen: int) -> dict:  # Kommentar: Funktion mehrfach ausführen und Zeiten sammeln
+    zeiten = []  # Kommentar: Laufzeiten in Sekunden
+    ergebnis = None  # Kommentar: letztes Ergebnis
+    for _ in range(wiederholungen):  # Kommentar: Wiederholungen
+        start = time.perf_counter()  # Kommentar: Start
+        ergebnis = funktion()  # Kommentar: ausführen
+        zeiten.append(time.perf_counter() - start)  # Kommentar: Dauer merken
+    return {  # Kommentar: Kennzahlen
+        "median_s": round(statistics.median(zeiten), 4),  # Kommentar: Median
+        "min_s": round(min(zeiten), 4),  # Kommentar: Bestwert
+        "max_s": round(max(zeiten), 4),  # Kommentar: Schlechtester Wert
+        "ergebnis": ergebnis,  # Kommentar: für Plausibilitätsprüfung
+    }  # Kommentar: Ende Kennzahlen
+
+
+def bench_pdf(args) -> dict:  # Kommentar: seriell vs. parallel, jeweils mit und ohne Zeichenbudget
+    dateien = _pdf_dateien(args.pfade)  # Kommentar: PDFs sammeln
+    if not dateien:  # Kommentar: nichts gefunden?
+        raise SystemExit("Keine PDF-Dateien gefunden.")  # Kommentar: Abbruch
+    varianten = [  # Kommentar: (Name, Modus, Budget)
+        ("seriell_voll", "seriell", None),  # Kommentar: bisheriges Verhalten
+        ("seriell_budget", "seriell", args.max_zeichen),  # Kommentar: Abbruch bei vollem Budget
+        ("parallel_voll", "parallel", None),  # Kommentar: Prozess-Pool, alle Seiten
+        ("parallel_budget", "parallel", args.max_zeichen),  # Kommentar: Prozess-Pool mit Budget
+    ]  # Kommentar: Ende Varianten
+    programm_1_ki_input._pdf_pool_holen()  # Kommentar: Pool vorab starten (Startkosten nicht mitmessen)
+    ergebnisse = []  # Kommentar: Ergebnis je Datei
+    for pfad in dateien:  # Kommentar: Dateien iterieren
+        zeile = {"datei": os.path.basename(pfad)}  # Kommentar: Ergebniszeile
+        referenz = None  # Kommentar: Text der seriellen Vollextraktion
+        for name, modus, budget in varianten:  # Kommentar: Varianten iterieren
+            messung = _messen(lambda: programm_1_ki_input.pdf_text_auslesen(pfad, max_zeichen=budget, modus=modus), args.wiederholungen)  # Kommentar: messen
+            text = messung.pop("ergebnis")  # Kommentar: Text separat
+            if referenz is None:  # Kommentar: erste Variante = Referenz
+                referenz = text  # Kommentar: merken
+            messung["zeichen"] = len(text)  # Kommentar: extrahierte Zeichen
+            messung["gleicher_prefix"] = referenz[:args.max_zeichen] == text[:args.max_zeichen]  # Kommentar: Reihenfolge/Inhalt korrekt?
+            zeile[name] = messung  # Kommentar: speichern
+        ergebnisse.append(zeile)  # Kommentar: Zeile sammeln
+        print(f"{zeile['datei']}: " + ", ".join(f"{n}={zeile[n]['median_s']}s" for n, _, _ in varianten))  # Kommentar: Kurzausgabe
+    return {"teil": "pdf", "worker": programm_1_ki_input.PDF_PARALLEL_WORKER, "ergebnisse": ergebnisse}  # Kommentar: Gesamtergebnis
+
+
+def _antwort_aufnehmen(pfad: str, korpus: str) -> None:  # Kommentar: Ein PDF live in beiden Modi analysieren und Antworten ablegen
+    text = programm_1_ki_input.gutachten_text_begrenzen(programm_1_ki_input.pdf_text_auslesen(pfad, max_zeichen=programm_1_ki_input.MAX_EXTRAKTION_CHARS))  # Kommentar: gleicher Text für beide Modi
+    basisname = os.path.splitext(os.path.basename(pfad))[0]  # Kommentar: Name ohne Endung
+    for modus in AUSGABE_MODI:  # Kommentar: Modi iterieren
+        info = {}  # Kommentar: Dauer/Tokens
+        prompt = programm_1_ki_input.prompt_bauen(text, "", "", modus=modus)  # Kommentar: Prompt je Modus
+        antwort = programm_1_ki_input.ki_aufrufen(prompt, info, modus=modus) or ""  # Kommentar: Live-Aufruf
+        with open(os.path.join(korpus, f"{basisname}.{modus}.txt"), "w", encoding="utf-8") as f:  # Kommentar: Antwort speichern
+            f.write(antwort)  # Kommentar: schreiben
+        with open(os.path.join(korpus, f"{basisname}.{modus}.json"), "w", encoding="utf-8") as f:  # Kommentar: Messwerte speichern
+            json.dump({"zeit_gesamt_s": info.get("zeit_gesamt_s"), "ausgabe_tokens": info.get("ausgabe_tokens"), "prompt_zeichen": len(prompt)}, f)  # Kommentar: schreiben
+        print(f"{basisname} [{modus}]: {info.get('zeit_gesamt_s')} s, {info.get('ausgabe_tokens')} Tokens")  # Kommentar: Kurzausgabe
+
+
+def _antwort_modus(name: str, text: str) -> str:  # Kommentar: Modus aus Dateiname (<name>.<modus>.txt) oder Inhalt
+    for modus in AUSGABE_MODI:  # Kommentar: Suffix prüfen
+        if name.endswith(f".{modus}.txt"):  # Kommentar: Treffer?
+            return modus  # Kommentar: Modus
+    return "schema" if text.lstrip().startswith("{") else "marker"  # Kommentar: z.B. *_ki.txt aus ki_antworten
+
+
+def bench_antworten(args) -> dict:  # Kommentar: Marker- vs. Schema-Modus auf aufgezeichneten Antworten
+    os.makedirs(args.korpus, exist_ok=True)  # Kommentar: Korpus-Ordner sicherstellen
+    for pfad in _pdf_dateien(args.aufnehmen):  # Kommentar: optional neue Antworten live aufnehmen
+        _antwort_aufnehmen(pfad, args.korpus)  # Kommentar: beide Modi
+    werte = {m: {"anzahl": 0, "parse_fehler": 0, "fehlende_felder": 0, "tokens": [], "tokens_geschaetzt": 0, "latenz": [], "parse_us": []} for m in AUSGABE_MODI}  # Kommentar: Sammler je Modus
+    for name in sorted(os.listdir(args.korpus)):  # Kommentar: Antworten iterieren
+        if not name.endswith(".txt"):  # Kommentar: nur Antworttexte
+            continue  # Kommentar: überspringen
+        with open(os.path.join(args.korpus, name), "r", encoding="utf-8") as f:  # Kommentar: Antwort lesen
+            text = f.read()  # Kommentar: Text
+        w = werte[_antwort_modus(name, text)]  # Kommentar: Sammler des Modus
+        w["anzahl"] += 1  # Kommentar: zählen
+        meta_pfad = os.path.join(args.korpus, name[:-4] + ".json")  # Kommentar: Messwerte der Aufnahme
+        meta = {}  # Kommentar: Default ohne Messwerte
+        if os.path.exists(meta_pfad):  # Kommentar: vorhanden?
+            with open(meta_pfad, "r", encoding="utf-8") as f:  # Kommentar: lesen
+                meta = json.load(f)  # Kommentar: laden
+        if meta.get("ausgabe_tokens"):  # Kommentar: echte Tokenzahl?
+            w["tokens"].append(meta["ausgabe_tokens"])  # Kommentar: übernehmen
+        else:  # Kommentar: sonst schätzen
+            w["tokens"].append(len(text) / 4)  # Kommentar: ~4 Zeichen je Token
+            w["tokens_geschaetzt"] += 1  # Kommentar: markieren
+        if meta.get("zeit_gesamt_s") is not None:  # Kommentar: Latenz aufgezeichnet?
+            w["latenz"].append(meta["zeit_gesamt_s"])  # Kommentar: übernehmen
+        start = time.perf_counter()  # Kommentar: Parse-Zeit messen
+        try:  # Kommentar: Parser wie in der Pipeline
+            daten = programm_2_word_output.json_aus_ki_antwort_parsen(text)  # Kommentar: parsen
+        except ValueError:  # Kommentar: Marker fehlen / ungültiges JSON (JSONDecodeError ist ValueError)
+            w["parse_fehler"] += 1  # Kommentar: zählen
+            continue  # Kommentar: nächste Datei
+        finally:  # Kommentar: Zeit auch im Fehlerfall
+            w["parse_us"].append((time.perf_counter() - start) * 1e6)  # Kommentar: Mikrosekunden
+        w["fehlende_felder"] += sum(1 for k in programm_1_ki_input.KI_FELDER if k not in daten)  # Kommentar: unvollständige Antworten
+    if not any(w["anzahl"] for w in werte.values()):  # Kommentar: leerer Korpus -> keine Aussage möglich
+        raise SystemExit(f"Keine aufgezeichneten Antworten (*.txt) in {args.korpus}. Mit --aufnehmen <PDFs> aufnehmen (braucht GEMINI_API_KEY) oder --korpus angeben.")  # Kommentar: Abbruch mit Exit-Code 1
+    ergebnis = {"teil": "antworten", "korpus": args.korpus}  # Kommentar: Gesamtergebnis
+    for modus, w in werte.items():  # Kommentar: Kennzahlen je Modus
+        ergebnis[modus] = {  # Kommentar: Kennzahlen
+            "anzahl": w["anzahl"],  # Kommentar: Antworten
+            "parse_fehler": w["parse_fehler"],  # Kommentar: nicht parsebar
+            "fehlende_felder": w["fehlende_felder"],  # Kommentar: Summe fehlender Keys
+            "ausgabe_tokens_median": round(statistics.median(w["tokens"]), 1) if w["tokens"] else None,  # Kommentar: Tokens
+            "tokens_geschaetzt": w["tokens_geschaetzt"],  # Kommentar: davon geschätzt
+            "latenz_median_s": round(statistics.median(w["latenz"]), 3) if w["latenz"] else None,  # Kommentar: API-Latenz (nur aufgenommene)
+            "parse_median_us": round(statistics.median(w["parse_us"]), 1) if w["parse_us"] else None,  # Kommentar: Parse-Zeit
+        }  # Kommentar: Ende Kennzahlen
+        print(f"{modus}: {ergebnis[modus]}")  # Kommentar: Kurzausgabe
+    return ergebnis  # Kommentar: zurückgeben
+
+
+def _perzentile_ms(zeiten: list[float]) -> dict:  # Kommentar: p50/p95/max in Millisekunden
+    q = statistics.quantiles(zeiten, n=100) if len(zeiten) > 1 else zeiten * 99  # Kommentar: Perzentile
+    return {"p50_ms": round(q[49] * 1000, 2), "p95_ms": round(q[94] * 1000, 2), "max_ms": round(max(zeiten) * 1000, 2)}  # Kommentar: Kennzahlen
+
+
+def bench_login(args) -> dict:  # Kommentar: Login-Latenz JSON vs. SQLite bei vielen Benutzern und gleichzeitigen Logins
+    passwort = "benchmark-passwort"  # Kommentar: gleiches Passwort für alle Testbenutzer
+    salt_hex = "00" * user_store.SALT_BYTES  # Kommentar: fester Salt (Hash nur einmal berechnen)
+    record = {"salt": salt_hex, "hash": user_store.pbkdf2_hash_password(passwort, salt_hex)}  # Kommentar: Record für alle Benutzer
+    namen = [f"benutzer{i:06d}" for i in range(args.benutzer)]  # Kommentar: Benutzernamen
+    ergebnis = {"teil": "login", "benutzer": args.benutzer, "gleichzeitig": args.gleichzeitig, "hash_worker": user_store.HASH_WORKER}  # Kommentar: Gesamtergebnis
+    with tempfile.TemporaryDirectory() as ordner:  # Kommentar: nichts im Projekt anlegen
+        json_pfad = os.path.join(ordner, "users.json")  # Kommentar: Altformat
+        with open(json_pfad, "w", encoding="utf-8") as f:  # Kommentar: Datei schreiben
+            json.dump({n: record for n in namen}, f, indent=2)  # Kommentar: wie bisher (eingerückt)
+        start = time.perf_counter()  # Kommentar: Migrationsdauer messen
+        sqlite_speicher = user_store.SqliteBenutzerSpeicher(os.path.join(ordner, "users.sqlite3"), json_pfad)  # Kommentar: inkl. Migration
+        ergebnis["migration_s"] = round(time.perf_counter() - start, 3)  # Kommentar: Dauer
+        for name, speicher in [("json", user_store.JsonBenutzerSpeicher(json_pfad)), ("sqlite", sqlite_speicher)]:  # Kommentar: Backends
+            def einloggen(_):  # Kommentar: ein Login (Lookup + PBKDF2), Dauer zurückgeben
+                benutzer = random.choice(namen)  # Kommentar: zufälliger Benutzer
+                t0 = time.perf_counter()  # Kommentar: Start
+                record_db = speicher.holen(benutzer)  # Kommentar: Lookup
+                t1 = time.perf_counter()  # Kommentar: Lookup fertig
+                if not (record_db and user_store.check_password(passwort, record_db)):  # Kommentar: PBKDF2 im Pool
+                    raise RuntimeError(f"Login fehlgeschlagen: {benutzer}")  # Kommentar: Benchmark ungültig
+                return time.perf_counter() - t0, t1 - t0  # Kommentar: (gesamt, nur Lookup)
+            start = time.perf_counter()  # Kommentar: Gesamtzeit
+            with ThreadPoolExecutor(max_workers=args.gleichzeitig) as pool:  # Kommentar: gleichzeitige Sessions
+                messungen = list(pool.map(einloggen, range(args.logins)))  # Kommentar: alle Logins
+            dauer = time.perf_counter() - start  # Kommentar: Gesamtdauer
+            ergebnis[name] = {  # Kommentar: Kennzahlen je Backend
+                "login": _perzentile_ms([m[0] for m in messungen]),  # Kommentar: Lookup + Hash (inkl. Warten auf Pool)
+                "lookup": _perzentile_ms([m[1] for m in messungen]),  # Kommentar: nur Speicherzugriff
+                "logins_pro_s": round(args.logins / dauer, 1),  # Kommentar: Durchsatz
+            }  # Kommentar: Ende Kennzahlen
+            print(f"{name}: {ergebnis[name]}")  # Kommentar: Kurzausgabe
+    return ergebnis  # Kommentar: zurückgeben
+
+
+def _stub_antworten(ordner: str) -> list[str]:  # Kommentar: Aufgezeichnete Antworten (*.txt) laden, leer = kanonische Stub-Antwort
+    if not ordner or not os.path.isdir(ordner):  # Kommentar: kein Ordner?
+        return []  # Kommentar: Stub erzeugt Antworten selbst
+    antworten = []  # Kommentar: Texte
+    for name in sorted(os.listdir(ordner)):  # Kommentar: Dateien sortiert
+        if name.endswith(".txt"):  # Kommentar: nur Textdateien
+            with open(os.path.join(ordner, name), "r", encoding="utf-8") as f:  # Kommentar: lesen
+                antworten.append(f.read())  # Kommentar: merken
+    return antworten  # Kommentar: Liste zurückgeben
+
+
+def bench_stufen(args) -> dict:  # Kommentar: Jede Pipeline-Stufe einzeln auf synthetischen Gutachten (ohne API)
+    client = bench_daten.StubGeminiClient(_stub_antworten(args.antworten), latenz_s=args.latenz_ms / 1000)  # Kommentar: Stub statt genai.Client
+    programm_1_ki_input.gemini_client_setzen(client)  # Kommentar: Stub einsetzen
+    ki_limiter.gemini_limiter().konfigurieren(rpm=0, tpm=0)  # Kommentar: keine Wartezeiten durch den Limiter
+    vorlage_pfad = programm_2_word_output.resolve_vorlage_pfad(args.auswahl)  # Kommentar: Vorlage der Variante
+    programm_2_word_output.vorlage_laden(vorlage_pfad)  # Kommentar: Vorlage vorab lesen (Cache, nicht mitmessen)
+    n = args.wiederholungen  # Kommentar: Kurzname
+    ergebnisse = []  # Kommentar: Ergebnis je Seitenzahl
+    for seiten in args.seiten:  # Kommentar: Seitenzahlen iterieren
+        pdf_bytes = bench_daten.synthetisches_pdf(seiten)  # Kommentar: synthetisches Gutachten
+        zeile = {"seiten": seiten, "pdf_bytes": len(pdf_bytes)}  # Kommentar: Ergebniszeile
+        stufen = {}  # Kommentar: Stufe -> Messung
+        stufen["pdf_text_auslesen"] = _messen(lambda: programm_1_ki_input.pdf_text_auslesen(pdf_bytes, max_zeichen=programm_1_ki_input.MAX_EXTRAKTION_CHARS), n)  # Kommentar: Extraktion
+        text = programm_1_ki_input.gutachten_text_begrenzen(stufen["pdf_text_auslesen"]["ergebnis"])  # Kommentar: Text für den Prompt
+        stufen["prompt_bauen"] = _messen(lambda: programm_1_ki_input.prompt_bauen(text, args.auswahl, args.steuerstatus), n)  # Kommentar: Prompt
+        prompt = stufen["prompt_bauen"]["ergebnis"]  # Kommentar: Prompt-Text
+        stufen["ki_aufrufen"] = _messen(lambda: programm_1_ki_input.ki_aufrufen(prompt), n)  # Kommentar: KI (Stub, inkl. Stream-Parser)
+        stufen["json_aus_ki_antwort_parsen"] = _messen(lambda: programm_2_word_output.json_aus_ki_antwort_parsen(stufen["ki_aufrufen"]["ergebnis"]), n)  # Kommentar: JSON parsen
+        daten = stufen["json_aus_ki_antwort_parsen"]["ergebnis"]  # Kommentar: Daten-Dict
+        stufen["prepare_data_for_template"] = _messen(lambda: programm_2_word_output.prepare_data_for_template(dict(daten), args.auswahl, args.steuerstatus), n)  # Kommentar: Nachbearbeitung + Summe
+        vorbereitet = stufen["prepare_data_for_template"]["ergebnis"]  # Kommentar: fertige Template-Daten
+
+        def rendern() -> bytes:  # Kommentar: Vorlage (aus Cache) rendern und speichern, ohne Schrift-Normalisierung
+            doc = programm_2_word_output.vorlage_laden(vorlage_pfad)  # Kommentar: Vorlage aus dem Cache
+            doc.render(vorbereitet)  # Kommentar: rendern
+            puffer = io.BytesIO()  # Kommentar: In-Memory-Ziel
+            doc.save(puffer)  # Kommentar: speichern
+            return puffer.getvalue()  # Kommentar: DOCX-Bytes
+
+        rendern()  # Kommentar: patch_xml/Jinja-Cache der Vorlage vorwärmen (nicht mitmessen)
+        stufen["docx_rendern"] = _messen(rendern, n)  # Kommentar: Render + Save
+        docx_bytes = stufen["docx_rendern"]["ergebnis"]  # Kommentar: gerendertes DOCX
+        stufen["erzwinge_schrift"] = _messen(lambda: programm_2_word_output.erzwinge_schrift_bytes(docx_bytes), n)  # Kommentar: Schrift-Normalisierung
+        zeile["zeichen"] = len(stufen["pdf_text_auslesen"]["ergebnis"])  # Kommentar: extrahierte Zeichen
+        zeile["prompt_zeichen"] = len(prompt)  # Kommentar: Prompt-Länge
+        zeile["felder"] = sum(1 for wert in daten.values() if wert)  # Kommentar: gefüllte Felder (Plausibilität)
+        for messung in stufen.values():  # Kommentar: Ergebnisse nicht ins JSON
+            messung.pop("ergebnis")  # Kommentar: entfernen
+        zeile["stufen"] = stufen  # Kommentar: speichern
+        zeile["gesamt_median_s"] = round(sum(m["median_s"] for m in stufen.values()), 4)  # Kommentar: Summe der Mediane
+        ergebnisse.append(zeile)  # Kommentar: Zeile sammeln
+        print(f"{seiten} Seiten: " + ", ".join(f"{name}={m['median_s']}s" for name, m in stufen.items()))  # Kommentar: Kurzausgabe
+    return {  # Kommentar: Gesamtergebnis
+        "teil": "stufen",  # Kommentar: Benchmark-Name
+        "auswahl": args.auswahl,  # Kommentar: Variante
+        "vorlage": os.path.basename(vorlage_pfad),  # Kommentar: Vorlage
+        "ausgabe_modus": programm_1_ki_input.KI_AUSGABE_MODUS,  # Kommentar: marker/schema
+        "streaming": programm_1_ki_input.KI_STREAMING_AKTIV,  # Kommentar: Streaming an/aus
+        "stub_antworten": "aufgezeichnet" if client.antworten else "kanonisch",  # Kommentar: Antwortquelle
+        "stub_aufrufe": client.aufrufe,  # Kommentar: KI-Aufrufe
+        "wiederholungen": n,  # Kommentar: Wiederholungen je Stufe
+        "ergebnisse": ergebnisse,  # Kommentar: Zeilen
+    }  # Kommentar: Ende Gesamtergebnis
+
+
+def bench_backends(args) -> dict:  # Kommentar: Seiten/s je PDF-Backend auf dem Korpus (ohne Korpus: synthetische Gutachten)
+    quellen = [(os.path.basename(p), p) for p in _pdf_dateien(args.pfade)]  # Kommentar: (Name, Pfad)
+    if not quellen:  # Kommentar: kein Korpus angegeben?
+        quellen = [(f"synthetisch_{n}s.pdf", bench_daten.synthetisches_pdf(n)) for n in args.synthetisch]  # Kommentar: synthetische PDFs
+    namen = pdf_backends.verfuegbare_backends()  # Kommentar: installierte Backends
+    summen = {name: {"seiten": 0, "zeit_s": 0.0, "verwertbar": 0} for name in namen}  # Kommentar: Summen je Backend
+    ergebnisse = []  # Kommentar: Ergebnis je Datei
+    for datei, quelle in quellen:  # Kommentar: Dateien iterieren
+        zeile = {"datei": datei}  # Kommentar: Ergebniszeile
+        for name in namen:  # Kommentar: Backends iterieren
+            messung = _messen(lambda: list(pdf_backends.backend(name).seiten(quelle)), args.wiederholungen)  # Kommentar: alle Seiten lesen
+            seiten = messung.pop("ergebnis")  # Kommentar: Seitentexte
+            text = "\n".join(seiten)  # Kommentar: Gesamttext
+            messung["seiten"] = len(seiten)  # Kommentar: Seitenzahl
+            messung["zeichen"] = len(text)  # Kommentar: Zeichen
+            messung["seiten_pro_s"] = round(len(seiten) / messung["median_s"], 1) if messung["median_s"] else None  # Kommentar: Durchsatz
+            messung["verwertbar"] = pdf_backends.text_verwertbar(text, programm_1_ki_input.MIN_TEXT_CHARS)  # Kommentar: würde im Auto-Modus akzeptiert?
+            summen[name]["seiten"] += len(seiten)  # Kommentar: aufsummieren
+            summen[name]["zeit_s"] += messung["median_s"]  # Kommentar: aufsummieren
+            summen[name]["verwertbar"] += int(messung["verwertbar"])  # Kommentar: aufsummieren
+            zeile[name] = messung  # Kommentar: speichern
+        zeile["auto"] = next((n for n in pdf_backends.kandidaten("auto") if zeile[n]["verwertbar"]), None)  # Kommentar: Wahl im Auto-Modus
+        ergebnisse.append(zeile)  # Kommentar: Zeile sammeln
+        print(f"{datei}: " + ", ".join(f"{n}={zeile[n]['seiten_pro_s']} S/s" for n in namen) + f" -> auto={zeile['auto']}")  # Kommentar: Kurzausgabe
+    gesamt = {  # Kommentar: Durchsatz über den ganzen Korpus
+        name: {"seiten_pro_s": round(s["seiten"] / s["zeit_s"], 1) if s["zeit_s"] else None, "verwertbar": f"{s['verwertbar']}/{len(quellen)}"}  # Kommentar: Kennzahlen
+        for name, s in summen.items()  # Kommentar: je Backend
+    }  # Kommentar: Ende gesamt
+    print(f"gesamt: {gesamt}")  # Kommentar: Kurzausgabe
+    return {"teil": "backends", "reihenfolge": pdf_backends.kandidaten("auto"), "gesamt": gesamt, "ergebnisse": ergebnisse}  # Kommentar: Gesamtergebnis
+
+
+def _zufallsfaelle(anzahl: int, seed: int = 1) -> list[dict]:  # Kommentar: Fälle mit zufälligen Beträgen/Varianten (wie gespeicherte Analysen)
+    rnd = random.Random(seed)  # Kommentar: reproduzierbar
+    varianten = list(config.VORLAGEN)  # Kommentar: alle Abrechnungsvarianten
+    steuer = ["nicht vorsteuerabzugsberechtigt", "vorsteuerabzugsberechtigt"]  # Kommentar: beide Steuerstatus
+    def betrag(hoch: int, zahl: bool = True):  # Kommentar: Euro-Text, leer, Bruchteile von Cent ("1.234,565") oder Zahl (wie aus JSON)
+        art = rnd.random()  # Kommentar: Art des Werts
+        if art < 0.15:  # Kommentar: leer
+            return ""  # Kommentar: fehlt im Gutachten
+        if art < 0.20:  # Kommentar: drei Nachkommastellen (Rundungsgrenzfälle wie 1,015 / 2,675)
+            return f"{rnd.randint(0, hoch * 1000) / 1000:,.3f}".replace(",", "X").replace(".", ",").replace("X", ".") + " €"  # Kommentar: deutsches Format
+        if art < 0.25 and zahl:  # Kommentar: Zahl statt Text
+            return rnd.choice([rnd.randint(0, hoch * 1000) / 1000, rnd.randint(0, hoch * 100) / 100, rnd.randint(0, hoch)])  # Kommentar: Float mit/ohne Bruchteile oder int
+        return programm_2_word_output.float_zu_euro(rnd.randint(0, hoch * 100) / 100)  # Kommentar: ganze Cent
+    faelle = []  # Kommentar: Ergebnis
+    for _ in range(anzahl):  # Kommentar: Fälle erzeugen
+        daten = {  # Kommentar: Betragsfelder
+            "REPARATURKOSTEN": betrag(20000), "MWST_BETRAG": betrag(4000), "WERTMINDERUNG": betrag(2000),
+            "NUTZUNGSAUSFALL": betrag(1500), "KOSTENPAUSCHALE": rnd.choice(["25,00 €", "30,00 €", ""]),
+            "GUTACHTERKOSTEN": betrag(1500), "ZUSATZKOSTEN_BETRAG": betrag(300, zahl=False),  # Kommentar: Zusatzbetrag immer Text (Formular)
+            "WIEDERBESCHAFFUNGSWERT": betrag(40000), "RESTWERT": betrag(15000),
+        }  # Kommentar: Ende Daten
+        faelle.append({"daten": daten, "auswahl": rnd.choice(varianten), "steuerstatus": rnd.choice(steuer)})  # Kommentar: Fall
+    return faelle  # Kommentar: Liste zurückgeben
+
+
+def bench_summen(args) -> dict:  # Kommentar: Summen vieler Fälle: Einzelfall-Pfad vs. spaltenweise (Decimal/NumPy) inkl. Abgleich
+    faelle = _zufallsfaelle(args.faelle)  # Kommentar: Testfälle
+    spalten = batch_summen.spalten_aus_faellen(faelle)  # Kommentar: einmal in Spalten umwandeln
+    skalar = lambda: [programm_2_word_output.prepare_data_for_template(dict(f["daten"]), f["auswahl"], f["steuerstatus"], "", f["daten"]["ZUSATZKOSTEN_BETRAG"]) for f in faelle]  # Kommentar: bisheriger Weg je Fall
+    ergebnis = {"teil": "summen", "faelle": args.faelle, "numpy": batch_summen.np is not None}  # Kommentar: Gesamtergebnis
+    ergebnis["skalar"] = _messen(skalar, args.wiederholungen)  # Kommentar: Einzelfall-Pfad
+    ergebnis["batch_decimal"] = _messen(lambda: batch_summen.summen_neu_berechnen(spalten, numpy_nutzen=False), args.wiederholungen)  # Kommentar: Decimal-Pfad
+    if batch_summen.np is not None:  # Kommentar: NumPy installiert?
+        ergebnis["batch_numpy"] = _messen(lambda: batch_summen.summen_neu_berechnen(spalten, numpy_nutzen=True), args.wiederholungen)  # Kommentar: vektorisiert
+    for name in ("skalar", "batch_decimal", "batch_numpy"):  # Kommentar: Ergebnisse nicht ins JSON
+        if name in ergebnis:  # Kommentar: gemessen?
+            ergebnis[name].pop("ergebnis")  # Kommentar: entfernen
+            ergebnis[name]["faelle_pro_s"] = round(args.faelle / ergebnis[name]["median_s"]) if ergebnis[name]["median_s"] else None  # Kommentar: Durchsatz
+    ergebnis["abweichungen"] = {  # Kommentar: Abgleich mit dem Einzelfall-Pfad (muss 0 sein)
+        "decimal": len(batch_summen.mit_skalarpfad_vergleichen(faelle, numpy_nutzen=False)),  # Kommentar: Decimal-Pfad
+        "numpy": len(batch_summen.mit_skalarpfad_vergleichen(faelle, numpy_nutzen=True)),  # Kommentar: NumPy-Pfad (ohne NumPy = Decimal)
+    }  # Kommentar: Ende Abgleich
+    print({k: v for k, v in ergebnis.items() if k != "teil"})  # Kommentar: Kurzausgabe
+    return ergebnis  # Kommentar: zurückgeben
+
+
+def _brief_text(docx_bytes: bytes) -> list[str]:  # Kommentar: Absatztexte aus document.xml (für den Abgleich schnell vs. docxtpl)
+    xml = zipfile.ZipFile(io.BytesIO(docx_bytes)).read("word/document.xml").decode("utf-8")  # Kommentar: Hauptteil
+    absaetze = re.split(r"<w:p[ >]", xml)  # Kommentar: grob nach Absätzen teilen
+    return [  # Kommentar: Text je Absatz (Umbrüche/Tabs als Zeichen)
+        "".join(m.group(1) if m.group(1) is not None else ("\n" if m.group(0) == "<w:br/>" else "\t") for m in re.finditer(r"<w:t(?: [^>]*[^/])?>(.*?)</w:t>|<w:br/>|<w:tab/>", absatz, re.S))  # Kommentar: Text
+        for absatz in absaetze  # Kommentar: je Absatz
+    ]  # Kommentar: Ende Liste
+
+
+def bench_serienbrief(args) -> dict:  # Kommentar: Briefe/s je Vorlage: kompilierte Vorlage vs. docxtpl, inkl. Textabgleich
+    ergebnisse = []  # Kommentar: Ergebnis je Vorlage
+    for auswahl in config.VORLAGEN:  # Kommentar: alle Varianten
+        try:  # Kommentar: Vorlage vorhanden?
+            vorlage_pfad = programm_2_word_output.resolve_vorlage_pfad(auswahl)  # Kommentar: Pfad
+        except FileNotFoundError:  # Kommentar: nicht im Ordner
+            continue  # Kommentar: überspringen
+        daten = programm_2_word_output.prepare_data_for_template(dict(bench_daten.GUTACHTEN_WERTE), auswahl, args.steuerstatus)  # Kommentar: Daten wie im Einzelfall
+        zeile = {"auswahl": auswahl, "vorlage": os.path.basename(vorlage_pfad)}  # Kommentar: Ergebniszeile
+        start = time.perf_counter()  # Kommentar: Kompilieren einmal messen
+        zeile["kompilierbar"] = serienbrief.kompilat_laden(vorlage_pfad) is not None  # Kommentar: nur {{KEY}}?
+        zeile["kompilieren_s"] = round(time.perf_counter() - start, 4)  # Kommentar: einmalige Kosten
+        programm_2_word_output.word_aus_vorlage_bytes(daten, vorlage_pfad)  # Kommentar: docxtpl-Cache vorwärmen (nicht mitmessen)
+        schnell = _messen(lambda: [serienbrief.brief_bytes(daten, vorlage_pfad) for _ in range(args.briefe)], args.wiederholungen)  # Kommentar: N Briefe schnell
+        docxtpl = _messen(lambda: [programm_2_word_output.word_aus_vorlage_bytes(daten, vorlage_pfad) for _ in range(args.briefe_docxtpl)], args.wiederholungen)  # Kommentar: N Briefe docxtpl
+        zeile["gleicher_text"] = _brief_text(schnell.pop("ergebnis")[0]) == _brief_text(docxtpl.pop("ergebnis")[0])  # Kommentar: Abgleich (muss True sein)
+        zeile["schnell_briefe_pro_s"] = round(args.briefe / schnell["median_s"], 1) if schnell["median_s"] else None  # Kommentar: Durchsatz schnell
+        zeile["docxtpl_briefe_pro_s"] = round(args.briefe_docxtpl / docxtpl["median_s"], 1) if docxtpl["median_s"] else None  # Kommentar: Durchsatz docxtpl
+        ergebnisse.append(zeile)  # Kommentar: Zeile sammeln
+        print(f"{zeile['vorlage']}: schnell={zeile['schnell_briefe_pro_s']}/s, docxtpl={zeile['docxtpl_briefe_pro_s']}/s, gleicher_text={zeile['gleicher_text']}")  # Kommentar: Kurzausgabe
+    return {"teil": "serienbrief", "briefe": args.briefe, "zip_stufe": serienbrief.ZIP_STUFE, "ergebnisse": ergebnisse}  # Kommentar: Gesamtergebnis
+
+
+def bench_langdokument(args) -> dict:  # Kommentar: Wandzeit und Vollständigkeit: Textfenster vs. Abschnitte (Map-Reduce) auf langen Gutachten
+    client = bench_daten.StubGeminiClient(latenz_s=args.latenz_ms / 1000)  # Kommentar: Stub mit simulierter Modell-Latenz
+    programm_1_ki_input.gemini_client_setzen(client)  # Kommentar: Stub einsetzen
+    ki_limiter.gemini_limiter().konfigurieren(rpm=0, tpm=0)  # Kommentar: keine Wartezeiten durch den Limiter
+    ki_cache.CACHE_AKTIV = False  # Kommentar: jede Messung ruft die KI wirklich auf
+    modus_vorher = programm_1_ki_input.LANGDOKUMENT_MODUS  # Kommentar: Einstellung merken
+    ergebnisse = []  # Kommentar: Ergebnis je Seitenzahl
+    try:  # Kommentar: Modus am Ende zurücksetzen
+        for seiten in args.seiten:  # Kommentar: Seitenzahlen iterieren
+            pdf_bytes = bench_daten.synthetisches_pdf(seiten)  # Kommentar: synthetisches Gutachten
+            zeile = {"seiten": seiten}  # Kommentar: Ergebniszeile
+            for modus in ("aus", "auto"):  # Kommentar: Textfenster vs. Abschnitte
+                programm_1_ki_input.LANGDOKUMENT_MODUS = modus  # Kommentar: Modus setzen
+                info = {}  # Kommentar: Status des letzten Laufs
+                aufrufe_vorher = client.aufrufe  # Kommentar: KI-Aufrufe zählen
+                messung = _messen(lambda: programm_1_ki_input.analyse_aus_bytes(pdf_bytes, args.auswahl, args.steuerstatus, info=info), args.wiederholungen)  # Kommentar: kompletter Analyse-Weg
+                daten = programm_2_word_output.json_aus_ki_antwort_parsen(messung.pop("ergebnis"))  # Kommentar: Felder der letzten Antwort
+                zeile[modus] = {  # Kommentar: Kennzahlen je Modus
+                    **messung,  # Kommentar: Zeiten
+                    "abschnitte": info.get("abschnitte", 1),  # Kommentar: Gemini-Aufrufe je Analyse
+                    "ki_aufrufe": client.aufrufe - aufrufe_vorher,  # Kommentar: insgesamt (alle Wiederholungen)
+                    "felder": sum(1 for wert in daten.values() if wert),  # Kommentar: gefüllte Felder (Plausibilität)
+                }  # Kommentar: Ende Kennzahlen
+            zeile["zeitfaktor"] = round(zeile["auto"]["median_s"] / zeile["aus"]["median_s"], 2) if zeile["aus"]["median_s"] else None  # Kommentar: Abschnitte / Textfenster
+            ergebnisse.append(zeile)  # Kommentar: Zeile sammeln
+            print(f"{seiten} Seiten: aus={zeile['aus']['median_s']}s, auto={zeile['auto']['median_s']}s ({zeile['auto']['abschnitte']} Abschnitte), Faktor={zeile['zeitfaktor']}")  # Kommentar: Kurzausgabe
+    finally:  # Kommentar: auch bei Fehlern
+        programm_1_ki_input.LANGDOKUMENT_MODUS = modus_vorher  # Kommentar: Einstellung wiederherstellen
+    return {  # Kommentar: Gesamtergebnis
+        "teil": "langdokument",  # Kommentar: Benchmark-Name
+        "latenz_ms": args.latenz_ms,  # Kommentar: simulierte Latenz
+        "abschnitt_zeichen": programm_1_ki_input.LANGDOKUMENT_ABSCHNITT_ZEICHEN,  # Kommentar: Abschnittsgröße
+        "parallel": programm_1_ki_input.LANGDOKUMENT_PARALLEL,  # Kommentar: Fan-out
+        "ergebnisse": ergebnisse,  # Kommentar: Zeilen
+    }  # Kommentar: Ende Gesamtergebnis
+
+
+def bench_prompt_cache(args) -> dict:  # Kommentar: Eingabetokens und Latenz je Prompt-Cache-Modus (aus / system / kontext)
+    if not args.live:  # Kommentar: ohne API: Stub mit Kontext-Caches
+        client = bench_daten.StubGeminiClient(latenz_s=args.latenz_ms / 1000)  # Kommentar: Stub statt genai.Client
+        programm_1_ki_input.gemini_client_setzen(client)  # Kommentar: Stub einsetzen
+        ki_limiter.gemini_limiter().konfigurieren(rpm=0, tpm=0)  # Kommentar: keine Wartezeiten durch den Limiter
+    pdf_bytes = bench_daten.synthetisches_pdf(args.seiten)  # Kommentar: synthetisches Gutachten
+    text = programm_1_ki_input.gutachten_text_begrenzen(programm_1_ki_input.pdf_text_auslesen(pdf_bytes, max_zeichen=programm_1_ki_input.MAX_EXTRAKTION_CHARS))  # Kommentar: Text wie im Einzelfall
+    prompt = programm_1_ki_input.prompt_bauen(text, args.auswahl, args.steuerstatus)  # Kommentar: derselbe Prompt für alle Modi
+    statisch, _ = programm_1_ki_input.prompt_teilen(prompt)  # Kommentar: statischer Teil
+    modus_vorher = kontext_cache.PROMPT_CACHE_MODUS  # Kommentar: Einstellung merken
+    ergebnisse = []  # Kommentar: Ergebnis je Modus
+    try:  # Kommentar: Modus am Ende zurücksetzen
+        for modus in ("aus", "system", "kontext"):  # Kommentar: Modi vergleichen
+            kontext_cache.PROMPT_CACHE_MODUS = modus  # Kommentar: Modus setzen
+            zeiten, infos = [], []  # Kommentar: Latenz + Status je Aufruf
+            for _ in range(args.aufrufe):  # Kommentar: Aufrufe (erster legt im Modus "kontext" den Cache an)
+                info = {}  # Kommentar: Status des Aufrufs
+                start = time.perf_counter()  # Kommentar: Start
+                programm_1_ki_input.ki_aufrufen(prompt, info)  # Kommentar: KI-Aufruf
+                zeiten.append(time.perf_counter() - start)  # Kommentar: Dauer merken
+                infos.append(info)  # Kommentar: Tokens merken
+            eingabe = [i.get("eingabe_tokens") or 0 for i in infos]  # Kommentar: Eingabetokens je Aufruf (inkl. Cache)
+            gecacht = [i.get("cache_tokens") or 0 for i in infos]  # Kommentar: davon aus dem Cache
+            zeile = {  # Kommentar: Kennzahlen je Modus
+                "modus": modus,  # Kommentar: Modus
+                "genutzt": infos[-1].get("prompt_cache"),  # Kommentar: tatsächlich genutzter Weg (Fallback sichtbar)
+                "erster_aufruf_s": round(zeiten[0], 4),  # Kommentar: inkl. Anlegen des Caches
+                "latenz_median_s": round(statistics.median(zeiten[1:] or zeiten), 4),  # Kommentar: Folgeaufrufe
+                "eingabe_tokens_median": statistics.median(eingabe),  # Kommentar: Eingabetokens
+                "cache_tokens_median": statistics.median(gecacht),  # Kommentar: davon aus dem Cache (ermäßigt)
+                "volle_tokens_median": statistics.median(e - g for e, g in zip(eingabe, gecacht)),  # Kommentar: zum vollen Preis
+            }  # Kommentar: Ende Kennzahlen
+            ergebnisse.append(zeile)  # Kommentar: Zeile sammeln
+            print(f"{modus}: {zeile['genutzt']}, Latenz={zeile['latenz_median_s']}s (erster {zeile['erster_aufruf_s']}s), Eingabe={zeile['eingabe_tokens_median']} Tokens, davon Cache={zeile['cache_tokens_median']}")  # Kommentar: Kurzausgabe
+    finally:  # Kommentar: auch bei Fehlern
+        kontext_cache.PROMPT_CACHE_MODUS = modus_vorher  # Kommentar: Einstellung wiederherstellen
+        statistik = kontext_cache.kontext_cache().statistik()  # Kommentar: Anlegen/Treffer/Erneuerungen
+        kontext_cache.kontext_cache().aufraeumen()  # Kommentar: angelegte Caches löschen
+    return {  # Kommentar: Gesamtergebnis
+        "teil": "prompt_cache",  # Kommentar: Benchmark-Name
+        "quelle": "live" if args.live else "stub",  # Kommentar: echter Client oder Stub
+        "prompt_zeichen": len(prompt),  # Kommentar: Länge des ganzen Prompts
+        "statisch_zeichen": len(statisch),  # Kommentar: davon statisch
+        "aufrufe": args.aufrufe,  # Kommentar: Aufrufe je Modus
+        "kontext_cache": statistik,  # Kommentar: Zähler
+        "ergebnisse": ergebnisse,  # Kommentar: Zeilen
+    }  # Kommentar: Ende Gesamtergebnis
+
+
+def main(argv: list[str] | None = None) -> int:  # Kommentar: Entry-Point
+    parser = argparse.ArgumentParser(description="Benchmarks für die Gutachten-Pipeline")  # Kommentar: Parser
+    parser.add_argument("--json", default="", help="Ergebnis zusätzlich als JSON-Datei schreiben")  # Kommentar: Ausgabe-Datei
+    teile = parser.add_subparsers(dest="teil", required=True)  # Kommentar: Unterbefehle
+
+    p_pdf = teile.add_parser("pdf", help="PDF-Extraktion: seriell vs. parallel")  # Kommentar: Unterbefehl pdf
+    p_pdf.add_argument("pfade", nargs="+", help="PDF-Dateien oder Ordner")  # Kommentar: Eingaben
+    p_pdf.add_argument("--wiederholungen", type=int, default=3)  # Kommentar: Wiederholungen je Variante
+    p_pdf.add_argument("--max-zeichen", type=int, default=programm_1_ki_input.MAX_TEXT_CHARS)  # Kommentar: Budget
+    p_pdf.set_defaults(funktion=bench_pdf)  # Kommentar: Funktion zuordnen
+
+    p_antw = teile.add_parser("antworten", help="Ausgabemodus marker vs. schema: Tokens, Latenz, Parse-Fehler")  # Kommentar: Unterbefehl antworten
+    p_antw.add_argument("--korpus", default=os.path.join(programm_1_ki_input.KI_ANTWORT_ORDNER, "korpus"), help="Ordner mit aufgezeichneten Antworten (<name>.<modus>.txt)")  # Kommentar: fester Korpus
+    p_antw.add_argument("--aufnehmen", nargs="*", default=[], help="PDFs live in beiden Modi analysieren und in den Korpus aufnehmen")  # Kommentar: optional (braucht API-Key)
+    p_antw.set_defaults(funktion=bench_antworten)  # Kommentar: Funktion zuordnen
+
+    p_login = teile.add_parser("login", help="Login-Latenz (p95): JSON vs. SQLite, Hashing im Worker-Pool")  # Kommentar: Unterbefehl login
+    p_login.add_argument("--benutzer", type=int, default=10_000)  # Kommentar: Anzahl Benutzer
+    p_login.add_argument("--gleichzeitig", type=int, default=20)  # Kommentar: gleichzeitige Logins
+    p_login.add_argument("--logins", type=int, default=200)  # Kommentar: Logins je Backend
+    p_login.set_defaults(funktion=bench_login)  # Kommentar: Funktion zuordnen
+
+    p_stufen = teile.add_parser("stufen", help="Zeit je Pipeline-Stufe auf synthetischen Gutachten (Stub statt Gemini)")  # Kommentar: Unterbefehl stufen
+    p_stufen.add_argument("--seiten", type=int, nargs="+", default=[5, 20, 60])  # Kommentar: Seitenzahlen der synthetischen PDFs
+    p_stufen.add_argument("--wiederholungen", type=int, default=5)  # Kommentar: Wiederholungen je Stufe
+    p_stufen.add_argument("--antworten", default="", help="Ordner mit aufgezeichneten Antworten (*.txt); leer = kanonische Stub-Antwort")  # Kommentar: Antwortquelle
+    p_stufen.add_argument("--latenz-ms", type=float, default=0.0, help="simulierte Modell-Latenz je Aufruf")  # Kommentar: Stub-Latenz
+    p_stufen.add_argument("--auswahl", default="Konkrete Abrechnung < WBW")  # Kommentar: Variante (Vorlage)
+    p_stufen.add_argument("--steuerstatus", default="nicht vorsteuerabzugsberechtigt")  # Kommentar: Steuerstatus
+    p_stufen.set_defaults(funktion=bench_stufen)  # Kommentar: Funktion zuordnen
+
+    p_backends = teile.add_parser("backends", help="PDF-Backends: Seiten/s und Verwertbarkeit je Backend")  # Kommentar: Unterbefehl backends
+    p_backends.add_argument("pfade", nargs="*", help="PDF-Dateien oder Ordner (leer = synthetische Gutachten)")  # Kommentar: Korpus
+    p_backends.add_argument("--synthetisch", type=int, nargs="+", default=[5, 20, 60], help="Seitenzahlen der synthetischen PDFs")  # Kommentar: ohne Korpus
+    p_backends.add_argument("--wiederholungen", type=int, default=3)  # Kommentar: Wiederholungen je Backend
+    p_backends.set_defaults(funktion=bench_backends)  # Kommentar: Funktion zuordnen
+
+    p_summen = teile.add_parser("summen", help="Summen-Neuberechnung: Einzelfall vs. spaltenweise, inkl. Abgleich")  # Kommentar: Unterbefehl summen
+    p_summen.add_argument("--faelle", type=int, default=10_000)  # Kommentar: Anzahl Fälle
+    p_summen.add_argument("--wiederholungen", type=int, default=3)  # Kommentar: Wiederholungen je Variante
+    p_summen.set_defaults(funktion=bench_summen)  # Kommentar: Funktion zuordnen
+
+    p_brief = teile.add_parser("serienbrief", help="Serienbriefe: kompilierte Vorlage vs. docxtpl (Briefe/s, Textabgleich)")  # Kommentar: Unterbefehl serienbrief
+    p_brief.add_argument("--briefe", type=int, default=500, help="Briefe je Messung (schneller Weg)")  # Kommentar: Anzahl schnell
+    p_brief.add_argument("--briefe-docxtpl", type=int, default=10, help="Briefe je Messung (docxtpl)")  # Kommentar: Anzahl docxtpl
+    p_brief.add_argument("--wiederholungen", type=int, default=3)  # Kommentar: Wiederholungen
+    p_brief.add_argument("--steuerstatus", default="nicht vorsteuerabzugsberechtigt")  # Kommentar: Steuerstatus
+    p_brief.set_defaults(funktion=bench_serienbrief)  # Kommentar: Funktion zuordnen
+
+    p_lang = teile.add_parser("langdokument", help="Lange Gutachten: Textfenster vs. Abschnitte (Wandzeit, Aufrufe, Felder)")  # Kommentar: Unterbefehl langdokument
+    p_lang.add_argument("--seiten", type=int, nargs="+", default=[20, 100])  # Kommentar: Seitenzahlen der synthetischen PDFs
+    p_lang.add_argument("--wiederholungen", type=int, default=3)  # Kommentar: Wiederholungen je Modus
+    p_lang.add_argument("--latenz-ms", type=float, default=1000.0, help="simulierte Modell-Latenz je Aufruf")  # Kommentar: Stub-Latenz
+    p_lang.add_argument("--auswahl", default="Konkrete Abrechnung < WBW")  # Kommentar: Variante
+    p_lang.add_argument("--steuerstatus", default="nicht vorsteuerabzugsberechtigt")  # Kommentar: Steuerstatus
+    p_lang.set_defaults(funktion=bench_langdokument)  # Kommentar: Funktion zuordnen
+
+    p_pcache = teile.add_parser("prompt_cache", help="Statischer Prompt-Teil: ohne / als System-Instruktion / im Kontext-Cache (Tokens, Latenz)")  # Kommentar: Unterbefehl prompt_cache
+    p_pcache.add_argument("--aufrufe", type=int, default=10)  # Kommentar: Aufrufe je Modus
+    p_pcache.add_argument("--seiten", type=int, default=20)  # Kommentar: Seitenzahl des synthetischen PDFs
+    p_pcache.add_argument("--latenz-ms", type=float, default=0.0, help="simulierte Modell-Latenz je Aufruf (Stub)")  # Kommentar: Stub-Latenz
+    p_pcache.add_argument("--live", action="store_true", help="echten Gemini-Client nutzen (braucht GEMINI_API_KEY)")  # Kommentar: echte Latenz/Tokens
+    p_pcache.add_argument("--auswahl", default="Konkrete Abrechnung < WBW")  # Kommentar: Variante
+    p_pcache.add_argument("--steuerstatus", default="nicht vorsteuerabzugsberechtigt")  # Kommentar: Steuerstatus
+    p_pcache.set_defaults(funktion=bench_prompt_cache)  # Kommentar: Funktion zuordnen
+
+    args = parser.parse_args(argv)  # Kommentar: Argumente parsen
+    ergebnis = args.funktion(args)  # Kommentar: Benchmark ausführen
+    if args.json:  # Kommentar: JSON gewünscht?
+        with open(args.json, "w", encoding="utf-8") as f:  # Kommentar: Datei öffnen
+            json.dump(ergebnis, f, ensure_ascii=False, indent=2)  # Kommentar: schreiben
+    return 0  # Kommentar: OK
+
+
+if __name__ == "__main__":  # Kommentar: Direktausführung (Guard nötig für Prozess-Pool)
+    sys.exit(main())  # Kommentar: Aufruf
@@ -5,5 +5,15 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 EINGANGS_ORDNER = os.path.join(BASE_DIR, "eingang_gutachten")
 KI_ANTWORT_ORDNER = os.path.join(BASE_DIR, "ki_antworten")
 VORLAGEN_ORDNER = os.path.join(BASE_DIR, "vorlagen")
+DATEN_ORDNER = os.getenv("DATEN_ORDNER", os.path.join(BASE_DIR, "daten"))  # Kommentar: lokale Datenbanken (nicht im Repo, siehe .gitignore)
 
 DEFAULT_VORLAGE = os.path.join(VORLAGEN_ORDNER, "vorlage_schreiben.docx")
+
+VORLAGEN = {  # Kommentar: Abrechnungsvariante -> Vorlagendatei (gemeinsam für App und Batch)
+    "Fiktive Abrechnung (Reparaturschaden)": "vorlage_fiktive_abrechnung.docx",  # Kommentar: Variante 1
+    "Konkrete Abrechnung < WBW": "vorlage_konkret_unter_wbw.docx",  # Kommentar: Variante 2
+    "130%-Regelung": "vorlage_130_prozent.docx",  # Kommentar: Variante 3
+    "Totalschaden fiktiv": "vorlage_totalschaden_fiktiv.docx",  # Kommentar: Variante 4
+    "Totalschaden konkret": "vorlage_totalschaden_konkret.docx",  # Kommentar: Variante 5
+    "Totalschaden Ersatzbeschaffung": "vorlage_schreibentotalschaden.docx"  # Kommentar: Variante 6
+}  # Kommentar: Ende Vorlagen
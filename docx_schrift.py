@@ -0,0 +1,83 @@
+# docx_schrift.py  # Kommentar: Schrift/Größe direkt in den OOXML-Teilen setzen (ein Durchlauf über das Zip, ohne python-docx)
+
+import io  # Kommentar: In-Memory-Zip
+import re  # Kommentar: Reguläre Ausdrücke (einmal kompiliert)
+import zipfile  # Kommentar: DOCX ist ein Zip-Archiv
+from xml.sax.saxutils import quoteattr  # Kommentar: Fontname sicher als Attribut
+
+TEIL_RE = re.compile(r"^word/(?:document|header\d*|footer\d*|footnotes|endnotes|comments|styles)\.xml$")  # Kommentar: Teile mit Text/Stilen
+RUN_RE = re.compile(r"<w:r(?=[\s>])[^>]*(?<!/)>(\s*)(?:<w:rPr/>|<w:rPr>(.*?)</w:rPr>)?", re.S)  # Kommentar: Run-Start + optionale Run-Eigenschaften
+RFONTS_RE = re.compile(r"<w:rFonts\b([^>]*?)/>")  # Kommentar: vorhandenes rFonts-Element
+GROESSE_RE = re.compile(r"<w:sz(?:Cs)?\b[^>]*/>")  # Kommentar: vorhandene sz/szCs-Elemente
+ATTR_RE = re.compile(r'([\w:]+)="([^"]*)"')  # Kommentar: Attribute eines Elements
+RSTYLE_RE = re.compile(r"^\s*<w:rStyle\b[^>]*/>")  # Kommentar: rStyle steht laut Schema vorne
+NACH_GROESSE_RE = re.compile(  # Kommentar: Elemente, die laut Schema nach sz/szCs stehen
+    r"<w:(?:highlight|u|effect|bdr|shd|fitText|vertAlign|rtl|cs|em|lang|eastAsianLayout|specVanish|oMath)\b"
+)  # Kommentar: Ende Regex
+NORMAL_STIL_RE = re.compile(r'(<w:style\b[^>]*w:styleId="Normal"[^>]*>)(.*?)(</w:style>)', re.S)  # Kommentar: Standardstil in styles.xml
+STIL_RPR_RE = re.compile(r"<w:rPr/>|<w:rPr>(.*?)</w:rPr>", re.S)  # Kommentar: rPr innerhalb des Stils
+ERSETZTE_FONT_ATTRIBUTE = {"w:ascii", "w:hAnsi", "w:cs", "w:asciiTheme", "w:hAnsiTheme", "w:cstheme"}  # Kommentar: Theme-Attribute würden den Font übersteuern
+
+
+def _rfonts_element(alt_attribute: str, font_name: str) -> str:  # Kommentar: rFonts mit Zielschrift, übrige Attribute (eastAsia, hint) behalten
+    behalten = "".join(f' {k}="{v}"' for k, v in ATTR_RE.findall(alt_attribute) if k not in ERSETZTE_FONT_ATTRIBUTE)  # Kommentar: nicht betroffene Attribute
+    name = quoteattr(font_name)  # Kommentar: Attributwert escapen
+    return f"<w:rFonts w:ascii={name} w:hAnsi={name} w:cs={name}{behalten}/>"  # Kommentar: neues Element
+
+
+def _rpr_inhalt(inhalt: str, font_name: str, halbpunkte: int) -> str:  # Kommentar: rFonts/sz/szCs im rPr-Inhalt setzen (Schema-Reihenfolge)
+    alt = RFONTS_RE.search(inhalt)  # Kommentar: vorhandenes rFonts?
+    rfonts = _rfonts_element(alt.group(1) if alt else "", font_name)  # Kommentar: neues rFonts
+    inhalt = GROESSE_RE.sub("", RFONTS_RE.sub("", inhalt))  # Kommentar: alte Werte entfernen
+    groesse = f'<w:sz w:val="{halbpunkte}"/><w:szCs w:val="{halbpunkte}"/>'  # Kommentar: Größe in Halbpunkten
+    stil = RSTYLE_RE.match(inhalt)  # Kommentar: rStyle vorne?
+    pos = stil.end() if stil else 0  # Kommentar: rFonts direkt danach
+    inhalt = inhalt[:pos] + rfonts + inhalt[pos:]  # Kommentar: rFonts einfügen
+    nach = NACH_GROESSE_RE.search(inhalt)  # Kommentar: erstes Element nach sz?
+    pos = nach.start() if nach else len(inhalt)  # Kommentar: davor oder am Ende
+    return inhalt[:pos] + groesse + inhalt[pos:]  # Kommentar: sz/szCs einfügen
+
+
+def _xml_normalisieren(xml: str, font_name: str, halbpunkte: int) -> str:  # Kommentar: Alle Runs eines Teils in einem Durchlauf
+    def run_ersetzen(m: re.Match) -> str:  # Kommentar: Ersetzung je Run
+        inhalt = m.group(2) or ""  # Kommentar: bisherige Eigenschaften
+        if "<w:rPrChange" in inhalt:  # Kommentar: Änderungsverfolgung (verschachteltes rPr) nicht anfassen
+            return m.group(0)  # Kommentar: unverändert
+        start = m.group(0)[:m.start(1) - m.start(0)]  # Kommentar: Run-Starttag
+        return start + m.group(1) + "<w:rPr>" + _rpr_inhalt(inhalt, font_name, halbpunkte) + "</w:rPr>"  # Kommentar: neue Eigenschaften
+    return RUN_RE.sub(run_ersetzen, xml)  # Kommentar: alle Runs ersetzen
+
+
+def _stile_normalisieren(xml: str, font_name: str, halbpunkte: int) -> str:  # Kommentar: Standardstil "Normal" setzen
+    def stil_ersetzen(m: re.Match) -> str:  # Kommentar: Ersetzung für den Stil
+        koerper = m.group(2)  # Kommentar: Stilinhalt
+        rpr = STIL_RPR_RE.search(koerper)  # Kommentar: vorhandenes rPr?
+        if rpr:  # Kommentar: ja -> ersetzen
+            neu = "<w:rPr>" + _rpr_inhalt(rpr.group(1) or "", font_name, halbpunkte) + "</w:rPr>"  # Kommentar: neues rPr
+            koerper = koerper[:rpr.start()] + neu + koerper[rpr.end():]  # Kommentar: einsetzen
+        else:  # Kommentar: nein -> am Ende anfügen (nach pPr)
+            koerper += "<w:rPr>" + _rpr_inhalt("", font_name, halbpunkte) + "</w:rPr>"  # Kommentar: neues rPr
+        return m.group(1) + koerper + m.group(3)  # Kommentar: Stil zusammensetzen
+    return NORMAL_STIL_RE.sub(stil_ersetzen, xml, count=1)  # Kommentar: nur den Standardstil
+
+
+def teil_normalisieren(dateiname: str, xml: str, font_name: str = "Arial MT Pro", font_size_pt: int = 11) -> str:  # Kommentar: Einen Zip-Teil normalisieren (unbetroffene Teile unverändert)
+    if not TEIL_RE.match(dateiname):  # Kommentar: kein Text-/Stil-Teil?
+        return xml  # Kommentar: unverändert
+    halbpunkte = int(round(font_size_pt * 2))  # Kommentar: Word speichert Halbpunkte
+    xml = _xml_normalisieren(xml, font_name, halbpunkte)  # Kommentar: Runs (inkl. Kopf-/Fußzeilen, Textboxen, verschachtelte Tabellen)
+    if dateiname == "word/styles.xml":  # Kommentar: Stile?
+        xml = _stile_normalisieren(xml, font_name, halbpunkte)  # Kommentar: Standardstil
+    return xml  # Kommentar: Ergebnis
+
+
+def schrift_normalisieren(docx_bytes: bytes, font_name: str = "Arial MT Pro", font_size_pt: int = 11) -> bytes:  # Kommentar: DOCX-Bytes -> DOCX-Bytes mit einheitlicher Schrift
+    ausgabe = io.BytesIO()  # Kommentar: Ziel-Zip im Speicher
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zin, zipfile.ZipFile(ausgabe, "w", zipfile.ZIP_DEFLATED) as zout:  # Kommentar: beide Archive
+        for info in zin.infolist():  # Kommentar: Einträge in Originalreihenfolge
+            daten = zin.read(info.filename)  # Kommentar: Inhalt lesen
+            if TEIL_RE.match(info.filename):  # Kommentar: relevanter XML-Teil?
+                xml = teil_normalisieren(info.filename, daten.decode("utf-8"), font_name, font_size_pt)  # Kommentar: OOXML ist UTF-8
+                daten = xml.encode("utf-8")  # Kommentar: zurück in Bytes
+            zout.writestr(info, daten)  # Kommentar: Eintrag schreiben (Metadaten/Kompression wie im Original)
+    return ausgabe.getvalue()  # Kommentar: Bytes zurückgeben
@@ -0,0 +1,218 @@
+# fall_speicher.py  # Kommentar: Lokaler Fall-Speicher (SQLite) – Extraktion, KI-Antwort, korrigierte Daten und Render-Infos je Fall (Neu-Erzeugen ohne neue Analyse)
+
+import os  # Kommentar: Pfade/Env
+import time  # Kommentar: Zeitstempel für Aufbewahrung/LRU
+import json  # Kommentar: Daten-Dicts als JSON-Text
+import sqlite3  # Kommentar: Lokale Datenbank (ohne externe Library)
+import config  # Kommentar: Basisverzeichnis
+import programm_2_word_output  # Kommentar: Vorlage + Datenaufbereitung (Summen)
+import serienbrief  # Kommentar: schneller Render-Weg (kompilierte Vorlage, Rückfall docxtpl)
+
+FALL_DB = os.getenv("FALL_DB", os.path.join(config.DATEN_ORDNER, "faelle.sqlite3"))  # Kommentar: SQLite-Datei im Datenordner (nicht im Repo)
+FALL_SPEICHER_AKTIV = os.getenv("FALL_SPEICHER_AKTIV", "0") == "1"  # Kommentar: Opt-in (FALL_SPEICHER_AKTIV=1), da Mandantendaten auf dem Server bleiben
+FALL_MAX_BYTES = int(os.getenv("FALL_MAX_BYTES", str(100 * 1024 * 1024)))  # Kommentar: Größenlimit (Default 100 MB)
+FALL_MAX_ALTER_S = int(os.getenv("FALL_MAX_ALTER_S", str(90 * 24 * 3600)))  # Kommentar: Aufbewahrung ab letzter Nutzung (Default 90 Tage)
+LISTEN_SPALTEN = "id, dateiname, auswahl, steuerstatus, schadensnummer, aktenzeichen, mandant, erstellt, geaendert, render_meta"  # Kommentar: Spalten für Listen (ohne große Texte)
+
+
+def _verbindung() -> sqlite3.Connection:  # Kommentar: Verbindung öffnen (pro Aufruf, daher threadsicher)
+    os.makedirs(os.path.dirname(FALL_DB) or ".", exist_ok=True)  # Kommentar: Ordner sicherstellen
+    con = sqlite3.connect(FALL_DB, timeout=30)  # Kommentar: Verbindung mit Wartezeit bei Sperre
+    con.execute("PRAGMA journal_mode=WAL")  # Kommentar: WAL -> paralleles Lesen während Schreiben
+    con.execute(  # Kommentar: Tabelle anlegen (falls nicht vorhanden)
+        "CREATE TABLE IF NOT EXISTS faelle ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"  # Kommentar: Fall-ID
+        " benutzer TEXT NOT NULL,"  # Kommentar: Eigentümer
+        " dateiname TEXT NOT NULL DEFAULT '',"  # Kommentar: Name des Gutachtens
+        " pdf_sha256 TEXT NOT NULL DEFAULT '',"  # Kommentar: PDF-Hash (Diagnose, Bezug zum KI-Cache)
+        " auswahl TEXT NOT NULL,"  # Kommentar: Variante
+        " steuerstatus TEXT NOT NULL,"  # Kommentar: Steuerstatus
+        " schadensnummer TEXT NOT NULL DEFAULT '' COLLATE NOCASE,"  # Kommentar: Suchfeld (Groß/Klein egal)
+        " aktenzeichen TEXT NOT NULL DEFAULT '' COLLATE NOCASE,"  # Kommentar: Suchfeld (Groß/Klein egal)
+        " mandant TEXT NOT NULL DEFAULT '',"  # Kommentar: Anzeige
+        " extraktion TEXT NOT NULL DEFAULT '',"  # Kommentar: extrahierter PDF-Text (leer bei Cache-Treffer)
+        " ki_text TEXT NOT NULL DEFAULT '',"  # Kommentar: Modellantwort
+        " daten TEXT NOT NULL,"  # Kommentar: Analyse-Ergebnis (JSON)
+        " korrigiert TEXT,"  # Kommentar: vom Nutzer korrigierte Daten (JSON, NULL = noch nicht)
+        " render_meta TEXT NOT NULL DEFAULT '{}',"  # Kommentar: Zusatzkosten, Vorlage, Zeitpunkt, Größe (JSON)
+        " groesse INTEGER NOT NULL,"  # Kommentar: Größe in Bytes (für Limit)
+        " erstellt REAL NOT NULL,"  # Kommentar: Anlagezeit
+        " geaendert REAL NOT NULL,"  # Kommentar: letzte Korrektur/Erzeugung
+        " zuletzt_genutzt REAL NOT NULL"  # Kommentar: letzter Zugriff (Aufbewahrung, LRU)
+        ")"
+    )  # Kommentar: Ende CREATE
+    con.execute("CREATE INDEX IF NOT EXISTS idx_faelle_schadensnummer ON faelle(benutzer, schadensnummer)")  # Kommentar: Suche nach Schadensnummer
+    con.execute("CREATE INDEX IF NOT EXISTS idx_faelle_aktenzeichen ON faelle(benutzer, aktenzeichen)")  # Kommentar: Suche nach Aktenzeichen
+    con.execute("CREATE INDEX IF NOT EXISTS idx_faelle_lru ON faelle(zuletzt_genutzt)")  # Kommentar: Index für Verdrängung
+    return con  # Kommentar: Verbindung zurückgeben
+
+
+def _groesse(*texte: str) -> int:  # Kommentar: Bytes der gespeicherten Texte
+    return sum(len((t or "").encode("utf-8")) for t in texte)  # Kommentar: aufsummieren
+
+
+def _suchfelder(daten: dict) -> tuple[str, str, str]:  # Kommentar: (Schadensnummer, Aktenzeichen, Mandant) aus einem Daten-Dict
+    mandant = str(daten.get("MANDANT_NAME") or f"{daten.get('MANDANT_VORNAME', '')} {daten.get('MANDANT_NACHNAME', '')}").strip()  # Kommentar: Name für die Liste
+    return str(daten.get("SCHADENSNUMMER", "")).strip(), str(daten.get("AKTENZEICHEN", "")).strip(), mandant  # Kommentar: Suchfelder
+
+
+def _zeile_zu_dict(cur: sqlite3.Cursor, zeile: tuple) -> dict:  # Kommentar: DB-Zeile -> Dict (JSON-Spalten entpackt)
+    fall = {spalte[0]: wert for spalte, wert in zip(cur.description, zeile)}  # Kommentar: Spaltenname -> Wert
+    for key in ("daten", "korrigiert", "render_meta"):  # Kommentar: JSON-Spalten
+        if key in fall and fall[key] is not None:  # Kommentar: vorhanden?
+            fall[key] = json.loads(fall[key])  # Kommentar: entpacken
+    return fall  # Kommentar: Dict zurückgeben
+
+
+def fall_anlegen(benutzer: str, dateiname: str, auswahl: str, steuerstatus: str, daten: dict, ki_text: str = "", extraktion: str = "", pdf_sha256: str = "") -> int | None:  # Kommentar: Analyse speichern, Fall-ID zurückgeben (None = abgeschaltet/Fehler)
+    if not FALL_SPEICHER_AKTIV:  # Kommentar: abgeschaltet?
+        return None  # Kommentar: nichts speichern
+    jetzt = time.time()  # Kommentar: aktuelle Zeit
+    daten_json = json.dumps(daten, ensure_ascii=False)  # Kommentar: Daten als JSON
+    schadensnummer, aktenzeichen, mandant = _suchfelder(daten)  # Kommentar: Suchfelder
+    try:  # Kommentar: Speicher-Fehler dürfen die Analyse nie blockieren
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            with con:  # Kommentar: Transaktion
+                cur = con.execute(  # Kommentar: Fall einfügen
+                    "INSERT INTO faelle (benutzer, dateiname, pdf_sha256, auswahl, steuerstatus, schadensnummer, aktenzeichen, mandant,"
+                    " extraktion, ki_text, daten, groesse, erstellt, geaendert, zuletzt_genutzt)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (benutzer, dateiname or "", pdf_sha256 or "", auswahl, steuerstatus, schadensnummer, aktenzeichen, mandant,
+                     extraktion or "", ki_text or "", daten_json, _groesse(extraktion, ki_text, daten_json), jetzt, jetzt, jetzt),
+                )  # Kommentar: Ende INSERT
+            _verdraengen(con, jetzt)  # Kommentar: Limits durchsetzen
+            return cur.lastrowid  # Kommentar: neue Fall-ID
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error as e:  # Kommentar: DB-Fehler
+        print("[DEBUG] Fall speichern fehlgeschlagen:", repr(e))  # Kommentar: loggen
+        return None  # Kommentar: kein Fall
+
+
+def korrektur_speichern(fall_id: int, benutzer: str, daten: dict, render_meta: dict | None = None) -> bool:  # Kommentar: Korrigierte Daten (+ Render-Infos) am Fall ablegen
+    if not FALL_SPEICHER_AKTIV or fall_id is None:  # Kommentar: abgeschaltet oder kein Fall?
+        return False  # Kommentar: nichts gespeichert
+    jetzt = time.time()  # Kommentar: aktuelle Zeit
+    korrigiert_json = json.dumps(daten, ensure_ascii=False)  # Kommentar: Daten als JSON
+    meta_json = json.dumps(render_meta or {}, ensure_ascii=False)  # Kommentar: Render-Infos als JSON
+    schadensnummer, aktenzeichen, mandant = _suchfelder(daten)  # Kommentar: Suchfelder aus der Korrektur
+    try:  # Kommentar: Speicher-Fehler nur loggen
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            with con:  # Kommentar: Transaktion
+                cur = con.execute(  # Kommentar: Fall aktualisieren (nur eigener Fall)
+                    "UPDATE faelle SET korrigiert = ?, render_meta = ?, schadensnummer = ?, aktenzeichen = ?, mandant = ?,"
+                    " groesse = length(CAST(extraktion AS BLOB)) + length(CAST(ki_text AS BLOB)) + length(CAST(daten AS BLOB)) + ?,"
+                    " geaendert = ?, zuletzt_genutzt = ? WHERE id = ? AND benutzer = ?",
+                    (korrigiert_json, meta_json, schadensnummer, aktenzeichen, mandant, _groesse(korrigiert_json, meta_json), jetzt, jetzt, fall_id, benutzer),
+                )  # Kommentar: Ende UPDATE
+            return cur.rowcount == 1  # Kommentar: gefunden?
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error as e:  # Kommentar: DB-Fehler
+        print("[DEBUG] Korrektur speichern fehlgeschlagen:", repr(e))  # Kommentar: loggen
+        return False  # Kommentar: nicht gespeichert
+
+
+def fall_holen(fall_id: int, benutzer: str) -> dict | None:  # Kommentar: Kompletter Fall (nur für Eigentümer), aktualisiert den Zugriff (None = fehlt/fremd/DB-Fehler)
+    try:  # Kommentar: DB-Fehler nur loggen
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            cur = con.execute("SELECT * FROM faelle WHERE id = ? AND benutzer = ?", (fall_id, benutzer))  # Kommentar: Primärschlüssel-Lookup
+            zeile = cur.fetchone()  # Kommentar: eine Zeile
+            if zeile is None:  # Kommentar: fehlt oder fremd?
+                return None  # Kommentar: nichts
+            with con:  # Kommentar: Transaktion
+                con.execute("UPDATE faelle SET zuletzt_genutzt = ? WHERE id = ?", (time.time(), fall_id))  # Kommentar: Aufbewahrung verlängern
+            return _zeile_zu_dict(cur, zeile)  # Kommentar: als Dict
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error as e:  # Kommentar: DB-Fehler
+        print("[DEBUG] Fall laden fehlgeschlagen:", repr(e))  # Kommentar: loggen
+        return None  # Kommentar: kein Fall
+
+
+def faelle_suchen(benutzer: str, suchbegriff: str = "", limit: int = 20) -> list[dict] | None:  # Kommentar: Fälle eines Benutzers (neueste zuerst), optional Präfix von Schadensnummer/Aktenzeichen (None = DB-Fehler)
+    suchbegriff = suchbegriff.strip()  # Kommentar: Leerraum entfernen
+    try:  # Kommentar: DB-Fehler nur loggen
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            if suchbegriff:  # Kommentar: Suche (Präfix nutzt die NOCASE-Indizes)
+                muster = suchbegriff.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"  # Kommentar: LIKE-Sonderzeichen maskieren
+                cur = con.execute(  # Kommentar: beide Suchfelder
+                    f"SELECT {LISTEN_SPALTEN} FROM faelle WHERE benutzer = ? AND (schadensnummer LIKE ? ESCAPE '\\' OR aktenzeichen LIKE ? ESCAPE '\\')"
+                    " ORDER BY geaendert DESC LIMIT ?",
+                    (benutzer, muster, muster, limit),
+                )  # Kommentar: Ende SELECT
+            else:  # Kommentar: ohne Suche
+                cur = con.execute(f"SELECT {LISTEN_SPALTEN} FROM faelle WHERE benutzer = ? ORDER BY geaendert DESC LIMIT ?", (benutzer, limit))  # Kommentar: neueste Fälle
+            return [_zeile_zu_dict(cur, zeile) for zeile in cur.fetchall()]  # Kommentar: als Dicts
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error as e:  # Kommentar: DB-Fehler
+        print("[DEBUG] Fälle suchen fehlgeschlagen:", repr(e))  # Kommentar: loggen
+        return None  # Kommentar: Aufrufer zeigt Hinweis
+
+
+def fall_loeschen(fall_id: int, benutzer: str) -> bool:  # Kommentar: Fall löschen (nur Eigentümer; False = fehlt/fremd/DB-Fehler)
+    try:  # Kommentar: DB-Fehler nur loggen
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            with con:  # Kommentar: Transaktion
+                return con.execute("DELETE FROM faelle WHERE id = ? AND benutzer = ?", (fall_id, benutzer)).rowcount == 1  # Kommentar: gelöscht?
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error as e:  # Kommentar: DB-Fehler
+        print("[DEBUG] Fall löschen fehlgeschlagen:", repr(e))  # Kommentar: loggen
+        return False  # Kommentar: nicht gelöscht
+
+
+def fall_rendern(fall_id: int, benutzer: str, zus_bez: str | None = None, zus_betrag: str | None = None) -> bytes:  # Kommentar: DOCX aus gespeicherten Daten (ohne neue Analyse); Zusatzkosten optional neu
+    fall = fall_holen(fall_id, benutzer)  # Kommentar: Fall laden
+    if fall is None:  # Kommentar: fehlt oder fremd?
+        raise ValueError(f"Fall nicht gefunden: {fall_id}")  # Kommentar: Fehler
+    meta = fall["render_meta"]  # Kommentar: letzte Render-Infos
+    zus_bez = meta.get("zus_bez", "") if zus_bez is None else zus_bez  # Kommentar: bisherige Zusatzkosten als Default
+    zus_betrag = meta.get("zus_betrag", "") if zus_betrag is None else zus_betrag  # Kommentar: bisheriger Betrag als Default
+    daten = fall["korrigiert"] if fall["korrigiert"] is not None else fall["daten"]  # Kommentar: Korrektur hat Vorrang
+    vorlage_pfad = programm_2_word_output.resolve_vorlage_pfad(fall["auswahl"])  # Kommentar: aktuelle Vorlage der Variante
+    daten = programm_2_word_output.prepare_data_for_template(dict(daten), fall["auswahl"], fall["steuerstatus"], zus_bez, zus_betrag)  # Kommentar: Summen/Defaults neu
+    docx_bytes = serienbrief.brief_bytes(daten, vorlage_pfad)  # Kommentar: Millisekunden (kompilierte Vorlage)
+    if (zus_bez, zus_betrag) != (meta.get("zus_bez", ""), meta.get("zus_betrag", "")):  # Kommentar: Zusatzkosten geändert?
+        meta = {**meta, "zus_bez": zus_bez, "zus_betrag": zus_betrag, "vorlage": os.path.basename(vorlage_pfad), "gerendert": time.time(), "docx_bytes": len(docx_bytes)}  # Kommentar: neue Render-Infos
+        korrektur_speichern(fall_id, benutzer, fall["korrigiert"] if fall["korrigiert"] is not None else fall["daten"], meta)  # Kommentar: merken
+    return docx_bytes  # Kommentar: DOCX-Bytes
+
+
+def _verdraengen(con: sqlite3.Connection, jetzt: float) -> None:  # Kommentar: Aufbewahrung und Größenlimit durchsetzen
+    with con:  # Kommentar: Transaktion
+        cur = con.execute("DELETE FROM faelle WHERE zuletzt_genutzt < ?", (jetzt - FALL_MAX_ALTER_S,))  # Kommentar: lange ungenutzte Fälle löschen
+        entfernt = cur.rowcount  # Kommentar: Anzahl merken
+        gesamt = con.execute("SELECT COALESCE(SUM(groesse), 0) FROM faelle").fetchone()[0]  # Kommentar: Gesamtgröße
+        if gesamt > FALL_MAX_BYTES:  # Kommentar: Limit überschritten?
+            for fall_id, groesse in con.execute(  # Kommentar: älteste Zugriffe zuerst
+                "SELECT id, groesse FROM faelle ORDER BY zuletzt_genutzt ASC"
+            ).fetchall():  # Kommentar: alle Kandidaten
+                if gesamt <= FALL_MAX_BYTES:  # Kommentar: wieder unter Limit?
+                    break  # Kommentar: fertig
+                con.execute("DELETE FROM faelle WHERE id = ?", (fall_id,))  # Kommentar: Fall löschen
+                gesamt -= groesse  # Kommentar: Größe abziehen
+                entfernt += 1  # Kommentar: zählen
+    if entfernt:  # Kommentar: etwas verdrängt?
+        print(f"[DEBUG] Fall-Speicher: {entfernt} Fall/Fälle entfernt (Aufbewahrung/Größenlimit)")  # Kommentar: loggen
+
+
+def speicher_statistik() -> dict:  # Kommentar: Belegung (für Debug-Anzeige)
+    stats = {"aktiv": FALL_SPEICHER_AKTIV, "faelle": 0, "bytes": 0, "max_bytes": FALL_MAX_BYTES, "max_alter_tage": round(FALL_MAX_ALTER_S / 86400, 1)}  # Kommentar: Defaults
+    if not os.path.isfile(FALL_DB):  # Kommentar: noch keine DB?
+        return stats  # Kommentar: nur Konfiguration
+    try:  # Kommentar: Belegung lesen
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: sicher schließen
+            stats["faelle"], stats["bytes"] = con.execute("SELECT COUNT(*), COALESCE(SUM(groesse), 0) FROM faelle").fetchone()  # Kommentar: Belegung
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error:  # Kommentar: DB-Fehler
+        pass  # Kommentar: Konfiguration reicht
+    return stats  # Kommentar: Statistik zurückgeben
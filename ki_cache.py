@@ -0,0 +1,138 @@
+# ki_cache.py  # Kommentar: Persistenter Cache für KI-Antworten (SQLite, Schlüssel = PDF-Hash + Variante + Prompt-Version)
+
+import os  # Kommentar: Pfade/Env
+import time  # Kommentar: Zeitstempel für Alter/LRU
+import sqlite3  # Kommentar: Lokale Datenbank (ohne externe Library)
+import hashlib  # Kommentar: SHA-256 für Inhaltsadressierung
+import threading  # Kommentar: Lock für Zähler (mehrere Sessions)
+import config  # Kommentar: Eigene Konfigurationsdatei importieren
+
+CACHE_DATEI = os.path.join(config.KI_ANTWORT_ORDNER, "ki_cache.sqlite3")  # Kommentar: Cache-Datei im KI-Antwortordner
+CACHE_AKTIV = os.getenv("KI_CACHE_AKTIV", "1") != "0"  # Kommentar: Per Env abschaltbar (KI_CACHE_AKTIV=0)
+CACHE_MAX_BYTES = int(os.getenv("KI_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))  # Kommentar: Größenlimit (Default 200 MB)
+CACHE_MAX_ALTER_S = int(os.getenv("KI_CACHE_MAX_ALTER_S", str(30 * 24 * 3600)))  # Kommentar: Maximales Alter (Default 30 Tage)
+
+_zaehler_lock = threading.Lock()  # Kommentar: Lock für Prozess-Zähler
+_zaehler = {"treffer": 0, "fehlschlaege": 0, "geschrieben": 0, "verdraengt": 0}  # Kommentar: Hit/Miss-Zähler (pro Prozess)
+
+
+def _zaehlen(name: str, anzahl: int = 1) -> None:  # Kommentar: Zähler threadsicher erhöhen
+    with _zaehler_lock:  # Kommentar: Lock halten
+        _zaehler[name] = _zaehler.get(name, 0) + anzahl  # Kommentar: erhöhen
+
+
+def pdf_hash(pdf_bytes: bytes) -> str:  # Kommentar: SHA-256 der PDF-Bytes
+    return hashlib.sha256(pdf_bytes).hexdigest()  # Kommentar: Hex-Digest zurückgeben
+
+
+def cache_schluessel(pdf_sha256: str, auswahl: str, steuerstatus: str, prompt_version: str) -> str:  # Kommentar: Gesamtschlüssel bilden
+    roh = "\x1f".join([pdf_sha256, auswahl or "", steuerstatus or "", prompt_version or ""])  # Kommentar: Bestandteile mit Trennzeichen verbinden
+    return hashlib.sha256(roh.encode("utf-8")).hexdigest()  # Kommentar: Schlüssel als SHA-256
+
+
+def _verbindung() -> sqlite3.Connection:  # Kommentar: Verbindung öffnen (pro Aufruf, daher threadsicher)
+    os.makedirs(os.path.dirname(CACHE_DATEI), exist_ok=True)  # Kommentar: Ordner sicherstellen
+    con = sqlite3.connect(CACHE_DATEI, timeout=30)  # Kommentar: Verbindung mit Wartezeit bei Sperre
+    con.execute("PRAGMA journal_mode=WAL")  # Kommentar: WAL -> paralleles Lesen während Schreiben
+    con.execute(  # Kommentar: Tabelle anlegen (falls nicht vorhanden)
+        "CREATE TABLE IF NOT EXISTS ki_cache ("
+        " schluessel TEXT PRIMARY KEY,"  # Kommentar: Inhaltsadresse
+        " pdf_sha256 TEXT NOT NULL,"  # Kommentar: PDF-Hash (für Diagnose)
+        " ki_text TEXT NOT NULL,"  # Kommentar: KI-Antwort
+        " groesse INTEGER NOT NULL,"  # Kommentar: Größe in Bytes (für Limit)
+        " erstellt REAL NOT NULL,"  # Kommentar: Erstellzeit (für Alterslimit)
+        " zuletzt_genutzt REAL NOT NULL,"  # Kommentar: Letzter Zugriff (für LRU)
+        " treffer INTEGER NOT NULL DEFAULT 0"  # Kommentar: Trefferzähler je Eintrag
+        ")"
+    )  # Kommentar: Ende CREATE
+    con.execute("CREATE INDEX IF NOT EXISTS idx_ki_cache_lru ON ki_cache(zuletzt_genutzt)")  # Kommentar: Index für Verdrängung
+    return con  # Kommentar: Verbindung zurückgeben
+
+
+def cache_lesen(schluessel: str) -> str | None:  # Kommentar: Eintrag lesen (None = Miss)
+    if not CACHE_AKTIV:  # Kommentar: Cache abgeschaltet?
+        return None  # Kommentar: immer Miss
+    jetzt = time.time()  # Kommentar: aktuelle Zeit
+    try:  # Kommentar: Cache-Fehler dürfen die Analyse nie blockieren
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            zeile = con.execute(  # Kommentar: Eintrag suchen
+                "SELECT ki_text, erstellt FROM ki_cache WHERE schluessel = ?", (schluessel,)
+            ).fetchone()  # Kommentar: eine Zeile
+            if zeile is None or jetzt - zeile[1] > CACHE_MAX_ALTER_S:  # Kommentar: fehlt oder zu alt?
+                _zaehlen("fehlschlaege")  # Kommentar: Miss zählen
+                return None  # Kommentar: Miss
+            with con:  # Kommentar: Transaktion
+                con.execute(  # Kommentar: LRU-Zeit und Treffer aktualisieren
+                    "UPDATE ki_cache SET zuletzt_genutzt = ?, treffer = treffer + 1 WHERE schluessel = ?",
+                    (jetzt, schluessel),
+                )  # Kommentar: Ende UPDATE
+            _zaehlen("treffer")  # Kommentar: Hit zählen
+            return zeile[0]  # Kommentar: KI-Text zurückgeben
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error as e:  # Kommentar: DB-Fehler
+        print("[DEBUG] KI-Cache lesen fehlgeschlagen:", repr(e))  # Kommentar: loggen
+        _zaehlen("fehlschlaege")  # Kommentar: als Miss zählen
+        return None  # Kommentar: Miss
+
+
+def cache_schreiben(schluessel: str, pdf_sha256: str, ki_text: str) -> None:  # Kommentar: Eintrag speichern + Verdrängung
+    if not CACHE_AKTIV or not ki_text:  # Kommentar: abgeschaltet oder leer?
+        return  # Kommentar: nichts tun
+    jetzt = time.time()  # Kommentar: aktuelle Zeit
+    try:  # Kommentar: Cache-Fehler ignorieren (nur loggen)
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            with con:  # Kommentar: Transaktion
+                con.execute(  # Kommentar: Einfügen oder ersetzen
+                    "INSERT OR REPLACE INTO ki_cache (schluessel, pdf_sha256, ki_text, groesse, erstellt, zuletzt_genutzt, treffer)"
+                    " VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    (schluessel, pdf_sha256, ki_text, len(ki_text.encode("utf-8")), jetzt, jetzt),
+                )  # Kommentar: Ende INSERT
+            _zaehlen("geschrieben")  # Kommentar: Schreibzähler
+            _verdraengen(con, jetzt)  # Kommentar: Limits durchsetzen
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error as e:  # Kommentar: DB-Fehler
+        print("[DEBUG] KI-Cache schreiben fehlgeschlagen:", repr(e))  # Kommentar: loggen
+
+
+def _verdraengen(con: sqlite3.Connection, jetzt: float) -> None:  # Kommentar: Alters- und Größenlimit durchsetzen
+    with con:  # Kommentar: Transaktion
+        cur = con.execute("DELETE FROM ki_cache WHERE erstellt < ?", (jetzt - CACHE_MAX_ALTER_S,))  # Kommentar: zu alte Einträge löschen
+        entfernt = cur.rowcount  # Kommentar: Anzahl merken
+        gesamt = con.execute("SELECT COALESCE(SUM(groesse), 0) FROM ki_cache").fetchone()[0]  # Kommentar: Gesamtgröße
+        if gesamt > CACHE_MAX_BYTES:  # Kommentar: Limit überschritten?
+            for schluessel, groesse in con.execute(  # Kommentar: älteste Zugriffe zuerst
+                "SELECT schluessel, groesse FROM ki_cache ORDER BY zuletzt_genutzt ASC"
+            ).fetchall():  # Kommentar: alle Kandidaten
+                if gesamt <= CACHE_MAX_BYTES:  # Kommentar: wieder unter Limit?
+                    break  # Kommentar: fertig
+                con.execute("DELETE FROM ki_cache WHERE schluessel = ?", (schluessel,))  # Kommentar: Eintrag löschen
+                gesamt -= groesse  # Kommentar: Größe abziehen
+                entfernt += 1  # Kommentar: zählen
+    if entfernt:  # Kommentar: etwas verdrängt?
+        _zaehlen("verdraengt", entfernt)  # Kommentar: Verdrängungszähler
+
+
+def cache_statistik() -> dict:  # Kommentar: Zähler + Belegung (für Debug-Anzeige)
+    with _zaehler_lock:  # Kommentar: Lock halten
+        stats = dict(_zaehler)  # Kommentar: Kopie der Prozess-Zähler
+    anfragen = stats["treffer"] + stats["fehlschlaege"]  # Kommentar: Gesamtanfragen
+    stats["trefferquote"] = round(stats["treffer"] / anfragen, 3) if anfragen else 0.0  # Kommentar: Hit-Rate
+    stats["eintraege"] = 0  # Kommentar: Default
+    stats["bytes"] = 0  # Kommentar: Default
+    if not os.path.isfile(CACHE_DATEI):  # Kommentar: noch keine DB?
+        return stats  # Kommentar: nur Zähler
+    try:  # Kommentar: Belegung lesen
+        con = _verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: sicher schließen
+            anzahl, groesse = con.execute("SELECT COUNT(*), COALESCE(SUM(groesse), 0) FROM ki_cache").fetchone()  # Kommentar: Belegung
+            stats["eintraege"] = anzahl  # Kommentar: Einträge
+            stats["bytes"] = groesse  # Kommentar: Bytes
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+    except sqlite3.Error:  # Kommentar: DB-Fehler
+        pass  # Kommentar: Zähler reichen
+    return stats  # Kommentar: Statistik zurückgeben
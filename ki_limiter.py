@@ -0,0 +1,79 @@
+# ki_limiter.py  # Kommentar: Prozessweiter Ratenbegrenzer für Gemini (Anfragen/Minute + Tokens/Minute, gemeinsam für alle Sessions)
+
+import os  # Kommentar: Env für Limits
+import time  # Kommentar: monotone Zeit + sleep
+import threading  # Kommentar: Locks
+
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "10"))  # Kommentar: Anfragen pro Minute (0 = ohne Limit)
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "250000"))  # Kommentar: Tokens pro Minute (0 = ohne Limit)
+
+
+class TokenBucket:  # Kommentar: Klassischer Token-Bucket (Kapazität = Rate pro Minute)
+    def __init__(self, pro_minute: float):  # Kommentar: Rate pro Minute
+        self.lock = threading.Lock()  # Kommentar: Lock
+        self.setzen(pro_minute)  # Kommentar: Rate setzen
+
+    def setzen(self, pro_minute: float) -> None:  # Kommentar: Rate (neu) setzen, Bucket voll
+        with self.lock:  # Kommentar: exklusiv
+            self.pro_minute = max(pro_minute, 0.0)  # Kommentar: Rate
+            self.rate = self.pro_minute / 60.0  # Kommentar: pro Sekunde
+            self.kapazitaet = self.pro_minute  # Kommentar: eine Minute Burst
+            self.tokens = self.kapazitaet  # Kommentar: voll starten
+            self.zuletzt = time.monotonic()  # Kommentar: letzter Auffüllzeitpunkt
+
+    def reservieren(self, menge: float) -> float:  # Kommentar: Menge sofort abbuchen, Wartezeit bis zur Deckung zurückgeben
+        with self.lock:  # Kommentar: exklusiv
+            if self.rate <= 0:  # Kommentar: kein Limit?
+                return 0.0  # Kommentar: sofort
+            jetzt = time.monotonic()  # Kommentar: Zeit
+            self.tokens = min(self.kapazitaet, self.tokens + (jetzt - self.zuletzt) * self.rate)  # Kommentar: auffüllen
+            self.zuletzt = jetzt  # Kommentar: merken
+            menge = min(menge, self.kapazitaet)  # Kommentar: mehr als Kapazität nie verlangen (sonst Deadlock)
+            self.tokens -= menge  # Kommentar: abbuchen (darf negativ werden = Schuld der Wartenden)
+            return max(-self.tokens / self.rate, 0.0)  # Kommentar: Wartezeit bis Saldo wieder >= 0
+
+
+class GeminiLimiter:  # Kommentar: RPM- und TPM-Bucket zusammen
+    def __init__(self, rpm: float, tpm: float):  # Kommentar: Limits
+        self.anfragen = TokenBucket(rpm)  # Kommentar: Anfragen-Bucket
+        self.tokens = TokenBucket(tpm)  # Kommentar: Token-Bucket
+        self.stats_lock = threading.Lock()  # Kommentar: Lock für Statistik
+        self.stats = {"anfragen": 0, "gewartet": 0, "wartezeit_s": 0.0, "max_wartezeit_s": 0.0}  # Kommentar: Statistik
+
+    def konfigurieren(self, rpm: float | None = None, tpm: float | None = None) -> None:  # Kommentar: Limits zur Laufzeit ändern (z.B. Batch)
+        if rpm is not None:  # Kommentar: RPM gesetzt?
+            self.anfragen.setzen(rpm)  # Kommentar: übernehmen
+        if tpm is not None:  # Kommentar: TPM gesetzt?
+            self.tokens.setzen(tpm)  # Kommentar: übernehmen
+
+    def wartezeit_reservieren(self, tokens: float) -> float:  # Kommentar: Platz für eine Anfrage reservieren, Wartezeit zurückgeben (ohne zu schlafen)
+        wartezeit = max(self.anfragen.reservieren(1.0), self.tokens.reservieren(tokens))  # Kommentar: das strengere Limit zählt
+        with self.stats_lock:  # Kommentar: Statistik exklusiv
+            self.stats["anfragen"] += 1  # Kommentar: zählen
+            if wartezeit > 0:  # Kommentar: musste gewartet werden?
+                self.stats["gewartet"] += 1  # Kommentar: zählen
+                self.stats["wartezeit_s"] += wartezeit  # Kommentar: summieren
+                self.stats["max_wartezeit_s"] = max(self.stats["max_wartezeit_s"], wartezeit)  # Kommentar: Maximum
+        return wartezeit  # Kommentar: Wartezeit zurückgeben
+
+    def erwerben(self, tokens: float) -> float:  # Kommentar: Reservieren und ggf. schlafen, tatsächliche Wartezeit zurückgeben
+        wartezeit = self.wartezeit_reservieren(tokens)  # Kommentar: reservieren
+        if wartezeit > 0:  # Kommentar: warten nötig?
+            time.sleep(wartezeit)  # Kommentar: schlafen (außerhalb aller Locks)
+        return wartezeit  # Kommentar: Wartezeit zurückgeben
+
+    def statistik(self) -> dict:  # Kommentar: Kopie der Statistik
+        with self.stats_lock:  # Kommentar: exklusiv
+            stats = dict(self.stats)  # Kommentar: Kopie
+        stats["wartezeit_s"] = round(stats["wartezeit_s"], 3)  # Kommentar: runden
+        stats["max_wartezeit_s"] = round(stats["max_wartezeit_s"], 3)  # Kommentar: runden
+        stats["rpm"] = self.anfragen.pro_minute  # Kommentar: Konfiguration
+        stats["tpm"] = self.tokens.pro_minute  # Kommentar: Konfiguration
+        return stats  # Kommentar: zurückgeben
+
+
+_limiter = GeminiLimiter(GEMINI_RPM, GEMINI_TPM)  # Kommentar: ein Limiter pro Prozess (Modul wird nur einmal importiert)
+
+
+def gemini_limiter() -> GeminiLimiter:  # Kommentar: gemeinsamen Limiter holen
+    return _limiter  # Kommentar: Singleton zurückgeben
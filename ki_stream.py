@@ -0,0 +1,52 @@
+# ki_stream.py  # Kommentar: Inkrementelles Auslesen der JSON-Felder aus einer gestreamten KI-Antwort
+
+import re  # Kommentar: Reguläre Ausdrücke (einmal kompiliert)
+import json  # Kommentar: JSON-Strings korrekt dekodieren (Escapes, Umlaute)
+
+JSON_START_MARKER = "JSON_START"  # Kommentar: Marker Start (wie im Prompt)
+JSON_END_MARKER = "JSON_END"  # Kommentar: Marker Ende (wie im Prompt)
+FELD_RE = re.compile(r'"([A-Z0-9_]+)"\s*:\s*"((?:[^"\\]|\\.)*)"')  # Kommentar: vollständiges "KEY": "Wert"-Paar (Wert endet am unmaskierten Anführungszeichen)
+
+
+class JsonFeldParser:  # Kommentar: Nimmt Text-Stücke entgegen und meldet jedes fertige Feld genau einmal
+    def __init__(self, bei_feld=None, mit_markern: bool = True):  # Kommentar: Callback(key, wert) für neue Felder; ohne Marker = reines JSON (Schema-Modus)
+        self.bei_feld = bei_feld  # Kommentar: Callback merken
+        self.puffer = ""  # Kommentar: gesamter bisheriger Text
+        self.json_start = -1 if mit_markern else 0  # Kommentar: Position hinter JSON_START (-1 = noch nicht gesehen)
+        self.mit_markern = mit_markern  # Kommentar: Modus merken
+        self.gelesen_bis = 0  # Kommentar: ab hier nach neuen Feldern suchen
+        self.felder = {}  # Kommentar: bisher erkannte Felder
+        self.fertig = False  # Kommentar: JSON_END gesehen?
+
+    def hinzufuegen(self, stueck: str) -> bool:  # Kommentar: Text-Stück verarbeiten, True sobald JSON_END erreicht ist
+        if self.fertig or not stueck:  # Kommentar: nichts mehr zu tun?
+            return self.fertig  # Kommentar: Status zurückgeben
+        self.puffer += stueck  # Kommentar: anhängen
+        if self.json_start == -1:  # Kommentar: Start noch nicht gefunden?
+            pos = self.puffer.find(JSON_START_MARKER)  # Kommentar: Marker suchen
+            if pos == -1:  # Kommentar: noch nicht da
+                return False  # Kommentar: weiter lesen
+            self.json_start = self.gelesen_bis = pos + len(JSON_START_MARKER)  # Kommentar: ab hier Felder suchen
+        ende = self.puffer.find(JSON_END_MARKER, self.json_start) if self.mit_markern else -1  # Kommentar: Ende im Puffer? (reines JSON endet mit dem Stream)
+        bereich_ende = ende if ende != -1 else len(self.puffer)  # Kommentar: nur bis zum Ende-Marker suchen
+        for m in FELD_RE.finditer(self.puffer, self.gelesen_bis, bereich_ende):  # Kommentar: neue vollständige Paare
+            self._feld_melden(m.group(1), m.group(2))  # Kommentar: Feld übernehmen
+            self.gelesen_bis = m.end()  # Kommentar: nicht erneut lesen
+        if ende != -1:  # Kommentar: JSON abgeschlossen?
+            self.fertig = True  # Kommentar: merken
+            self.puffer = self.puffer[:ende + len(JSON_END_MARKER)]  # Kommentar: Rest nach dem Marker verwerfen
+        return self.fertig  # Kommentar: Status zurückgeben
+
+    def _feld_melden(self, key: str, roh: str) -> None:  # Kommentar: JSON-String dekodieren und Callback aufrufen
+        try:  # Kommentar: Escapes auflösen
+            wert = json.loads('"' + roh + '"')  # Kommentar: z.B. \n, \", ü
+        except ValueError:  # Kommentar: defektes Escape
+            wert = roh  # Kommentar: Rohwert übernehmen
+        self.felder[key] = wert  # Kommentar: merken
+        if self.bei_feld is not None:  # Kommentar: Callback gesetzt?
+            self.bei_feld(key, wert)  # Kommentar: melden
+
+    def text(self) -> str:  # Kommentar: Antworttext für Cache/Parser (endet mit JSON_END, falls der Stream per Stoppsequenz endete)
+        if self.mit_markern and self.json_start != -1 and not self.fertig:  # Kommentar: Start gesehen, Ende fehlt?
+            return self.puffer + "\n" + JSON_END_MARKER  # Kommentar: Marker ergänzen (Stoppsequenz wird nicht mitgeliefert)
+        return self.puffer  # Kommentar: unverändert
@@ -0,0 +1,127 @@
+# kontext_cache.py  # Kommentar: Statischen Prompt-Teil einmal als Gemini-Kontext-Cache anlegen und über Aufrufe hinweg wiederverwenden (TTL + Erneuerung)
+
+import os  # Kommentar: Env für Modus und Zeiten
+import time  # Kommentar: monotone Zeit für Ablauf
+import atexit  # Kommentar: Caches beim Beenden löschen
+import hashlib  # Kommentar: Schlüssel aus dem statischen Text
+import threading  # Kommentar: Lock + Events (Sessions/Batch-Worker teilen die Caches)
+import weakref  # Kommentar: Client als schwacher Schlüssel (keine wiederverwendeten id()-Werte)
+
+from google.genai import types as genai_types  # Kommentar: CreateCachedContentConfig / UpdateCachedContentConfig
+
+PROMPT_CACHE_MODUS = os.getenv("PROMPT_CACHE_MODUS", "aus")  # Kommentar: "aus" (ganzer Prompt je Aufruf), "system" (statischer Teil als System-Instruktion) oder "kontext" (statischer Teil im Kontext-Cache)
+PROMPT_CACHE_TTL_S = int(os.getenv("PROMPT_CACHE_TTL_S", "3600"))  # Kommentar: Lebensdauer eines Caches beim Server
+PROMPT_CACHE_ERNEUERN_S = float(os.getenv("PROMPT_CACHE_ERNEUERN_S", "300"))  # Kommentar: TTL verlängern, wenn weniger Restzeit übrig ist
+PROMPT_CACHE_SPERRE_S = float(os.getenv("PROMPT_CACHE_SPERRE_S", "600"))  # Kommentar: nach fehlgeschlagenem Anlegen so lange nur System-Instruktion
+
+
+class KontextCache:  # Kommentar: Verwaltung der Caches je (Client, Modell, statischer Text)
+    def __init__(self, ttl_s: int, erneuern_s: float, sperre_s: float):  # Kommentar: Zeiten
+        self.ttl_s = ttl_s  # Kommentar: TTL beim Anlegen/Verlängern
+        self.erneuern_s = erneuern_s  # Kommentar: Vorlauf für die Verlängerung
+        self.sperre_s = sperre_s  # Kommentar: Pause nach Fehlern
+        self.lock = threading.Lock()  # Kommentar: Lock nur für den Zustand (Netzaufrufe laufen ohne Lock)
+        self.clients = weakref.WeakKeyDictionary()  # Kommentar: Client -> {"eintraege", "laufend", "gesperrt_bis"} (verschwindet mit dem Client)
+        self.stats = {"angelegt": 0, "verlaengert": 0, "treffer": 0, "verworfen": 0, "fehler": 0, "gewartet": 0}  # Kommentar: Zähler
+
+    def _zustand(self, client) -> dict:  # Kommentar: Zustand eines Clients (unter Lock aufrufen)
+        zustand = self.clients.get(client)  # Kommentar: vorhanden?
+        if zustand is None:  # Kommentar: erster Aufruf mit diesem Client
+            zustand = {"eintraege": {}, "laufend": {}, "gesperrt_bis": {}}  # Kommentar: Schlüssel (Modell, Hash) -> Eintrag / Event / Zeit
+            self.clients[client] = zustand  # Kommentar: merken
+        return zustand  # Kommentar: Zustand zurückgeben
+
+    def name_holen(self, client, modell: str, statisch: str) -> str | None:  # Kommentar: Cache-Name für den statischen Text (None = nicht verfügbar)
+        schluessel = (modell, hashlib.sha256(statisch.encode("utf-8")).hexdigest())  # Kommentar: je Client (schwacher Schlüssel) und Modell/Text ein Cache
+        while True:  # Kommentar: warten, falls ein anderer Thread gerade anlegt
+            with self.lock:  # Kommentar: Zustand exklusiv (kurz)
+                jetzt = time.monotonic()  # Kommentar: Zeit
+                zustand = self._zustand(client)  # Kommentar: Zustand des Clients
+                eintrag = zustand["eintraege"].get(schluessel)  # Kommentar: vorhandener Cache?
+                gueltig = eintrag is not None and eintrag["ablauf"] > jetzt  # Kommentar: beim Server noch vorhanden?
+                if gueltig and (eintrag["ablauf"] - jetzt > self.erneuern_s or schluessel in zustand["laufend"]):  # Kommentar: lange genug gültig oder Verlängerung läuft schon
+                    self.stats["treffer"] += 1  # Kommentar: zählen
+                    return eintrag["name"]  # Kommentar: wiederverwenden
+                ereignis = zustand["laufend"].get(schluessel)  # Kommentar: legt ein anderer Thread gerade an?
+                if ereignis is None:  # Kommentar: nein -> dieser Thread übernimmt
+                    if not gueltig:  # Kommentar: abgelaufen oder nie angelegt
+                        zustand["eintraege"].pop(schluessel, None)  # Kommentar: abgelaufenen Eintrag entfernen
+                        if zustand["gesperrt_bis"].get(schluessel, 0.0) > jetzt:  # Kommentar: kürzlich fehlgeschlagen?
+                            return None  # Kommentar: nicht bei jedem Aufruf erneut versuchen
+                    ereignis = threading.Event()  # Kommentar: "in Arbeit"-Markierung
+                    zustand["laufend"][schluessel] = ereignis  # Kommentar: für andere Threads sichtbar
+                    break  # Kommentar: Netzaufruf ohne Lock
+                self.stats["gewartet"] += 1  # Kommentar: zählen
+            ereignis.wait()  # Kommentar: bis der andere Thread fertig ist, dann neu prüfen
+        try:  # Kommentar: Markierung immer aufheben
+            return self._anlegen_oder_verlaengern(client, modell, statisch, schluessel, eintrag if gueltig else None)  # Kommentar: Netzaufruf
+        finally:  # Kommentar: Wartende wecken
+            with self.lock:  # Kommentar: exklusiv
+                zustand["laufend"].pop(schluessel, None)  # Kommentar: Markierung entfernen
+            ereignis.set()  # Kommentar: wecken
+
+    def _anlegen_oder_verlaengern(self, client, modell: str, statisch: str, schluessel: tuple, eintrag: dict | None) -> str | None:  # Kommentar: Netzaufrufe (ohne Lock), Ergebnis unter Lock veröffentlichen
+        jetzt = time.monotonic()  # Kommentar: Zeit
+        if eintrag is not None:  # Kommentar: läuft bald ab -> TTL verlängern
+            try:  # Kommentar: Verlängern kann fehlschlagen (z.B. schon gelöscht)
+                client.caches.update(name=eintrag["name"], config=genai_types.UpdateCachedContentConfig(ttl=f"{self.ttl_s}s"))  # Kommentar: neue TTL
+                with self.lock:  # Kommentar: veröffentlichen
+                    eintrag["ablauf"] = jetzt + self.ttl_s  # Kommentar: Ablauf merken
+                    self.stats["verlaengert"] += 1  # Kommentar: zählen
+                return eintrag["name"]  # Kommentar: weiterverwenden
+            except Exception as e:  # Kommentar: dann neu anlegen
+                print("[DEBUG] Kontext-Cache verlängern fehlgeschlagen:", repr(e))  # Kommentar: loggen
+                with self.lock:  # Kommentar: exklusiv
+                    self._zustand(client)["eintraege"].pop(schluessel, None)  # Kommentar: alten Eintrag nicht mehr ausgeben
+        try:  # Kommentar: Cache beim Server anlegen
+            cache = client.caches.create(model=modell, config=genai_types.CreateCachedContentConfig(  # Kommentar: statischer Teil als System-Instruktion im Cache
+                system_instruction=statisch,  # Kommentar: Anweisungen + Ausgabeformat
+                ttl=f"{self.ttl_s}s",  # Kommentar: Lebensdauer
+                display_name="gutachten-prompt-" + schluessel[1][:12],  # Kommentar: lesbarer Name (Prompt-Hash)
+            ))  # Kommentar: Ende create
+        except Exception as e:  # Kommentar: z.B. Text unter der Mindestgröße, Kontingent, Netz
+            print("[DEBUG] Kontext-Cache anlegen fehlgeschlagen:", repr(e))  # Kommentar: loggen
+            with self.lock:  # Kommentar: veröffentlichen
+                self.stats["fehler"] += 1  # Kommentar: zählen
+                self._zustand(client)["gesperrt_bis"][schluessel] = time.monotonic() + self.sperre_s  # Kommentar: eine Weile ohne Cache
+            return None  # Kommentar: Aufrufer nutzt die System-Instruktion
+        with self.lock:  # Kommentar: veröffentlichen
+            self._zustand(client)["eintraege"][schluessel] = {"name": cache.name, "ablauf": jetzt + self.ttl_s}  # Kommentar: merken
+            self.stats["angelegt"] += 1  # Kommentar: zählen
+        print("[DEBUG] Kontext-Cache angelegt:", cache.name)  # Kommentar: loggen
+        return cache.name  # Kommentar: Name zurückgeben
+
+    def verwerfen(self, name: str) -> None:  # Kommentar: Cache beim Server nicht mehr vorhanden (abgelaufen/gelöscht) -> beim nächsten Aufruf neu anlegen
+        with self.lock:  # Kommentar: exklusiv
+            for zustand in list(self.clients.values()):  # Kommentar: alle Clients
+                for schluessel, eintrag in list(zustand["eintraege"].items()):  # Kommentar: Eintrag zum Namen suchen
+                    if eintrag["name"] == name:  # Kommentar: gefunden?
+                        del zustand["eintraege"][schluessel]  # Kommentar: entfernen
+                        self.stats["verworfen"] += 1  # Kommentar: zählen
+
+    def aufraeumen(self) -> None:  # Kommentar: alle angelegten Caches löschen (spart Speicherkosten bis zum TTL-Ablauf)
+        with self.lock:  # Kommentar: exklusiv
+            loeschen = []  # Kommentar: (Client, Name) noch lebender Clients
+            for client, zustand in list(self.clients.items()):  # Kommentar: je Client
+                loeschen.extend((client, eintrag["name"]) for eintrag in zustand["eintraege"].values())  # Kommentar: Namen sammeln
+                zustand["eintraege"].clear()  # Kommentar: leeren
+        for client, name in loeschen:  # Kommentar: je Cache (ohne Lock)
+            try:  # Kommentar: Fehler beim Beenden ignorieren
+                client.caches.delete(name=name)  # Kommentar: löschen
+            except Exception as e:  # Kommentar: z.B. schon abgelaufen
+                print("[DEBUG] Kontext-Cache löschen fehlgeschlagen:", repr(e))  # Kommentar: loggen
+
+    def statistik(self) -> dict:  # Kommentar: Kopie der Statistik
+        with self.lock:  # Kommentar: exklusiv
+            stats = dict(self.stats)  # Kommentar: Kopie
+            stats["aktiv"] = sum(len(zustand["eintraege"]) for zustand in self.clients.values())  # Kommentar: derzeit genutzte Caches
+        stats.update({"modus": PROMPT_CACHE_MODUS, "ttl_s": self.ttl_s})  # Kommentar: Konfiguration
+        return stats  # Kommentar: zurückgeben
+
+
+_kontext_cache = KontextCache(PROMPT_CACHE_TTL_S, PROMPT_CACHE_ERNEUERN_S, PROMPT_CACHE_SPERRE_S)  # Kommentar: ein Verwalter pro Prozess
+atexit.register(_kontext_cache.aufraeumen)  # Kommentar: beim Beenden löschen
+
+
+def kontext_cache() -> KontextCache:  # Kommentar: gemeinsamen Verwalter holen
+    return _kontext_cache  # Kommentar: Instanz zurückgeben
@@ -0,0 +1,85 @@
+# langdokument.py  # Kommentar: Lange Gutachten in überlappende Abschnitte zerlegen und Teilergebnisse der KI feldweise zusammenführen
+
+from collections import Counter  # Kommentar: Häufigkeit von Beträgen über Abschnitte
+
+import regel_extraktor  # Kommentar: Betrags-Regex, netto/brutto-Hinweis und Steuer-Präferenz der Variante
+
+REGEL_ERSTER = "erster"  # Kommentar: erster nicht-leerer Wert in Dokumentreihenfolge (Stammdaten stehen vorne)
+REGEL_GROESSTER_BELEGT = "groesster_belegt"  # Kommentar: größter Betrag, der so im Gutachten steht (Gesamtsumme statt Teilposition)
+BETRAGSFELDER = (  # Kommentar: Kostenfelder (Euro-Beträge)
+    "REPARATURKOSTEN", "WERTMINDERUNG", "KOSTENPAUSCHALE", "GUTACHTERKOSTEN", "NUTZUNGSAUSFALL", "MWST_BETRAG",
+    "WIEDERBESCHAFFUNGSWERT", "RESTWERT",
+)  # Kommentar: Ende Betragsfelder
+ZUSAMMENFUEHRUNG = {feld: REGEL_GROESSTER_BELEGT for feld in BETRAGSFELDER}  # Kommentar: Feld -> Regel (alle anderen Felder, z.B. SCHADENHERGANG: REGEL_ERSTER)
+
+
+def text_zerlegen(text: str, groesse: int, ueberlappung: int) -> list[str]:  # Kommentar: Abschnitte von max. groesse Zeichen, Schnitt an Zeilenenden, je ueberlappung Zeichen doppelt
+    if len(text) <= groesse:  # Kommentar: passt in einen Abschnitt?
+        return [text]  # Kommentar: unverändert
+    abschnitte = []  # Kommentar: Ergebnis
+    start = 0  # Kommentar: Beginn des aktuellen Abschnitts
+    while True:  # Kommentar: bis zum Textende
+        ende = start + groesse  # Kommentar: maximales Ende
+        if ende >= len(text):  # Kommentar: letzter Abschnitt?
+            abschnitte.append(text[start:])  # Kommentar: Rest
+            return abschnitte  # Kommentar: fertig
+        umbruch = text.rfind("\n", start + groesse // 2, ende)  # Kommentar: letztes Zeilenende in der zweiten Hälfte
+        if umbruch != -1:  # Kommentar: gefunden?
+            ende = umbruch + 1  # Kommentar: keine Zeile zerschneiden
+        abschnitte.append(text[start:ende])  # Kommentar: Abschnitt übernehmen
+        zeilenanfang = text.rfind("\n", start + 1, ende - ueberlappung) + 1  # Kommentar: nächster Abschnitt beginnt an einer Zeile vor der Überlappung
+        start = max(zeilenanfang if zeilenanfang > 0 else ende - ueberlappung, start + 1)  # Kommentar: immer vorankommen
+
+
+def _cent(wert: str) -> int | None:  # Kommentar: "1.234,56 €" -> 123456 (None ohne Betrag)
+    m = regel_extraktor.BETRAG_RE.search(wert or "")  # Kommentar: erster deutscher Betrag
+    if not m:  # Kommentar: kein Betrag?
+        return None  # Kommentar: nicht vergleichbar
+    return int(m.group(1).replace(".", "")) * 100 + int(m.group(2))  # Kommentar: ganzzahlig in Cent (kein Rundungsproblem)
+
+
+def betrag_belege(text: str) -> dict[int, list[str]]:  # Kommentar: Betrag (Cent) -> Zeilen des Gutachtens, in denen er steht
+    belege = {}  # Kommentar: Ergebnis
+    for zeile in text.splitlines():  # Kommentar: zeilenweise
+        for m in regel_extraktor.BETRAG_RE.finditer(zeile):  # Kommentar: alle Beträge der Zeile
+            belege.setdefault(int(m.group(1).replace(".", "")) * 100 + int(m.group(2)), []).append(zeile)  # Kommentar: merken
+    return belege  # Kommentar: Index zurückgeben
+
+
+def _steuer_passt(feld: str, zeilen: list[str], praeferenz: str | None) -> bool:  # Kommentar: widerspricht der Betrag der netto/brutto-Vorgabe der Variante?
+    if feld != "REPARATURKOSTEN" or not praeferenz:  # Kommentar: nur Reparaturkosten haben eine Vorgabe
+        return True  # Kommentar: passt
+    for zeile in zeilen:  # Kommentar: Fundstellen
+        m = regel_extraktor.NETTO_BRUTTO_RE.search(zeile)  # Kommentar: Hinweis in der Zeile?
+        if m is None or m.group(1).lower() == praeferenz:  # Kommentar: ohne Hinweis oder passender Hinweis
+            return True  # Kommentar: passt
+    return False  # Kommentar: nur als Gegenteil ausgewiesen (z.B. brutto bei fiktiver Abrechnung)
+
+
+def _betrag_waehlen(feld: str, werte: list[str], belege: dict, praeferenz: str | None) -> str:  # Kommentar: größter belegter Betrag, sonst häufigster
+    geparst = [(wert, cent) for wert in werte if (cent := _cent(wert)) is not None]  # Kommentar: Werte mit Betrag
+    if not geparst:  # Kommentar: kein Wert als Betrag lesbar?
+        return werte[0]  # Kommentar: erster Wert
+    belegt = [(wert, cent) for wert, cent in geparst if cent in belege and _steuer_passt(feld, belege[cent], praeferenz)]  # Kommentar: steht so im Gutachten und passt zur Variante
+    if belegt:  # Kommentar: belegte Werte vorhanden?
+        return max(belegt, key=lambda p: p[1])[0]  # Kommentar: größter (bei Gleichstand der erste)
+    haeufigkeit = Counter(cent for _, cent in geparst)  # Kommentar: wie viele Abschnitte nennen den Betrag?
+    return max(geparst, key=lambda p: haeufigkeit[p[1]])[0]  # Kommentar: häufigster, bei Gleichstand der erste
+
+
+def zusammenfuehren(teilergebnisse: list[dict], text: str, auswahl: str = "") -> dict:  # Kommentar: Felder je Abschnitt (Dokumentreihenfolge) -> ein Ergebnis
+    belege = betrag_belege(text)  # Kommentar: Beträge im vollständigen Text
+    praeferenz = regel_extraktor.steuer_praeferenz(auswahl)  # Kommentar: netto/brutto je Variante (wie Regel-Extraktor)
+    ergebnis = {}  # Kommentar: zusammengeführte Felder
+    felder = []  # Kommentar: alle Keys in erster Reihenfolge
+    for teil in teilergebnisse:  # Kommentar: Abschnitte
+        felder += [k for k in teil if k not in felder]  # Kommentar: neue Keys anhängen
+    for feld in felder:  # Kommentar: feldweise
+        werte = [teil[feld].strip() for teil in teilergebnisse if (teil.get(feld) or "").strip()]  # Kommentar: nicht-leere Werte in Dokumentreihenfolge
+        if not werte:  # Kommentar: kein Abschnitt hat etwas gefunden
+            ergebnis[feld] = ""  # Kommentar: leer
+        elif ZUSAMMENFUEHRUNG.get(feld, REGEL_ERSTER) == REGEL_GROESSTER_BELEGT:  # Kommentar: Kostenfeld
+            ergebnis[feld] = _betrag_waehlen(feld, werte, belege, praeferenz)  # Kommentar: größter belegter Betrag
+        else:  # Kommentar: Text-/Stammdatenfeld
+            ergebnis[feld] = werte[0]  # Kommentar: erster nicht-leerer Wert
+    return ergebnis  # Kommentar: Ergebnis zurückgeben
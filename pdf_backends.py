@@ -0,0 +1,137 @@
+# pdf_backends.py  # Kommentar: Austauschbare PDF-Text-Backends (pdfplumber, pdfminer ohne Box-Sortierung, optional pypdfium2) + Prüfung auf verwertbaren Text
+
+import io  # Kommentar: PDF-Bytes als Datei-Objekt
+import os  # Kommentar: Env für Backend-Auswahl
+import re  # Kommentar: (cid:NN)-Platzhalter erkennen
+import unicodedata  # Kommentar: Zeichenkategorien für die Garbage-Erkennung
+
+import pdfplumber  # Kommentar: bisheriges Backend (bringt pdfminer.six mit)
+
+try:  # Kommentar: pdfminer ist Abhängigkeit von pdfplumber, trotzdem robust importieren
+    from pdfminer.high_level import extract_pages  # Kommentar: Seitenweise Layout-Objekte
+    from pdfminer.layout import LAParams, LTTextContainer  # Kommentar: Layout-Parameter / Textblöcke
+    from pdfminer.pdfpage import PDFPage  # Kommentar: Seitenzahl ohne Layout-Analyse
+except ImportError:  # Kommentar: nicht vorhanden
+    extract_pages = None  # Kommentar: Backend nicht verfügbar
+
+try:  # Kommentar: optional (pip install pypdfium2), deutlich schneller (C++-Bibliothek)
+    import pypdfium2 as pdfium  # Kommentar: PDFium-Bindings
+except ImportError:  # Kommentar: nicht installiert
+    pdfium = None  # Kommentar: Backend nicht verfügbar
+
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto")  # Kommentar: "auto" (schnellstes brauchbares) oder fester Name
+PDF_BACKEND_REIHENFOLGE = [n.strip() for n in os.getenv("PDF_BACKEND_REIHENFOLGE", "pypdfium2,pdfminer,pdfplumber").split(",") if n.strip()]  # Kommentar: Versuchsreihenfolge im Auto-Modus (schnell -> gründlich)
+CID_RE = re.compile(r"\(cid:\d+\)")  # Kommentar: Glyphen ohne Unicode-Zuordnung (pdfminer-Ausgabe)
+MAX_ANTEIL_DEFEKT = 0.02  # Kommentar: max. Anteil defekter Zeichen (�, Private Use, Steuerzeichen, cid)
+MIN_ANTEIL_BUCHSTABEN = 0.5  # Kommentar: mind. Anteil Buchstaben an den Nicht-Leerzeichen
+MIN_ANTEIL_LEERZEICHEN = 0.05  # Kommentar: mind. Anteil Leerzeichen (sonst "zusammengeklebte" Wörter)
+
+
+def _quelle(quelle: str | bytes):  # Kommentar: Pfad bleibt Pfad, Bytes werden zum Stream
+    return io.BytesIO(quelle) if isinstance(quelle, (bytes, bytearray)) else quelle  # Kommentar: ohne Temp-Datei
+
+
+class PdfplumberBackend:  # Kommentar: Bisheriger Weg (volle Zeichen-Clusterung in Python, langsam aber bewährt)
+    name = "pdfplumber"  # Kommentar: Name für Konfiguration/Benchmark
+
+    def verfuegbar(self) -> bool:  # Kommentar: immer installiert (requirements.txt)
+        return True  # Kommentar: ja
+
+    def seitenzahl(self, quelle: str | bytes) -> int:  # Kommentar: Anzahl Seiten
+        with pdfplumber.open(_quelle(quelle)) as pdf:  # Kommentar: PDF öffnen
+            return len(pdf.pages)  # Kommentar: Seiten zählen
+
+    def seiten(self, quelle: str | bytes, start: int = 0, ende: int | None = None):  # Kommentar: Seitentexte [start, ende) nacheinander liefern
+        with pdfplumber.open(_quelle(quelle)) as pdf:  # Kommentar: PDF öffnen
+            for seite in pdf.pages[start:ende]:  # Kommentar: Seiten iterieren
+                yield seite.extract_text() or ""  # Kommentar: Text (oder leer)
+
+
+class PdfminerBackend:  # Kommentar: pdfminer direkt, ohne die teure Box-Sortierung (boxes_flow=None), Zeilen bleiben erhalten
+    name = "pdfminer"  # Kommentar: Name
+
+    def verfuegbar(self) -> bool:  # Kommentar: Import geklappt?
+        return extract_pages is not None  # Kommentar: ja/nein
+
+    def seitenzahl(self, quelle: str | bytes) -> int:  # Kommentar: Anzahl Seiten (nur Seitenbaum, kein Layout)
+        datei = _quelle(quelle)  # Kommentar: Stream/Pfad
+        if isinstance(datei, str):  # Kommentar: Pfad?
+            with open(datei, "rb") as f:  # Kommentar: Datei öffnen
+                return sum(1 for _ in PDFPage.get_pages(f))  # Kommentar: Seiten zählen
+        return sum(1 for _ in PDFPage.get_pages(datei))  # Kommentar: Seiten zählen
+
+    def seiten(self, quelle: str | bytes, start: int = 0, ende: int | None = None):  # Kommentar: Seitentexte [start, ende) nacheinander liefern
+        nummern = None if start == 0 and ende is None else set(range(start, ende if ende is not None else self.seitenzahl(quelle)))  # Kommentar: nur benötigte Seiten analysieren
+        laparams = LAParams(boxes_flow=None, detect_vertical=False, all_texts=False)  # Kommentar: Zeilen/Boxen bilden, aber nicht hierarchisch sortieren
+        for layout in extract_pages(_quelle(quelle), page_numbers=nummern, laparams=laparams):  # Kommentar: Seiten lazy analysieren
+            yield "".join(el.get_text() for el in layout if isinstance(el, LTTextContainer)).rstrip("\n")  # Kommentar: Textblöcke in Lesereihenfolge
+
+
+class Pypdfium2Backend:  # Kommentar: PDFium (C++), Text direkt aus der Textseite, sehr schnell
+    name = "pypdfium2"  # Kommentar: Name
+
+    def verfuegbar(self) -> bool:  # Kommentar: installiert?
+        return pdfium is not None  # Kommentar: ja/nein
+
+    def seitenzahl(self, quelle: str | bytes) -> int:  # Kommentar: Anzahl Seiten
+        pdf = pdfium.PdfDocument(quelle)  # Kommentar: akzeptiert Pfad oder Bytes
+        try:  # Kommentar: Dokument sicher schließen
+            return len(pdf)  # Kommentar: Seiten zählen
+        finally:  # Kommentar: Aufräumen
+            pdf.close()  # Kommentar: schließen
+
+    def seiten(self, quelle: str | bytes, start: int = 0, ende: int | None = None):  # Kommentar: Seitentexte [start, ende) nacheinander liefern
+        pdf = pdfium.PdfDocument(quelle)  # Kommentar: Dokument öffnen
+        try:  # Kommentar: Dokument sicher schließen
+            for i in range(start, min(ende if ende is not None else len(pdf), len(pdf))):  # Kommentar: Seiten iterieren
+                seite = pdf[i]  # Kommentar: Seite laden
+                textseite = seite.get_textpage()  # Kommentar: Textebene
+                yield textseite.get_text_range().replace("\r\n", "\n")  # Kommentar: Text (Zeilenenden vereinheitlichen)
+                textseite.close()  # Kommentar: freigeben
+                seite.close()  # Kommentar: freigeben
+        finally:  # Kommentar: Aufräumen
+            pdf.close()  # Kommentar: schließen
+
+
+BACKENDS = {b.name: b for b in (PdfplumberBackend(), PdfminerBackend(), Pypdfium2Backend())}  # Kommentar: Name -> Backend
+
+
+def backend(name: str):  # Kommentar: Backend per Name (Fehler bei unbekanntem/nicht installiertem)
+    if name not in BACKENDS:  # Kommentar: unbekannt?
+        raise ValueError(f"Unbekanntes PDF-Backend: {name}")  # Kommentar: Fehler
+    if not BACKENDS[name].verfuegbar():  # Kommentar: nicht installiert?
+        raise ValueError(f"PDF-Backend nicht installiert: {name}")  # Kommentar: Fehler
+    return BACKENDS[name]  # Kommentar: Backend zurückgeben
+
+
+def verfuegbare_backends() -> list[str]:  # Kommentar: Namen aller installierten Backends
+    return [name for name, b in BACKENDS.items() if b.verfuegbar()]  # Kommentar: filtern
+
+
+def kandidaten(auswahl: str | None = None) -> list[str]:  # Kommentar: Backends in Versuchsreihenfolge ("auto" oder fester Name)
+    auswahl = auswahl or PDF_BACKEND  # Kommentar: Parameter oder Konfiguration
+    if auswahl != "auto":  # Kommentar: fest gewählt?
+        return [backend(auswahl).name]  # Kommentar: nur dieses (prüft Verfügbarkeit)
+    namen = [n for n in PDF_BACKEND_REIHENFOLGE if n in BACKENDS and BACKENDS[n].verfuegbar()]  # Kommentar: installierte in Reihenfolge
+    return namen or ["pdfplumber"]  # Kommentar: mindestens das bisherige Backend
+
+
+def text_verwertbar(text: str, min_zeichen: int) -> bool:  # Kommentar: Genug Text und nicht "zerschossen" (fehlende Zeichentabellen, Glyph-IDs)?
+    inhalt = text.strip()  # Kommentar: ohne Rand-Leerraum
+    if len(inhalt) < min_zeichen:  # Kommentar: zu wenig Text (z.B. Scan ohne Textebene)
+        return False  # Kommentar: nicht verwertbar
+    defekt = sum(len(m) for m in CID_RE.findall(inhalt))  # Kommentar: Zeichen in (cid:NN)-Platzhaltern
+    buchstaben = 0  # Kommentar: Zähler Buchstaben
+    leerzeichen = 0  # Kommentar: Zähler Leerraum
+    for zeichen in inhalt:  # Kommentar: Zeichen prüfen
+        if zeichen.isalpha():  # Kommentar: Buchstabe (inkl. Umlaute)
+            buchstaben += 1  # Kommentar: zählen
+        elif zeichen.isspace():  # Kommentar: Leerraum
+            leerzeichen += 1  # Kommentar: zählen
+        elif zeichen == "�" or unicodedata.category(zeichen) in ("Co", "Cc", "Cn"):  # Kommentar: Ersatzzeichen, Private Use, Steuerzeichen, nicht zugeordnet
+            defekt += 1  # Kommentar: zählen
+    if defekt > len(inhalt) * MAX_ANTEIL_DEFEKT:  # Kommentar: zu viele defekte Zeichen?
+        return False  # Kommentar: zerschossen
+    if buchstaben < (len(inhalt) - leerzeichen) * MIN_ANTEIL_BUCHSTABEN:  # Kommentar: überwiegend Symbole/Ziffernsalat?
+        return False  # Kommentar: zerschossen
+    return leerzeichen >= len(inhalt) * MIN_ANTEIL_LEERZEICHEN  # Kommentar: Wörter getrennt?
@@ -0,0 +1,280 @@
+# pdf_konverter.py  # Kommentar: Warmer Pool lokaler LibreOffice-Prozesse (headless) für DOCX -> PDF über eine lokale UNO-Pipe
+
+import os  # Kommentar: Env für Konfiguration, Prozess-ID
+import time  # Kommentar: Latenzen, Startwartezeit
+import uuid  # Kommentar: eindeutige Pipe-Namen
+import queue  # Kommentar: freie Worker
+import shutil  # Kommentar: soffice suchen, Profil löschen
+import atexit  # Kommentar: Prozesse beim Beenden aufräumen
+import tempfile  # Kommentar: eigenes LibreOffice-Profil je Worker
+import threading  # Kommentar: Locks, Neustart im Hintergrund
+import subprocess  # Kommentar: soffice starten
+from pathlib import Path  # Kommentar: Profilpfad als file://-URL
+from collections import deque  # Kommentar: letzte Latenzen
+
+import telemetrie  # Kommentar: Stufe "pdf_konvertieren" (Log + Metriken)
+
+try:  # Kommentar: optional (LibreOffice-Python bzw. Paket python3-uno)
+    import uno  # Kommentar: UNO-Brücke
+    import unohelper  # Kommentar: Basisklasse für eigene UNO-Objekte
+    from com.sun.star.beans import PropertyValue  # Kommentar: Lade-/Speicher-Optionen
+    from com.sun.star.io import XOutputStream  # Kommentar: PDF direkt in den Speicher schreiben
+    from com.sun.star.connection import NoConnectException  # Kommentar: soffice noch nicht bereit
+except ImportError:  # Kommentar: nicht installiert
+    uno = None  # Kommentar: Konverter nicht verfügbar
+
+PDF_KONVERTER_AKTIV = os.getenv("PDF_KONVERTER_AKTIV", "0") == "1"  # Kommentar: PDF-Ausgabe anbieten (Default: nur DOCX)
+SOFFICE_PFAD = os.getenv("SOFFICE_PFAD", "soffice")  # Kommentar: LibreOffice-Programm (Name im PATH oder voller Pfad)
+PDF_POOL_GROESSE = int(os.getenv("PDF_POOL_GROESSE", "2"))  # Kommentar: gleichzeitig warme soffice-Prozesse
+PDF_JOBS_PRO_WORKER = int(os.getenv("PDF_JOBS_PRO_WORKER", "200"))  # Kommentar: nach so vielen Dokumenten neu starten (Speicher wächst sonst)
+PDF_START_TIMEOUT_S = float(os.getenv("PDF_START_TIMEOUT_S", "30"))  # Kommentar: max. Wartezeit bis soffice die Pipe annimmt
+PDF_TIMEOUT_S = float(os.getenv("PDF_TIMEOUT_S", "60"))  # Kommentar: max. Dauer einer Konvertierung (danach Prozess beenden)
+PDF_WARTE_TIMEOUT_S = float(os.getenv("PDF_WARTE_TIMEOUT_S", "120"))  # Kommentar: max. Wartezeit auf einen freien Worker
+DOCX_FILTER = "MS Word 2007 XML"  # Kommentar: Import-Filter (kein Erkennen nötig)
+PDF_FILTER = "writer_pdf_Export"  # Kommentar: Export-Filter
+
+
+def verfuegbar() -> bool:  # Kommentar: UNO importierbar und soffice vorhanden?
+    return uno is not None and shutil.which(SOFFICE_PFAD) is not None  # Kommentar: ja/nein
+
+
+def _eigenschaften(**werte) -> tuple:  # Kommentar: dict -> UNO-PropertyValues
+    return tuple(PropertyValue(Name=name, Value=wert) for name, wert in werte.items())  # Kommentar: Tupel für UNO-Aufrufe
+
+
+if uno is not None:  # Kommentar: Klasse braucht die UNO-Basistypen
+    class _PufferAusgabe(unohelper.Base, XOutputStream):  # Kommentar: UNO-Ausgabestrom in einen Python-Puffer
+        def __init__(self):  # Kommentar: leerer Puffer
+            self.teile = []  # Kommentar: geschriebene Blöcke
+
+        def writeBytes(self, daten) -> None:  # Kommentar: Block anhängen
+            self.teile.append(daten.value)  # Kommentar: ByteSequence -> bytes
+
+        def flush(self) -> None:  # Kommentar: nichts zu tun
+            pass  # Kommentar: Puffer im Speicher
+
+        def closeOutput(self) -> None:  # Kommentar: nichts zu tun
+            pass  # Kommentar: Puffer bleibt lesbar
+
+        def getvalue(self) -> bytes:  # Kommentar: gesamtes PDF
+            return b"".join(self.teile)  # Kommentar: Blöcke zusammenfügen
+
+
+class KonverterWorker:  # Kommentar: ein headless soffice mit eigenem Profil und eigener Pipe
+    def __init__(self, nummer: int):  # Kommentar: Worker anlegen (Start erst bei Bedarf)
+        self.nummer = nummer  # Kommentar: Nummer im Pool
+        self.prozess = None  # Kommentar: soffice-Prozess
+        self.desktop = None  # Kommentar: UNO-Desktop des Prozesses
+        self.kontext = None  # Kommentar: UNO-Kontext des Prozesses
+        self.profil = ""  # Kommentar: temporäres Benutzerprofil
+        self.jobs = 0  # Kommentar: Dokumente seit dem Start
+
+    def laeuft(self) -> bool:  # Kommentar: Prozess aktiv und verbunden?
+        return self.prozess is not None and self.prozess.poll() is None and self.desktop is not None  # Kommentar: ja/nein
+
+    def starten(self) -> None:  # Kommentar: soffice starten und über die Pipe verbinden
+        self.profil = tempfile.mkdtemp(prefix="gutachten_soffice_")  # Kommentar: eigenes Profil (keine Sperren zwischen Workern)
+        pipe = f"gutachten_pdf_{os.getpid()}_{self.nummer}_{uuid.uuid4().hex[:8]}"  # Kommentar: lokale Pipe (kein offener Port)
+        self.prozess = subprocess.Popen(  # Kommentar: soffice im Hintergrund
+            [
+                SOFFICE_PFAD, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault", "--nolockcheck",  # Kommentar: ohne UI/Wiederherstellung
+                "-env:UserInstallation=" + Path(self.profil).as_uri(),  # Kommentar: Profil
+                f"--accept=pipe,name={pipe};urp;StarOffice.ComponentContext",  # Kommentar: UNO über die Pipe annehmen
+            ],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,  # Kommentar: keine Ausgabe
+        )  # Kommentar: Ende Popen
+        lokal = uno.getComponentContext()  # Kommentar: lokaler UNO-Kontext
+        resolver = lokal.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", lokal)  # Kommentar: Verbindungsaufbau
+        frist = time.monotonic() + PDF_START_TIMEOUT_S  # Kommentar: Startfrist
+        while True:  # Kommentar: warten bis die Pipe angenommen wird
+            try:  # Kommentar: verbinden versuchen
+                self.kontext = resolver.resolve(f"uno:pipe,name={pipe};urp;StarOffice.ComponentContext")  # Kommentar: entfernter Kontext
+                break  # Kommentar: verbunden
+            except NoConnectException:  # Kommentar: noch nicht bereit
+                if self.prozess.poll() is not None or time.monotonic() > frist:  # Kommentar: abgestürzt oder zu langsam?
+                    self.beenden()  # Kommentar: aufräumen
+                    raise RuntimeError(f"LibreOffice-Worker {self.nummer} konnte nicht gestartet werden.")  # Kommentar: Fehler
+                time.sleep(0.1)  # Kommentar: kurz warten
+        self.desktop = self.kontext.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", self.kontext)  # Kommentar: Dokumente laden/speichern
+        self.jobs = 0  # Kommentar: frischer Prozess
+        print(f"[DEBUG] PDF-Worker {self.nummer} gestartet (pid {self.prozess.pid})")  # Kommentar: loggen
+
+    def konvertieren(self, docx_bytes: bytes) -> bytes:  # Kommentar: DOCX-Bytes -> PDF-Bytes (ohne Dateien)
+        smgr = self.kontext.ServiceManager  # Kommentar: Service-Manager des soffice
+        eingabe = smgr.createInstanceWithArgumentsAndContext("com.sun.star.io.SequenceInputStream", (uno.ByteSequence(docx_bytes),), self.kontext)  # Kommentar: Bytes als UNO-Strom
+        wachhund = threading.Timer(PDF_TIMEOUT_S, self.prozess.kill)  # Kommentar: hängende Konvertierung -> Prozess beenden (UNO-Aufruf bricht dann ab)
+        wachhund.start()  # Kommentar: Frist starten
+        try:  # Kommentar: Dokument immer schließen
+            dokument = self.desktop.loadComponentFromURL("private:stream", "_blank", 0, _eigenschaften(InputStream=eingabe, FilterName=DOCX_FILTER, Hidden=True, ReadOnly=True))  # Kommentar: aus dem Strom laden
+            try:  # Kommentar: exportieren
+                ausgabe = _PufferAusgabe()  # Kommentar: Ziel im Speicher
+                dokument.storeToURL("private:stream", _eigenschaften(FilterName=PDF_FILTER, OutputStream=ausgabe))  # Kommentar: als PDF in den Strom
+            finally:  # Kommentar: aufräumen
+                dokument.close(True)  # Kommentar: Dokument schließen
+        finally:  # Kommentar: Frist beenden
+            wachhund.cancel()  # Kommentar: rechtzeitig fertig
+        self.jobs += 1  # Kommentar: zählen
+        return ausgabe.getvalue()  # Kommentar: PDF-Bytes
+
+    def beenden(self) -> None:  # Kommentar: Prozess stoppen und Profil löschen
+        if self.desktop is not None:  # Kommentar: noch verbunden?
+            try:  # Kommentar: sauber beenden versuchen
+                self.desktop.terminate()  # Kommentar: soffice beenden
+            except Exception:  # Kommentar: Verbindung schon weg
+                pass  # Kommentar: ignorieren
+        if self.prozess is not None:  # Kommentar: Prozess vorhanden?
+            try:  # Kommentar: warten
+                self.prozess.wait(timeout=5)  # Kommentar: kurz warten
+            except subprocess.TimeoutExpired:  # Kommentar: hängt
+                self.prozess.kill()  # Kommentar: hart beenden
+                self.prozess.wait()  # Kommentar: Zombie vermeiden
+        if self.profil:  # Kommentar: Profil vorhanden?
+            shutil.rmtree(self.profil, ignore_errors=True)  # Kommentar: löschen
+        self.prozess = None  # Kommentar: zurücksetzen
+        self.desktop = None  # Kommentar: zurücksetzen
+        self.kontext = None  # Kommentar: zurücksetzen
+        self.profil = ""  # Kommentar: zurücksetzen
+        self.jobs = 0  # Kommentar: zurücksetzen
+
+
+class KonverterPool:  # Kommentar: feste Anzahl Worker, Recycling nach N Jobs oder Absturz
+    def __init__(self, groesse: int, jobs_pro_worker: int):  # Kommentar: Pool anlegen (Prozesse starten lazy oder per vorwaermen)
+        self.groesse = max(groesse, 1)  # Kommentar: mindestens ein Worker
+        self.jobs_pro_worker = max(jobs_pro_worker, 1)  # Kommentar: Recycling-Grenze
+        self.frei = queue.Queue()  # Kommentar: freie Worker
+        self.worker = [KonverterWorker(i) for i in range(self.groesse)]  # Kommentar: alle Worker
+        for worker in self.worker:  # Kommentar: alle frei
+            self.frei.put(worker)  # Kommentar: einreihen
+        self.lock = threading.Lock()  # Kommentar: Lock für Statistik
+        self.start = time.monotonic()  # Kommentar: für Auslastung
+        self.latenzen = deque(maxlen=500)  # Kommentar: letzte Konvertierungsdauern
+        self.stats = {"jobs": 0, "fehler": 0, "starts": 0, "recycelt": 0, "abstuerze": 0, "belegt": 0, "max_belegt": 0, "belegt_s": 0.0, "wartezeit_s": 0.0}  # Kommentar: Zähler
+
+    def _starten(self, worker: KonverterWorker) -> None:  # Kommentar: Worker starten und zählen
+        worker.starten()  # Kommentar: soffice + Verbindung
+        with self.lock:  # Kommentar: exklusiv
+            self.stats["starts"] += 1  # Kommentar: zählen
+
+    def _neu_starten(self, worker: KonverterWorker) -> None:  # Kommentar: im Hintergrund neu starten, danach wieder freigeben
+        try:  # Kommentar: Startfehler abfangen
+            worker.beenden()  # Kommentar: alten Prozess weg
+            self._starten(worker)  # Kommentar: frischer Prozess
+        except Exception as e:  # Kommentar: Start fehlgeschlagen
+            print("[DEBUG] PDF-Worker Neustart fehlgeschlagen:", repr(e))  # Kommentar: nächster Job versucht es erneut
+        finally:  # Kommentar: immer zurück in den Pool
+            self.frei.put(worker)  # Kommentar: freigeben
+
+    def vorwaermen(self) -> None:  # Kommentar: alle Worker im Hintergrund starten (erster Brief ohne Startzeit)
+        for _ in range(self.groesse):  # Kommentar: jeden freien Worker einmal holen
+            try:  # Kommentar: nicht blockieren
+                worker = self.frei.get_nowait()  # Kommentar: freien Worker holen
+            except queue.Empty:  # Kommentar: alle belegt
+                return  # Kommentar: fertig
+            if worker.laeuft():  # Kommentar: schon warm?
+                self.frei.put(worker)  # Kommentar: zurück
+                continue  # Kommentar: nächster
+            threading.Thread(target=self._neu_starten, args=(worker,), daemon=True).start()  # Kommentar: parallel starten
+
+    def konvertieren(self, docx_bytes: bytes) -> bytes:  # Kommentar: DOCX -> PDF auf einem freien Worker
+        warte_start = time.perf_counter()  # Kommentar: Wartezeit messen
+        try:  # Kommentar: Überlast erkennen
+            worker = self.frei.get(timeout=PDF_WARTE_TIMEOUT_S)  # Kommentar: freien Worker holen
+        except queue.Empty:  # Kommentar: alle zu lange belegt
+            raise RuntimeError("Alle PDF-Konverter sind belegt, bitte später erneut versuchen.")  # Kommentar: Fehler
+        wartezeit = time.perf_counter() - warte_start  # Kommentar: Wartezeit
+        with self.lock:  # Kommentar: exklusiv
+            self.stats["belegt"] += 1  # Kommentar: belegt
+            self.stats["max_belegt"] = max(self.stats["max_belegt"], self.stats["belegt"])  # Kommentar: Spitze
+            self.stats["wartezeit_s"] += wartezeit  # Kommentar: Summe
+        start = time.perf_counter()  # Kommentar: Start
+        neu_starten = False  # Kommentar: Worker danach recyceln?
+        try:  # Kommentar: Worker immer zurückgeben
+            with telemetrie.stufe("pdf_konvertieren", docx_bytes=len(docx_bytes), worker=worker.nummer, wartezeit_s=round(wartezeit, 4)) as messung:  # Kommentar: Dauer messen
+                if not worker.laeuft():  # Kommentar: kalt oder abgestürzt?
+                    if worker.prozess is not None:  # Kommentar: war gestartet -> Absturz
+                        with self.lock:  # Kommentar: exklusiv
+                            self.stats["abstuerze"] += 1  # Kommentar: zählen
+                    worker.beenden()  # Kommentar: Reste aufräumen
+                    self._starten(worker)  # Kommentar: kalt starten (nur ohne Vorwärmen)
+                    messung["kaltstart"] = 1  # Kommentar: markieren
+                pdf_bytes = worker.konvertieren(docx_bytes)  # Kommentar: konvertieren
+                messung["pdf_bytes"] = len(pdf_bytes)  # Kommentar: Größe
+            neu_starten = worker.jobs >= self.jobs_pro_worker  # Kommentar: Grenze erreicht?
+            if neu_starten:  # Kommentar: recyceln
+                with self.lock:  # Kommentar: exklusiv
+                    self.stats["recycelt"] += 1  # Kommentar: zählen
+            return pdf_bytes  # Kommentar: PDF zurück
+        except Exception:  # Kommentar: Fehler (Absturz, Zeitüberschreitung, defektes Dokument)
+            neu_starten = True  # Kommentar: Worker nicht weiterverwenden
+            with self.lock:  # Kommentar: exklusiv
+                self.stats["fehler"] += 1  # Kommentar: zählen
+                if worker.prozess is not None and worker.prozess.poll() is not None:  # Kommentar: Prozess tot (Absturz/Wachhund)?
+                    self.stats["abstuerze"] += 1  # Kommentar: zählen
+            raise  # Kommentar: weitergeben
+        finally:  # Kommentar: Statistik + Rückgabe
+            dauer = time.perf_counter() - start  # Kommentar: Konvertierungsdauer
+            with self.lock:  # Kommentar: exklusiv
+                self.stats["jobs"] += 1  # Kommentar: zählen
+                self.stats["belegt"] -= 1  # Kommentar: frei
+                self.stats["belegt_s"] += dauer  # Kommentar: für Auslastung
+                self.latenzen.append(dauer)  # Kommentar: Latenz merken
+            if neu_starten:  # Kommentar: Recycling/Absturz
+                threading.Thread(target=self._neu_starten, args=(worker,), daemon=True).start()  # Kommentar: im Hintergrund, Aufrufer wartet nicht
+            else:  # Kommentar: weiter warm
+                self.frei.put(worker)  # Kommentar: freigeben
+
+    def statistik(self) -> dict:  # Kommentar: Kopie der Statistik inkl. Latenzen/Auslastung
+        with self.lock:  # Kommentar: exklusiv
+            stats = dict(self.stats)  # Kommentar: Kopie
+            latenzen = sorted(self.latenzen)  # Kommentar: sortiert für Perzentile
+        laufzeit = time.monotonic() - self.start  # Kommentar: seit Pool-Start
+        stats["groesse"] = self.groesse  # Kommentar: Konfiguration
+        stats["jobs_pro_worker"] = self.jobs_pro_worker  # Kommentar: Konfiguration
+        stats["warm"] = sum(1 for w in self.worker if w.laeuft())  # Kommentar: laufende Prozesse
+        stats["auslastung"] = round(stats["belegt_s"] / (laufzeit * self.groesse), 4) if laufzeit > 0 else 0.0  # Kommentar: Anteil belegter Worker-Zeit
+        stats["belegt_s"] = round(stats["belegt_s"], 3)  # Kommentar: runden
+        stats["wartezeit_s"] = round(stats["wartezeit_s"], 3)  # Kommentar: runden
+        stats["latenz_mittel_s"] = round(sum(latenzen) / len(latenzen), 4) if latenzen else 0.0  # Kommentar: Mittelwert
+        stats["latenz_p95_s"] = round(latenzen[min(int(len(latenzen) * 0.95), len(latenzen) - 1)], 4) if latenzen else 0.0  # Kommentar: 95. Perzentil
+        return stats  # Kommentar: zurückgeben
+
+    def beenden(self) -> None:  # Kommentar: alle Prozesse stoppen
+        for worker in self.worker:  # Kommentar: alle Worker
+            worker.beenden()  # Kommentar: stoppen
+
+
+_pool = None  # Kommentar: ein Pool pro Prozess (bei Bedarf angelegt)
+_pool_lock = threading.Lock()  # Kommentar: Lock für das Anlegen
+
+
+def pool_holen() -> KonverterPool:  # Kommentar: gemeinsamen Pool holen (anlegen beim ersten Aufruf)
+    global _pool  # Kommentar: Modulzustand
+    with _pool_lock:  # Kommentar: exklusiv
+        if _pool is None:  # Kommentar: noch keiner?
+            if not verfuegbar():  # Kommentar: UNO/soffice fehlt
+                raise RuntimeError("PDF-Konvertierung nicht verfügbar (LibreOffice/python3-uno nicht gefunden).")  # Kommentar: Fehler
+            _pool = KonverterPool(PDF_POOL_GROESSE, PDF_JOBS_PRO_WORKER)  # Kommentar: anlegen
+        return _pool  # Kommentar: zurückgeben
+
+
+def docx_zu_pdf_bytes(docx_bytes: bytes) -> bytes:  # Kommentar: Public: DOCX-Bytes -> PDF-Bytes über den Pool
+    return pool_holen().konvertieren(docx_bytes)  # Kommentar: konvertieren
+
+
+def pdf_neben_docx(docx_pfad: str) -> str:  # Kommentar: fertiges DOCX (z.B. aus word_aus_vorlage_erstellen) zusätzlich als PDF ablegen
+    with open(docx_pfad, "rb") as f:  # Kommentar: DOCX lesen
+        pdf_bytes = docx_zu_pdf_bytes(f.read())  # Kommentar: konvertieren
+    pdf_pfad = os.path.splitext(docx_pfad)[0] + ".pdf"  # Kommentar: gleicher Name, Endung .pdf
+    with open(pdf_pfad, "wb") as f:  # Kommentar: schreiben
+        f.write(pdf_bytes)  # Kommentar: PDF
+    return pdf_pfad  # Kommentar: Pfad zurückgeben
+
+
+def pool_statistik() -> dict:  # Kommentar: Statistik für Debug-Anzeige/Batch (leer ohne Pool)
+    return _pool.statistik() if _pool is not None else {}  # Kommentar: nur wenn angelegt
+
+
+@atexit.register
+def _pool_beenden() -> None:  # Kommentar: soffice-Prozesse nicht verwaist zurücklassen
+    if _pool is not None:  # Kommentar: Pool angelegt?
+        _pool.beenden()  # Kommentar: stoppen
@@ -1,11 +1,29 @@
 # programm_1_ki_input.py  # Kommentar: Programm 1 (PDF -> Text -> Gemini -> KI-Antwortdatei)
 
+import re  # Kommentar: JSON-Beispielblock im Schema-Modus entfernen
 import os  # Kommentar: Betriebssystem-Funktionen (Pfade/Env) importieren
+import json  # Kommentar: Antwort aus lokal erkannten Feldern bauen
 import time  # Kommentar: Zeitfunktionen (sleep) importieren
-import pdfplumber  # Kommentar: PDF-Text-Extraktion importieren
+import random  # Kommentar: Jitter für Backoff
+import hashlib  # Kommentar: Hash für Prompt-Version (Cache-Schlüssel)
+from email.utils import parsedate_to_datetime  # Kommentar: Retry-After als HTTP-Datum
+import threading  # Kommentar: Lock für den gemeinsamen Prozess-Pool
+import contextvars  # Kommentar: Telemetrie-Job an die Abschnitt-Threads weitergeben
+from collections import deque  # Kommentar: Warteschlange für laufende Seitenblöcke
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor  # Kommentar: Parallele Seitenextraktion über mehrere Kerne / parallele KI-Aufrufe je Abschnitt
+import pdf_backends  # Kommentar: PDF-Text-Backends (pdfplumber, pdfminer, pypdfium2) mit Fallback
 from google import genai  # Kommentar: Google GenAI Client importieren
 from google.genai import errors as genai_errors  # Kommentar: GenAI Fehlerklassen importieren
+from google.genai import types as genai_types  # Kommentar: GenAI Optionen (HttpOptions) importieren
 import config  # Kommentar: Eigene Konfigurationsdatei importieren
+import ki_cache  # Kommentar: Persistenter Cache für KI-Antworten
+import text_fenster  # Kommentar: Abschnittsbewusste Textauswahl für den Prompt
+import ki_limiter  # Kommentar: Gemeinsamer Ratenbegrenzer (RPM/TPM) für alle Sessions
+import ki_stream  # Kommentar: Felder schon während des Streamings auslesen
+import regel_extraktor  # Kommentar: Lokale Regel-Extraktion (Kennzeichen, Datum, Beträge ...)
+import telemetrie  # Kommentar: Zeitmessung je Stufe (Spans, Metriken)
+import langdokument  # Kommentar: Lange Gutachten: Abschnitte bilden und Teilergebnisse zusammenführen
+import kontext_cache  # Kommentar: Statischen Prompt-Teil als Kontext-Cache wiederverwenden
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Kommentar: Basisverzeichnis des Projekts bestimmen
 
@@ -16,7 +34,28 @@ GEMINI_MODEL = "gemini-2.5-flash"  # Kommentar: Stabiler Modellname für generat
 
 MAX_TEXT_CHARS = 12000  # Kommentar: Begrenzung, damit Requests nicht zu groß werden (Streamlit Cloud stabil)
 KI_MAX_RETRIES = 3  # Kommentar: Maximaler Retry-Zähler für KI-Aufrufe
+KI_RETRY_DEADLINE_S = float(os.getenv("KI_RETRY_DEADLINE_S", "120"))  # Kommentar: Gesamtzeit für alle Versuche inkl. Wartezeiten
+KI_BACKOFF_BASIS_S = 1.0  # Kommentar: Start-Backoff (verdoppelt sich je Versuch)
+KI_BACKOFF_MAX_S = 30.0  # Kommentar: Obergrenze je Backoff
+KI_ERWARTETE_AUSGABE_TOKENS = 1500  # Kommentar: Schätzung der Antwortlänge für das TPM-Limit
+WIEDERHOLBARE_STATUS = {408, 429, 500, 502, 503, 504}  # Kommentar: HTTP-Status, bei denen ein neuer Versuch sinnvoll ist
+KI_AUSGABE_MODUS = os.getenv("KI_AUSGABE_MODUS", "marker")  # Kommentar: "marker" (JSON_START/JSON_END im Text) oder "schema" (JSON-Ausgabe mit Response-Schema)
+REGEL_MODUS = os.getenv("REGEL_MODUS", "hinweis")  # Kommentar: "aus", "hinweis" (KI nur nach restlichen Feldern fragen) oder "schnell" (ohne KI, wenn Pflichtfelder sicher)
+REGEL_FALLBACK_AKTIV = os.getenv("REGEL_FALLBACK_AKTIV", "1") != "0"  # Kommentar: Regel-Ergebnis liefern, wenn Gemini nicht erreichbar ist
+KI_STREAMING_AKTIV = os.getenv("KI_STREAMING_AKTIV", "1") != "0"  # Kommentar: Antwort streamen, nur JSON anfordern, bei JSON_END stoppen
+GEMINI_POOL_GROESSE = int(os.getenv("GEMINI_POOL_GROESSE", "10"))  # Kommentar: max. offene Keep-Alive-Verbindungen des gemeinsamen Clients
 MIN_TEXT_CHARS = 600  # Kommentar: Mindestlänge des extrahierten Textes (sonst Abbruch)
+MAX_EXTRAKTION_CHARS = 8 * MAX_TEXT_CHARS  # Kommentar: Extraktionsbudget (mehr als MAX_TEXT_CHARS, damit spätere Abschnitte gefunden werden)
+TEXT_FENSTER_AKTIV = os.getenv("TEXT_FENSTER_AKTIV", "1") != "0"  # Kommentar: Abschnittsfenster statt hartem Abschneiden
+
+PDF_EXTRAKTION_MODUS = os.getenv("PDF_EXTRAKTION_MODUS", "seriell")  # Kommentar: "seriell" oder "parallel" (Prozess-Pool)
+PDF_PARALLEL_WORKER = int(os.getenv("PDF_PARALLEL_WORKER", str(min(4, os.cpu_count() or 1))))  # Kommentar: Anzahl Worker-Prozesse
+PDF_SEITEN_PRO_BLOCK = 4  # Kommentar: Seiten je Auftrag an einen Worker (kleiner = früherer Abbruch, größer = weniger Overhead)
+LANGDOKUMENT_MODUS = os.getenv("LANGDOKUMENT_MODUS", "aus")  # Kommentar: "aus" (Textfenster) oder "auto" (Texte > MAX_TEXT_CHARS vollständig in Abschnitten analysieren)
+LANGDOKUMENT_MAX_ZEICHEN = int(os.getenv("LANGDOKUMENT_MAX_ZEICHEN", "1000000"))  # Kommentar: Extraktionsbudget im Langdokument-Modus (~300 Seiten)
+LANGDOKUMENT_ABSCHNITT_ZEICHEN = int(os.getenv("LANGDOKUMENT_ABSCHNITT_ZEICHEN", str(4 * MAX_TEXT_CHARS)))  # Kommentar: Zeichen je Abschnitt (größer = weniger Aufrufe, 100 Seiten in einer Runde)
+LANGDOKUMENT_UEBERLAPPUNG = text_fenster.HERGANG_MAX_ZEICHEN  # Kommentar: Überlappung (ein Hergang-Abschnitt steht immer vollständig in einem Abschnitt)
+LANGDOKUMENT_PARALLEL = int(os.getenv("LANGDOKUMENT_PARALLEL", "6"))  # Kommentar: max. gleichzeitige Gemini-Aufrufe je Gutachten (Ratenlimit gilt zusätzlich)
 
 
 def prompt_zusatz(auswahl: str, steuerstatus: str) -> str:  # Kommentar: Zusätzlichen Kontext je Abrechnungsvariante erzeugen
@@ -194,7 +233,55 @@ HIER IST DAS GUTACHTEN (Textauszug, nutze möglichst viele Infos daraus):  # Kom
 """  # Kommentar: Ende Prompt-Template
 
 
-def get_gemini_client():  # Kommentar: Gemini-Client erstellen (Env + Streamlit-Secrets Fallback)
+KI_FELDER = [  # Kommentar: Keys des JSON-Blocks im PROMPT_TEMPLATE (Reihenfolge = Ausgabereihenfolge)
+    "MANDANT_VORNAME", "MANDANT_NACHNAME", "MANDANT_NAME", "MANDANT_STRASSE", "MANDANT_PLZ_ORT",  # Kommentar: Mandant
+    "UNFALL_DATUM", "UNFALL_UHRZEIT", "UNFALLORT", "UNFALL_STRASSE",  # Kommentar: Unfall
+    "FAHRZEUGTYP", "KENNZEICHEN", "FAHRZEUG_KENNZEICHEN",  # Kommentar: Fahrzeug
+    "POLIZEIAKTE_NUMMER", "SCHADENSNUMMER", "AKTENZEICHEN",  # Kommentar: Nummern
+    "SCHADENHERGANG",  # Kommentar: Hergang
+    "REPARATURKOSTEN", "WERTMINDERUNG", "KOSTENPAUSCHALE", "GUTACHTERKOSTEN", "NUTZUNGSAUSFALL", "MWST_BETRAG",  # Kommentar: Kosten
+    "WIEDERBESCHAFFUNGSWERT", "RESTWERT",  # Kommentar: Totalschaden
+    "FRIST_DATUM", "HEUTDATUM",  # Kommentar: Datum
+]  # Kommentar: Ende Felder
+PROMPT_TRENNER = "HIER IST DER ZUSÄTZLICHE KONTEXT ZUR ABRECHNUNG:"  # Kommentar: ab hier ist der Prompt fallabhängig (Zusatz + Gutachtentext), davor statisch
+JSON_BEISPIEL_RE = re.compile(r"^JSON_START\b.*?^JSON_END\b[^\n]*\n", re.S | re.M)  # Kommentar: JSON-Beispielblock im Template
+
+AUSGABE_MIT_STICHPUNKTEN = """AUSGABE:  # Kommentar: Ausgabeanforderung
+1) Stichpunkte (lesbar)  # Kommentar: Teil 1
+2) JSON zwischen JSON_START und JSON_END (nur gültiges JSON)  # Kommentar: Teil 2
+"""  # Kommentar: Ausgabeblock im PROMPT_TEMPLATE
+AUSGABE_NUR_JSON = """AUSGABE:  # Kommentar: Ausgabeanforderung (Streaming)
+- KEINE Stichpunkte, keine Erklärungen.  # Kommentar: Regel
+- Beginne direkt mit JSON_START, dann gültiges JSON, dann JSON_END. Danach nichts mehr.  # Kommentar: Regel
+- Halte die Reihenfolge der Keys wie unten ein.  # Kommentar: Regel
+"""  # Kommentar: Ersatz im Streaming-Modus (spart Ausgabetokens vor dem JSON)
+AUSGABE_SCHEMA = """AUSGABE:  # Kommentar: Ausgabeanforderung (Schema-Modus)
+- Antworte ausschließlich mit einem JSON-Objekt gemäß dem vorgegebenen Schema (alle Werte als Text, unbekannt = "").  # Kommentar: Regel
+"""  # Kommentar: Ersatz im Schema-Modus (Felder kommen aus dem Response-Schema)
+
+
+_gemini_client = None  # Kommentar: Gemeinsamer Client pro Prozess (Keep-Alive-Verbindungen werden wiederverwendet)
+_gemini_client_lock = threading.Lock()  # Kommentar: Lock für Client-Erstellung
+_verbindungs_stats = {"anfragen": 0, "neue_verbindungen": 0}  # Kommentar: Zähler für Verbindungs-Wiederverwendung
+_verbindungs_stats_lock = threading.Lock()  # Kommentar: Lock für Zähler
+
+
+def _verbindung_zaehlen(name: str) -> None:  # Kommentar: Zähler threadsicher erhöhen
+    with _verbindungs_stats_lock:  # Kommentar: Lock halten
+        _verbindungs_stats[name] += 1  # Kommentar: erhöhen
+
+
+def _trace_ereignis(ereignis: str, info: dict) -> None:  # Kommentar: httpcore-Trace: neuer TCP-Aufbau = keine Wiederverwendung
+    if ereignis == "connection.connect_tcp.complete":  # Kommentar: neue Verbindung aufgebaut
+        _verbindung_zaehlen("neue_verbindungen")  # Kommentar: zählen
+
+
+def _anfrage_hook(request) -> None:  # Kommentar: httpx-Request-Hook: Anfrage zählen + Trace anhängen
+    _verbindung_zaehlen("anfragen")  # Kommentar: zählen
+    request.extensions["trace"] = _trace_ereignis  # Kommentar: Verbindungsereignisse mitschneiden
+
+
+def _api_key_lesen() -> str | None:  # Kommentar: API-Key aus Env oder Streamlit-Secrets
     api_key = os.getenv("GEMINI_API_KEY")  # Kommentar: Zuerst aus Environment Variable lesen
     if not api_key:  # Kommentar: Wenn Env-Variable nicht gesetzt ist
         try:  # Kommentar: Fallback für Streamlit Cloud versuchen
@@ -202,50 +289,370 @@ def get_gemini_client():  # Kommentar: Gemini-Client erstellen (Env + Streamlit-
             api_key = st.secrets.get("GEMINI_API_KEY")  # Kommentar: API-Key aus Secrets holen
         except Exception:  # Kommentar: Wenn Streamlit/Secrets nicht verfügbar
             api_key = None  # Kommentar: explizit None setzen
-    print("[DEBUG] GEMINI_API_KEY vorhanden:", bool(api_key))  # Kommentar: Nur True/False loggen (Key niemals ausgeben!)
-    if not api_key:  # Kommentar: Wenn immer noch kein Key vorhanden
-        raise RuntimeError("GEMINI_API_KEY fehlt (Env oder Streamlit Secrets).")  # Kommentar: Klarer Fehler
-    return genai.Client(api_key=api_key)  # Kommentar: Client mit Key erstellen und zurückgeben
+    return api_key  # Kommentar: Key (oder None) zurückgeben
 
 
-def pdf_text_auslesen(pfad: str) -> str:  # Kommentar: PDF-Text extrahieren
-    seiten_text = []  # Kommentar: Liste für Seitentexte
-    with pdfplumber.open(pfad) as pdf:  # Kommentar: PDF öffnen
-        for seite in pdf.pages:  # Kommentar: Seiten iterieren
-            seiten_text.append(seite.extract_text() or "")  # Kommentar: Text extrahieren (oder leer)
-    return "\n".join(seiten_text)  # Kommentar: Seiten zusammenfügen und zurückgeben
+def _gemini_client_erstellen(api_key: str):  # Kommentar: Client mit Connection-Pool und Zählern bauen
+    try:  # Kommentar: Pool-Optionen brauchen eine aktuelle google-genai-Version
+        import httpx  # Kommentar: HTTP-Client von google-genai
+        http_options = genai_types.HttpOptions(client_args={  # Kommentar: Argumente für httpx.Client
+            "limits": httpx.Limits(max_connections=GEMINI_POOL_GROESSE, max_keepalive_connections=GEMINI_POOL_GROESSE),  # Kommentar: Pool-Größe
+            "event_hooks": {"request": [_anfrage_hook]},  # Kommentar: Wiederverwendung messen
+        })  # Kommentar: Ende HttpOptions
+        return genai.Client(api_key=api_key, http_options=http_options)  # Kommentar: Client mit Pool
+    except Exception as e:  # Kommentar: ältere Version/Option unbekannt
+        print("[DEBUG] Pool-Optionen nicht unterstützt, Standard-Client:", repr(e))  # Kommentar: loggen
+        return genai.Client(api_key=api_key)  # Kommentar: Client mit Standard-Pool von httpx
+
+
+def get_gemini_client():  # Kommentar: Gemeinsamen Gemini-Client holen (einmal pro Prozess erstellt, threadsicher)
+    global _gemini_client  # Kommentar: Modulvariable setzen
+    with _gemini_client_lock:  # Kommentar: nur ein Thread erstellt den Client
+        if _gemini_client is None:  # Kommentar: noch kein Client?
+            api_key = _api_key_lesen()  # Kommentar: Key lesen
+            print("[DEBUG] GEMINI_API_KEY vorhanden:", bool(api_key))  # Kommentar: Nur True/False loggen (Key niemals ausgeben!)
+            if not api_key:  # Kommentar: Wenn immer noch kein Key vorhanden
+                raise RuntimeError("GEMINI_API_KEY fehlt (Env oder Streamlit Secrets).")  # Kommentar: Klarer Fehler
+            _gemini_client = _gemini_client_erstellen(api_key)  # Kommentar: Client erstellen
+        return _gemini_client  # Kommentar: gemeinsamen Client zurückgeben
+
+
+def gemini_client_zuruecksetzen() -> None:  # Kommentar: Client verwerfen (z.B. nach Key-Wechsel)
+    global _gemini_client  # Kommentar: Modulvariable setzen
+    with _gemini_client_lock:  # Kommentar: Lock halten
+        _gemini_client = None  # Kommentar: beim nächsten Aufruf neu erstellen
+
+
+def gemini_client_setzen(client) -> None:  # Kommentar: Eigenen Client einsetzen (z.B. Stub für Benchmarks ohne API)
+    global _gemini_client  # Kommentar: Modulvariable setzen
+    with _gemini_client_lock:  # Kommentar: Lock halten
+        _gemini_client = client  # Kommentar: ab jetzt für alle Aufrufe
 
 
-def prompt_bauen(gutachten_text: str, auswahl: str, steuerstatus: str) -> str:  # Kommentar: Prompt final erstellen
+def verbindungs_statistik() -> dict:  # Kommentar: Anfragen vs. neue Verbindungen (Handshakes)
+    with _verbindungs_stats_lock:  # Kommentar: Lock halten
+        stats = dict(_verbindungs_stats)  # Kommentar: Kopie
+    stats["wiederverwendet"] = max(stats["anfragen"] - stats["neue_verbindungen"], 0)  # Kommentar: Anfragen ohne neuen Handshake
+    stats["wiederverwendungsquote"] = round(stats["wiederverwendet"] / stats["anfragen"], 3) if stats["anfragen"] else 0.0  # Kommentar: Quote
+    stats["pool_groesse"] = GEMINI_POOL_GROESSE  # Kommentar: Konfiguration
+    return stats  # Kommentar: Statistik zurückgeben
+
+
+_pdf_pool = None  # Kommentar: Gemeinsamer Prozess-Pool (wird bei Bedarf erstellt)
+_pdf_pool_lock = threading.Lock()  # Kommentar: Lock für Pool-Erstellung
+
+
+def _pdf_pool_holen() -> ProcessPoolExecutor:  # Kommentar: Pool einmal pro Prozess erstellen und wiederverwenden
+    global _pdf_pool  # Kommentar: Modulvariable setzen
+    with _pdf_pool_lock:  # Kommentar: Nur ein Thread erstellt den Pool
+        if _pdf_pool is None:  # Kommentar: noch kein Pool?
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_PARALLEL_WORKER)  # Kommentar: Pool starten
+        return _pdf_pool  # Kommentar: Pool zurückgeben
+
+
+def _seiten_block_extrahieren(pfad: str | bytes, start: int, ende: int, backend_name: str = "pdfplumber") -> list[str]:  # Kommentar: Worker: Seiten [start, ende) extrahieren
+    return list(pdf_backends.backend(backend_name).seiten(pfad, start, ende))  # Kommentar: Seitentexte in Reihenfolge
+
+
+def _budget_erreicht(seiten_text: list[str], max_zeichen: int | None) -> bool:  # Kommentar: Zeichenbudget gefüllt?
+    if max_zeichen is None:  # Kommentar: kein Budget?
+        return False  # Kommentar: nie erreicht
+    return sum(len(t) for t in seiten_text) + len(seiten_text) - 1 >= max_zeichen  # Kommentar: Länge inkl. Zeilenumbrüche
+
+
+def _seiten_bis_budget(seiten_text: list[str], max_zeichen: int | None) -> list[str]:  # Kommentar: Seiten bis einschließlich der Seite, mit der das Budget erreicht ist (wie seriell)
+    for anzahl in range(1, len(seiten_text) + 1):  # Kommentar: Seiten in Reihenfolge
+        if _budget_erreicht(seiten_text[:anzahl], max_zeichen):  # Kommentar: gleiche Bedingung wie seriell
+            return seiten_text[:anzahl]  # Kommentar: Rest des letzten Blocks verwerfen
+    return seiten_text  # Kommentar: Budget nicht erreicht
+
+
+def _pdf_text_seriell(pfad: str | bytes, max_zeichen: int | None, backend_name: str = "pdfplumber") -> list[str]:  # Kommentar: Seite für Seite, Abbruch bei vollem Budget
+    seiten_text = []  # Kommentar: Liste für Seitentexte
+    seiten = pdf_backends.backend(backend_name).seiten(pfad)  # Kommentar: Seiten lazy lesen
+    try:  # Kommentar: Dokument auch bei Abbruch schließen
+        for text in seiten:  # Kommentar: Seiten iterieren
+            seiten_text.append(text)  # Kommentar: merken
+            if _budget_erreicht(seiten_text, max_zeichen):  # Kommentar: Budget gefüllt? (gleiche Bedingung wie parallel)
+                break  # Kommentar: restliche Seiten nicht mehr lesen
+    finally:  # Kommentar: Aufräumen
+        seiten.close()  # Kommentar: Generator beenden (schließt das PDF)
+    return seiten_text  # Kommentar: Seitentexte zurückgeben
+
+
+def _pdf_text_parallel(pfad: str | bytes, max_zeichen: int | None, backend_name: str = "pdfplumber") -> list[str]:  # Kommentar: Seitenblöcke parallel, Reihenfolge bleibt erhalten
+    seitenzahl = pdf_backends.backend(backend_name).seitenzahl(pfad)  # Kommentar: Anzahl Seiten
+    if seitenzahl <= PDF_SEITEN_PRO_BLOCK or PDF_PARALLEL_WORKER <= 1:  # Kommentar: lohnt sich nicht?
+        return _pdf_text_seriell(pfad, max_zeichen, backend_name)  # Kommentar: seriell bleibt schneller
+    bloecke = [(s, min(s + PDF_SEITEN_PRO_BLOCK, seitenzahl)) for s in range(0, seitenzahl, PDF_SEITEN_PRO_BLOCK)]  # Kommentar: Seitenbereiche
+    pool = _pdf_pool_holen()  # Kommentar: gemeinsamen Pool holen
+    laufend = deque()  # Kommentar: Futures in Seitenreihenfolge
+    naechster = 0  # Kommentar: Index des nächsten Blocks
+    seiten_text = []  # Kommentar: Ergebnis
+    try:  # Kommentar: übrige Aufträge am Ende abbrechen
+        while naechster < len(bloecke) and len(laufend) < PDF_PARALLEL_WORKER * 2:  # Kommentar: begrenzt vorausplanen
+            laufend.append(pool.submit(_seiten_block_extrahieren, pfad, *bloecke[naechster], backend_name))  # Kommentar: Block einreichen
+            naechster += 1  # Kommentar: weiter
+        while laufend:  # Kommentar: in Reihenfolge einsammeln
+            seiten_text.extend(laufend.popleft().result())  # Kommentar: Block-Ergebnis anhängen
+            if _budget_erreicht(seiten_text, max_zeichen):  # Kommentar: genug Text?
+                break  # Kommentar: früh aufhören
+            if naechster < len(bloecke):  # Kommentar: noch Blöcke offen?
+                laufend.append(pool.submit(_seiten_block_extrahieren, pfad, *bloecke[naechster], backend_name))  # Kommentar: nachschieben
+                naechster += 1  # Kommentar: weiter
+    finally:  # Kommentar: Aufräumen
+        for future in laufend:  # Kommentar: nicht mehr benötigte Blöcke
+            future.cancel()  # Kommentar: wartende Aufträge abbrechen
+    return _seiten_bis_budget(seiten_text, max_zeichen)  # Kommentar: gleiche Seitenzahl wie seriell (Blöcke enden nicht an der Budgetgrenze)
+
+
+def pdf_text_auslesen(pfad: str | bytes, max_zeichen: int | None = None, modus: str | None = None, backend: str | None = None) -> str:  # Kommentar: PDF-Text extrahieren (backend: Name oder "auto")
+    modus = modus or PDF_EXTRAKTION_MODUS  # Kommentar: Modus aus Parameter oder Konfiguration
+    with telemetrie.stufe("pdf_text_auslesen", modus=modus) as messung:  # Kommentar: Dauer + Größen erfassen
+        if isinstance(pfad, (bytes, bytearray)):  # Kommentar: Bytes?
+            messung["pdf_bytes"] = len(pfad)  # Kommentar: PDF-Größe
+        namen = pdf_backends.kandidaten(backend)  # Kommentar: Backends in Versuchsreihenfolge (schnell -> gründlich)
+        min_zeichen = min(MIN_TEXT_CHARS, max_zeichen) if max_zeichen is not None else MIN_TEXT_CHARS  # Kommentar: Budget kann kleiner sein als die Mindestlänge
+        bester = None  # Kommentar: (Text, Seiten, Backend) mit dem meisten Text, falls keiner verwertbar ist
+        for versuch, name in enumerate(namen, start=1):  # Kommentar: Backends probieren
+            if modus == "parallel":  # Kommentar: Prozess-Pool-Pfad
+                seiten_text = _pdf_text_parallel(pfad, max_zeichen, name)  # Kommentar: parallel extrahieren
+            else:  # Kommentar: Standard
+                seiten_text = _pdf_text_seriell(pfad, max_zeichen, name)  # Kommentar: seriell extrahieren
+            text = "\n".join(seiten_text)  # Kommentar: Seiten zusammenfügen
+            messung["backend_versuche"] = versuch  # Kommentar: Anzahl probierter Backends
+            if bester is None or len(text.strip()) > len(bester[0].strip()):  # Kommentar: mehr Text als bisher?
+                bester = (text, seiten_text, name)  # Kommentar: merken
+            if pdf_backends.text_verwertbar(text, min_zeichen):  # Kommentar: genug und nicht zerschossen?
+                bester = (text, seiten_text, name)  # Kommentar: dieses Ergebnis nehmen
+                break  # Kommentar: langsamere Backends nicht mehr nötig
+            print(f"[DEBUG] PDF-Backend {name}: Text nicht verwertbar ({len(text)} Zeichen), nächstes Backend")  # Kommentar: Fallback loggen
+        text, seiten_text, name = bester  # Kommentar: Ergebnis
+        messung["backend"] = name  # Kommentar: verwendetes Backend
+        messung["seiten"] = len(seiten_text)  # Kommentar: gelesene Seiten
+        messung["zeichen"] = len(text)  # Kommentar: extrahierte Zeichen
+    return text  # Kommentar: Text zurückgeben
+
+
+def gutachten_text_begrenzen(voller_text: str) -> str:  # Kommentar: Text auf MAX_TEXT_CHARS bringen
+    if TEXT_FENSTER_AKTIV:  # Kommentar: Abschnittsfenster aktiv?
+        return text_fenster.text_fuer_prompt(voller_text, MAX_TEXT_CHARS)  # Kommentar: Hergang/Kosten/Stammdaten bevorzugen
+    return voller_text[:MAX_TEXT_CHARS]  # Kommentar: bisheriges Abschneiden
+
+
+def prompt_bauen(gutachten_text: str, auswahl: str, steuerstatus: str, modus: str | None = None, bekannt: list[str] | None = None, hinweis: str = "") -> str:  # Kommentar: Prompt final erstellen (bekannt: lokal sicher erkannte Felder, hinweis: z.B. Abschnitt i von n)
     zusatz = prompt_zusatz(auswahl, steuerstatus)  # Kommentar: Zusatzkontext bauen
+    if bekannt:  # Kommentar: Felder schon lokal erkannt?
+        zusatz += "\nBEREITS LOKAL ERKANNT (NICHT extrahieren, jeweils \"\" ausgeben): " + ", ".join(bekannt) + "\n"  # Kommentar: KI nur nach restlichen Feldern fragen
+    if hinweis:  # Kommentar: zusätzlicher Hinweis?
+        zusatz += "\n" + hinweis + "\n"  # Kommentar: anhängen
     prompt = PROMPT_TEMPLATE.replace("{GUTACHTEN_TEXT}", gutachten_text)  # Kommentar: Gutachtentext einsetzen
     prompt = prompt.replace("{ZUSATZ}", zusatz.strip())  # Kommentar: Zusatz einsetzen
+    if (modus or KI_AUSGABE_MODUS) == "schema":  # Kommentar: Schema-Modus -> Felder stehen im Schema, nicht im Text
+        prompt = prompt.replace(AUSGABE_MIT_STICHPUNKTEN, AUSGABE_SCHEMA, 1)  # Kommentar: nur JSON anfordern
+        prompt = JSON_BEISPIEL_RE.sub("", prompt, count=1)  # Kommentar: Beispielblock mit Markern entfernen
+    elif KI_STREAMING_AKTIV:  # Kommentar: Streaming -> nur JSON anfordern
+        prompt = prompt.replace(AUSGABE_MIT_STICHPUNKTEN, AUSGABE_NUR_JSON, 1)  # Kommentar: Stichpunkte werden nie genutzt
     return prompt  # Kommentar: Prompt zurückgeben
 
 
-def ki_aufrufen(prompt_text: str) -> str:  # Kommentar: Gemini aufrufen und Antworttext zurückgeben
-    client = get_gemini_client()  # Kommentar: Gemini Client holen
+def prompt_teilen(prompt_text: str) -> tuple[str, str]:  # Kommentar: (statischer Teil, fallabhängiger Teil) für System-Instruktion/Kontext-Cache
+    pos = prompt_text.find(PROMPT_TRENNER)  # Kommentar: Beginn des fallabhängigen Teils
+    if pos <= 0:  # Kommentar: kein Prompt aus prompt_bauen?
+        return "", prompt_text  # Kommentar: alles fallabhängig
+    return prompt_text[:pos], prompt_text[pos:]  # Kommentar: am Trenner teilen
+
+
+def _retry_after_lesen(e: Exception) -> float | None:  # Kommentar: Vom Server gewünschte Wartezeit (Header oder RetryInfo)
+    antwort = getattr(e, "response", None)  # Kommentar: HTTP-Antwort (falls vorhanden)
+    header = getattr(antwort, "headers", None)  # Kommentar: Header
+    wert = header.get("retry-after") if header is not None else None  # Kommentar: Retry-After-Header
+    if wert:  # Kommentar: Header gesetzt?
+        try:  # Kommentar: Sekunden?
+            return max(float(wert), 0.0)  # Kommentar: Sekunden zurückgeben
+        except ValueError:  # Kommentar: sonst HTTP-Datum
+            try:  # Kommentar: Datum parsen
+                return max(parsedate_to_datetime(wert).timestamp() - time.time(), 0.0)  # Kommentar: Differenz zu jetzt
+            except (TypeError, ValueError):  # Kommentar: unlesbar
+                pass  # Kommentar: weiter mit Details
+    details = getattr(e, "details", None)  # Kommentar: JSON-Fehlerdetails der API
+    fehler = details.get("error", details) if isinstance(details, dict) else {}  # Kommentar: {"error": {...}} oder direkt
+    for eintrag in fehler.get("details", []) if isinstance(fehler, dict) else []:  # Kommentar: google.rpc-Details
+        verzoegerung = eintrag.get("retryDelay") if isinstance(eintrag, dict) else None  # Kommentar: z.B. "12s" oder "0.5s"
+        if isinstance(verzoegerung, str) and verzoegerung.endswith("s"):  # Kommentar: Format prüfen
+            try:  # Kommentar: parsen
+                return max(float(verzoegerung[:-1]), 0.0)  # Kommentar: Sekunden zurückgeben
+            except ValueError:  # Kommentar: unlesbar
+                pass  # Kommentar: ignorieren
+    return None  # Kommentar: keine Vorgabe
+
+
+def _ist_wiederholbar(e: Exception) -> bool:  # Kommentar: Fehlerklasse -> neuer Versuch sinnvoll?
+    if isinstance(e, genai_errors.APIError):  # Kommentar: API-Fehler mit Statuscode
+        return getattr(e, "code", None) in WIEDERHOLBARE_STATUS or isinstance(e, genai_errors.ServerError)  # Kommentar: 408/429/5xx ja, 400/401/403/404 nie
+    if isinstance(e, (ConnectionError, TimeoutError)):  # Kommentar: Netzwerk/Timeout
+        return True  # Kommentar: erneut versuchen
+    return type(e).__module__.split(".")[0] in ("httpx", "httpcore")  # Kommentar: Transportfehler des HTTP-Clients
+
+
+def _backoff_s(versuch: int) -> float:  # Kommentar: Exponentieller Backoff mit vollem Jitter
+    return random.uniform(0, min(KI_BACKOFF_MAX_S, KI_BACKOFF_BASIS_S * 2 ** (versuch - 1)))  # Kommentar: 0..min(max, basis*2^n)
+
+
+def antwort_schema(felder: list[str] | None = None):  # Kommentar: Response-Schema aus KI_FELDER (alle Felder Pflicht, Typ Text)
+    felder = felder or KI_FELDER  # Kommentar: Default: alle Felder
+    return genai_types.Schema(  # Kommentar: Objekt-Schema
+        type="OBJECT",  # Kommentar: JSON-Objekt
+        properties={k: genai_types.Schema(type="STRING") for k in felder},  # Kommentar: ein Text je Feld
+        required=list(felder),  # Kommentar: alle Keys immer liefern ("" wenn unbekannt)
+        property_ordering=list(felder),  # Kommentar: feste Reihenfolge (wichtig fürs Streaming)
+    )  # Kommentar: Ende Schema
+
+
+def _generierungs_config(modus: str, felder: list[str] | None = None, system: str = "", cache_name: str | None = None):  # Kommentar: GenerateContentConfig je Ausgabemodus (+ statischer Prompt-Teil)
+    optionen = {}  # Kommentar: Argumente für GenerateContentConfig
+    if modus == "schema":  # Kommentar: Schema-Modus
+        optionen.update(response_mime_type="application/json", response_schema=antwort_schema(felder))  # Kommentar: reines JSON (nur angefragte Felder)
+    elif KI_STREAMING_AKTIV:  # Kommentar: Marker + Streaming
+        optionen["stop_sequences"] = [ki_stream.JSON_END_MARKER]  # Kommentar: Server hört bei JSON_END auf
+    if cache_name:  # Kommentar: statischer Teil liegt im Kontext-Cache
+        optionen["cached_content"] = cache_name  # Kommentar: nur referenzieren (System-Instruktion steckt im Cache)
+    elif system:  # Kommentar: statischer Teil als System-Instruktion
+        optionen["system_instruction"] = system  # Kommentar: gleichbleibender Präfix (implizites Caching beim Server)
+    return genai_types.GenerateContentConfig(**optionen) if optionen else None  # Kommentar: ohne Optionen bisheriges Verhalten
+
+
+def _ausgabe_tokens(antwort) -> int | None:  # Kommentar: Ausgabetokens aus usage_metadata (falls geliefert)
+    usage = getattr(antwort, "usage_metadata", None)  # Kommentar: Nutzungsdaten
+    return getattr(usage, "candidates_token_count", None) if usage is not None else None  # Kommentar: Tokens der Antwort
+
+
+def _eingabe_tokens(antwort) -> int | None:  # Kommentar: Eingabetokens (Prompt) aus usage_metadata (falls geliefert)
+    usage = getattr(antwort, "usage_metadata", None)  # Kommentar: Nutzungsdaten
+    return getattr(usage, "prompt_token_count", None) if usage is not None else None  # Kommentar: Tokens des Prompts
+
+
+def _cache_tokens(antwort) -> int | None:  # Kommentar: davon aus dem Kontext-Cache gelesene Eingabetokens
+    usage = getattr(antwort, "usage_metadata", None)  # Kommentar: Nutzungsdaten
+    return getattr(usage, "cached_content_token_count", None) if usage is not None else None  # Kommentar: Tokens aus dem Cache
+
+
+def _nutzung_merken(antwort, info: dict) -> None:  # Kommentar: Tokenzahlen (letzter Stand) in info übernehmen
+    info["ausgabe_tokens"] = _ausgabe_tokens(antwort) or info.get("ausgabe_tokens")  # Kommentar: Ausgabetokens
+    info["eingabe_tokens"] = _eingabe_tokens(antwort) or info.get("eingabe_tokens")  # Kommentar: Prompt-Tokens (inkl. Cache)
+    info["cache_tokens"] = _cache_tokens(antwort) or info.get("cache_tokens")  # Kommentar: davon aus dem Kontext-Cache
+
+
+def _stream_lesen(client, prompt_text: str, bei_feld, info: dict, modus: str, config) -> str:  # Kommentar: Antwort streamen, Felder melden, bei JSON_END schließen
+    start = time.perf_counter()  # Kommentar: Zeitmessung
+    def feld_gemeldet(key: str, wert: str) -> None:  # Kommentar: Zeit bis zum ersten Feld messen
+        info.setdefault("zeit_erstes_feld_s", round(time.perf_counter() - start, 3))  # Kommentar: nur beim ersten Feld
+        if bei_feld is not None:  # Kommentar: Aufrufer interessiert?
+            bei_feld(key, wert)  # Kommentar: weitergeben
+    parser = ki_stream.JsonFeldParser(feld_gemeldet, mit_markern=modus != "schema")  # Kommentar: inkrementeller Parser (Schema: reines JSON)
+    stream = client.models.generate_content_stream(  # Kommentar: Streaming-Aufruf
+        model=GEMINI_MODEL,  # Kommentar: Modell übergeben
+        contents=prompt_text,  # Kommentar: Prompt übergeben
+        config=config,  # Kommentar: Stoppsequenz bzw. Schema (+ Cache/System-Instruktion)
+    )  # Kommentar: Call Ende
+    try:  # Kommentar: Stream immer schließen
+        for stueck in stream:  # Kommentar: Stücke in Ankunftsreihenfolge
+            _nutzung_merken(stueck, info)  # Kommentar: letzter Stand der Nutzungsdaten
+            if parser.hinzufuegen(stueck.text or ""):  # Kommentar: JSON_END erreicht?
+                info["stream_abgebrochen"] = True  # Kommentar: Rest nicht mehr abwarten
+                break  # Kommentar: Schleife verlassen
+    finally:  # Kommentar: Verbindung freigeben
+        schliessen = getattr(stream, "close", None)  # Kommentar: Generator schließen beendet die HTTP-Antwort
+        if schliessen is not None:  # Kommentar: vorhanden?
+            schliessen()  # Kommentar: schließen
+    info["zeit_gesamt_s"] = round(time.perf_counter() - start, 3)  # Kommentar: Gesamtdauer
+    info["felder"] = len(parser.felder)  # Kommentar: Anzahl gestreamter Felder
+    return parser.text()  # Kommentar: Antworttext (bis einschließlich JSON_END)
+
+
+def ki_aufrufen(prompt_text: str, info: dict | None = None, bei_feld=None, modus: str | None = None, felder: list[str] | None = None) -> str:  # Kommentar: Gemini aufrufen und Antworttext zurückgeben (info erhält Wartezeiten/Versuche, bei_feld(key, wert) gestreamte Felder)
+    info = info if info is not None else {}  # Kommentar: Aufrufer kann Wartezeiten einsehen
+    modus = modus or KI_AUSGABE_MODUS  # Kommentar: Ausgabemodus (marker/schema)
+    info.update({"versuche": 0, "wartezeit_limiter_s": 0.0, "wartezeit_backoff_s": 0.0})  # Kommentar: Startwerte
+    client = get_gemini_client()  # Kommentar: Gemeinsamen Gemini Client holen (Verbindungen bleiben offen)
+    limiter = ki_limiter.gemini_limiter()  # Kommentar: gemeinsamer RPM/TPM-Begrenzer
+    geschaetzte_tokens = len(prompt_text) / 4 + KI_ERWARTETE_AUSGABE_TOKENS  # Kommentar: grobe Token-Schätzung (4 Zeichen/Token)
     print("[DEBUG] Verwende Modell:", GEMINI_MODEL)  # Kommentar: Modell in Logs ausgeben
     print("[DEBUG] Prompt-Länge Zeichen:", len(prompt_text))  # Kommentar: Prompt-Länge loggen
-    for versuch in range(1, KI_MAX_RETRIES + 1):  # Kommentar: Retry-Schleife
-        try:  # Kommentar: Versuch starten
-            response = client.models.generate_content(  # Kommentar: Content generieren
-                model=GEMINI_MODEL,  # Kommentar: Modell übergeben
-                contents=prompt_text,  # Kommentar: Prompt übergeben
-            )  # Kommentar: Call Ende
-            return response.text  # Kommentar: Antworttext zurückgeben
-        except genai_errors.ClientError as e:  # Kommentar: ClientError (Auth/Quota/BadRequest) abfangen
-            msg = f"Gemini ClientError: {repr(e)}"  # Kommentar: repr enthält oft Statuscodes/Details
-            print(msg)  # Kommentar: Fehler in Logs schreiben
-            if versuch == KI_MAX_RETRIES:  # Kommentar: Letzter Versuch?
-                raise RuntimeError(msg) from e  # Kommentar: Eskalieren mit Details
-            time.sleep(5)  # Kommentar: Kurz warten und erneut versuchen
-        except Exception as e:  # Kommentar: Sonstige Fehler abfangen
-            msg = f"Allgemeiner Fehler bei Gemini: {repr(e)}"  # Kommentar: Fehlertext bauen
-            print(msg)  # Kommentar: In Logs schreiben
-            if versuch == KI_MAX_RETRIES:  # Kommentar: Letzter Versuch?
-                raise RuntimeError(msg) from e  # Kommentar: Eskalieren
-            time.sleep(5)  # Kommentar: Kurz warten
+    statisch, inhalt = prompt_teilen(prompt_text) if kontext_cache.PROMPT_CACHE_MODUS != "aus" else ("", prompt_text)  # Kommentar: statischen Teil abtrennen?
+    with telemetrie.stufe("ki_aufrufen", werte=info, prompt_zeichen=len(prompt_text), modus=modus):  # Kommentar: Dauer, Versuche, Wartezeiten, Tokens erfassen
+        deadline = time.monotonic() + KI_RETRY_DEADLINE_S  # Kommentar: späteste Zeit für den letzten Versuch
+        for versuch in range(1, KI_MAX_RETRIES + 1):  # Kommentar: Retry-Schleife
+            info["versuche"] = versuch  # Kommentar: Versuch merken
+            info["wartezeit_limiter_s"] += limiter.erwerben(geschaetzte_tokens)  # Kommentar: globales Ratenlimit einhalten
+            cache_name = kontext_cache.kontext_cache().name_holen(client, GEMINI_MODEL, statisch) if statisch and kontext_cache.PROMPT_CACHE_MODUS == "kontext" else None  # Kommentar: Cache anlegen/wiederverwenden (None = System-Instruktion)
+            info["prompt_cache"] = "kontext" if cache_name else ("system" if statisch else "aus")  # Kommentar: tatsächlich genutzter Weg
+            config = _generierungs_config(modus, felder, system=statisch, cache_name=cache_name)  # Kommentar: Config je Versuch (Cache kann erneuert worden sein)
+            try:  # Kommentar: Versuch starten
+                if KI_STREAMING_AKTIV:  # Kommentar: Streaming-Modus?
+                    return _stream_lesen(client, inhalt, bei_feld, info, modus, config)  # Kommentar: gestreamte Antwort
+                start = time.perf_counter()  # Kommentar: Zeitmessung
+                response = client.models.generate_content(  # Kommentar: Content generieren
+                    model=GEMINI_MODEL,  # Kommentar: Modell übergeben
+                    contents=inhalt,  # Kommentar: Prompt übergeben (ohne statischen Teil, falls abgetrennt)
+                    config=config,  # Kommentar: None bzw. Schema (+ Cache/System-Instruktion)
+                )  # Kommentar: Call Ende
+                info["zeit_gesamt_s"] = round(time.perf_counter() - start, 3)  # Kommentar: Dauer
+                _nutzung_merken(response, info)  # Kommentar: Tokenzahlen
+                return response.text  # Kommentar: Antworttext zurückgeben
+            except Exception as e:  # Kommentar: Fehler klassifizieren
+                art = f"Gemini {type(e).__name__}" if isinstance(e, genai_errors.APIError) else "Allgemeiner Fehler bei Gemini"  # Kommentar: Fehlerart
+                msg = f"{art}: {repr(e)}"  # Kommentar: repr enthält oft Statuscodes/Details
+                print(msg)  # Kommentar: Fehler in Logs schreiben
+                if cache_name and isinstance(e, genai_errors.APIError) and getattr(e, "code", None) in (403, 404) and versuch < KI_MAX_RETRIES:  # Kommentar: Cache beim Server abgelaufen/gelöscht?
+                    kontext_cache.kontext_cache().verwerfen(cache_name)  # Kommentar: nächster Versuch legt ihn neu an
+                    info["cache_erneuert"] = info.get("cache_erneuert", 0) + 1  # Kommentar: zählen
+                    continue  # Kommentar: sofort erneut (kein Backoff nötig)
+                if not _ist_wiederholbar(e) or versuch == KI_MAX_RETRIES:  # Kommentar: nicht wiederholbar oder letzter Versuch?
+                    raise RuntimeError(msg) from e  # Kommentar: Eskalieren mit Details
+                retry_after = _retry_after_lesen(e)  # Kommentar: Server-Vorgabe (429)
+                pause = max(retry_after or 0.0, _backoff_s(versuch))  # Kommentar: nie kürzer als vom Server verlangt
+                if time.monotonic() + pause > deadline:  # Kommentar: Deadline würde überschritten?
+                    raise RuntimeError(f"{msg} (Deadline {KI_RETRY_DEADLINE_S:.0f} s überschritten)") from e  # Kommentar: aufgeben
+                print(f"[DEBUG] Neuer Versuch in {pause:.1f} s (Retry-After: {retry_after})")  # Kommentar: Wartezeit loggen
+                info["wartezeit_backoff_s"] += pause  # Kommentar: Wartezeit merken
+                time.sleep(pause)  # Kommentar: warten
+
+
+def prompt_version() -> str:  # Kommentar: Version von Prompt + Modell (ändert sich -> alte Cache-Einträge ungültig)
+    roh = "\x1f".join([PROMPT_TEMPLATE, GEMINI_MODEL, str(MAX_TEXT_CHARS), str(MAX_EXTRAKTION_CHARS), str(TEXT_FENSTER_AKTIV), str(KI_STREAMING_AKTIV), KI_AUSGABE_MODUS, REGEL_MODUS, pdf_backends.PDF_BACKEND])  # Kommentar: alle Einflussgrößen verbinden
+    if LANGDOKUMENT_MODUS != "aus":  # Kommentar: Langdokument-Modus ändert das Ergebnis langer Gutachten
+        roh += "\x1f".join(["", LANGDOKUMENT_MODUS, str(LANGDOKUMENT_MAX_ZEICHEN), str(LANGDOKUMENT_ABSCHNITT_ZEICHEN), str(LANGDOKUMENT_UEBERLAPPUNG)])  # Kommentar: anhängen (Version ohne Modus bleibt gleich)
+    if kontext_cache.PROMPT_CACHE_MODUS != "aus":  # Kommentar: statischer Teil als System-Instruktion kann die Antworten verändern
+        roh += "\x1f" + "prompt_cache=system"  # Kommentar: "system" und "kontext" senden dem Modell dasselbe
+    return hashlib.sha256(roh.encode("utf-8")).hexdigest()[:16]  # Kommentar: kurzer Hash reicht
+
+
+def antwort_verwertbar(ki_antwort: str | None) -> bool:  # Kommentar: Enthält die Antwort ein JSON (Marker oder reines Schema-JSON)?
+    if not ki_antwort:  # Kommentar: leer?
+        return False  # Kommentar: nein
+    if ki_antwort.lstrip().startswith("{"):  # Kommentar: Schema-Modus: reines JSON
+        return ki_antwort.rstrip().endswith("}")  # Kommentar: vollständig?
+    return "JSON_START" in ki_antwort and "JSON_END" in ki_antwort  # Kommentar: Marker-Modus
+
+
+def antwort_aus_werten(werte: dict) -> str:  # Kommentar: Feldwerte -> Antworttext im Marker-Format (für Schnellmodus/Fallback/Ergänzung)
+    daten = {k: werte.get(k, "") for k in KI_FELDER}  # Kommentar: alle Keys in Template-Reihenfolge
+    return "JSON_START\n" + json.dumps(daten, ensure_ascii=False, indent=2) + "\nJSON_END"  # Kommentar: wie von der KI geliefert
+
+
+def antwort_felder(ki_antwort: str) -> dict:  # Kommentar: Feldwerte aus einer Antwort (Marker oder reines Schema-JSON)
+    parser = ki_stream.JsonFeldParser(mit_markern=not ki_antwort.lstrip().startswith("{"))  # Kommentar: gleicher Parser wie beim Streaming
+    parser.hinzufuegen(ki_antwort)  # Kommentar: Antwort komplett einlesen
+    return dict(parser.felder)  # Kommentar: Felder der KI
+
+
+def antwort_ergaenzen(ki_antwort: str, werte: dict) -> str:  # Kommentar: Lokal erkannte Werte in leere/fehlende KI-Felder einsetzen
+    daten = antwort_felder(ki_antwort)  # Kommentar: Felder der KI
+    for k, wert in werte.items():  # Kommentar: lokale Werte
+        if not daten.get(k):  # Kommentar: KI hat nichts geliefert (wie angewiesen)
+            daten[k] = wert  # Kommentar: einsetzen
+    return antwort_aus_werten(daten)  # Kommentar: einheitliches Format
 
 
 def ki_antwort_speichern(basisname: str, ki_text: str) -> str:  # Kommentar: KI-Antwort in Datei speichern
@@ -256,21 +663,120 @@ def ki_antwort_speichern(basisname: str, ki_text: str) -> str:  # Kommentar: KI-
     return ziel_pfad  # Kommentar: Pfad zurückgeben
 
 
-def main(pdf_pfad: str | None = None, auswahl: str = "", steuerstatus: str = "") -> str | None:  # Kommentar: Entry-Point
+def langdokument_analysieren(voller_text: str, auswahl: str, steuerstatus: str, info: dict, bekannt: list[str]) -> str:  # Kommentar: Abschnitte parallel analysieren, Felder zusammenführen (Map-Reduce)
+    abschnitte = langdokument.text_zerlegen(voller_text, LANGDOKUMENT_ABSCHNITT_ZEICHEN, LANGDOKUMENT_UEBERLAPPUNG)  # Kommentar: überlappende Abschnitte
+    felder = [k for k in KI_FELDER if k not in bekannt]  # Kommentar: nur restliche Felder anfragen
+    infos = [{} for _ in abschnitte]  # Kommentar: Versuche/Wartezeiten/Tokens je Abschnitt
+
+    def abschnitt_analysieren(nr: int) -> str:  # Kommentar: ein Abschnitt = ein Gemini-Aufruf
+        hinweis = (  # Kommentar: KI weiß, dass sie nur einen Ausschnitt sieht
+            f"TEXTAUSZUG {nr + 1} VON {len(abschnitte)} eines langen Gutachtens: Felder, die in diesem Auszug "
+            "nicht eindeutig vorkommen, als \"\" ausgeben."
+        )  # Kommentar: Ende Hinweis
+        prompt = prompt_bauen(abschnitte[nr], auswahl, steuerstatus, bekannt=bekannt, hinweis=hinweis)  # Kommentar: Prompt je Abschnitt
+        return ki_aufrufen(prompt, infos[nr], felder=felder)  # Kommentar: ohne Feld-Callback (Werte erst nach dem Zusammenführen gültig)
+
+    with telemetrie.stufe("langdokument", abschnitte=len(abschnitte), text_zeichen=len(voller_text)) as messung:  # Kommentar: Gesamtdauer (Wanduhr) messen
+        teilergebnisse = []  # Kommentar: Felder je Abschnitt (Dokumentreihenfolge)
+        fehler = 0  # Kommentar: fehlgeschlagene Abschnitte
+        with ThreadPoolExecutor(max_workers=max(min(LANGDOKUMENT_PARALLEL, len(abschnitte)), 1)) as pool:  # Kommentar: begrenzte Parallelität (I/O-lastig)
+            futures = [pool.submit(contextvars.copy_context().run, abschnitt_analysieren, nr) for nr in range(len(abschnitte))]  # Kommentar: je Abschnitt eigener Kontext (Stufen landen im Job)
+            for future in futures:  # Kommentar: in Dokumentreihenfolge einsammeln
+                try:  # Kommentar: einzelne Abschnitte dürfen fehlschlagen
+                    antwort = future.result()  # Kommentar: Antworttext
+                except RuntimeError as e:  # Kommentar: Gemini-Fehler nach allen Versuchen
+                    print("[DEBUG] Langdokument-Abschnitt fehlgeschlagen:", repr(e))  # Kommentar: loggen
+                    fehler += 1  # Kommentar: zählen
+                    continue  # Kommentar: restliche Abschnitte trotzdem nutzen
+                teilergebnisse.append(antwort_felder(antwort) if antwort_verwertbar(antwort) else {})  # Kommentar: Felder (unverwertbar = leer)
+        if not teilergebnisse:  # Kommentar: alle Abschnitte fehlgeschlagen?
+            raise RuntimeError(f"Alle {len(abschnitte)} Abschnitte des Gutachtens sind fehlgeschlagen.")  # Kommentar: wie ein fehlgeschlagener Einzelaufruf (Regel-Fallback)
+        daten = langdokument.zusammenfuehren(teilergebnisse, voller_text, auswahl)  # Kommentar: feldweise Vorrangregeln
+        messung["fehler"] = fehler  # Kommentar: fehlgeschlagene Abschnitte
+    info["abschnitte"] = len(abschnitte)  # Kommentar: Anzahl Abschnitte
+    info["langdokument_fehler"] = fehler  # Kommentar: > 0 = unvollständig (nicht cachen)
+    for schluessel in ("versuche", "wartezeit_limiter_s", "wartezeit_backoff_s", "eingabe_tokens", "ausgabe_tokens", "cache_tokens"):  # Kommentar: Summen über alle Abschnitte
+        info[schluessel] = sum(i.get(schluessel) or 0 for i in infos)  # Kommentar: aufsummieren
+    return antwort_aus_werten(daten)  # Kommentar: einheitliches Marker-Format (wie Einzelaufruf)
+
+
+def analyse_aus_bytes(pdf_bytes: bytes, auswahl: str = "", steuerstatus: str = "", info: dict | None = None, bei_feld=None) -> str:  # Kommentar: PDF-Bytes -> KI-Antworttext (komplett im Speicher)
+    info = info if info is not None else {}  # Kommentar: Status für Aufrufer (Schnellmodus/Fallback, Extraktion für den Fall-Speicher)
+    pdf_sha256 = ki_cache.pdf_hash(pdf_bytes)  # Kommentar: Inhalts-Hash bilden
+    info["pdf_sha256"] = pdf_sha256  # Kommentar: Hash für den Fall-Speicher
+    schluessel = ki_cache.cache_schluessel(pdf_sha256, auswahl, steuerstatus, prompt_version())  # Kommentar: Cache-Schlüssel
+    with telemetrie.stufe("cache_lesen") as messung:  # Kommentar: Dauer des Cache-Zugriffs
+        ki_antwort = ki_cache.cache_lesen(schluessel)  # Kommentar: Cache-Treffer? (spart Extraktion + Gemini)
+        messung["treffer"] = int(ki_antwort is not None)  # Kommentar: 1 = Treffer
+    if ki_antwort is not None:  # Kommentar: Cache-Treffer
+        print("[DEBUG] KI-Cache Treffer:", pdf_sha256[:12])  # Kommentar: loggen
+        telemetrie.attribute_setzen(cache_treffer=True)  # Kommentar: im Job vermerken
+        return ki_antwort  # Kommentar: direkt zurückgeben
+
+    extraktion_budget = MAX_EXTRAKTION_CHARS if TEXT_FENSTER_AKTIV else MAX_TEXT_CHARS  # Kommentar: mit Fenstern mehr Text lesen
+    if LANGDOKUMENT_MODUS == "auto":  # Kommentar: Langdokument-Modus liest (fast) alles
+        extraktion_budget = LANGDOKUMENT_MAX_ZEICHEN  # Kommentar: kein Datenverlust hinter dem Fenster
+    voller_text = pdf_text_auslesen(pdf_bytes, max_zeichen=extraktion_budget)  # Kommentar: PDF-Text extrahieren (stoppt bei vollem Budget)
+
+    if not voller_text or len(voller_text.strip()) < MIN_TEXT_CHARS:  # Kommentar: Mindesttext prüfen
+        raise RuntimeError("Das Dokument enthält zu wenig verwertbaren Text.")  # Kommentar: Fehler
+    info["extraktion"] = voller_text  # Kommentar: Rohtext für den Fall-Speicher (bei Cache-Treffer nicht vorhanden)
+
+    with telemetrie.stufe("regeln") as messung:  # Kommentar: Dauer der lokalen Regeln
+        regel_felder = regel_extraktor.felder_extrahieren(voller_text, auswahl) if REGEL_MODUS != "aus" or REGEL_FALLBACK_AKTIV else {}  # Kommentar: lokale Regeln (Millisekunden)
+        messung["felder"] = len(regel_felder)  # Kommentar: erkannte Felder
+    sicher = regel_extraktor.sichere_werte(regel_felder) if REGEL_MODUS != "aus" else {}  # Kommentar: sichere Werte -> nicht mehr von der KI holen
+    info["regel_felder"] = len(sicher)  # Kommentar: Anzahl lokal erkannter Felder
+    if bei_feld is not None:  # Kommentar: Aufrufer zeigt Felder vorab an?
+        for k, wert in sicher.items():  # Kommentar: lokale Werte sofort melden
+            bei_feld(k, wert)  # Kommentar: melden
+    if REGEL_MODUS == "schnell" and regel_extraktor.alle_pflichtfelder_sicher(regel_felder, auswahl):  # Kommentar: Schnellmodus möglich?
+        print("[DEBUG] Schnellmodus: alle Pflichtfelder lokal erkannt, kein KI-Aufruf")  # Kommentar: loggen
+        info["schnellmodus"] = True  # Kommentar: markieren
+        return antwort_aus_werten(sicher)  # Kommentar: ohne Gemini (Hergang u.ä. bleiben leer)
+
+    ki_bei_feld = bei_feld  # Kommentar: Callback für gestreamte KI-Felder
+    if bei_feld is not None and sicher:  # Kommentar: KI liefert "" für lokale Felder -> Anzeige nicht überschreiben
+        ki_bei_feld = lambda k, wert: None if k in sicher else bei_feld(k, wert)  # Kommentar: lokale Felder ausblenden
+    lang = LANGDOKUMENT_MODUS == "auto" and len(voller_text) > MAX_TEXT_CHARS  # Kommentar: passt nicht in einen Prompt -> Abschnitte
+    if not lang:  # Kommentar: Einzelaufruf
+        with telemetrie.stufe("prompt_bauen") as messung:  # Kommentar: Textfenster + Prompt
+            gutachten_text = gutachten_text_begrenzen(voller_text)  # Kommentar: Text begrenzen (relevante Abschnitte bevorzugt)
+            prompt = prompt_bauen(gutachten_text, auswahl, steuerstatus, bekannt=list(sicher))  # Kommentar: Prompt bauen (nur restliche Felder anfragen)
+            messung["text_zeichen"] = len(gutachten_text)  # Kommentar: Text im Prompt
+            messung["prompt_zeichen"] = len(prompt)  # Kommentar: Prompt gesamt
+    try:  # Kommentar: Gemini-Ausfall abfangen
+        if lang:  # Kommentar: Langdokument-Modus
+            ki_antwort = langdokument_analysieren(voller_text, auswahl, steuerstatus, info, list(sicher))  # Kommentar: Abschnitte parallel, dann zusammenführen
+            if ki_bei_feld is not None:  # Kommentar: Felder erst jetzt bekannt
+                for k, wert in antwort_felder(ki_antwort).items():  # Kommentar: zusammengeführte Felder
+                    if wert:  # Kommentar: nur gefundene Werte
+                        ki_bei_feld(k, wert)  # Kommentar: melden
+        else:  # Kommentar: ein Aufruf
+            ki_antwort = ki_aufrufen(prompt, info, ki_bei_feld, felder=[k for k in KI_FELDER if k not in sicher])  # Kommentar: KI aufrufen (info: Versuche/Wartezeiten, bei_feld: Felder während des Streamings)
+    except RuntimeError:  # Kommentar: Gemini nicht erreichbar / Retries erschöpft
+        if not (REGEL_FALLBACK_AKTIV and regel_felder):  # Kommentar: kein Fallback möglich?
+            raise  # Kommentar: Fehler weitergeben
+        print("[DEBUG] Gemini nicht verfügbar -> Ergebnis nur aus lokalen Regeln")  # Kommentar: loggen
+        info["fallback"] = True  # Kommentar: markieren (nicht cachen)
+        return antwort_aus_werten({k: f["wert"] for k, f in regel_felder.items()})  # Kommentar: auch unsichere Werte (Nutzer korrigiert)
+    if sicher and antwort_verwertbar(ki_antwort):  # Kommentar: lokale Werte ergänzen
+        ki_antwort = antwort_ergaenzen(ki_antwort, sicher)  # Kommentar: zusammenführen
+    if antwort_verwertbar(ki_antwort) and not info.get("langdokument_fehler"):  # Kommentar: Nur verwertbare, vollständige Antworten cachen
+        ki_cache.cache_schreiben(schluessel, pdf_sha256, ki_antwort)  # Kommentar: Antwort im Cache ablegen
+    return ki_antwort  # Kommentar: KI-Text zurückgeben
+
+
+def main(pdf_pfad: str | None = None, auswahl: str = "", steuerstatus: str = "", info: dict | None = None) -> str | None:  # Kommentar: Entry-Point (Datei-basiert)
     os.makedirs(EINGANGS_ORDNER, exist_ok=True)  # Kommentar: Eingang sicherstellen
     os.makedirs(KI_ANTWORT_ORDNER, exist_ok=True)  # Kommentar: KI-Ordner sicherstellen
 
     if pdf_pfad is None:  # Kommentar: PDF muss übergeben werden (Multi-User sicher)
         raise RuntimeError("pdf_pfad muss übergeben werden.")  # Kommentar: Fehler
 
-    voller_text = pdf_text_auslesen(pdf_pfad)  # Kommentar: PDF-Text extrahieren
-
-    if not voller_text or len(voller_text.strip()) < MIN_TEXT_CHARS:  # Kommentar: Mindesttext prüfen
-        raise RuntimeError("Das Dokument enthält zu wenig verwertbaren Text.")  # Kommentar: Fehler
-
-    gutachten_text = voller_text[:MAX_TEXT_CHARS]  # Kommentar: Text begrenzen
-    prompt = prompt_bauen(gutachten_text, auswahl, steuerstatus)  # Kommentar: Prompt bauen
-    ki_antwort = ki_aufrufen(prompt)  # Kommentar: KI aufrufen
+    with open(pdf_pfad, "rb") as f:  # Kommentar: PDF einmal lesen
+        pdf_bytes = f.read()  # Kommentar: Bytes
+    ki_antwort = analyse_aus_bytes(pdf_bytes, auswahl, steuerstatus, info)  # Kommentar: Analyse im Speicher
 
     basisname = os.path.splitext(os.path.basename(pdf_pfad))[0]  # Kommentar: Basisname aus PDF-Datei
     pfad_ki = ki_antwort_speichern(basisname, ki_antwort)  # Kommentar: Antwort speichern
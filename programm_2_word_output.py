@@ -1,9 +1,16 @@
 # programm_2_word_output.py  # Kommentar: Programm 2 – KI JSON -> Word, inkl. Summenlogik + Schrift erzwingen (Arial MT Pro 11)
 
+import io  # Kommentar: In-Memory-Puffer für DOCX
 import os  # Kommentar: OS-Pfade/Ordner
 import json  # Kommentar: JSON parsing
+import threading  # Kommentar: Lock für den Vorlagen-Cache
 from datetime import datetime, timedelta  # Kommentar: Datum/Frist
+import jinja2  # Kommentar: Jinja-Umgebung mit Template-Cache
 from docxtpl import DocxTemplate  # Kommentar: Word-Template Engine (docxtpl)
+import docx_schrift  # Kommentar: Schrift direkt im DOCX-Zip setzen (ein Durchlauf)
+import telemetrie  # Kommentar: Zeitmessung je Stufe (Render, Schrift)
+import config  # Kommentar: Konfiguration (Vorlagen)
+import programm_1_ki_input  # Kommentar: Programm 1 (Analyse im Speicher)
 from programm_1_ki_input import KI_ANTWORT_ORDNER, BASE_DIR  # Kommentar: Pfade aus Programm 1
 
 PROGRAMM_2_VERSION = "2025-12-26-summe-all-varianten-v2-arial11"  # Kommentar: Version zum Debuggen (siehst du in der App)
@@ -12,19 +19,9 @@ AUSGANGS_ORDNER = os.path.join(BASE_DIR, "ausgang_schreiben")  # Kommentar: Ausg
 JSON_START_MARKER = "JSON_START"  # Kommentar: JSON Start Marker
 JSON_END_MARKER = "JSON_END"  # Kommentar: JSON End Marker
 
-try:  # Kommentar: Optionaler Import (falls python-docx nicht installiert ist)
-    from docx import Document  # Kommentar: DOCX nachträglich öffnen/bearbeiten (python-docx)
-    from docx.shared import Pt  # Kommentar: Punktgröße (11pt)
-    from docx.oxml.ns import qn  # Kommentar: Word-XML Font-Felder (ascii/hAnsi/cs)
-    PYDOCX_AVAILABLE = True  # Kommentar: Flag: python-docx verfügbar
-except Exception:  # Kommentar: Wenn Import fehlschlägt
-    Document = None  # Kommentar: Platzhalter
-    Pt = None  # Kommentar: Platzhalter
-    qn = None  # Kommentar: Platzhalter
-    PYDOCX_AVAILABLE = False  # Kommentar: Flag: python-docx nicht verfügbar
-
-
 def json_aus_ki_antwort_parsen(ki_text: str) -> dict:  # Kommentar: JSON Block aus KI Text extrahieren
+    if ki_text.lstrip().startswith("{"):  # Kommentar: Schema-Modus: Antwort ist bereits reines JSON
+        return json.loads(ki_text)  # Kommentar: ohne Marker-Suche/Reparaturen laden
     start_idx = ki_text.find(JSON_START_MARKER)  # Kommentar: Startmarker suchen
     end_idx = ki_text.find(JSON_END_MARKER)  # Kommentar: Endmarker suchen
     if start_idx == -1 or end_idx == -1:  # Kommentar: Marker fehlen?
@@ -130,6 +127,18 @@ def mwst_leeren_wenn_noetig(daten: dict, auswahl: str, steuerstatus: str) -> dic
     return daten  # Kommentar: sonst belassen
 
 
+NEBENKOSTEN = ("NUTZUNGSAUSFALL", "KOSTENPAUSCHALE", "GUTACHTERKOSTEN", "ZUSATZKOSTEN_BETRAG")  # Kommentar: in allen Varianten addiert
+SUMMEN_POSITIONEN = {  # Kommentar: Variante -> addierte Positionen in Additionsreihenfolge (gemeinsam für Einzelfall und Batch, WIEDERBESCHAFFUNGSAUFWAND = WBW - Restwert)
+    "FIKTIV_REPARATUR": ("REPARATURKOSTEN", "WERTMINDERUNG") + NEBENKOSTEN,  # Kommentar: fiktiv Reparaturschaden -> ohne MwSt
+    "KONKRET_UNTER_WBW": ("REPARATURKOSTEN", "WERTMINDERUNG") + NEBENKOSTEN,  # Kommentar: konkret < WBW -> Reparatur (brutto)
+    "REGEL_130": ("REPARATURKOSTEN", "MWST_BETRAG") + NEBENKOSTEN,  # Kommentar: 130% -> Wertminderung ausgeschlossen
+    "TOTAL_FIKTIV": ("WIEDERBESCHAFFUNGSAUFWAND",) + NEBENKOSTEN,  # Kommentar: Totalschaden fiktiv -> WBA statt Reparatur, ohne MwSt
+    "TOTAL_KONKRET": ("WIEDERBESCHAFFUNGSAUFWAND", "MWST_BETRAG") + NEBENKOSTEN,  # Kommentar: Totalschaden konkret -> WBA + ggf MwSt + Nebenkosten
+    "TOTAL_ERSATZ": ("WIEDERBESCHAFFUNGSAUFWAND", "MWST_BETRAG") + NEBENKOSTEN,  # Kommentar: Ersatzbeschaffung -> WBA + MwSt (bis Grenze) + Nebenkosten
+    "UNKNOWN": ("REPARATURKOSTEN", "MWST_BETRAG", "WERTMINDERUNG") + NEBENKOSTEN + ("WIEDERBESCHAFFUNGSAUFWAND",),  # Kommentar: Fallback: alles
+}  # Kommentar: Ende Positionen
+
+
 def summe_tabelle_berechnen(  # Kommentar: Summen je Variante (entscheidet, was addiert wird)
     variant: str,  # Kommentar: interner Variant-Key
     reparatur: float,  # Kommentar: Reparaturkosten
@@ -141,68 +150,27 @@ def summe_tabelle_berechnen(  # Kommentar: Summen je Variante (entscheidet, was
     zusatz: float,  # Kommentar: Zusatzkosten
     wba: float,  # Kommentar: Wiederbeschaffungsaufwand
 ) -> float:  # Kommentar: Summe float
-    if variant == "FIKTIV_REPARATUR":  # Kommentar: fiktiv Reparaturschaden -> ohne MwSt
-        return reparatur + wertminderung + nutzung + kostenpausch + gutachter + zusatz  # Kommentar: addieren
-    if variant == "KONKRET_UNTER_WBW":  # Kommentar: konkret < WBW -> MwSt wird addiert (wenn nicht geleert)
-        return reparatur + wertminderung + nutzung + kostenpausch + gutachter + zusatz  # Kommentar: addieren , reperatur (brutto)
-    if variant == "REGEL_130":  # Kommentar: 130% -> Wertminderung ausgeschlossen
-        return reparatur + mwst + nutzung + kostenpausch + gutachter + zusatz  # Kommentar: addieren
-    if variant == "TOTAL_FIKTIV":  # Kommentar: Totalschaden fiktiv -> WBA statt Reparatur, ohne MwSt
-        return wba + nutzung + kostenpausch + gutachter + zusatz  # Kommentar: addieren
-    if variant == "TOTAL_KONKRET":  # Kommentar: Totalschaden konkret -> WBA + ggf MwSt + Nebenkosten
-        return wba + mwst + nutzung + kostenpausch + gutachter + zusatz  # Kommentar: addieren
-    if variant == "TOTAL_ERSATZ":  # Kommentar: Ersatzbeschaffung -> WBA + MwSt (bis Grenze) + Nebenkosten
-        return wba + mwst + nutzung + kostenpausch + gutachter + zusatz  # Kommentar: addieren
-    return reparatur + mwst + wertminderung + nutzung + kostenpausch + gutachter + zusatz + wba  # Kommentar: Fallback
-
-
-def erzwinge_schrift(docx_pfad: str, font_name: str = "Arial MT Pro", font_size_pt: int = 11) -> None:  # Kommentar: Schrift global erzwingen
-    if not PYDOCX_AVAILABLE:  # Kommentar: Wenn python-docx fehlt
-        return  # Kommentar: dann skip (Vorlage muss es regeln)
-    doc = Document(docx_pfad)  # Kommentar: DOCX laden
-    size = Pt(font_size_pt)  # Kommentar: 11pt als Word-Einheit
-    if "Normal" in doc.styles:  # Kommentar: Prüfen, ob Standardstil existiert
-        doc.styles["Normal"].font.name = font_name  # Kommentar: Normal-Stil Font setzen
-        doc.styles["Normal"].font.size = size  # Kommentar: Normal-Stil Größe setzen
-        try:  # Kommentar: XML-Fonts setzen (robuster in Word)
-            doc.styles["Normal"]._element.rPr.rFonts.set(qn("w:ascii"), font_name)  # Kommentar: ASCII Font
-            doc.styles["Normal"]._element.rPr.rFonts.set(qn("w:hAnsi"), font_name)  # Kommentar: HAnsi Font
-            doc.styles["Normal"]._element.rPr.rFonts.set(qn("w:cs"), font_name)  # Kommentar: CS Font
-        except Exception:  # Kommentar: Falls XML nicht erreichbar
-            pass  # Kommentar: Ignorieren
-
-    for paragraph in doc.paragraphs:  # Kommentar: Alle Absätze
-        for run in paragraph.runs:  # Kommentar: Alle Runs im Absatz
-            run.font.name = font_name  # Kommentar: Run-Font setzen
-            run.font.size = size  # Kommentar: Run-Größe setzen
-            try:  # Kommentar: XML-Fonts setzen (robuster)
-                run._element.get_or_add_rPr()  # Kommentar: rPr sicherstellen
-                rfonts = run._element.rPr.rFonts  # Kommentar: rFonts holen
-                if rfonts is not None:  # Kommentar: wenn vorhanden
-                    rfonts.set(qn("w:ascii"), font_name)  # Kommentar: ASCII Font
-                    rfonts.set(qn("w:hAnsi"), font_name)  # Kommentar: HAnsi Font
-                    rfonts.set(qn("w:cs"), font_name)  # Kommentar: CS Font
-            except Exception:  # Kommentar: Falls nicht möglich
-                pass  # Kommentar: Ignorieren
-
-    for table in doc.tables:  # Kommentar: Tabellen
-        for row in table.rows:  # Kommentar: Zeilen
-            for cell in row.cells:  # Kommentar: Zellen
-                for paragraph in cell.paragraphs:  # Kommentar: Absätze in Zellen
-                    for run in paragraph.runs:  # Kommentar: Runs in Zellen
-                        run.font.name = font_name  # Kommentar: Font setzen
-                        run.font.size = size  # Kommentar: Größe setzen
-                        try:  # Kommentar: XML-Fonts setzen
-                            run._element.get_or_add_rPr()  # Kommentar: rPr sicherstellen
-                            rfonts = run._element.rPr.rFonts  # Kommentar: rFonts holen
-                            if rfonts is not None:  # Kommentar: wenn vorhanden
-                                rfonts.set(qn("w:ascii"), font_name)  # Kommentar: ASCII Font
-                                rfonts.set(qn("w:hAnsi"), font_name)  # Kommentar: HAnsi Font
-                                rfonts.set(qn("w:cs"), font_name)  # Kommentar: CS Font
-                        except Exception:  # Kommentar: Falls nicht möglich
-                            pass  # Kommentar: Ignorieren
-
-    doc.save(docx_pfad)  # Kommentar: Speichern (überschreibt Datei)
+    werte = {  # Kommentar: Position -> Betrag
+        "REPARATURKOSTEN": reparatur, "MWST_BETRAG": mwst, "WERTMINDERUNG": wertminderung, "NUTZUNGSAUSFALL": nutzung,
+        "KOSTENPAUSCHALE": kostenpausch, "GUTACHTERKOSTEN": gutachter, "ZUSATZKOSTEN_BETRAG": zusatz, "WIEDERBESCHAFFUNGSAUFWAND": wba,
+    }  # Kommentar: Ende Werte
+    positionen = SUMMEN_POSITIONEN.get(variant, SUMMEN_POSITIONEN["UNKNOWN"])  # Kommentar: Positionen der Variante
+    summe = werte[positionen[0]]  # Kommentar: erste Position
+    for position in positionen[1:]:  # Kommentar: gleiche Reihenfolge wie bisher (Float-Ergebnis bleibt bitgleich)
+        summe += werte[position]  # Kommentar: addieren
+    return summe  # Kommentar: Summe zurückgeben
+
+
+def erzwinge_schrift(docx_pfad: str, font_name: str = "Arial MT Pro", font_size_pt: int = 11) -> None:  # Kommentar: Schrift global erzwingen (Datei)
+    with open(docx_pfad, "rb") as f:  # Kommentar: DOCX lesen
+        docx_bytes = f.read()  # Kommentar: Bytes
+    docx_bytes = erzwinge_schrift_bytes(docx_bytes, font_name, font_size_pt)  # Kommentar: im Speicher normalisieren
+    with open(docx_pfad, "wb") as f:  # Kommentar: zurückschreiben
+        f.write(docx_bytes)  # Kommentar: überschreibt Datei
+
+
+def erzwinge_schrift_bytes(docx_bytes: bytes, font_name: str = "Arial MT Pro", font_size_pt: int = 11) -> bytes:  # Kommentar: Schrift global erzwingen (Bytes)
+    return docx_schrift.schrift_normalisieren(docx_bytes, font_name, font_size_pt)  # Kommentar: alle Teile (Body, Kopf/Fuß, Textboxen, Stile) in einem Durchlauf
 
 
 def prepare_data_for_template(daten: dict, auswahl: str, steuerstatus: str, zus_bez: str = "", zus_betrag: str = "") -> dict:  # Kommentar: Public Funktion – bereitet Daten inkl. Summe vor
@@ -271,12 +239,150 @@ def prepare_data_for_template(daten: dict, auswahl: str, steuerstatus: str, zus_
     return daten  # Kommentar: Return
 
 
+SUMMEN_EINGABEN = (  # Kommentar: Felder, von denen Positionen/Summe abhängen (alles andere ändert die Vorschau nicht)
+    "REPARATURKOSTEN", "MWST_BETRAG", "WERTMINDERUNG", "NUTZUNGSAUSFALL", "KOSTENPAUSCHALE", "GUTACHTERKOSTEN",
+    "WIEDERBESCHAFFUNGSWERT", "RESTWERT", "WIEDERBESCHAFFUNGSAUFWAND",
+)  # Kommentar: Ende Eingaben
+POSITIONS_NAMEN = {  # Kommentar: Anzeigename je Summen-Position
+    "REPARATURKOSTEN": "Reparaturkosten", "MWST_BETRAG": "MwSt", "WERTMINDERUNG": "Wertminderung",
+    "NUTZUNGSAUSFALL": "Nutzungsausfall", "KOSTENPAUSCHALE": "Kostenpauschale", "GUTACHTERKOSTEN": "Gutachterkosten",
+    "ZUSATZKOSTEN_BETRAG": "Zusatzkosten", "WIEDERBESCHAFFUNGSAUFWAND": "Wiederbeschaffungsaufwand",
+}  # Kommentar: Ende Namen
+
+
+def summen_vorschau(eingaben: dict, auswahl: str, steuerstatus: str, zus_bez: str = "", zus_betrag: str = "") -> dict:  # Kommentar: Positionen + Summe ohne Vorlage/Render
+    daten = {k: eingaben.get(k, "") for k in SUMMEN_EINGABEN}  # Kommentar: nur summenrelevante Felder (Kopie)
+    daten = prepare_data_for_template(daten, auswahl, steuerstatus, zus_bez, zus_betrag)  # Kommentar: gleicher Rechenweg wie beim Erzeugen
+    positionen = []  # Kommentar: Tabellenzeilen
+    for position in SUMMEN_POSITIONEN.get(variante_key(auswahl), SUMMEN_POSITIONEN["UNKNOWN"]):  # Kommentar: addierte Positionen der Variante
+        betrag = euro_zu_float(daten.get(position, ""))  # Kommentar: Betrag (geleerte Felder = 0)
+        if betrag <= 0:  # Kommentar: nichts addiert?
+            continue  # Kommentar: nicht anzeigen
+        name = POSITIONS_NAMEN.get(position, position)  # Kommentar: Anzeigename
+        if position == "ZUSATZKOSTEN_BETRAG" and daten["ZUSATZKOSTEN_BEZEICHNUNG"]:  # Kommentar: eigene Bezeichnung?
+            name = daten["ZUSATZKOSTEN_BEZEICHNUNG"]  # Kommentar: übernehmen
+        positionen.append({"Position": name, "Betrag": float_zu_euro(betrag)})  # Kommentar: Zeile
+    return {  # Kommentar: Ergebnis
+        "positionen": positionen,  # Kommentar: Tabelle
+        "KOSTENSUMME_X": daten["KOSTENSUMME_X"],  # Kommentar: Summe wie im Schreiben
+        "WIEDERBESCHAFFUNGSAUFWAND": daten.get("WIEDERBESCHAFFUNGSAUFWAND", ""),  # Kommentar: WBA wie im Schreiben
+        "debug": daten["DEBUG_SUMME_TEILE"],  # Kommentar: Rechenweg
+    }  # Kommentar: Ende Ergebnis
+
+
+def resolve_vorlage_pfad(auswahl: str) -> str:  # Kommentar: Auswahl -> Pfad der Word-Vorlage
+    if auswahl not in config.VORLAGEN:  # Kommentar: Check
+        raise ValueError(f"Unbekannte Auswahl: {auswahl}")  # Kommentar: Fehler
+    dateiname = config.VORLAGEN[auswahl]  # Kommentar: Dateiname
+    if getattr(config, "VORLAGEN_ORDNER", None):  # Kommentar: Wenn Vorlagenordner gesetzt
+        pfad1 = os.path.join(config.VORLAGEN_ORDNER, dateiname)  # Kommentar: Pfad
+        if os.path.isfile(pfad1):  # Kommentar: Existiert?
+            return pfad1  # Kommentar: Treffer
+    pfad2 = os.path.join(BASE_DIR, dateiname)  # Kommentar: Fallback in BASE_DIR
+    if os.path.isfile(pfad2):  # Kommentar: Existiert?
+        return pfad2  # Kommentar: Treffer
+    if os.path.isabs(dateiname) and os.path.isfile(dateiname):  # Kommentar: Absoluter Pfad
+        return dateiname  # Kommentar: Treffer
+    raise FileNotFoundError(f"Vorlage nicht gefunden: {dateiname}")  # Kommentar: Fehler
+
+
+class _JinjaMitCache(jinja2.Environment):  # Kommentar: Jinja-Umgebung, die kompilierte Templates je Quelltext wiederverwendet
+    def __init__(self):  # Kommentar: Standard-Einstellungen wie docxtpl ohne jinja_env
+        super().__init__()  # Kommentar: autoescape aus
+        self._kompiliert = {}  # Kommentar: Quelltext -> kompiliertes Template
+        self._kompiliert_lock = threading.Lock()  # Kommentar: Lock (Batch-Threads)
+
+    def from_string(self, source, globals=None, template_class=None):  # Kommentar: wie jinja2, aber einmal kompilieren
+        if globals or template_class:  # Kommentar: Sonderfälle nicht cachen
+            return super().from_string(source, globals, template_class)  # Kommentar: Standardweg
+        with self._kompiliert_lock:  # Kommentar: exklusiv
+            template = self._kompiliert.get(source)  # Kommentar: schon kompiliert?
+        if template is None:  # Kommentar: erstes Rendern dieses Teils
+            template = super().from_string(source)  # Kommentar: parsen + kompilieren
+            with self._kompiliert_lock:  # Kommentar: exklusiv
+                self._kompiliert[source] = template  # Kommentar: merken
+        return template  # Kommentar: Template (Rendern ist threadsicher)
+
+
+class _GecachteVorlage(DocxTemplate):  # Kommentar: DocxTemplate, das patch_xml + Jinja-Kompilat der Vorlage wiederverwendet
+    def __init__(self, template_file, eintrag: dict):  # Kommentar: Cache-Eintrag der Vorlage (mtime-genau)
+        super().__init__(template_file)  # Kommentar: Zip + XML laden (lazy)
+        self._eintrag = eintrag  # Kommentar: gemeinsame Caches dieser Vorlagenversion
+
+    def patch_xml(self, src_xml):  # Kommentar: XML-Bereinigung (Regex-lastig) nur einmal je Teil
+        gepatcht = self._eintrag["gepatcht"].get(src_xml)  # Kommentar: schon bereinigt?
+        if gepatcht is None:  # Kommentar: erstes Rendern
+            gepatcht = super().patch_xml(src_xml)  # Kommentar: bereinigen (reine Funktion des Quelltexts)
+            self._eintrag["gepatcht"][src_xml] = gepatcht  # Kommentar: merken
+        return gepatcht  # Kommentar: bereinigtes XML
+
+    def render(self, context, jinja_env=None, autoescape=False):  # Kommentar: ohne eigene Umgebung die gecachte nutzen
+        if jinja_env is None and not autoescape:  # Kommentar: Standardfall der App
+            jinja_env = self._eintrag["jinja"]  # Kommentar: kompilierte Templates wiederverwenden
+        super().render(context, jinja_env, autoescape)  # Kommentar: normal rendern
+
+
+_vorlagen_cache = {}  # Kommentar: Vorlagenpfad -> {"mtime", "groesse", "bytes", "gepatcht", "jinja"} (einmal pro Prozess gelesen)
+_vorlagen_cache_lock = threading.Lock()  # Kommentar: Lock für den Cache (mehrere Sessions/Batch-Threads)
+
+
+def vorlage_laden(vorlage_pfad: str) -> DocxTemplate:  # Kommentar: Renderbare Vorlage mit gecachtem patch_xml/Jinja-Kompilat
+    pfad = os.path.abspath(vorlage_pfad)  # Kommentar: Pfad normalisieren (Cache-Schlüssel)
+    info = os.stat(pfad)  # Kommentar: mtime/Größe für Invalidierung
+    with _vorlagen_cache_lock:  # Kommentar: Cache exklusiv
+        eintrag = _vorlagen_cache.get(pfad)  # Kommentar: vorhandener Eintrag
+        if eintrag is None or eintrag["mtime"] != info.st_mtime_ns or eintrag["groesse"] != info.st_size:  # Kommentar: neu oder geändert?
+            with open(pfad, "rb") as f:  # Kommentar: Vorlage einmal lesen
+                roh = f.read()  # Kommentar: Bytes
+            eintrag = {"mtime": info.st_mtime_ns, "groesse": info.st_size, "bytes": roh, "gepatcht": {}, "jinja": _JinjaMitCache()}  # Kommentar: Eintrag (neue Caches je Version)
+            _vorlagen_cache[pfad] = eintrag  # Kommentar: speichern
+    return _GecachteVorlage(io.BytesIO(eintrag["bytes"]), eintrag)  # Kommentar: frisches Dokument aus den Bytes (Zip-Parse ist billig, kein deepcopy)
+
+
+def vorlagen_cache_leeren() -> None:  # Kommentar: Cache leeren (z.B. nach Vorlagen-Update)
+    with _vorlagen_cache_lock:  # Kommentar: Cache exklusiv
+        _vorlagen_cache.clear()  # Kommentar: leeren
+
+
+def word_aus_vorlage_bytes(daten: dict, vorlage_pfad: str) -> bytes:  # Kommentar: DOCX rendern direkt in den Speicher
+    with telemetrie.stufe("docx_rendern", vorlage=os.path.basename(vorlage_pfad)) as messung:  # Kommentar: Render + Speichern messen
+        doc = vorlage_laden(vorlage_pfad)  # Kommentar: Template aus Cache
+        doc.render(daten)  # Kommentar: rendern (alle Keys verfügbar)
+        puffer = io.BytesIO()  # Kommentar: In-Memory-Ziel
+        doc.save(puffer)  # Kommentar: speichern in Puffer
+        messung["docx_bytes"] = puffer.tell()  # Kommentar: Größe des DOCX
+    with telemetrie.stufe("erzwinge_schrift") as messung:  # Kommentar: Schrift-Durchlauf messen
+        docx_bytes = erzwinge_schrift_bytes(puffer.getvalue(), "Arial MT Pro", 11)  # Kommentar: Schrift global erzwingen
+        messung["docx_bytes"] = len(docx_bytes)  # Kommentar: Größe danach
+    return docx_bytes  # Kommentar: DOCX-Bytes zurückgeben
+
+
 def word_aus_vorlage_erstellen(daten: dict, vorlage_pfad: str, ziel_pfad: str) -> None:  # Kommentar: DOCX rendern
-    doc = DocxTemplate(vorlage_pfad)  # Kommentar: Template laden
+    docx_bytes = word_aus_vorlage_bytes(daten, vorlage_pfad)  # Kommentar: im Speicher rendern
     os.makedirs(os.path.dirname(ziel_pfad), exist_ok=True)  # Kommentar: Ordner sicherstellen
-    doc.render(daten)  # Kommentar: rendern (alle Keys verfügbar)
-    doc.save(ziel_pfad)  # Kommentar: speichern
-    erzwinge_schrift(ziel_pfad, "Arial MT Pro", 11)  # Kommentar: Schrift global erzwingen (wenn python-docx verfügbar)
+    with open(ziel_pfad, "wb") as f:  # Kommentar: Datei öffnen
+        f.write(docx_bytes)  # Kommentar: einmal schreiben
+
+
+def daten_aus_pdf_bytes(pdf_bytes: bytes, auswahl: str, steuerstatus: str, info: dict | None = None, bei_feld=None) -> dict:  # Kommentar: PDF-Bytes -> KI -> Daten-Dict (ohne Dateien)
+    ki_text = programm_1_ki_input.analyse_aus_bytes(pdf_bytes, auswahl, steuerstatus, info, bei_feld)  # Kommentar: Analyse im Speicher (Felder ggf. vorab per Callback)
+    with telemetrie.stufe("json_parsen", antwort_zeichen=len(ki_text)) as messung:  # Kommentar: Parser messen
+        daten = json_aus_ki_antwort_parsen(ki_text)  # Kommentar: JSON parsen
+        messung["felder"] = len(daten)  # Kommentar: Anzahl Felder
+    if info is not None:  # Kommentar: Aufrufer will die Antwort (z.B. Fall-Speicher)
+        info["ki_text"] = ki_text  # Kommentar: Modellantwort merken
+    return daten  # Kommentar: Daten zurückgeben
+
+
+def generate_from_data(daten: dict, vorlage_pfad: str, auswahl: str, steuerstatus: str, zus_bez: str = "", zus_betrag: str = "") -> bytes:  # Kommentar: Daten-Dict -> DOCX-Bytes (ohne Dateien)
+    with telemetrie.stufe("daten_vorbereiten"):  # Kommentar: Defaults + Summe messen
+        daten = prepare_data_for_template(dict(daten), auswahl, steuerstatus, zus_bez, zus_betrag)  # Kommentar: Kopie nachbearbeiten + Summe
+    return word_aus_vorlage_bytes(daten, vorlage_pfad)  # Kommentar: rendern im Speicher
+
+
+def pdf_zu_docx_bytes(pdf_bytes: bytes, vorlage_pfad: str, auswahl: str, steuerstatus: str, zus_bez: str = "", zus_betrag: str = "") -> bytes:  # Kommentar: Komplette Pipeline im Speicher
+    daten = daten_aus_pdf_bytes(pdf_bytes, auswahl, steuerstatus)  # Kommentar: Analyse
+    return generate_from_data(daten, vorlage_pfad, auswahl, steuerstatus, zus_bez, zus_betrag)  # Kommentar: Rendern
 
 
 def ki_datei_verarbeiten(pfad_ki_txt: str, vorlage_pfad: str, auswahl: str, steuerstatus: str, zus_bez: str, zus_betrag: str) -> str:  # Kommentar: KI-Datei -> DOCX
@@ -0,0 +1,142 @@
+# regel_extraktor.py  # Kommentar: Lokale Regel-Extraktion (Regex/Schlüsselwörter) für mechanisch erkennbare Felder, ohne KI
+
+import re  # Kommentar: Reguläre Ausdrücke (einmal kompiliert)
+
+MIN_KONFIDENZ = 0.8  # Kommentar: ab hier gilt ein Wert als sicher (wird der KI nicht mehr abgefragt)
+
+BETRAG_RE = re.compile(r"(?<![\d.,])(\d{1,3}(?:\.\d{3})*|\d+),(\d{2})(?!\d)\s*(?:€|EUR|Euro)?", re.IGNORECASE)  # Kommentar: deutscher Euro-Betrag
+DATUM_RE = re.compile(r"(?<!\d)(\d{1,2})\.\s?(\d{1,2})\.\s?(\d{4}|\d{2})(?!\d)")  # Kommentar: TT.MM.JJJJ oder TT.MM.JJ
+UHRZEIT_RE = re.compile(r"(?<!\d)([01]?\d|2[0-3])[:.]([0-5]\d)(?!\d)(?:\s*Uhr)?")  # Kommentar: HH:MM oder HH.MM
+UNFALL_KONTEXT_RE = re.compile(r"Unfall|Schadens?(?:tag|zeit|ereignis)|Tatzeit", re.IGNORECASE)  # Kommentar: Zeile spricht vom Unfall (nicht Besichtigung/Termin)
+KENNZEICHEN_RE = re.compile(r"\b([A-ZÄÖÜ]{1,3})[- ]([A-Z]{1,2})[- ]?(\d{1,4}[EH]?)\b")  # Kommentar: deutsches Kennzeichen (z.B. "B-AB 1234", "M XY 12E")
+NUMMER_RE = re.compile(r"[:.#]?\s*([A-Z0-9][A-Z0-9./\-]*(?: ?[A-Z0-9./\-]+){0,3})")  # Kommentar: Nummer/Aktenzeichen nach dem Schlüsselwort
+
+SCHLUESSEL = {  # Kommentar: Feld -> Schlüsselwörter (kompiliert, Zeile muss sie enthalten)
+    "KENNZEICHEN": re.compile(r"(?:amtl\.?\s*)?Kennzeichen|Kfz-Kennzeichen", re.IGNORECASE),  # Kommentar: Kennzeichen
+    "UNFALL_DATUM": re.compile(r"Unfalltag|Unfalldatum|Schadentag|Schadendatum|Schadenstag|Unfall\s+am|Tag\s+des\s+Unfalls", re.IGNORECASE),  # Kommentar: Datum
+    "UNFALL_UHRZEIT": re.compile(r"Unfallzeit|Uhrzeit|Unfall\s*(?:am|um)\b.*\bUhr", re.IGNORECASE),  # Kommentar: Uhrzeit
+    "SCHADENSNUMMER": re.compile(r"Schadens?[- ]?(?:nummer|nr\.?)", re.IGNORECASE),  # Kommentar: echte Schadensnummer
+    "VS_NUMMER": re.compile(r"VS[- ]?Nr\.?|Versicherungsschein(?:nummer|-Nr\.?)", re.IGNORECASE),  # Kommentar: VS-Nr (nur Ersatz für Schadensnummer)
+    "AKTENZEICHEN": re.compile(r"Aktenzeichen|\bAz\.", re.IGNORECASE),  # Kommentar: Aktenzeichen
+    "POLIZEIAKTE_NUMMER": re.compile(r"Tagebuch[- ]?(?:nummer|nr\.?)|Tgb\.?[- ]?Nr\.?|Vorgangsnummer\s+(?:der\s+)?Polizei", re.IGNORECASE),  # Kommentar: Polizei
+    "REPARATURKOSTEN": re.compile(r"Reparaturkosten", re.IGNORECASE),  # Kommentar: Betrag
+    "WIEDERBESCHAFFUNGSWERT": re.compile(r"Wiederbeschaffungswert|\bWBW\b", re.IGNORECASE),  # Kommentar: Betrag
+    "RESTWERT": re.compile(r"Restwert", re.IGNORECASE),  # Kommentar: Betrag
+    "WERTMINDERUNG": re.compile(r"Wertminderung|Minderwert", re.IGNORECASE),  # Kommentar: Betrag
+}  # Kommentar: Ende Schlüsselwörter
+BETRAGSFELDER = ["REPARATURKOSTEN", "WIEDERBESCHAFFUNGSWERT", "RESTWERT", "WERTMINDERUNG"]  # Kommentar: Felder mit Euro-Betrag
+NETTO_BRUTTO_RE = re.compile(r"\b(netto|brutto)\b", re.IGNORECASE)  # Kommentar: Steuerhinweis in der Zeile
+
+PFLICHTFELDER = {  # Kommentar: Felder, die für den Schnellmodus sicher erkannt sein müssen (je Variante, Schlüsselwort in der Auswahl)
+    "fiktive abrechnung": ["KENNZEICHEN", "UNFALL_DATUM", "SCHADENSNUMMER", "REPARATURKOSTEN"],  # Kommentar: Reparaturschaden fiktiv
+    "konkrete abrechnung": ["KENNZEICHEN", "UNFALL_DATUM", "SCHADENSNUMMER", "REPARATURKOSTEN"],  # Kommentar: Reparaturschaden konkret
+    "130": ["KENNZEICHEN", "UNFALL_DATUM", "SCHADENSNUMMER", "REPARATURKOSTEN", "WIEDERBESCHAFFUNGSWERT"],  # Kommentar: 130%-Regelung
+    "totalschaden": ["KENNZEICHEN", "UNFALL_DATUM", "SCHADENSNUMMER", "WIEDERBESCHAFFUNGSWERT", "RESTWERT"],  # Kommentar: Totalschaden
+}  # Kommentar: Ende Pflichtfelder
+
+
+def _betrag_formatieren(euro: str, cent: str) -> str:  # Kommentar: "1.234" + "56" -> "1.234,56 €"
+    ziffern = euro.replace(".", "")  # Kommentar: Tausenderpunkte entfernen
+    gruppiert = f"{int(ziffern):,}".replace(",", ".")  # Kommentar: Tausenderpunkte neu setzen
+    return f"{gruppiert},{cent} €"  # Kommentar: deutsches Format wie im Prompt
+
+
+def _datum_formatieren(tag: str, monat: str, jahr: str) -> str | None:  # Kommentar: TT.MM.JJJJ (None bei unmöglichem Datum)
+    if not (1 <= int(tag) <= 31 and 1 <= int(monat) <= 12):  # Kommentar: plausibel?
+        return None  # Kommentar: verwerfen
+    if len(jahr) == 2:  # Kommentar: zweistellig?
+        jahr = "20" + jahr  # Kommentar: Gutachten sind aktuell
+    return f"{int(tag):02d}.{int(monat):02d}.{jahr}"  # Kommentar: formatieren
+
+
+def _kandidaten(zeilen: list[str], feld: str) -> list[tuple[str, str]]:  # Kommentar: (Wert, Zeile) für alle Zeilen mit Schlüsselwort
+    schluessel = SCHLUESSEL[feld]  # Kommentar: Regex des Feldes
+    ergebnis = []  # Kommentar: Kandidaten
+    for zeile in zeilen:  # Kommentar: Zeilen iterieren
+        m = schluessel.search(zeile)  # Kommentar: Schlüsselwort?
+        if not m:  # Kommentar: nein
+            continue  # Kommentar: nächste Zeile
+        rest = zeile[m.end():]  # Kommentar: Wert steht hinter dem Schlüsselwort
+        wert = None  # Kommentar: Default
+        if feld in BETRAGSFELDER:  # Kommentar: Betrag
+            b = BETRAG_RE.search(rest)  # Kommentar: erster Betrag
+            wert = _betrag_formatieren(b.group(1), b.group(2)) if b else None  # Kommentar: formatieren
+        elif feld == "UNFALL_DATUM":  # Kommentar: Datum
+            d = DATUM_RE.search(rest)  # Kommentar: erstes Datum
+            wert = _datum_formatieren(*d.groups()) if d else None  # Kommentar: formatieren
+        elif feld == "UNFALL_UHRZEIT":  # Kommentar: Uhrzeit
+            for u in UHRZEIT_RE.finditer(zeile, m.start()):  # Kommentar: "Unfall am ... um 14:30 Uhr" -> ganze Zeile ab Schlüsselwort
+                if not DATUM_RE.match(zeile, u.start()):  # Kommentar: kein Datumsteil ("12.03." ist keine Uhrzeit)
+                    wert = f"{int(u.group(1)):02d}:{u.group(2)}"  # Kommentar: HH:MM
+                    break  # Kommentar: erster Treffer
+        elif feld == "KENNZEICHEN":  # Kommentar: Kennzeichen
+            k = KENNZEICHEN_RE.search(rest)  # Kommentar: erstes Kennzeichen
+            wert = f"{k.group(1)}-{k.group(2)} {k.group(3)}" if k else None  # Kommentar: einheitlich "B-AB 1234"
+        else:  # Kommentar: Nummernfelder
+            n = NUMMER_RE.match(rest.strip(" \t:"))  # Kommentar: direkt folgende Nummer
+            if n and any(c.isdigit() for c in n.group(1)):  # Kommentar: muss Ziffern enthalten
+                wert = n.group(1).strip(" .-/")  # Kommentar: Rand säubern
+        if wert:  # Kommentar: Wert gefunden?
+            ergebnis.append((wert, zeile))  # Kommentar: merken
+    return ergebnis  # Kommentar: Liste zurückgeben
+
+
+def steuer_praeferenz(auswahl: str) -> str | None:  # Kommentar: Welche Reparaturkosten die Variante braucht (wie prompt_zusatz)
+    norm = (auswahl or "").lower()  # Kommentar: normalisieren
+    if "fiktive abrechnung" in norm:  # Kommentar: fiktiv
+        return "netto"  # Kommentar: ausschließlich netto
+    if "konkrete abrechnung" in norm or "130" in norm:  # Kommentar: konkret/130%
+        return "brutto"  # Kommentar: inkl. MwSt
+    return None  # Kommentar: keine Vorgabe
+
+
+def _bewerten(feld: str, kandidaten: list[tuple[str, str]], auswahl: str = "") -> tuple[str, float]:  # Kommentar: Wert + Konfidenz aus Kandidaten
+    werte = [w for w, _ in kandidaten]  # Kommentar: nur Werte
+    if feld in BETRAGSFELDER and any(NETTO_BRUTTO_RE.search(z) for _, z in kandidaten):  # Kommentar: netto/brutto getrennt ausgewiesen?
+        praeferenz = steuer_praeferenz(auswahl) if feld == "REPARATURKOSTEN" else None  # Kommentar: nur bei Reparaturkosten eindeutig
+        passend = {w for w, z in kandidaten if praeferenz and (m := NETTO_BRUTTO_RE.search(z)) and m.group(1).lower() == praeferenz}  # Kommentar: Werte mit passendem Hinweis
+        if len(passend) == 1:  # Kommentar: genau ein passender Wert?
+            return passend.pop(), 0.9  # Kommentar: sicher
+        return werte[0], 0.5  # Kommentar: Variante entscheidet -> KI fragen
+    eindeutig = len(set(werte)) == 1  # Kommentar: alle Fundstellen gleich?
+    konfidenz = 0.95 if eindeutig else 0.5  # Kommentar: Widerspruch -> unsicher
+    if feld == "UNFALL_UHRZEIT":  # Kommentar: Uhrzeit hat oft Nebenfunde (Besichtigung, Termin usw.)
+        unfall = [w for w, z in kandidaten if UNFALL_KONTEXT_RE.search(z)]  # Kommentar: Fundstellen mit Unfallbezug
+        if not unfall:  # Kommentar: nur "Uhrzeit: ..." ohne Unfallbezug
+            return werte[0], 0.6  # Kommentar: unter MIN_KONFIDENZ -> KI entscheidet
+        return unfall[0], 0.85 if len(set(unfall)) == 1 else 0.5  # Kommentar: eindeutig mit Unfallbezug etwas vorsichtiger als andere Felder
+    return werte[0], konfidenz  # Kommentar: erster Fund + Konfidenz
+
+
+def felder_extrahieren(text: str, auswahl: str = "") -> dict:  # Kommentar: Text -> {FELD: {"wert": str, "konfidenz": float}}
+    zeilen = text.splitlines()  # Kommentar: zeilenweise (Wert steht meist hinter dem Schlüsselwort)
+    ergebnis = {}  # Kommentar: Felder
+    for feld in SCHLUESSEL:  # Kommentar: alle Felder
+        kandidaten = _kandidaten(zeilen, feld)  # Kommentar: Fundstellen
+        if kandidaten:  # Kommentar: gefunden?
+            wert, konfidenz = _bewerten(feld, kandidaten, auswahl)  # Kommentar: bewerten
+            ergebnis[feld] = {"wert": wert, "konfidenz": konfidenz}  # Kommentar: merken
+    vs = ergebnis.pop("VS_NUMMER", None)  # Kommentar: VS-Nr ist kein eigenes Template-Feld
+    if vs and "SCHADENSNUMMER" not in ergebnis:  # Kommentar: Priorität: echte Schadensnummer > VS-Nr
+        ergebnis["SCHADENSNUMMER"] = {"wert": vs["wert"], "konfidenz": min(vs["konfidenz"], 0.5)}  # Kommentar: nur als unsicherer Ersatz
+    if "KENNZEICHEN" in ergebnis:  # Kommentar: Template kennt zwei Kennzeichen-Keys
+        ergebnis["FAHRZEUG_KENNZEICHEN"] = dict(ergebnis["KENNZEICHEN"])  # Kommentar: gleicher Wert
+    return ergebnis  # Kommentar: Ergebnis zurückgeben
+
+
+def sichere_werte(felder: dict, min_konfidenz: float = MIN_KONFIDENZ) -> dict:  # Kommentar: nur Werte mit ausreichender Konfidenz
+    return {k: f["wert"] for k, f in felder.items() if f["konfidenz"] >= min_konfidenz}  # Kommentar: {FELD: wert}
+
+
+def pflichtfelder(auswahl: str) -> list[str]:  # Kommentar: Pflichtfelder der Variante (leer = Schnellmodus nie möglich)
+    norm = (auswahl or "").lower()  # Kommentar: robust vergleichen (wie prompt_zusatz)
+    for schluessel, felder in PFLICHTFELDER.items():  # Kommentar: Varianten prüfen
+        if schluessel in norm:  # Kommentar: Treffer?
+            return felder  # Kommentar: Liste
+    return []  # Kommentar: unbekannte Variante
+
+
+def alle_pflichtfelder_sicher(felder: dict, auswahl: str) -> bool:  # Kommentar: Schnellmodus möglich?
+    benoetigt = pflichtfelder(auswahl)  # Kommentar: Pflichtfelder
+    sicher = sichere_werte(felder)  # Kommentar: sichere Werte
+    return bool(benoetigt) and all(k in sicher for k in benoetigt)  # Kommentar: alle vorhanden?
@@ -0,0 +1,240 @@
+# serienbrief.py  # Kommentar: Serienbrief-Schnellpfad – Vorlage einmal "kompilieren", danach Werte nur noch in statische XML-Segmente einsetzen
+
+import io  # Kommentar: In-Memory-Zip
+import os  # Kommentar: Pfade/mtime
+import re  # Kommentar: Platzhalter/Bereinigung
+import sys  # Kommentar: Exit-Code
+import json  # Kommentar: Fälle als JSON
+import zlib  # Kommentar: Deflate + CRC32 (Zip-Einträge selbst schreiben)
+import struct  # Kommentar: Zip-Header als Bytes
+import argparse  # Kommentar: Kommandozeile
+import threading  # Kommentar: Lock für den Kompilat-Cache
+import zipfile  # Kommentar: Vorlage lesen
+from xml.sax.saxutils import escape  # Kommentar: Werte XML-sicher machen (&, <, >)
+
+import docx_schrift  # Kommentar: Schrift einmal in der Vorlage setzen (statt je Brief)
+import telemetrie  # Kommentar: Kompilieren messen
+import programm_2_word_output  # Kommentar: docxtpl-Weg als Rückfall (Steuerlogik in der Vorlage)
+
+SCHRIFT = "Arial MT Pro"  # Kommentar: wie word_aus_vorlage_bytes
+SCHRIFT_PT = 11  # Kommentar: Schriftgröße in Punkt
+ZIP_STUFE = int(os.getenv("SERIENBRIEF_ZIP_STUFE", "6"))  # Kommentar: Deflate-Stufe für die variablen Teile (1 = schneller, größer)
+RENDER_TEIL_RE = re.compile(r"^word/(?:document|header\d*|footer\d*|footnotes)\.xml$")  # Kommentar: Teile, die docxtpl rendert
+EIGENSCHAFTEN_TEIL = "docProps/core.xml"  # Kommentar: docxtpl rendert auch Titel/Autor usw.
+TAG_ZWISCHEN_KLAMMERN_RE = re.compile(r"(?<={)(<[^>]*>)+(?=[\{%\#])|(?<=[%\}\#])(<[^>]*>)+(?=\})", re.S)  # Kommentar: "{<tags>{" -> "{{" (wie docxtpl)
+TAG_BLOCK_RE = re.compile(r"{%(?:(?!%}).)*|{#(?:(?!#}).)*|{{(?:(?!}}).)*", re.S)  # Kommentar: Inhalt von {{ }}/{% %}/{# #}
+TEXT_WECHSEL_RE = re.compile(r"</w:t>.*?(<w:t>|<w:t [^>]*>)", re.S)  # Kommentar: Run-Grenzen innerhalb eines Platzhalters
+LEERZEICHEN_RE = re.compile(r"<w:t>((?:(?!<w:t>).)*)({{.*?}}|{%.*?%})", re.S)  # Kommentar: Text mit Platzhalter braucht xml:space="preserve"
+PLATZHALTER_RE = re.compile(r"{{\s*([A-Za-z_]\w*)\s*}}")  # Kommentar: einfacher Platzhalter {{KEY}}
+STEUER_RE = re.compile(r"{%|{#|{{")  # Kommentar: jede Jinja-Syntax (nach Abzug der einfachen Platzhalter = nicht kompilierbar)
+TEXT_START_RE = re.compile(r"<w:t(?: [^>]*)?>")  # Kommentar: Beginn eines Textknotens
+RUN_START_RE = re.compile(r"<w:r(?: [^>]*)?>")  # Kommentar: Beginn eines Runs
+ABSATZ_START_RE = re.compile(r"<w:p(?: [^>]*)?>")  # Kommentar: Beginn eines Absatzes
+RPR_RE = re.compile(r"<w:rPr>.*?</w:rPr>")  # Kommentar: Run-Eigenschaften (wie docxtpl resolve_listing)
+PPR_RE = re.compile(r"<w:pPr>.*?</w:pPr>")  # Kommentar: Absatz-Eigenschaften (wie docxtpl resolve_listing)
+SONDERZEICHEN = ("\t", "\a", "\n", "\f")  # Kommentar: Zeichen, die docxtpl in Word-Elemente umsetzt (Reihenfolge wie dort)
+
+
+class NichtKompilierbar(ValueError):  # Kommentar: Vorlage nutzt mehr als {{KEY}} (Schleifen, Bedingungen, Filter)
+    pass  # Kommentar: nur Typ
+
+
+def _teil_bereinigen(xml: str) -> str:  # Kommentar: Von Word zerstückelte Platzhalter zusammenführen (Schritte aus docxtpl.patch_xml)
+    xml = TAG_ZWISCHEN_KLAMMERN_RE.sub("", xml)  # Kommentar: Tags zwischen den Klammern entfernen
+    xml = TAG_BLOCK_RE.sub(lambda m: TEXT_WECHSEL_RE.sub("", m.group(0)), xml)  # Kommentar: Run-Wechsel im Platzhalter entfernen
+    return LEERZEICHEN_RE.sub(r'<w:t xml:space="preserve">\1\2', xml)  # Kommentar: Leerzeichen in Werten erhalten
+
+
+def _sonder_ersetzungen(xml: str, pos: int) -> dict | None:  # Kommentar: Ersatz für Tab/Umbruch an dieser Stelle (None = nicht im Textknoten)
+    text_start = None  # Kommentar: letzter Textknoten vor dem Platzhalter
+    for text_start in TEXT_START_RE.finditer(xml, 0, pos):  # Kommentar: vorwärts bis zum letzten
+        pass  # Kommentar: nur letzten behalten
+    if text_start is None or "<" in xml[text_start.end():pos]:  # Kommentar: Platzhalter steht nicht im Text (z.B. Attribut)?
+        return None  # Kommentar: dort setzt docxtpl nichts um
+    run = [m for m in RUN_START_RE.finditer(xml, 0, pos)]  # Kommentar: Runs vor dem Platzhalter
+    absatz = [m for m in ABSATZ_START_RE.finditer(xml, 0, pos)]  # Kommentar: Absätze vor dem Platzhalter
+    rpr = RPR_RE.search(xml, run[-1].start(), pos) if run else None  # Kommentar: Eigenschaften des umgebenden Runs
+    ppr = PPR_RE.search(xml, absatz[-1].start(), pos) if absatz else None  # Kommentar: Eigenschaften des umgebenden Absatzes
+    rpr = rpr.group(0) if rpr else ""  # Kommentar: als Text
+    ppr = ppr.group(0) if ppr else ""  # Kommentar: als Text
+    return {  # Kommentar: wie docxtpl.resolve_listing
+        "\t": f'</w:t></w:r><w:r>{rpr}<w:tab/></w:r><w:r>{rpr}<w:t xml:space="preserve">',  # Kommentar: Tabulator
+        "\a": f'</w:t></w:r></w:p><w:p>{ppr}<w:r>{rpr}<w:t xml:space="preserve">',  # Kommentar: neuer Absatz
+        "\n": '</w:t><w:br/><w:t xml:space="preserve">',  # Kommentar: Zeilenumbruch
+        "\f": f'</w:t></w:r></w:p><w:p><w:r><w:br w:type="page"/></w:r></w:p><w:p>{ppr}<w:r>{rpr}<w:t xml:space="preserve">',  # Kommentar: Seitenumbruch
+    }  # Kommentar: Ende Ersetzungen
+
+
+def _teil_zerlegen(xml: str) -> tuple[list[str], list[tuple]]:  # Kommentar: XML -> statische Segmente + Platzhalter dazwischen
+    segmente = []  # Kommentar: len(platzhalter) + 1 Segmente
+    platzhalter = []  # Kommentar: (Key, Sonderzeichen-Ersatz)
+    pos = 0  # Kommentar: Ende des letzten Platzhalters
+    for m in PLATZHALTER_RE.finditer(xml):  # Kommentar: alle {{KEY}}
+        segmente.append(xml[pos:m.start()])  # Kommentar: statischer Teil davor
+        platzhalter.append((m.group(1), _sonder_ersetzungen(xml, m.start())))  # Kommentar: Key + Umgebung
+        pos = m.end()  # Kommentar: weiter hinter dem Platzhalter
+    segmente.append(xml[pos:])  # Kommentar: Rest
+    for segment in segmente:  # Kommentar: übrig gebliebene Jinja-Syntax?
+        if STEUER_RE.search(segment):  # Kommentar: Bedingung/Schleife/Filter/Kommentar
+            raise NichtKompilierbar("Vorlage enthält Jinja-Steuerlogik oder Ausdrücke")  # Kommentar: docxtpl nötig
+    return segmente, platzhalter  # Kommentar: Ergebnis
+
+
+def _komprimieren(daten: bytes, methode: int) -> bytes:  # Kommentar: Roh-Deflate (ohne zlib-Header), wie im Zip erwartet
+    if methode == zipfile.ZIP_STORED:  # Kommentar: unkomprimiert (z.B. PNG)
+        return daten  # Kommentar: unverändert
+    packer = zlib.compressobj(ZIP_STUFE, zlib.DEFLATED, -15)  # Kommentar: raw deflate
+    return packer.compress(daten) + packer.flush()  # Kommentar: komplett
+
+
+def _dos_zeit(datum_zeit: tuple) -> tuple[int, int]:  # Kommentar: Zip-Zeitstempel (DOS-Format)
+    jahr, monat, tag, stunde, minute, sekunde = datum_zeit  # Kommentar: aus ZipInfo
+    return (stunde << 11) | (minute << 5) | (sekunde // 2), ((jahr - 1980) << 9) | (monat << 5) | tag  # Kommentar: (Zeit, Datum)
+
+
+def vorlage_kompilieren(vorlage_bytes: bytes) -> dict:  # Kommentar: Vorlage einmal zerlegen; Schrift wird vorab gesetzt, statische Teile vorab komprimiert
+    eintraege = []  # Kommentar: Zip-Einträge in Originalreihenfolge
+    with zipfile.ZipFile(io.BytesIO(vorlage_bytes)) as zin:  # Kommentar: Vorlage öffnen
+        for info in zin.infolist():  # Kommentar: Einträge
+            daten = zin.read(info.filename)  # Kommentar: Inhalt
+            methode = zipfile.ZIP_STORED if info.compress_type == zipfile.ZIP_STORED else zipfile.ZIP_DEFLATED  # Kommentar: Kompression wie im Original
+            eintrag = {"name": info.filename, "methode": methode, "zeit": _dos_zeit(info.date_time)}  # Kommentar: Metadaten
+            if info.filename == EIGENSCHAFTEN_TEIL and STEUER_RE.search(daten.decode("utf-8", "replace")):  # Kommentar: Platzhalter in Dokumenteigenschaften?
+                raise NichtKompilierbar("Platzhalter in den Dokumenteigenschaften")  # Kommentar: selten, docxtpl übernimmt
+            if info.filename.endswith(".xml"):  # Kommentar: XML-Teil
+                xml = daten.decode("utf-8")  # Kommentar: OOXML ist UTF-8
+                if RENDER_TEIL_RE.match(info.filename) and "{" in xml:  # Kommentar: möglicherweise Platzhalter
+                    xml = _teil_bereinigen(xml)  # Kommentar: zerstückelte Platzhalter zusammenführen
+                xml = docx_schrift.teil_normalisieren(info.filename, xml, SCHRIFT, SCHRIFT_PT)  # Kommentar: Schrift einmal setzen (Werte ändern keine Runs)
+                if RENDER_TEIL_RE.match(info.filename) and PLATZHALTER_RE.search(xml):  # Kommentar: variabler Teil?
+                    eintrag["segmente"], eintrag["platzhalter"] = _teil_zerlegen(xml)  # Kommentar: je Brief neu zusammensetzen
+                    eintraege.append(eintrag)  # Kommentar: speichern
+                    continue  # Kommentar: nächster Eintrag
+                if RENDER_TEIL_RE.match(info.filename) and STEUER_RE.search(xml):  # Kommentar: nur Steuerlogik im Teil?
+                    raise NichtKompilierbar("Vorlage enthält Jinja-Steuerlogik oder Ausdrücke")  # Kommentar: docxtpl nötig
+                daten = xml.encode("utf-8")  # Kommentar: normalisierter Teil
+            eintrag["crc"] = zlib.crc32(daten)  # Kommentar: Prüfsumme einmal
+            eintrag["groesse"] = len(daten)  # Kommentar: unkomprimierte Größe
+            eintrag["daten"] = _komprimieren(daten, methode)  # Kommentar: einmal komprimieren
+            eintraege.append(eintrag)  # Kommentar: speichern
+    return {"eintraege": eintraege, "keys": sorted({k for e in eintraege for k, _ in e.get("platzhalter", [])})}  # Kommentar: Kompilat
+
+
+def _wert_xml(wert, sonder: dict | None) -> str:  # Kommentar: Wert wie Jinja in Text wandeln, escapen, Sonderzeichen umsetzen
+    text = escape(str(wert))  # Kommentar: str() wie Jinja ({{None}} -> "None")
+    if sonder is not None:  # Kommentar: Platzhalter im Textknoten?
+        for zeichen in SONDERZEICHEN:  # Kommentar: Tab, Absatz, Umbruch, Seitenumbruch
+            if zeichen in text:  # Kommentar: selten -> nur dann ersetzen
+                text = text.replace(zeichen, sonder[zeichen])  # Kommentar: Word-Element einsetzen
+    return text  # Kommentar: XML-Text
+
+
+def _teil_fuellen(eintrag: dict, daten: dict) -> bytes:  # Kommentar: Segmente und Werte abwechselnd zusammensetzen
+    segmente = eintrag["segmente"]  # Kommentar: statische Teile
+    teile = [segmente[0]]  # Kommentar: erstes Segment
+    for i, (key, sonder) in enumerate(eintrag["platzhalter"]):  # Kommentar: Platzhalter in Reihenfolge
+        teile.append(_wert_xml(daten[key], sonder) if key in daten else "")  # Kommentar: fehlender Key -> leer (wie Jinja)
+        teile.append(segmente[i + 1])  # Kommentar: folgendes Segment
+    return "".join(teile).encode("utf-8")  # Kommentar: ein Join, ein Encode
+
+
+def brief_aus_kompilat(kompilat: dict, daten: dict) -> bytes:  # Kommentar: Ein DOCX aus dem Kompilat (Zip direkt schreiben, statische Teile unverändert übernehmen)
+    lokal = []  # Kommentar: Local-Header + Daten
+    zentral = []  # Kommentar: Central-Directory-Einträge
+    versatz = 0  # Kommentar: Position im Archiv
+    for eintrag in kompilat["eintraege"]:  # Kommentar: Einträge in Originalreihenfolge
+        if "segmente" in eintrag:  # Kommentar: variabler Teil
+            roh = _teil_fuellen(eintrag, daten)  # Kommentar: Werte einsetzen
+            crc, groesse, gepackt = zlib.crc32(roh), len(roh), _komprimieren(roh, eintrag["methode"])  # Kommentar: je Brief
+        else:  # Kommentar: statischer Teil
+            crc, groesse, gepackt = eintrag["crc"], eintrag["groesse"], eintrag["daten"]  # Kommentar: vorberechnet
+        name = eintrag["name"].encode("utf-8")  # Kommentar: Dateiname
+        flags = 0x800 if not eintrag["name"].isascii() else 0  # Kommentar: UTF-8-Flag bei Umlauten
+        zeit, datum = eintrag["zeit"]  # Kommentar: Zeitstempel
+        kopf = struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, flags, eintrag["methode"], zeit, datum, crc, len(gepackt), groesse, len(name), 0)  # Kommentar: Local File Header
+        zentral.append(struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, flags, eintrag["methode"], zeit, datum, crc, len(gepackt), groesse, len(name), 0, 0, 0, 0, 0, versatz) + name)  # Kommentar: Central Directory
+        lokal.append(kopf + name)  # Kommentar: Header
+        lokal.append(gepackt)  # Kommentar: Daten
+        versatz += len(kopf) + len(name) + len(gepackt)  # Kommentar: nächste Position
+    verzeichnis = b"".join(zentral)  # Kommentar: Central Directory
+    ende = struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, len(zentral), len(zentral), len(verzeichnis), versatz, 0)  # Kommentar: End of Central Directory
+    return b"".join(lokal) + verzeichnis + ende  # Kommentar: fertiges DOCX
+
+
+_kompilat_cache = {}  # Kommentar: Vorlagenpfad -> {"mtime", "groesse", "kompilat"} (None = nicht kompilierbar, docxtpl nutzen)
+_kompilat_cache_lock = threading.Lock()  # Kommentar: Lock für den Cache
+
+
+def kompilat_laden(vorlage_pfad: str) -> dict | None:  # Kommentar: Kompilat aus Cache (None = Vorlage braucht docxtpl)
+    pfad = os.path.abspath(vorlage_pfad)  # Kommentar: Cache-Schlüssel
+    info = os.stat(pfad)  # Kommentar: mtime/Größe für Invalidierung
+    with _kompilat_cache_lock:  # Kommentar: exklusiv (einmal kompilieren)
+        eintrag = _kompilat_cache.get(pfad)  # Kommentar: vorhandener Eintrag
+        if eintrag is None or eintrag["mtime"] != info.st_mtime_ns or eintrag["groesse"] != info.st_size:  # Kommentar: neu oder geändert?
+            with telemetrie.stufe("vorlage_kompilieren", vorlage=os.path.basename(pfad)) as messung:  # Kommentar: einmalige Kosten messen
+                with open(pfad, "rb") as f:  # Kommentar: Vorlage lesen
+                    roh = f.read()  # Kommentar: Bytes
+                try:  # Kommentar: nur flache Platzhalter?
+                    kompilat = vorlage_kompilieren(roh)  # Kommentar: zerlegen
+                    messung["platzhalter"] = len(kompilat["keys"])  # Kommentar: Anzahl verschiedener Keys
+                except NichtKompilierbar as e:  # Kommentar: Steuerlogik
+                    print(f"[DEBUG] Serienbrief: {os.path.basename(pfad)} nicht kompilierbar ({e}), nutze docxtpl")  # Kommentar: Hinweis
+                    kompilat = None  # Kommentar: Rückfall merken
+            eintrag = {"mtime": info.st_mtime_ns, "groesse": info.st_size, "kompilat": kompilat}  # Kommentar: Eintrag
+            _kompilat_cache[pfad] = eintrag  # Kommentar: speichern
+    return eintrag["kompilat"]  # Kommentar: Kompilat oder None
+
+
+def kompilat_cache_leeren() -> None:  # Kommentar: Cache leeren (z.B. nach Vorlagen-Update)
+    with _kompilat_cache_lock:  # Kommentar: exklusiv
+        _kompilat_cache.clear()  # Kommentar: leeren
+
+
+def brief_bytes(daten: dict, vorlage_pfad: str) -> bytes:  # Kommentar: Ein Brief (vorbereitete Daten) -> DOCX-Bytes; schneller Weg oder docxtpl
+    kompilat = kompilat_laden(vorlage_pfad)  # Kommentar: Kompilat (einmal je Vorlage)
+    if kompilat is None:  # Kommentar: Steuerlogik in der Vorlage?
+        return programm_2_word_output.word_aus_vorlage_bytes(daten, vorlage_pfad)  # Kommentar: bisheriger Weg
+    return brief_aus_kompilat(kompilat, daten)  # Kommentar: Segmente + Werte
+
+
+def serienbriefe(faelle: list[dict], ausgabe_ordner: str) -> list[dict]:  # Kommentar: Viele Briefe schreiben (Fall: daten, auswahl, steuerstatus, optional name/zus_bez/zus_betrag)
+    os.makedirs(ausgabe_ordner, exist_ok=True)  # Kommentar: Ordner einmal anlegen
+    ergebnisse = []  # Kommentar: Ergebniszeilen
+    for i, fall in enumerate(faelle):  # Kommentar: Fälle nacheinander (CPU-gebunden)
+        name = fall.get("name") or f"brief_{i + 1:05d}"  # Kommentar: Dateiname ohne Endung
+        ergebnis = {"name": name, "status": "fehler", "docx": "", "fehler": ""}  # Kommentar: Ergebniszeile
+        try:  # Kommentar: Fehler je Brief abfangen
+            vorlage_pfad = programm_2_word_output.resolve_vorlage_pfad(fall["auswahl"])  # Kommentar: Vorlage der Variante
+            daten = programm_2_word_output.prepare_data_for_template(  # Kommentar: Defaults/Summen wie im Einzelfall
+                dict(fall["daten"]), fall["auswahl"], fall["steuerstatus"], fall.get("zus_bez", ""), fall.get("zus_betrag", "")
+            )  # Kommentar: Ende prepare
+            ziel_pfad = os.path.join(ausgabe_ordner, name + ".docx")  # Kommentar: Ausgabepfad
+            with open(ziel_pfad, "wb") as f:  # Kommentar: Datei öffnen
+                f.write(brief_bytes(daten, vorlage_pfad))  # Kommentar: Brief schreiben
+            ergebnis["status"] = "ok"  # Kommentar: Erfolg
+            ergebnis["docx"] = ziel_pfad  # Kommentar: Pfad merken
+        except Exception as e:  # Kommentar: Fehlerfall
+            ergebnis["fehler"] = repr(e)  # Kommentar: Fehlertext
+        ergebnisse.append(ergebnis)  # Kommentar: sammeln
+    return ergebnisse  # Kommentar: Ergebnisse
+
+
+def main(argv: list[str] | None = None) -> int:  # Kommentar: Entry-Point (python serienbrief.py --faelle faelle.json --ausgabe ordner)
+    parser = argparse.ArgumentParser(description="Serienbriefe aus gespeicherten Fall-Daten erzeugen (kompilierte Vorlagen)")  # Kommentar: Parser
+    parser.add_argument("--faelle", required=True, help="JSON-Liste von {name, daten, auswahl, steuerstatus[, zus_bez, zus_betrag]}")  # Kommentar: Eingabe
+    parser.add_argument("--ausgabe", default=os.path.join(programm_2_word_output.AUSGANGS_ORDNER, "serienbriefe"), help="Ausgabeordner")  # Kommentar: Ausgabe
+    args = parser.parse_args(argv)  # Kommentar: parsen
+
+    with open(args.faelle, "r", encoding="utf-8") as f:  # Kommentar: Fälle lesen
+        faelle = json.load(f)  # Kommentar: Liste
+    ergebnisse = serienbriefe(faelle, args.ausgabe)  # Kommentar: Briefe schreiben
+    ok = sum(1 for e in ergebnisse if e["status"] == "ok")  # Kommentar: Erfolge zählen
+    for e in ergebnisse:  # Kommentar: Fehler ausgeben
+        if e["status"] != "ok":  # Kommentar: nur Fehler
+            print(f"[fehler] {e['name']}: {e['fehler']}")  # Kommentar: Hinweis
+    print(f"{ok}/{len(ergebnisse)} Briefe -> {args.ausgabe}")  # Kommentar: Ergebnis
+    return 0 if ok == len(ergebnisse) else 2  # Kommentar: Exit-Code (2 = Teilfehler)
+
+
+if __name__ == "__main__":  # Kommentar: Direktausführung
+    sys.exit(main())  # Kommentar: Aufruf
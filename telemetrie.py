@@ -0,0 +1,219 @@
+# telemetrie.py  # Kommentar: Leichte Zeitmessung je Stufe (Spans), strukturierte Logs und Prometheus-Metriken
+
+import os  # Kommentar: Pfade/Env
+import json  # Kommentar: Log-Zeilen als JSON
+import time  # Kommentar: Zeitmessung
+import uuid  # Kommentar: Job-IDs
+import threading  # Kommentar: Locks (mehrere Sessions/Worker)
+import contextvars  # Kommentar: aktueller Job je Thread/Aufruf
+from collections import deque  # Kommentar: letzte N Jobs
+from contextlib import contextmanager  # Kommentar: with-Blöcke für Jobs/Stufen
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Kommentar: optionaler /metrics-Endpunkt
+
+import config  # Kommentar: Basisverzeichnis
+
+TELEMETRIE_AKTIV = os.getenv("TELEMETRIE_AKTIV", "1") != "0"  # Kommentar: Per Env abschaltbar (TELEMETRIE_AKTIV=0)
+TELEMETRIE_ORDNER = os.getenv("TELEMETRIE_ORDNER", os.path.join(config.BASE_DIR, "telemetrie"))  # Kommentar: Ablage für Log + Metriken
+LOG_DATEI = os.path.join(TELEMETRIE_ORDNER, "telemetrie.jsonl")  # Kommentar: eine JSON-Zeile je Job
+METRIKEN_DATEI = os.path.join(TELEMETRIE_ORDNER, "metriken.prom")  # Kommentar: Prometheus-Textformat (z.B. für node_exporter textfile)
+LOG_MAX_BYTES = int(os.getenv("TELEMETRIE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Kommentar: Log rotieren ab dieser Größe (0 = nie)
+LOG_BACKUPS = int(os.getenv("TELEMETRIE_LOG_BACKUPS", "3"))  # Kommentar: Anzahl alter Logs (telemetrie.jsonl.1 ... .N)
+METRIKEN_PORT = int(os.getenv("TELEMETRIE_METRIKEN_PORT", "0"))  # Kommentar: >0 = /metrics per HTTP anbieten
+LETZTE_JOBS = int(os.getenv("TELEMETRIE_LETZTE_JOBS", "20"))  # Kommentar: Jobs für die Debug-Anzeige
+DAUER_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # Kommentar: Histogramm-Grenzen in Sekunden
+
+_aktueller_job = contextvars.ContextVar("telemetrie_job", default=None)  # Kommentar: Job des laufenden Threads
+_lock = threading.Lock()  # Kommentar: Lock für Metriken/letzte Jobs (nur Speicher, keine Datei-I/O)
+_datei_lock = threading.Lock()  # Kommentar: Lock für Log-/Metriken-Datei (I/O außerhalb von _lock)
+_stand = 0  # Kommentar: Nummer des letzten Metriken-Stands (unter _lock erhöht)
+_stand_geschrieben = 0  # Kommentar: zuletzt in die Datei geschriebener Stand (unter _datei_lock)
+_letzte = deque(maxlen=LETZTE_JOBS)  # Kommentar: abgeschlossene Jobs (neueste rechts)
+_histogramme = {}  # Kommentar: (Metrik, Label) -> {"buckets", "summe", "anzahl"}
+_zaehler = {}  # Kommentar: (Metrik, Labels) -> Wert
+_server = None  # Kommentar: HTTP-Server (bei Bedarf gestartet)
+
+
+def _zahlen(werte: dict) -> dict:  # Kommentar: nur Zahlenwerte (bool zählt nicht als Zahl)
+    return {k: v for k, v in werte.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}  # Kommentar: filtern
+
+
+def _histogramm_erfassen(metrik: str, label: str, dauer_s: float) -> None:  # Kommentar: Dauer einsortieren (unter Lock aufrufen)
+    h = _histogramme.setdefault((metrik, label), {"buckets": [0] * len(DAUER_BUCKETS), "summe": 0.0, "anzahl": 0})  # Kommentar: Eintrag holen/anlegen
+    for i, grenze in enumerate(DAUER_BUCKETS):  # Kommentar: kumulative Buckets
+        if dauer_s <= grenze:  # Kommentar: passt in Bucket?
+            h["buckets"][i] += 1  # Kommentar: zählen
+    h["summe"] += dauer_s  # Kommentar: Summe
+    h["anzahl"] += 1  # Kommentar: Anzahl
+
+
+def _zaehlen(metrik: str, labels: tuple, wert: float = 1) -> None:  # Kommentar: Zähler erhöhen (unter Lock aufrufen)
+    _zaehler[(metrik, labels)] = _zaehler.get((metrik, labels), 0) + wert  # Kommentar: erhöhen
+
+
+def _stufe_erfassen(span: dict) -> None:  # Kommentar: Metriken einer Stufe aktualisieren (unter Lock aufrufen)
+    _histogramm_erfassen("gutachten_stufe_dauer_sekunden", span["name"], span["dauer_s"])  # Kommentar: Dauer
+    _zaehlen("gutachten_stufe_total", (("stufe", span["name"]), ("ergebnis", span["ergebnis"])))  # Kommentar: Anzahl je Ergebnis
+    for attribut, wert in _zahlen(span["attribute"]).items():  # Kommentar: Größen (Bytes, Seiten, Zeichen, Tokens, Versuche)
+        _zaehlen("gutachten_stufe_attribut_summe_total", (("stufe", span["name"]), ("attribut", attribut)), wert)  # Kommentar: aufsummieren
+
+
+def _log_rotieren() -> None:  # Kommentar: Log ab LOG_MAX_BYTES umbenennen (telemetrie.jsonl -> .1 -> .2 ...; unter _datei_lock aufrufen)
+    if LOG_MAX_BYTES <= 0 or not os.path.exists(LOG_DATEI) or os.path.getsize(LOG_DATEI) < LOG_MAX_BYTES:  # Kommentar: noch klein genug?
+        return  # Kommentar: nichts tun
+    if LOG_BACKUPS <= 0:  # Kommentar: keine alten Logs behalten
+        os.remove(LOG_DATEI)  # Kommentar: neu beginnen
+        return  # Kommentar: fertig
+    for i in range(LOG_BACKUPS - 1, 0, -1):  # Kommentar: ältere Logs eine Stelle weiter schieben
+        if os.path.exists(f"{LOG_DATEI}.{i}"):  # Kommentar: vorhanden?
+            os.replace(f"{LOG_DATEI}.{i}", f"{LOG_DATEI}.{i + 1}")  # Kommentar: umbenennen (ältestes wird überschrieben)
+    os.replace(LOG_DATEI, LOG_DATEI + ".1")  # Kommentar: aktuelles Log wird .1
+
+
+def _log_schreiben(zeile: str, metriken: str, stand: int) -> None:  # Kommentar: Strukturierte Log-Zeile + Metriken-Datei (außerhalb von _lock)
+    global _stand_geschrieben  # Kommentar: Modulvariable setzen
+    try:  # Kommentar: Telemetrie darf nie die Verarbeitung stören
+        with _datei_lock:  # Kommentar: Dateien exklusiv (Jobs blockieren sich nicht beim Erfassen)
+            os.makedirs(TELEMETRIE_ORDNER, exist_ok=True)  # Kommentar: Ordner sicherstellen
+            _log_rotieren()  # Kommentar: Größe begrenzen
+            with open(LOG_DATEI, "a", encoding="utf-8") as f:  # Kommentar: anhängen
+                f.write(zeile + "\n")  # Kommentar: Zeile schreiben
+            if stand > _stand_geschrieben:  # Kommentar: kein älterer Stand überschreibt einen neueren
+                _metriken_datei_schreiben(metriken)  # Kommentar: Metriken-Datei aktualisieren
+                _stand_geschrieben = stand  # Kommentar: merken
+    except OSError as e:  # Kommentar: z.B. schreibgeschütztes Dateisystem
+        print("[DEBUG] Telemetrie nicht geschrieben:", repr(e))  # Kommentar: loggen
+
+
+def _metriken_datei_schreiben(metriken: str) -> None:  # Kommentar: Prometheus-Datei atomar ersetzen (Leser sehen nie halbe Dateien)
+    tmp = METRIKEN_DATEI + ".tmp"  # Kommentar: temporäre Datei
+    with open(tmp, "w", encoding="utf-8") as f:  # Kommentar: schreiben
+        f.write(metriken)  # Kommentar: Inhalt
+    os.replace(tmp, METRIKEN_DATEI)  # Kommentar: atomar umbenennen
+
+
+def _abschliessen(eintrag: dict) -> None:  # Kommentar: Job beenden: Metriken, letzte Jobs, dann Log/Datei ohne Lock
+    global _stand  # Kommentar: Modulvariable setzen
+    with _lock:  # Kommentar: exklusiv (nur Speicher)
+        _histogramm_erfassen("gutachten_job_dauer_sekunden", eintrag["name"], eintrag["dauer_s"])  # Kommentar: Gesamtdauer
+        _zaehlen("gutachten_job_total", (("job", eintrag["name"]), ("ergebnis", eintrag["ergebnis"])))  # Kommentar: Anzahl
+        for span in eintrag["stufen"]:  # Kommentar: Stufen des Jobs
+            _stufe_erfassen(span)  # Kommentar: Metriken
+        _letzte.append(eintrag)  # Kommentar: für Debug-Anzeige
+        _stand += 1  # Kommentar: neuer Metriken-Stand
+        stand = _stand  # Kommentar: Nummer dieses Stands
+        metriken = metriken_text()  # Kommentar: Schnappschuss der Metriken
+    _log_schreiben(json.dumps(eintrag, ensure_ascii=False, default=str), metriken, stand)  # Kommentar: Datei-I/O ohne _lock
+
+
+@contextmanager
+def job(name: str, **attribute):  # Kommentar: Job (Trace) starten; innerhalb eines Jobs wie eine Stufe
+    if not TELEMETRIE_AKTIV or _aktueller_job.get() is not None:  # Kommentar: aus oder schon in einem Job?
+        with stufe(name, **attribute) as werte:  # Kommentar: als Stufe des äußeren Jobs
+            yield werte  # Kommentar: Attribute zum Ergänzen
+        return  # Kommentar: fertig
+    eintrag = {"id": uuid.uuid4().hex[:12], "name": name, "start": round(time.time(), 3), "ergebnis": "ok", "attribute": dict(attribute), "stufen": []}  # Kommentar: Job-Eintrag
+    token = _aktueller_job.set(eintrag)  # Kommentar: als aktuellen Job setzen
+    start = time.perf_counter()  # Kommentar: Start
+    try:  # Kommentar: Ergebnis festhalten
+        yield eintrag["attribute"]  # Kommentar: Aufrufer kann Attribute ergänzen
+    except BaseException as e:  # Kommentar: Fehler im Job
+        eintrag["ergebnis"] = "fehler"  # Kommentar: markieren
+        eintrag["fehler"] = type(e).__name__  # Kommentar: Fehlerart (ohne Inhalt/Daten)
+        raise  # Kommentar: weitergeben
+    finally:  # Kommentar: immer abschließen
+        _aktueller_job.reset(token)  # Kommentar: Job-Kontext verlassen
+        eintrag["dauer_s"] = round(time.perf_counter() - start, 4)  # Kommentar: Dauer
+        _abschliessen(eintrag)  # Kommentar: erfassen
+
+
+@contextmanager
+def stufe(name: str, werte: dict | None = None, **attribute):  # Kommentar: Stufe (Span) messen; Zahlen aus werte (z.B. info) werden am Ende übernommen
+    if not TELEMETRIE_AKTIV:  # Kommentar: abgeschaltet?
+        yield dict(attribute)  # Kommentar: Attribute ins Leere
+        return  # Kommentar: fertig
+    span = {"name": name, "ergebnis": "ok", "attribute": dict(attribute)}  # Kommentar: Span
+    start = time.perf_counter()  # Kommentar: Start
+    try:  # Kommentar: Ergebnis festhalten
+        yield span["attribute"]  # Kommentar: Aufrufer ergänzt Größen (Zeichen, Seiten, ...)
+    except BaseException as e:  # Kommentar: Fehler in der Stufe
+        span["ergebnis"] = "fehler"  # Kommentar: markieren
+        span["fehler"] = type(e).__name__  # Kommentar: Fehlerart
+        raise  # Kommentar: weitergeben
+    finally:  # Kommentar: immer erfassen
+        span["dauer_s"] = round(time.perf_counter() - start, 4)  # Kommentar: Dauer
+        if werte:  # Kommentar: Zahlen aus Status-Dict übernehmen
+            span["attribute"].update(_zahlen(werte))  # Kommentar: z.B. Versuche, Wartezeit, Tokens
+        eintrag = _aktueller_job.get()  # Kommentar: laufender Job?
+        if eintrag is not None:  # Kommentar: ja -> im Job sammeln
+            eintrag["stufen"].append(span)  # Kommentar: anhängen (Metriken beim Job-Ende)
+        else:  # Kommentar: Stufe ohne Job (z.B. Benchmark)
+            with _lock:  # Kommentar: exklusiv
+                _stufe_erfassen(span)  # Kommentar: nur Metriken
+
+
+def attribute_setzen(**attribute) -> None:  # Kommentar: Attribute am laufenden Job setzen (z.B. Cache-Treffer)
+    eintrag = _aktueller_job.get()  # Kommentar: laufender Job
+    if eintrag is not None:  # Kommentar: nur innerhalb eines Jobs
+        eintrag["attribute"].update(attribute)  # Kommentar: setzen
+
+
+def letzte_jobs() -> list[dict]:  # Kommentar: letzte N Jobs (neueste zuerst) für die Debug-Anzeige
+    with _lock:  # Kommentar: exklusiv
+        return list(reversed(_letzte))  # Kommentar: Kopie der Liste
+
+
+def _labels(labels: tuple) -> str:  # Kommentar: Labels im Prometheus-Format
+    return ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels)  # Kommentar: \ und " escapen
+
+
+def metriken_text() -> str:  # Kommentar: alle Metriken im Prometheus-Textformat
+    zeilen = []  # Kommentar: Ausgabezeilen
+    for metrik in sorted({m for m, _ in _histogramme}):  # Kommentar: Histogramme
+        zeilen.append(f"# TYPE {metrik} histogram")  # Kommentar: Typ
+        label_name = "stufe" if metrik.startswith("gutachten_stufe") else "job"  # Kommentar: Label je Metrik
+        for (m, label), h in sorted(_histogramme.items()):  # Kommentar: Einträge
+            if m != metrik:  # Kommentar: andere Metrik?
+                continue  # Kommentar: überspringen
+            basis = _labels(((label_name, label),))  # Kommentar: Label-Text
+            for grenze, anzahl in zip(DAUER_BUCKETS, h["buckets"]):  # Kommentar: Buckets
+                zeilen.append(f'{metrik}_bucket{{{basis},le="{grenze}"}} {anzahl}')  # Kommentar: Bucket-Zeile
+            zeilen.append(f'{metrik}_bucket{{{basis},le="+Inf"}} {h["anzahl"]}')  # Kommentar: alle
+            zeilen.append(f"{metrik}_sum{{{basis}}} {round(h['summe'], 6)}")  # Kommentar: Summe
+            zeilen.append(f"{metrik}_count{{{basis}}} {h['anzahl']}")  # Kommentar: Anzahl
+    for metrik in sorted({m for m, _ in _zaehler}):  # Kommentar: Zähler
+        zeilen.append(f"# TYPE {metrik} counter")  # Kommentar: Typ
+        for (m, labels), wert in sorted(_zaehler.items()):  # Kommentar: Einträge
+            if m == metrik:  # Kommentar: passende Metrik?
+                zeilen.append(f"{metrik}{{{_labels(labels)}}} {wert}")  # Kommentar: Zeile
+    return "\n".join(zeilen) + "\n"  # Kommentar: Text (endet mit Zeilenumbruch)
+
+
+class _MetrikenHandler(BaseHTTPRequestHandler):  # Kommentar: GET /metrics
+    def do_GET(self):  # Kommentar: Anfrage beantworten
+        if self.path != "/metrics":  # Kommentar: nur /metrics
+            self.send_error(404)  # Kommentar: unbekannt
+            return  # Kommentar: fertig
+        with _lock:  # Kommentar: konsistenter Stand
+            inhalt = metriken_text().encode("utf-8")  # Kommentar: Text
+        self.send_response(200)  # Kommentar: OK
+        self.send_header("Content-Type", "text/plain; version=0.0.4")  # Kommentar: Prometheus-Format
+        self.send_header("Content-Length", str(len(inhalt)))  # Kommentar: Länge
+        self.end_headers()  # Kommentar: Header fertig
+        self.wfile.write(inhalt)  # Kommentar: senden
+
+    def log_message(self, *args):  # Kommentar: keine Zugriffslogs
+        pass  # Kommentar: still
+
+
+def metriken_server_starten(port: int | None = None) -> None:  # Kommentar: /metrics einmal pro Prozess starten (Port 0 = aus)
+    global _server  # Kommentar: Modulvariable setzen
+    port = METRIKEN_PORT if port is None else port  # Kommentar: Port aus Parameter oder Env
+    with _lock:  # Kommentar: nur ein Thread startet den Server
+        if _server is not None or port <= 0:  # Kommentar: läuft schon oder aus?
+            return  # Kommentar: nichts tun
+        try:  # Kommentar: Port belegt (z.B. zweiter Prozess) -> ohne Endpunkt weiter
+            _server = ThreadingHTTPServer(("127.0.0.1", port), _MetrikenHandler)  # Kommentar: nur lokal erreichbar
+        except OSError as e:  # Kommentar: Fehlerfall
+            print("[DEBUG] Metriken-Endpunkt nicht gestartet:", repr(e))  # Kommentar: loggen
+            return  # Kommentar: fertig
+        threading.Thread(target=_server.serve_forever, name="metriken", daemon=True).start()  # Kommentar: im Hintergrund bedienen
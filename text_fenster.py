@@ -0,0 +1,111 @@
+# text_fenster.py  # Kommentar: Abschnittsbewusste Textauswahl (statt blindem Abschneiden nach MAX_TEXT_CHARS)
+
+import re  # Kommentar: Reguläre Ausdrücke (einmal kompiliert)
+
+KOPF_ZEICHEN = 2500  # Kommentar: Dokumentanfang immer mitnehmen (Mandant, Kennzeichen, Daten)
+HERGANG_MIN_ZEICHEN = 250  # Kommentar: Hergang-Fenster erst nach so vielen Zeichen an Überschrift beenden
+HERGANG_MAX_ZEICHEN = 2000  # Kommentar: Maximale Länge eines Hergang-Fensters
+ZEILEN_VORHER = 1  # Kommentar: Kontextzeilen vor einer Kosten-/Stammdatenzeile
+ZEILEN_NACHHER = 2  # Kommentar: Kontextzeilen nach einer Kosten-/Stammdatenzeile
+TRENNER = "\n[...]\n"  # Kommentar: Markierung für ausgelassene Textstellen
+
+HERGANG_BEGRIFFE = [  # Kommentar: Überschriften wie im PROMPT_TEMPLATE (Suchlogik)
+    "Schadenhergang", "Schadenshergang", "Unfallhergang", "Sachverhalt",
+    "Unfallschilderung", "Hergang", "Unfallbeschreibung",
+]  # Kommentar: Ende Hergang
+KOSTEN_BEGRIFFE = [  # Kommentar: Kostenfelder/Kalkulationsblöcke
+    "Reparaturkosten", "Kalkulation", "Wiederbeschaffungswert", "WBW", "Restwert", "Wiederbeschaffungsaufwand",
+    "Wertminderung", "Minderwert", "Nutzungsausfall", "Kostenpauschale", "Gutachterkosten", "Gutachtenkosten",
+    "Sachverständigenkosten", "Mehrwertsteuer", "MwSt", "Netto", "Brutto", "Schadenhöhe", "Zusammenfassung",
+]  # Kommentar: Ende Kosten
+STAMMDATEN_BEGRIFFE = [  # Kommentar: Nummern, Beteiligte, Unfalldaten
+    "Schadennummer", "Schadensnummer", "Schaden-Nr", "Aktenzeichen", "Polizei", "Tagebuch", "Kennzeichen",
+    "Anspruchsteller", "Auftraggeber", "Eigentümer", "Halter", "Fahrzeugtyp", "Hersteller", "Unfalltag",
+    "Unfalldatum", "Unfallzeit", "Uhrzeit", "Unfallort", "Schadentag", "Versicherung", "VS-Nr",
+]  # Kommentar: Ende Stammdaten
+
+
+def _begriffe_regex(begriffe: list[str]) -> re.Pattern:  # Kommentar: Begriffsliste -> kompilierter Regex
+    return re.compile("|".join(re.escape(b) for b in sorted(begriffe, key=len, reverse=True)), re.IGNORECASE)  # Kommentar: längste zuerst
+
+
+HERGANG_UEBERSCHRIFT_RE = re.compile(  # Kommentar: Zeile beginnt (ggf. nummeriert) mit Hergang-Überschrift
+    r"^\s*(?:\d+(?:\.\d+)*\.?\s*)?(?:" + "|".join(re.escape(b) for b in HERGANG_BEGRIFFE) + r")\b",
+    re.IGNORECASE,
+)  # Kommentar: Ende Regex
+KOSTEN_RE = _begriffe_regex(KOSTEN_BEGRIFFE)  # Kommentar: Kostenbegriffe
+STAMMDATEN_RE = _begriffe_regex(STAMMDATEN_BEGRIFFE)  # Kommentar: Stammdatenbegriffe
+BETRAG_RE = re.compile(r"\d[\d.]*,\d{2}|\d+\s*(?:€|EUR)")  # Kommentar: Euro-Betrag in der Zeile
+ZEILE_RE = re.compile(r"[^\n]*\n?")  # Kommentar: Zeilen mit Offsets
+
+
+def _ist_ueberschrift(zeile: str) -> bool:  # Kommentar: Grobe Heuristik für Überschriftszeilen
+    z = zeile.strip()  # Kommentar: Leerraum entfernen
+    if not z or len(z) > 60 or len(z.split()) > 6:  # Kommentar: leer oder zu lang?
+        return False  # Kommentar: keine Überschrift
+    if z[-1] in ".,;" and not re.fullmatch(r"\d+(?:\.\d+)*\.", z):  # Kommentar: Satzende (außer reine Nummer)
+        return False  # Kommentar: keine Überschrift
+    return z.lstrip("0123456789. ")[:1].isupper()  # Kommentar: beginnt (nach Nummer) mit Großbuchstaben
+
+
+def _zeilen(text: str) -> list[tuple[int, int, str]]:  # Kommentar: (start, ende, zeile) je Zeile
+    return [(m.start(), m.end(), m.group()) for m in ZEILE_RE.finditer(text) if m.group()]  # Kommentar: leere Treffer weglassen
+
+
+def abschnitte_indexieren(text: str) -> dict:  # Kommentar: Fundstellen je Gruppe als (start, ende)-Bereiche
+    zeilen = _zeilen(text)  # Kommentar: Zeilen mit Offsets
+    index = {"hergang": [], "kosten": [], "stammdaten": []}  # Kommentar: Ergebnis
+    for i, (start, ende, zeile) in enumerate(zeilen):  # Kommentar: Zeilen iterieren
+        if HERGANG_UEBERSCHRIFT_RE.match(zeile) and _ist_ueberschrift(zeile.split(":")[0]):  # Kommentar: Hergang-Überschrift?
+            fenster_ende = ende  # Kommentar: Fenster wächst zeilenweise
+            for n_start, n_ende, n_zeile in zeilen[i + 1:]:  # Kommentar: folgende Zeilen
+                if n_start - start >= HERGANG_MIN_ZEICHEN and _ist_ueberschrift(n_zeile):  # Kommentar: nächstes Kapitel?
+                    break  # Kommentar: Abschnitt zu Ende
+                if n_ende - start > HERGANG_MAX_ZEICHEN:  # Kommentar: zu lang?
+                    break  # Kommentar: kappen
+                fenster_ende = n_ende  # Kommentar: Zeile übernehmen
+            index["hergang"].append((start, fenster_ende))  # Kommentar: Bereich merken
+            continue  # Kommentar: nächste Zeile
+        gruppe = None  # Kommentar: Kosten oder Stammdaten?
+        if KOSTEN_RE.search(zeile) and (BETRAG_RE.search(zeile) or _ist_ueberschrift(zeile)):  # Kommentar: Kostenzeile mit Betrag oder Kostenüberschrift
+            gruppe = "kosten"  # Kommentar: Kosten
+        elif STAMMDATEN_RE.search(zeile):  # Kommentar: Stammdatenzeile
+            gruppe = "stammdaten"  # Kommentar: Stammdaten
+        if gruppe:  # Kommentar: Treffer?
+            von = zeilen[max(i - ZEILEN_VORHER, 0)][0]  # Kommentar: Kontext davor
+            bis = zeilen[min(i + ZEILEN_NACHHER, len(zeilen) - 1)][1]  # Kommentar: Kontext danach
+            index[gruppe].append((von, bis))  # Kommentar: Bereich merken
+    return index  # Kommentar: Index zurückgeben
+
+
+def _bereiche_vereinigen(bereiche: list[tuple[int, int]]) -> list[tuple[int, int]]:  # Kommentar: Überlappende Bereiche zusammenfassen
+    ergebnis = []  # Kommentar: Ergebnisliste
+    for start, ende in sorted(bereiche):  # Kommentar: nach Start sortiert
+        if ergebnis and start <= ergebnis[-1][1]:  # Kommentar: überlappt/angrenzend?
+            ergebnis[-1] = (ergebnis[-1][0], max(ergebnis[-1][1], ende))  # Kommentar: verlängern
+        else:  # Kommentar: neuer Bereich
+            ergebnis.append((start, ende))  # Kommentar: anhängen
+    return ergebnis  # Kommentar: Liste zurückgeben
+
+
+def _laenge(bereiche: list[tuple[int, int]]) -> int:  # Kommentar: Zeichen inkl. Trenner
+    return sum(e - s for s, e in bereiche) + len(TRENNER) * max(len(bereiche) - 1, 0)  # Kommentar: Summe
+
+
+def text_fuer_prompt(text: str, max_zeichen: int) -> str:  # Kommentar: Relevante Fenster innerhalb des Budgets zusammenstellen
+    if len(text) <= max_zeichen:  # Kommentar: passt komplett?
+        return text  # Kommentar: unverändert
+    index = abschnitte_indexieren(text)  # Kommentar: Abschnitte finden
+    gewaehlt = [(0, min(KOPF_ZEICHEN, max_zeichen))]  # Kommentar: Dokumentanfang immer
+    for gruppe in ["hergang", "kosten", "stammdaten"]:  # Kommentar: nach Priorität auffüllen
+        for bereich in index[gruppe]:  # Kommentar: Fundstellen in Dokumentreihenfolge
+            kandidat = _bereiche_vereinigen(gewaehlt + [bereich])  # Kommentar: probeweise hinzufügen
+            if _laenge(kandidat) <= max_zeichen:  # Kommentar: passt ins Budget?
+                gewaehlt = kandidat  # Kommentar: übernehmen
+    rest = max_zeichen - _laenge(gewaehlt)  # Kommentar: freies Budget
+    if rest > 0:  # Kommentar: noch Platz?
+        luecke_start = gewaehlt[0][1]  # Kommentar: nach dem Kopf weiterlesen
+        naechster = gewaehlt[1][0] if len(gewaehlt) > 1 else len(text)  # Kommentar: bis zum nächsten Fenster
+        gewaehlt[0] = (0, min(luecke_start + rest, naechster))  # Kommentar: Kopf mit Resttext verlängern
+        gewaehlt = _bereiche_vereinigen(gewaehlt)  # Kommentar: ggf. zusammenfassen
+    return TRENNER.join(text[s:e].strip("\n") for s, e in gewaehlt)  # Kommentar: Fenster in Dokumentreihenfolge verbinden
@@ -0,0 +1,214 @@
+# user_store.py  # Kommentar: Benutzer-Speicher (JSON oder SQLite/WAL) + Passwort-Hashing im begrenzten Worker-Pool
+
+import os  # Kommentar: Pfade/Env
+import json  # Kommentar: users.json (Altbestand / JSON-Backend)
+import time  # Kommentar: Zeitstempel
+import hmac  # Kommentar: konstanter Zeitvergleich beim Login
+import sqlite3  # Kommentar: Lokale Datenbank (ohne externe Library)
+import hashlib  # Kommentar: PBKDF2
+import secrets  # Kommentar: kryptografisch sicherer Salt
+import threading  # Kommentar: Locks / Semaphore
+from concurrent.futures import ThreadPoolExecutor  # Kommentar: Hashing außerhalb des Streamlit-Skript-Threads
+import config  # Kommentar: Datenordner
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # Kommentar: Basisverzeichnis des Projekts
+USERS_FILE = os.path.join(BASE_DIR, "users.json")  # Kommentar: bisherige User-Datei (Hash + Salt)
+ALTE_USERS_DB = os.path.join(BASE_DIR, "users.sqlite3")  # Kommentar: früherer Ort im Projektordner (bestehende Installationen)
+USERS_DB = os.getenv("USERS_DB") or (ALTE_USERS_DB if os.path.isfile(ALTE_USERS_DB) else os.path.join(config.DATEN_ORDNER, "users.sqlite3"))  # Kommentar: SQLite-Datei im Datenordner (nicht im Repo)
+USER_STORE = os.getenv("USER_STORE", "sqlite")  # Kommentar: "sqlite" oder "json"
+
+PBKDF2_ITERATIONS = 200_000  # Kommentar: PBKDF2 Iterationen (MVP-sicher)
+PBKDF2_ALGO = "sha256"  # Kommentar: PBKDF2 Hash Algorithmus
+SALT_BYTES = 16  # Kommentar: Salt Länge (Bytes)
+HASH_WORKER = int(os.getenv("HASH_WORKER", str(min(4, os.cpu_count() or 1))))  # Kommentar: gleichzeitige Hash-Berechnungen (pbkdf2_hmac gibt den GIL frei)
+HASH_MAX_WARTEND = int(os.getenv("HASH_MAX_WARTEND", "64"))  # Kommentar: max. Anmeldungen in Bearbeitung/Warteschlange
+HASH_TIMEOUT_S = 30.0  # Kommentar: max. Wartezeit auf einen Platz in der Warteschlange
+
+
+def valid_username(name: str) -> bool:  # Kommentar: Username validieren
+    if not name or len(name) < 3 or len(name) > 32:  # Kommentar: Längencheck
+        return False  # Kommentar: Ungültig
+    for ch in name:  # Kommentar: Zeichen prüfen
+        if not (ch.isalnum() or ch in ["_", "-"]):  # Kommentar: Nur alnum/_/-
+            return False  # Kommentar: Ungültig
+    return True  # Kommentar: Gültig
+
+
+def valid_password(pw: str) -> bool:  # Kommentar: Passwort validieren
+    return isinstance(pw, str) and len(pw) >= 10  # Kommentar: Mindestlänge
+
+
+def pbkdf2_hash_password(password: str, salt_hex: str) -> str:  # Kommentar: PBKDF2 Hash berechnen
+    salt = bytes.fromhex(salt_hex)  # Kommentar: Salt hex -> bytes
+    dk = hashlib.pbkdf2_hmac(PBKDF2_ALGO, password.encode("utf-8"), salt, PBKDF2_ITERATIONS)  # Kommentar: Ableitung
+    return dk.hex()  # Kommentar: Rückgabe als hex
+
+
+_hash_pool = None  # Kommentar: Worker-Pool (bei Bedarf erstellt)
+_hash_pool_lock = threading.Lock()  # Kommentar: Lock für Pool-Erstellung
+_hash_plaetze = threading.BoundedSemaphore(HASH_MAX_WARTEND)  # Kommentar: begrenzt laufende + wartende Hash-Aufträge
+
+
+def _hash_pool_holen() -> ThreadPoolExecutor:  # Kommentar: Pool einmal pro Prozess erstellen
+    global _hash_pool  # Kommentar: Modulvariable setzen
+    with _hash_pool_lock:  # Kommentar: nur ein Thread erstellt den Pool
+        if _hash_pool is None:  # Kommentar: noch kein Pool?
+            _hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKER, thread_name_prefix="pbkdf2")  # Kommentar: Pool starten
+        return _hash_pool  # Kommentar: Pool zurückgeben
+
+
+def hash_im_pool(password: str, salt_hex: str) -> str:  # Kommentar: PBKDF2 im Pool berechnen (blockiert nur den Aufrufer)
+    if not _hash_plaetze.acquire(timeout=HASH_TIMEOUT_S):  # Kommentar: Warteschlange voll?
+        raise RuntimeError("Anmeldung derzeit überlastet. Bitte kurz warten und erneut versuchen.")  # Kommentar: Fehler
+    try:  # Kommentar: Platz immer freigeben
+        return _hash_pool_holen().submit(pbkdf2_hash_password, password, salt_hex).result()  # Kommentar: berechnen lassen
+    finally:  # Kommentar: Aufräumen
+        _hash_plaetze.release()  # Kommentar: Platz freigeben
+
+
+def create_password_record(password: str) -> dict:  # Kommentar: Record erstellen (salt + hash)
+    salt_hex = secrets.token_bytes(SALT_BYTES).hex()  # Kommentar: Salt erzeugen
+    pw_hash_hex = hash_im_pool(password, salt_hex)  # Kommentar: Hash erzeugen
+    return {"salt": salt_hex, "hash": pw_hash_hex}  # Kommentar: Record zurückgeben
+
+
+def check_password(password: str, record: dict) -> bool:  # Kommentar: Passwort prüfen
+    if not isinstance(record, dict):  # Kommentar: Typcheck
+        return False  # Kommentar: Ungültig
+    salt_hex = record.get("salt", "")  # Kommentar: Salt holen
+    stored_hash = record.get("hash", "")  # Kommentar: Hash holen
+    if not salt_hex or not stored_hash:  # Kommentar: Wenn fehlt
+        return False  # Kommentar: Ungültig
+    candidate = hash_im_pool(password, salt_hex)  # Kommentar: Kandidatenhash
+    return hmac.compare_digest(candidate, stored_hash)  # Kommentar: Konstanter Vergleich
+
+
+class JsonBenutzerSpeicher:  # Kommentar: Bisheriges Format (users.json), Schreibzugriffe im Prozess serialisiert
+    def __init__(self, pfad: str = USERS_FILE):  # Kommentar: Dateipfad
+        self.pfad = pfad  # Kommentar: merken
+        self.lock = threading.Lock()  # Kommentar: verhindert "letzter Schreiber gewinnt" zwischen Sessions
+
+    def _laden(self) -> dict:  # Kommentar: Datei laden
+        if not os.path.isfile(self.pfad):  # Kommentar: Wenn Datei nicht existiert
+            return {}  # Kommentar: Dann leeres Dict
+        try:  # Kommentar: Fehler abfangen
+            with open(self.pfad, "r", encoding="utf-8") as f:  # Kommentar: Datei öffnen
+                data = json.load(f)  # Kommentar: JSON laden
+            return data if isinstance(data, dict) else {}  # Kommentar: Format check
+        except Exception:  # Kommentar: Fehlerfall
+            return {}  # Kommentar: Fallback
+
+    def holen(self, username: str) -> dict | None:  # Kommentar: Record eines Benutzers
+        return self._laden().get(username)  # Kommentar: ganze Datei lesen (JSON kennt keinen Index)
+
+    def anlegen(self, username: str, record: dict) -> bool:  # Kommentar: Benutzer anlegen (False = existiert bereits)
+        with self.lock:  # Kommentar: Lesen-Ändern-Schreiben exklusiv
+            users = self._laden()  # Kommentar: aktueller Stand
+            if username in users:  # Kommentar: existiert?
+                return False  # Kommentar: nicht überschreiben
+            users[username] = record  # Kommentar: hinzufügen
+            tmp = self.pfad + ".tmp"  # Kommentar: Temp-Datei
+            with open(tmp, "w", encoding="utf-8") as f:  # Kommentar: Temp-Datei öffnen
+                json.dump(users, f, ensure_ascii=False, indent=2)  # Kommentar: JSON schreiben
+            os.replace(tmp, self.pfad)  # Kommentar: Temp-Datei atomar ersetzen
+            return True  # Kommentar: angelegt
+
+    def anzahl(self) -> int:  # Kommentar: Anzahl Benutzer
+        return len(self._laden())  # Kommentar: zählen
+
+
+class SqliteBenutzerSpeicher:  # Kommentar: Indizierte Lookups, transaktionale Inserts (WAL, mehrere Prozesse möglich)
+    def __init__(self, pfad: str = USERS_DB, json_pfad: str | None = USERS_FILE):  # Kommentar: DB-Pfad + Altbestand
+        self.pfad = pfad  # Kommentar: merken
+        con = self._verbindung()  # Kommentar: Schema anlegen
+        try:  # Kommentar: Verbindung sicher schließen
+            with con:  # Kommentar: Transaktion
+                con.execute(  # Kommentar: Benutzertabelle (Primärschlüssel = Index für Lookups)
+                    "CREATE TABLE IF NOT EXISTS users ("
+                    " username TEXT PRIMARY KEY,"  # Kommentar: eindeutiger Name
+                    " salt TEXT NOT NULL,"  # Kommentar: Salt (hex)
+                    " hash TEXT NOT NULL,"  # Kommentar: PBKDF2-Hash (hex)
+                    " erstellt REAL NOT NULL"  # Kommentar: Anlagezeit
+                    ")"
+                )  # Kommentar: Ende CREATE
+                con.execute("CREATE TABLE IF NOT EXISTS meta (schluessel TEXT PRIMARY KEY, wert TEXT)")  # Kommentar: Migrationsstatus
+            if json_pfad:  # Kommentar: Altbestand übernehmen?
+                self._json_migrieren(con, json_pfad)  # Kommentar: einmalig
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+
+    def _verbindung(self) -> sqlite3.Connection:  # Kommentar: Verbindung öffnen (pro Aufruf, daher threadsicher)
+        os.makedirs(os.path.dirname(self.pfad) or ".", exist_ok=True)  # Kommentar: Ordner sicherstellen
+        con = sqlite3.connect(self.pfad, timeout=30)  # Kommentar: Verbindung mit Wartezeit bei Sperre
+        con.execute("PRAGMA journal_mode=WAL")  # Kommentar: WAL -> Lesen blockiert Schreiben nicht
+        return con  # Kommentar: Verbindung zurückgeben
+
+    def _json_migrieren(self, con: sqlite3.Connection, json_pfad: str) -> None:  # Kommentar: users.json einmalig importieren
+        with con:  # Kommentar: eine Transaktion (Migration + Markierung)
+            if con.execute("SELECT 1 FROM meta WHERE schluessel = 'json_migriert'").fetchone():  # Kommentar: schon erledigt?
+                return  # Kommentar: nichts tun
+            users = JsonBenutzerSpeicher(json_pfad)._laden()  # Kommentar: Altbestand lesen
+            zeilen = [(u, r.get("salt", ""), r.get("hash", ""), time.time()) for u, r in users.items() if isinstance(r, dict)]  # Kommentar: Zeilen bauen
+            con.executemany("INSERT OR IGNORE INTO users (username, salt, hash, erstellt) VALUES (?, ?, ?, ?)", zeilen)  # Kommentar: vorhandene Namen nicht überschreiben
+            con.execute("INSERT INTO meta (schluessel, wert) VALUES ('json_migriert', ?)", (str(len(zeilen)),))  # Kommentar: Markierung
+        if zeilen:  # Kommentar: etwas übernommen?
+            print(f"[DEBUG] {len(zeilen)} Benutzer aus users.json nach SQLite übernommen")  # Kommentar: loggen
+
+    def holen(self, username: str) -> dict | None:  # Kommentar: Record eines Benutzers (Index-Lookup)
+        con = self._verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            zeile = con.execute("SELECT salt, hash FROM users WHERE username = ?", (username,)).fetchone()  # Kommentar: eine Zeile
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+        return {"salt": zeile[0], "hash": zeile[1]} if zeile else None  # Kommentar: gleiches Format wie users.json
+
+    def anlegen(self, username: str, record: dict) -> bool:  # Kommentar: Benutzer anlegen (False = existiert bereits)
+        con = self._verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            with con:  # Kommentar: Transaktion
+                con.execute(  # Kommentar: Insert (Primärschlüssel verhindert Doppelanlage)
+                    "INSERT INTO users (username, salt, hash, erstellt) VALUES (?, ?, ?, ?)",
+                    (username, record["salt"], record["hash"], time.time()),
+                )  # Kommentar: Ende INSERT
+            return True  # Kommentar: angelegt
+        except sqlite3.IntegrityError:  # Kommentar: Name vergeben (auch bei gleichzeitiger Registrierung)
+            return False  # Kommentar: nicht angelegt
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+
+    def anzahl(self) -> int:  # Kommentar: Anzahl Benutzer
+        con = self._verbindung()  # Kommentar: Verbindung öffnen
+        try:  # Kommentar: Verbindung sicher schließen
+            return con.execute("SELECT COUNT(*) FROM users").fetchone()[0]  # Kommentar: zählen
+        finally:  # Kommentar: Aufräumen
+            con.close()  # Kommentar: schließen
+
+
+_speicher = None  # Kommentar: aktiver Speicher (einmal pro Prozess)
+_speicher_lock = threading.Lock()  # Kommentar: Lock für Erstellung
+
+
+def speicher():  # Kommentar: Konfigurierten Speicher holen (USER_STORE)
+    global _speicher  # Kommentar: Modulvariable setzen
+    with _speicher_lock:  # Kommentar: nur ein Thread erstellt den Speicher (inkl. Migration)
+        if _speicher is None:  # Kommentar: noch nicht erstellt?
+            _speicher = JsonBenutzerSpeicher() if USER_STORE == "json" else SqliteBenutzerSpeicher()  # Kommentar: Backend wählen
+        return _speicher  # Kommentar: zurückgeben
+
+
+def register_user(username: str, pw: str, ziel=None) -> tuple[bool, str]:  # Kommentar: Registrieren (ziel: Speicher, Default konfiguriert)
+    ziel = ziel or speicher()  # Kommentar: Speicher
+    if not valid_username(username):  # Kommentar: Username prüfen
+        return False, "Benutzername ungültig (3–32 Zeichen, nur a-z A-Z 0-9 _ -)."  # Kommentar: Meldung
+    if ziel.holen(username) is not None:  # Kommentar: Existiert bereits? (vor dem teuren Hash)
+        return False, "Benutzername existiert bereits."  # Kommentar: Meldung
+    if not valid_password(pw):  # Kommentar: Passwort prüfen
+        return False, "Passwort zu kurz (mindestens 10 Zeichen)."  # Kommentar: Meldung
+    if not ziel.anlegen(username, create_password_record(pw)):  # Kommentar: Hash+Salt speichern (atomar)
+        return False, "Benutzername existiert bereits."  # Kommentar: gleichzeitig registriert
+    return True, "Registrierung erfolgreich. Du kannst dich jetzt einloggen."  # Kommentar: OK
+
+
+def login_pruefen(username: str, pw: str, ziel=None) -> bool:  # Kommentar: Zugangsdaten prüfen (ohne Session-State)
+    record = (ziel or speicher()).holen(username)  # Kommentar: Record holen
+    return bool(record) and check_password(pw, record)  # Kommentar: Check